@@ -1,16 +1,27 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from datetime import datetime, timedelta
-import zipfile
+from datetime import datetime
 import json
 import os
+import hashlib
 from supabase import create_client, Client
 
+from utils.excel_yazici import ExcelKitabi, icerir_stili
+from utils.urun_boyutu import malzeme_kod_anahtari
+from utils.kup import RollupKupu
+from utils.karne_cache import KarneOnbellegi, veri_parmak_izi
+from utils.rapor_cache import veri_surumu
+from utils.bolum import BolumluVeri
+from utils.sema import kanonik_kolonlar, kolon_eslesmesi
+from utils.magaza_raporu import (
+    RAPOR_STILLERI, tum_tespitler, sigara_maskesi, kasa_kod_dizisi,
+    generate_executive_summary, create_top_20_risky, create_excel_report,
+    kamera_kontrolu_ekle, iptal_kodu, iptal_magaza_bolumleri,
+    magazalar_zip, yeni_zip_dosyasi, zip_isci_sayisi
+)
+from ui.rapor_indir import rapor_indir_butonu
+
 # Mobil uyumlu sayfa ayarı
 st.set_page_config(page_title="Envanter Risk Analizi", layout="wide", page_icon="📊")
 
@@ -54,232 +65,10 @@ def get_iptal_verisi_from_sheets():
         return pd.DataFrame()
 
 
-def get_iptal_timestamps_for_magaza(magaza_kodu, malzeme_kodlari):
-    """Belirli mağaza ve ürünler için iptal timestamp bilgilerini döner"""
-    df_iptal = get_iptal_verisi_from_sheets()
-    
-    if df_iptal.empty:
-        return {}
-    
-    # Sabit sütun isimleri - doğrudan kullan
-    col_magaza = 'Mağaza - Anahtar'
-    col_malzeme = 'Malzeme - Anahtar'
-    col_tarih = 'Tarih - Anahtar'  # Tarih boş, Tarih - Anahtar dolu
-    col_saat = 'Fiş Saati'
-    col_miktar = 'Miktar'
-    col_islem_no = 'İşlem Numarası'
-    
-    # Sütunlar yoksa index ile dene
-    cols = df_iptal.columns.tolist()
-    if col_magaza not in cols and len(cols) > 7:
-        col_magaza = cols[7]
-    if col_malzeme not in cols and len(cols) > 17:
-        col_malzeme = cols[17]
-    if col_tarih not in cols and len(cols) > 3:
-        col_tarih = cols[3]
-    if col_saat not in cols and len(cols) > 31:
-        col_saat = cols[31]
-    if col_islem_no not in cols and len(cols) > 36:
-        col_islem_no = cols[36]
-    
-    # Mağaza ve Malzeme kodlarını temizle
-    def clean_code(x):
-        return str(x).strip().replace('.0', '')
-    
-    df_iptal[col_magaza] = df_iptal[col_magaza].apply(clean_code)
-    df_iptal[col_malzeme] = df_iptal[col_malzeme].apply(clean_code)
-    
-    # Mağaza filtrele
-    magaza_str = clean_code(magaza_kodu)
-    df_mag = df_iptal[df_iptal[col_magaza] == magaza_str]
-    
-    if df_mag.empty:
-        return {}
-    
-    # Malzeme kodlarını temizle
-    malzeme_set = set(clean_code(m) for m in malzeme_kodlari)
-    
-    result = {}
-    
-    for _, row in df_mag.iterrows():
-        malzeme = clean_code(row[col_malzeme])
-        
-        if malzeme not in malzeme_set:
-            continue
-        
-        tarih = row.get(col_tarih, '')
-        saat = row.get(col_saat, '')
-        miktar = row.get(col_miktar, 0)
-        islem_no = row.get(col_islem_no, '')
-        
-        if malzeme not in result:
-            result[malzeme] = []
-        
-        result[malzeme].append({
-            'tarih': tarih,
-            'saat': saat,
-            'miktar': miktar,
-            'islem_no': islem_no
-        })
-    
-    return result
-
-
 def enrich_internal_theft_with_camera(internal_df, magaza_kodu, envanter_tarihi, full_df=None):
-    """
-    İç hırsızlık tablosuna kamera kontrol bilgisi ekler
-    Eğer ürünün kendisi için iptal yoksa, aynı kategorideki 100+ TL ürünlerde iptal arar
-    
-    full_df: Tüm envanter verisi (kategori araması için gerekli)
-    """
-    if internal_df.empty:
-        return internal_df
-    
-    df = internal_df.copy()
-    
-    # Envanter tarihini datetime'a çevir
-    if isinstance(envanter_tarihi, str):
-        try:
-            envanter_tarihi = datetime.strptime(envanter_tarihi, '%Y-%m-%d')
-        except:
-            try:
-                envanter_tarihi = datetime.strptime(envanter_tarihi, '%d.%m.%Y')
-            except:
-                envanter_tarihi = datetime.now()
-    elif hasattr(envanter_tarihi, 'to_pydatetime'):
-        envanter_tarihi = envanter_tarihi.to_pydatetime()
-    
-    # 15 gün öncesi (kamera erişim limiti)
-    kamera_limit = envanter_tarihi - timedelta(days=15)
-    
-    # Malzeme kodlarını al
-    malzeme_kodlari = df['Malzeme Kodu'].astype(str).tolist()
-    
-    # Kategori bilgisini al (Mal Grubu Tanımı)
-    kategori_col = None
-    for col in ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup']:
-        if col in df.columns:
-            kategori_col = col
-            break
-    
-    # Kategorideki tüm 100+ TL ürünleri bul (alternatif arama için)
-    kategori_urunleri = {}
-    if kategori_col and full_df is not None:
-        for _, row in df.iterrows():
-            kategori = row.get(kategori_col, '')
-            if kategori and kategori not in kategori_urunleri:
-                # Bu kategorideki 100+ TL ürünleri bul
-                if kategori_col in full_df.columns and 'Satış Fiyatı' in full_df.columns:
-                    kat_mask = (full_df[kategori_col] == kategori) & (full_df['Satış Fiyatı'] >= 100)
-                    kat_urunler = full_df.loc[kat_mask, 'Malzeme Kodu'].astype(str).unique().tolist()
-                    kategori_urunleri[kategori] = kat_urunler
-    
-    # Tüm kategori ürünlerinin iptal verilerini çek
-    tum_kategori_kodlari = set()
-    for kodlar in kategori_urunleri.values():
-        tum_kategori_kodlari.update(kodlar)
-    
-    # İptal verilerini çek (hem direkt ürünler hem kategori ürünleri)
-    tum_kodlar = list(set(malzeme_kodlari) | tum_kategori_kodlari)
-    iptal_data = get_iptal_timestamps_for_magaza(magaza_kodu, tum_kodlar)
-    
-    # Yeni sütunlar
-    kamera_kontrol = []
-    
-    for _, row in df.iterrows():
-        malzeme_kodu = str(row['Malzeme Kodu']).strip()
-        kategori = row.get(kategori_col, '') if kategori_col else ''
-        
-        # Önce direkt ürün için iptal ara
-        sonuc = _ara_iptal_kaydi(malzeme_kodu, iptal_data, kamera_limit)
-        
-        if sonuc['bulundu']:
-            # Ürünün kendisi için kayıt var
-            kamera_kontrol.append(sonuc['detay'])
-        else:
-            # Ürün için kayıt yok, kategorideki diğer 100+ TL ürünlere bak
-            alternatif_bulundu = False
-            alternatif_detay = ""
-            
-            if kategori and kategori in kategori_urunleri:
-                for alt_kod in kategori_urunleri[kategori]:
-                    if alt_kod != malzeme_kodu:
-                        alt_sonuc = _ara_iptal_kaydi(alt_kod, iptal_data, kamera_limit)
-                        if alt_sonuc['bulundu']:
-                            alternatif_bulundu = True
-                            # Alternatif ürün adını bul
-                            alt_ad = ""
-                            if full_df is not None:
-                                alt_rows = full_df[full_df['Malzeme Kodu'].astype(str) == alt_kod]
-                                if len(alt_rows) > 0:
-                                    alt_ad = alt_rows['Malzeme Tanımı'].iloc[0] if 'Malzeme Tanımı' in alt_rows.columns else alt_kod
-                            
-                            alternatif_detay = f"🔄 KATEGORİ: {alt_ad[:30] if alt_ad else alt_kod} → {alt_sonuc['detay']}"
-                            break
-            
-            if alternatif_bulundu:
-                kamera_kontrol.append(alternatif_detay)
-            else:
-                # Ne ürün ne kategori için kayıt yok
-                kamera_kontrol.append(f"❌ {kategori} kategorisinde 100+ TL iptal yok" if kategori else "❌ İptal kaydı yok")
-    
-    df['KAMERA KONTROL DETAY'] = kamera_kontrol
-    
-    return df
-
-
-def _ara_iptal_kaydi(malzeme_kodu, iptal_data, kamera_limit):
-    """Bir ürün için iptal kaydı ara ve formatla"""
-    if malzeme_kodu not in iptal_data:
-        return {'bulundu': False, 'detay': ''}
-    
-    iptaller = iptal_data[malzeme_kodu]
-    son_15_gun = []
-    
-    for iptal in iptaller:
-        tarih_str = str(iptal['tarih'])
-        
-        try:
-            for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y']:
-                try:
-                    tarih = datetime.strptime(tarih_str.split()[0], fmt)
-                    break
-                except:
-                    continue
-            else:
-                continue
-            
-            if tarih >= kamera_limit:
-                son_15_gun.append({**iptal, 'tarih_dt': tarih})
-        except:
-            pass
-    
-    if not son_15_gun:
-        return {'bulundu': False, 'detay': ''}
-    
-    # Tarihe göre sırala ve formatla
-    son_15_gun_sorted = sorted(son_15_gun, key=lambda x: x['tarih_dt'], reverse=True)
-    
-    detaylar = []
-    for iptal in son_15_gun_sorted[:3]:  # En fazla 3 kayıt göster
-        tarih = iptal['tarih_dt'].strftime('%d.%m.%Y')
-        saat = str(iptal.get('saat', ''))[:8]
-        islem_no = str(iptal.get('islem_no', ''))
-        
-        # İşlem numarasından kasa numarasını çıkar (örn: 79150012711503250661 -> pozisyon 4-5)
-        kasa_no = ""
-        if len(islem_no) >= 6:
-            try:
-                kasa_no = f"Kasa:{int(islem_no[4:6])}"
-            except:
-                kasa_no = ""
-        
-        detaylar.append(f"{tarih} {saat} {kasa_no}".strip())
-    
-    return {
-        'bulundu': True,
-        'detay': "✅ KAMERA BAK " + " | ".join(detaylar)
-    }
+    """İç hırsızlık tablosuna kamera kontrol bilgisi ekler (iptal verisi Google Sheets önbelleğinden)"""
+    return kamera_kontrolu_ekle(internal_df, magaza_kodu, envanter_tarihi,
+                                get_iptal_verisi_from_sheets(), full_df=full_df)
 
 
 # ==================== SUPABASE BAĞLANTISI ====================
@@ -340,6 +129,21 @@ login()
 
 # ==================== SUPABASE FONKSİYONLARI ====================
 
+# envanter_veri tablosuna yazılan alanlar (şema anahtarları - utils.sema)
+ENVANTER_VERI_KOLONLARI = {
+    'magaza_kodu', 'magaza_tanim', 'satis_muduru', 'bolge_sorumlusu',
+    'depolama_kosulu_grubu', 'depolama_kosulu', 'envanter_donemi', 'envanter_tarihi', 'envanter_baslangic_tarihi',
+    'urun_grubu_kodu', 'urun_grubu_tanimi', 'mal_grubu_kodu', 'mal_grubu_tanimi',
+    'malzeme_kodu', 'malzeme_tanimi', 'satis_fiyati',
+    'sayim_miktari', 'sayim_tutari', 'kaydi_miktar', 'kaydi_tutar',
+    'fark_miktari', 'fark_tutari', 'kismi_envanter_miktari', 'kismi_envanter_tutari',
+    'fire_miktari', 'fire_tutari', 'onceki_fark_miktari', 'onceki_fark_tutari',
+    'onceki_fire_miktari', 'onceki_fire_tutari', 'satis_miktari', 'satis_hasilati',
+    'iade_miktari', 'iade_tutari', 'iptal_fisteki_miktar', 'iptal_fis_tutari',
+    'iptal_gp_miktari', 'iptal_gp_tutari', 'iptal_satir_miktari', 'iptal_satir_tutari',
+}
+
+
 def save_to_supabase(df_original):
     """
     Excel verisini Supabase'e kaydet
@@ -398,49 +202,9 @@ def save_to_supabase(df_original):
         duplicate_key_cols = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
         df_new = df_new.drop_duplicates(subset=duplicate_key_cols, keep='last')
         
-        # Sütun mapping
-        col_mapping = {
-            'Mağaza Kodu': 'magaza_kodu',
-            'Mağaza Tanım': 'magaza_tanim',
-            'Satış Müdürü': 'satis_muduru',
-            'Bölge Sorumlusu': 'bolge_sorumlusu',
-            'Depolama Koşulu Grubu': 'depolama_kosulu_grubu',
-            'Depolama Koşulu': 'depolama_kosulu',
-            'Envanter Dönemi': 'envanter_donemi',
-            'Envanter Tarihi': 'envanter_tarihi',
-            'Envanter Başlangıç Tarihi': 'envanter_baslangic_tarihi',
-            'Ürün Grubu Kodu': 'urun_grubu_kodu',
-            'Ürün Grubu Tanımı': 'urun_grubu_tanimi',
-            'Mal Grubu Kodu': 'mal_grubu_kodu',
-            'Mal Grubu Tanımı': 'mal_grubu_tanimi',
-            'Malzeme Kodu': 'malzeme_kodu',
-            'Malzeme Tanımı': 'malzeme_tanimi',
-            'Satış Fiyatı': 'satis_fiyati',
-            'Sayım Miktarı': 'sayim_miktari',
-            'Sayım Tutarı': 'sayim_tutari',
-            'Kaydi Miktar': 'kaydi_miktar',
-            'Kaydi Tutar': 'kaydi_tutar',
-            'Fark Miktarı': 'fark_miktari',
-            'Fark Tutarı': 'fark_tutari',
-            'Kısmi Envanter Miktarı': 'kismi_envanter_miktari',
-            'Kısmi Envanter Tutarı': 'kismi_envanter_tutari',
-            'Fire Miktarı': 'fire_miktari',
-            'Fire Tutarı': 'fire_tutari',
-            'Önceki Fark Miktarı': 'onceki_fark_miktari',
-            'Önceki Fark Tutarı': 'onceki_fark_tutari',
-            'Önceki Fire Miktarı': 'onceki_fire_miktari',
-            'Önceki Fire Tutarı': 'onceki_fire_tutari',
-            'Satış Miktarı': 'satis_miktari',
-            'Satış Hasılatı': 'satis_hasilati',
-            'İade Miktarı': 'iade_miktari',
-            'İade Tutarı': 'iade_tutari',
-            'İptal Fişteki Miktar': 'iptal_fisteki_miktar',
-            'İptal Fiş Tutarı': 'iptal_fis_tutari',
-            'İptal GP Miktarı': 'iptal_gp_miktari',
-            'İptal GP Tutarı': 'iptal_gp_tutari',
-            'İptal Satır Miktarı': 'iptal_satir_miktari',
-            'İptal Satır Tutarı': 'iptal_satir_tutari',
-        }
+        # Excel -> Supabase sütun eşlemesi (şema kaydından, sadece envanter_veri kolonları)
+        col_mapping = {excel_col: db_col for excel_col, db_col in kolon_eslesmesi(df_new.columns, hedef='anahtar').items()
+                       if db_col in ENVANTER_VERI_KOLONLARI}
         
         # Veriyi hazırla
         records = []
@@ -562,34 +326,8 @@ def get_single_store_data(magaza_kodu, donemler=None):
         
         df = pd.DataFrame(all_data)
         
-        reverse_mapping = {
-            'magaza_kodu': 'Mağaza Kodu',
-            'magaza_tanim': 'Mağaza Adı',
-            'satis_muduru': 'Satış Müdürü',
-            'bolge_sorumlusu': 'Bölge Sorumlusu',
-            'depolama_kosulu_grubu': 'Depolama Koşulu Grubu',
-            'depolama_kosulu': 'Depolama Koşulu',
-            'envanter_donemi': 'Envanter Dönemi',
-            'envanter_tarihi': 'Envanter Tarihi',
-            'envanter_baslangic_tarihi': 'Envanter Başlangıç Tarihi',
-            'mal_grubu_tanimi': 'Mal Grubu Tanımı',
-            'malzeme_kodu': 'Malzeme Kodu',
-            'malzeme_tanimi': 'Malzeme Tanımı',
-            'satis_fiyati': 'Satış Fiyatı',
-            'fark_miktari': 'Fark Miktarı',
-            'fark_tutari': 'Fark Tutarı',
-            'kismi_envanter_miktari': 'Kısmi Envanter Miktarı',
-            'kismi_envanter_tutari': 'Kısmi Envanter Tutarı',
-            'fire_miktari': 'Fire Miktarı',
-            'fire_tutari': 'Fire Tutarı',
-            'onceki_fark_miktari': 'Önceki Fark Miktarı',
-            'onceki_fire_miktari': 'Önceki Fire Miktarı',
-            'satis_miktari': 'Satış Miktarı',
-            'satis_hasilati': 'Satış Tutarı',
-            'iptal_satir_miktari': 'İptal Satır Miktarı'
-        }
-        
-        df = df.rename(columns=reverse_mapping)
+        # Sütun isimleri şema kaydından (Supabase -> analiz adları, tek in-place rename)
+        df = kanonik_kolonlar(df)
         return df
         
     except Exception as e:
@@ -650,35 +388,8 @@ def get_data_from_supabase(satis_muduru=None, donemler=None):
         
         df = pd.DataFrame(all_data)
         
-        # Sütun isimlerini geri çevir
-        reverse_mapping = {
-            'magaza_kodu': 'Mağaza Kodu',
-            'magaza_tanim': 'Mağaza Adı',
-            'satis_muduru': 'Satış Müdürü',
-            'bolge_sorumlusu': 'Bölge Sorumlusu',
-            'depolama_kosulu_grubu': 'Depolama Koşulu Grubu',
-            'depolama_kosulu': 'Depolama Koşulu',
-            'envanter_donemi': 'Envanter Dönemi',
-            'envanter_tarihi': 'Envanter Tarihi',
-            'envanter_baslangic_tarihi': 'Envanter Başlangıç Tarihi',
-            'mal_grubu_tanimi': 'Mal Grubu Tanımı',
-            'malzeme_kodu': 'Malzeme Kodu',
-            'malzeme_tanimi': 'Malzeme Adı',
-            'satis_fiyati': 'Satış Fiyatı',
-            'fark_miktari': 'Fark Miktarı',
-            'fark_tutari': 'Fark Tutarı',
-            'kismi_envanter_miktari': 'Kısmi Envanter Miktarı',
-            'kismi_envanter_tutari': 'Kısmi Envanter Tutarı',
-            'fire_miktari': 'Fire Miktarı',
-            'fire_tutari': 'Fire Tutarı',
-            'onceki_fark_miktari': 'Önceki Fark Miktarı',
-            'onceki_fire_miktari': 'Önceki Fire Miktarı',
-            'satis_miktari': 'Satış Miktarı',
-            'satis_hasilati': 'Satış Tutarı',
-            'iptal_satir_miktari': 'İptal Satır Miktarı',
-        }
-        
-        df = df.rename(columns=reverse_mapping)
+        # Sütun isimleri şema kaydından (Supabase -> analiz adları, tek in-place rename)
+        df = kanonik_kolonlar(df)
         
         return df
         
@@ -879,9 +590,9 @@ with col_title:
 with col_user:
     st.markdown(f"👤 **{st.session_state.user.upper()}**")
     if st.button("🚪 Çıkış", key="logout_btn"):
-        # Çıkışta cache'i temizle
-        if "df_all" in st.session_state:
-            del st.session_state.df_all
+        # Çıkışta cache'i temizle (paylaşılan veri kaydı diğer oturumlar için kalır)
+        if "df_all_surum" in st.session_state:
+            del st.session_state.df_all_surum
         if "df_all_analyzed" in st.session_state:
             del st.session_state.df_all_analyzed
         st.session_state.user = None
@@ -891,70 +602,102 @@ with col_user:
 # ⚠️ SADECE TEK MAĞAZA MODU İÇİN - SM/GM Özet'te KULLANILMAMALI
 # SM/GM Özet → get_sm_summary_from_view() kullanır
 
+@st.cache_resource(ttl=900, show_spinner=False)
+def tum_veri_yukle():
+    """
+    Tüm veriyi yükle ve analiz et - process genelinde 1 kez (15 dk).
+    cache_resource: isabette kopya / deserileştirme yok, tüm oturumlar aynı nesneyi alır.
+    Sürüm (veri parmak izi) yükleme başına bir kez hesaplanır; rerun'lar yeniden hash'lemez.
+
+    Returns:
+        tuple: (sürüm anahtarı, paylaşılan BolumluVeri, kaldırılan duplicate sayısı)
+    """
+    df_raw = get_data_from_supabase(satis_muduru=None, donemler=None)
+    if len(df_raw) == 0:
+        return None, BolumluVeri(pd.DataFrame()), 0
+    
+    df_analyzed = analyze_inventory(df_raw)
+    del df_raw
+    
+    # Duplicate'ları kaldır (aynı mağaza + dönem + depolama + malzeme)
+    duplicate_cols = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
+    existing_cols = [c for c in duplicate_cols if c in df_analyzed.columns]
+    
+    kaldirilan = 0
+    if existing_cols:
+        before_count = len(df_analyzed)
+        df_analyzed = df_analyzed.drop_duplicates(subset=existing_cols, keep='last')
+        kaldirilan = before_count - len(df_analyzed)
+    
+    # Mağaza / SM / dönem grup indeksleri ilk filtrede kurulur, oturumlar paylaşır
+    return veri_parmak_izi(df_analyzed), BolumluVeri(df_analyzed), kaldirilan
+
+
 def load_all_data_once():
     """
     ⚠️ SADECE TEK MAĞAZA MODU İÇİN
     SM/GM Özet'te bu fonksiyon ÇAĞRILMAMALI - VIEW kullanılmalı
+    
+    Veri oturuma kopyalanmaz: oturumda sadece sürüm anahtarı tutulur, dönen
+    DataFrame paylaşılan kopyanın salt okunur tutamacıdır (değiştirmeden önce .copy()).
     """
-    if "df_all" not in st.session_state or st.session_state.df_all is None:
-        progress_text = st.empty()
-        progress_bar = st.progress(0)
-        
-        progress_text.text("📊 Veriler yükleniyor...")
-        progress_bar.progress(10)
-        
-        df_raw = get_data_from_supabase(satis_muduru=None, donemler=None)
-        progress_bar.progress(70)
-        
-        if len(df_raw) > 0:
-            progress_text.text("🔄 Analiz yapılıyor...")
-            df_analyzed = analyze_inventory(df_raw)
-            progress_bar.progress(90)
-            
-            # Duplicate'ları kaldır (aynı mağaza + dönem + depolama + malzeme)
-            duplicate_cols = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
-            existing_cols = [c for c in duplicate_cols if c in df_analyzed.columns]
-            
-            if existing_cols:
-                before_count = len(df_analyzed)
-                df_analyzed = df_analyzed.drop_duplicates(subset=existing_cols, keep='last')
-                after_count = len(df_analyzed)
-                if before_count > after_count:
-                    st.info(f"🧹 {before_count - after_count:,} duplicate kayıt kaldırıldı")
-            
-            st.session_state.df_all = df_analyzed
-            st.session_state.df_all_loaded_at = datetime.now()
-            progress_bar.progress(100)
-            progress_text.text(f"✅ {len(df_analyzed):,} kayıt yüklendi")
-        else:
-            st.session_state.df_all = pd.DataFrame()
-            progress_text.text("⚠️ Veri bulunamadı")
-        
-        # Progress bar'ı temizle
-        import time
-        time.sleep(0.5)
-        progress_bar.empty()
-        progress_text.empty()
+    if st.session_state.get("df_all_surum") is not None:
+        surum, bolumler, _ = tum_veri_yukle()
+        st.session_state.df_all_surum = surum
+        return bolumler.df.copy(deep=False)
+    
+    progress_text = st.empty()
+    progress_bar = st.progress(0)
+    
+    progress_text.text("📊 Veriler yükleniyor...")
+    progress_bar.progress(10)
+    
+    surum, bolumler, kaldirilan = tum_veri_yukle()
+    df = bolumler.df
+    progress_bar.progress(90)
+    
+    if len(df) > 0:
+        if kaldirilan > 0:
+            st.info(f"🧹 {kaldirilan:,} duplicate kayıt kaldırıldı")
         
-    return st.session_state.df_all
-
-def filter_data(df, satis_muduru=None, donemler=None, magaza_kodu=None):
-    """DataFrame'i filtrele - Supabase çağırmadan"""
-    if df is None or len(df) == 0:
-        return pd.DataFrame()
+        st.session_state.df_all_surum = surum
+        st.session_state.df_all_loaded_at = datetime.now()
+        progress_bar.progress(100)
+        progress_text.text(f"✅ {len(df):,} kayıt yüklendi")
+    else:
+        progress_text.text("⚠️ Veri bulunamadı")
     
-    filtered = df.copy()
+    # Progress bar'ı temizle
+    import time
+    time.sleep(0.5)
+    progress_bar.empty()
+    progress_text.empty()
     
-    if satis_muduru:
-        filtered = filtered[filtered['Satış Müdürü'] == satis_muduru]
+    return df.copy(deep=False)
+
+def tum_veri_bolumleri():
+    """Tüm verinin bölüm indeksi (mağaza / SM / dönem) - veri sürümü başına 1 kez, oturumlar paylaşır"""
+    return tum_veri_yukle()[1]
+
+
+def filter_data(df, satis_muduru=None, donemler=None, magaza_kodu=None, bolumler=None):
+    """
+    DataFrame'i filtrele - Supabase çağırmadan.
+    Tam tablo kopyalanmaz / maskelenmez: seçim grup indekslerinden take ile (seçilen satır kadar maliyet).
     
-    if donemler and len(donemler) > 0:
-        filtered = filtered[filtered['Envanter Dönemi'].isin(donemler)]
+    bolumler: df'in BolumluVeri'si (ör. tum_veri_bolumleri()) - yoksa bu çağrı için kurulur
+    """
+    if df is None or len(df) == 0:
+        return pd.DataFrame()
     
-    if magaza_kodu:
-        filtered = filtered[filtered['Mağaza Kodu'] == magaza_kodu]
+    if bolumler is None:
+        bolumler = BolumluVeri(df)
     
-    return filtered
+    return bolumler.sec({
+        'Satış Müdürü': satis_muduru or None,
+        'Envanter Dönemi': list(donemler) if donemler else None,
+        'Mağaza Kodu': magaza_kodu or None,
+    })
 
 @st.cache_data(ttl=300)
 def get_available_periods_cached():
@@ -1057,8 +800,9 @@ with col_mode:
 with col_refresh:
     if analysis_mode in ["👔 SM Özet", "🌍 GM Özet"]:
         if st.button("🔄", help="Verileri yenile"):
-            if "df_all" in st.session_state:
-                del st.session_state.df_all
+            if "df_all_surum" in st.session_state:
+                del st.session_state.df_all_surum
+            tum_veri_yukle.clear()
             st.rerun()
 
 # SM Özet ve GM Özet modları için dosya yükleme gerekmez
@@ -1073,6 +817,9 @@ def analyze_inventory(df):
     """Veriyi analiz için hazırla"""
     df = df.copy()
     
+    # Kolonlar şema kaydındaki analiz adlarına (Excel / Supabase başlıkları, tek in-place rename)
+    df = kanonik_kolonlar(df)
+    
     # DUPLICATE TEMİZLEME - Doğru key ile
     # Aynı mağaza + dönem + depolama + malzeme sadece 1 kez olmalı
     dup_key = ['Mağaza Kodu', 'Envanter Dönemi', 'Depolama Koşulu Grubu', 'Malzeme Kodu']
@@ -1084,36 +831,6 @@ def analyze_inventory(df):
             df = df.sort_values('Envanter Tarihi', ascending=False)
         df = df.drop_duplicates(subset=dup_key, keep='first')
     
-    col_mapping = {
-        'Mağaza Kodu': 'Mağaza Kodu',
-        'Mağaza Tanım': 'Mağaza Adı',
-        'Malzeme Kodu': 'Malzeme Kodu',
-        'Malzeme Tanımı': 'Malzeme Adı',
-        'Mal Grubu Tanımı': 'Ürün Grubu',
-        'Ürün Grubu Tanımı': 'Ana Grup',
-        'Fark Miktarı': 'Fark Miktarı',
-        'Fark Tutarı': 'Fark Tutarı',
-        'Kısmi Envanter Miktarı': 'Kısmi Envanter Miktarı',
-        'Kısmi Envanter Tutarı': 'Kısmi Envanter Tutarı',
-        'Önceki Fark Miktarı': 'Önceki Fark Miktarı',
-        'Önceki Fark Tutarı': 'Önceki Fark Tutarı',
-        'Önceki Fire Miktarı': 'Önceki Fire Miktarı',
-        'Önceki Fire Tutarı': 'Önceki Fire Tutarı',
-        'İptal Satır Miktarı': 'İptal Satır Miktarı',
-        'İptal Satır Tutarı': 'İptal Satır Tutarı',
-        'Fire Miktarı': 'Fire Miktarı',
-        'Fire Tutarı': 'Fire Tutarı',
-        'Satış Miktarı': 'Satış Miktarı',
-        'Satış Hasılatı': 'Satış Tutarı',
-        'Satış Fiyatı': 'Birim Fiyat',
-        'Fark+Fire+Kısmi Envanter Tutarı': 'NET_ENVANTER_ETKİ_TUTARI',
-        'Envanter Dönemi': 'Envanter Dönemi',
-        'Envanter Tarihi': 'Envanter Tarihi',
-    }
-    
-    for old_col, new_col in col_mapping.items():
-        if old_col in df.columns:
-            df[new_col] = df[old_col]
     
     numeric_cols = ['Fark Miktarı', 'Fark Tutarı', 'Kısmi Envanter Miktarı', 'Kısmi Envanter Tutarı',
                     'Önceki Fark Miktarı', 'Önceki Fark Tutarı', 'İptal Satır Miktarı', 'İptal Satır Tutarı',
@@ -1123,651 +840,116 @@ def analyze_inventory(df):
     for col in numeric_cols:
         if col not in df.columns:
             df[col] = 0
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    if 'NET_ENVANTER_ETKİ_TUTARI' not in df.columns:
-        df['NET_ENVANTER_ETKİ_TUTARI'] = df['Fark Tutarı'] + df['Fire Tutarı'] + df['Kısmi Envanter Tutarı']
-    
-    df['TOPLAM_MIKTAR'] = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
-    
-    return df
-
-
-def is_balanced(row):
-    """Dengelenmiş mi? Fark + Kısmi + Önceki = 0"""
-    toplam = row['Fark Miktarı'] + row['Kısmi Envanter Miktarı'] + row['Önceki Fark Miktarı']
-    return abs(toplam) <= 0.01
-
-
-def get_first_two_words(text):
-    """İlk 2 kelimeyi al"""
-    if pd.isna(text):
-        return ""
-    words = str(text).strip().split()
-    return " ".join(words[:2]).upper() if len(words) >= 2 else str(text).upper()
-
-
-def get_last_word(text):
-    """Son kelimeyi (marka) al"""
-    if pd.isna(text):
-        return ""
-    words = str(text).strip().split()
-    return words[-1].upper() if words else ""
-
-
-def extract_quantity(text):
-    """Gramaj/ML çıkar: '750 ML' → 750, 'ML'"""
-    import re
-    if pd.isna(text):
-        return None, None
-    
-    text = str(text).upper()
-    
-    # Patterns: 750ML, 750 ML, 1.5L, 1,5 LT, 220G, 220 G, 1KG
-    patterns = [
-        r'(\d+[.,]?\d*)\s*(ML|LT|L|G|GR|KG|MG)\b',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            value = float(match.group(1).replace(',', '.'))
-            unit = match.group(2)
-            
-            # Normalize units to base (ML, G)
-            if unit in ['LT', 'L']:
-                value = value * 1000  # to ML
-                unit = 'ML'
-            elif unit == 'KG':
-                value = value * 1000  # to G
-                unit = 'G'
-            elif unit == 'GR':
-                unit = 'G'
-            
-            return value, unit
-    
-    return None, None
-
-
-def is_quantity_similar(qty1, unit1, qty2, unit2, tolerance=0.30):
-    """Gramaj benzer mi? Aynı boyut kategorisinde mi?"""
-    if qty1 is None or qty2 is None:
-        return True  # Gramaj bulunamadıysa benzer say
-    
-    if unit1 != unit2:
-        return False  # Farklı birim (ML vs G) benzer değil
-    
-    if qty1 == 0 or qty2 == 0:
-        return True
-    
-    # Oran kontrolü: max 3x fark olabilir
-    ratio = max(qty1, qty2) / min(qty1, qty2)
-    if ratio > 3:
-        return False  # 3 kattan fazla fark varsa benzer değil
-    
-    # Boyut kategorileri
-    def get_size_category(qty, unit):
-        if unit == 'ML':
-            if qty <= 400: return 'S'      # Küçük: 0-400ml
-            elif qty <= 1000: return 'M'   # Orta: 400-1000ml
-            else: return 'L'               # Büyük: 1000ml+
-        elif unit == 'G':
-            if qty <= 100: return 'S'      # Küçük: 0-100g
-            elif qty <= 400: return 'M'    # Orta: 100-400g
-            else: return 'L'               # Büyük: 400g+
-        return 'M'
-    
-    cat1 = get_size_category(qty1, unit1)
-    cat2 = get_size_category(qty2, unit2)
-    
-    # Sadece aynı kategorideyse benzer
-    return cat1 == cat2
-
-
-def detect_internal_theft(df):
-    """
-    İÇ HIRSIZLIK TESPİTİ:
-    - Satış Fiyatı >= 100 TL
-    - Dengelenmemiş (Fark + Kısmi + Önceki ≠ 0)
-    - |Toplam| ≈ İptal Satır, fark büyüdükçe risk AZALIR
-    """
-    results = []
-    
-    for idx, row in df.iterrows():
-        # Dengelenmiş ise atla
-        if is_balanced(row):
-            continue
-        
-        satis_fiyati = row.get('Birim Fiyat', 0) or 0
-        if satis_fiyati < 100:
-            continue
-        
-        fark = row['Fark Miktarı']
-        kismi = row['Kısmi Envanter Miktarı']
-        onceki = row['Önceki Fark Miktarı']
-        iptal = row['İptal Satır Miktarı']
-        
-        toplam = fark + kismi + onceki
-        
-        if toplam >= 0 or iptal <= 0:
             continue
-        
-        fark_mutlak = abs(abs(toplam) - iptal)
-        
-        if fark_mutlak == 0:
-            risk = "ÇOK YÜKSEK"
-            esitlik = "TAM EŞİT"
-        elif fark_mutlak <= 2:
-            risk = "YÜKSEK"
-            esitlik = "YAKIN (±2)"
-        elif fark_mutlak <= 5:
-            risk = "ORTA"
-            esitlik = "YAKIN (±5)"
-        elif fark_mutlak <= 10:
-            risk = "DÜŞÜK-ORTA"
-            esitlik = f"FARK: {fark_mutlak}"
-        else:
-            continue
-        
-        results.append({
-            'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-            'Malzeme Adı': row.get('Malzeme Adı', ''),
-            'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-            'Satış Fiyatı': satis_fiyati,
-            'Fark Miktarı': fark,
-            'Kısmi Env.': kismi,
-            'Önceki Fark': onceki,
-            'TOPLAM': toplam,
-            'İptal Satır': iptal,
-            'Fark': fark_mutlak,
-            'Durum': esitlik,
-            'Fark Tutarı (TL)': row['Fark Tutarı'],
-            'Risk': risk
-        })
-    
-    result_df = pd.DataFrame(results)
-    
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME - Aynı malzeme kodu sadece 1 kez görünsün
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        
-        # Risk sıralaması
-        risk_order = {'ÇOK YÜKSEK': 0, 'YÜKSEK': 1, 'ORTA': 2, 'DÜŞÜK-ORTA': 3}
-        result_df['_risk_sort'] = result_df['Risk'].map(risk_order)
-        result_df = result_df.sort_values(['_risk_sort', 'Fark Tutarı (TL)'], ascending=[True, True])
-        result_df = result_df.drop('_risk_sort', axis=1)
-    
-    return result_df
+        # Zaten sayısal kolon (Supabase / önceden analiz edilmiş) yeniden dönüştürülmez
+        seri = df[col]
+        if not pd.api.types.is_numeric_dtype(seri):
+            seri = pd.to_numeric(seri, errors='coerce')
+        if seri.hasnans:
+            seri = seri.fillna(0)
+        df[col] = seri
 
+    if 'NET_ENVANTER_ETKİ_TUTARI' not in df.columns:
+        df['NET_ENVANTER_ETKİ_TUTARI'] = df['Fark Tutarı'] + df['Fire Tutarı'] + df['Kısmi Envanter Tutarı']
 
-def detect_chronic_products(df):
-    """Kronik açık - her iki dönemde de Fark < 0"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        if is_balanced(row):
-            continue
-        
-        if row['Önceki Fark Miktarı'] < 0 and row['Fark Miktarı'] < 0:
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-                'Bu Dönem Fark': row['Fark Miktarı'],
-                'Bu Dönem Tutar': row['Fark Tutarı'],
-                'Önceki Fark': row['Önceki Fark Miktarı'],
-                'Önceki Tutar': row['Önceki Fark Tutarı'],
-                'Toplam Tutar': row['Fark Tutarı'] + row['Önceki Fark Tutarı']
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Bu Dönem Tutar', ascending=True)
-    
-    return result_df
+    df['TOPLAM_MIKTAR'] = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
 
+    return df
 
-def detect_chronic_fire(df):
-    """Kronik Fire - her iki dönemde de fire var VE dengelenmemiş"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        onceki_fire = row.get('Önceki Fire Miktarı', 0) or 0
-        bu_fire = row['Fire Miktarı']
-        
-        # Her iki dönemde de fire varsa
-        if onceki_fire != 0 and bu_fire != 0:
-            # Önceki Fark + Fark = 0 ise dengelenmiş, kronik değil
-            onceki_fark = row.get('Önceki Fark Miktarı', 0) or 0
-            bu_fark = row['Fark Miktarı']
-            
-            if abs(onceki_fark + bu_fark) <= 0.01:
-                continue  # Dengelenmiş, kronik fire değil
-            
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-                'Bu Dönem Fire': bu_fire,
-                'Bu Dönem Fire Tutarı': row['Fire Tutarı'],
-                'Önceki Fire': onceki_fire,
-                'Önceki Fire Tutarı': row.get('Önceki Fire Tutarı', 0),
-                'Toplam Fire Tutarı': row['Fire Tutarı'] + row.get('Önceki Fire Tutarı', 0)
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Bu Dönem Fire Tutarı', ascending=True)
-    
-    return result_df
 
+# ==================== YÜKLENEN DOSYA ÖNBELLEĞİ ====================
 
-def detect_fire_manipulation(df):
-    """Fire manipülasyonu: Fire var AMA Fark+Kısmi > 0 VE dengelenmemiş"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        fark = row['Fark Miktarı']
-        kismi = row['Kısmi Envanter Miktarı']
-        onceki_fark = row.get('Önceki Fark Miktarı', 0) or 0
-        fire = row['Fire Miktarı']
-        
-        fark_kismi = fark + kismi
-        
-        # Önceki Fark + Fark = 0 ise dengelenmiş, manipülasyon değil
-        if abs(onceki_fark + fark) <= 0.01:
-            continue
-        
-        if fire < 0 and fark_kismi > 0:
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Ürün Grubu': row.get('Mal Grubu Tanımı', row.get('Ürün Grubu', '')),
-                'Fark Miktarı': fark,
-                'Kısmi Env.': kismi,
-                'Önceki Fark': onceki_fark,
-                'Fark + Kısmi': fark_kismi,
-                'Fire Miktarı': fire,
-                'Fire Tutarı': row['Fire Tutarı'],
-                'Sonuç': 'FAZLA FİRE GİRİLMİŞ'
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Fire Tutarı', ascending=True)
-    
-    return result_df
+# Bellekte tutulan yüklenmiş dosya sayısı
+YUKLEME_LIMITI = 4
 
 
-def detect_cigarette_shortage(df):
+def yukleme_anahtari(dosya):
     """
-    Sigara açığı - Tüm sigaraların TOPLAM (Fark + Kısmi + Önceki) değerine bakılır
-    Eğer toplam < 0 ise sigara açığı var demektir
-    
-    NET = Fark Miktarı + Kısmi Envanter Miktarı + Önceki Fark Miktarı
-    
-    Sigara tespiti kuralları:
-    - Mal Grubu Tanımı veya Ürün Grubu içinde 'SİGARA' veya 'TÜTÜN' geçenler
-    - MAKARON tek başına sigara DEĞİLDİR (bilinçli olarak dışarıda tutulur)
-    - "MAKARON JEL KALEM" gibi ürünler yanlışlıkla yakalanmasın diye MAKARON dahil edilmez
+    Yüklenen dosyanın kimliği - yükleme başına sabit, rerun'larda veri hash'lenmez.
+    file_id yoksa (eski Streamlit) dosya baytlarının özeti kullanılır.
     """
-    
-    # Sigara kontrolü yapılacak kolonları belirle (öncelik sırasına göre)
-    # NOT: Malzeme Adı dahil değil - sadece kategori bazlı filtre yapılır
-    check_cols = []
-    for col in ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup']:
-        if col in df.columns:
-            check_cols.append(col)
-    
-    if not check_cols:
-        return pd.DataFrame()
-    
-    # Sigara mask oluştur - CONTAINS kullan (eşitlik değil!)
-    sigara_mask = pd.Series([False] * len(df), index=df.index)
-    
-    for col in check_cols:
-        # Türkçe karakterleri normalize et
-        col_values = df[col].fillna('').astype(str).str.upper()
-        col_values = col_values.str.replace('İ', 'I', regex=False)
-        col_values = col_values.str.replace('Ş', 'S', regex=False)
-        col_values = col_values.str.replace('Ğ', 'G', regex=False)
-        col_values = col_values.str.replace('Ü', 'U', regex=False)
-        col_values = col_values.str.replace('Ö', 'O', regex=False)
-        col_values = col_values.str.replace('Ç', 'C', regex=False)
-        col_values = col_values.str.replace('ı', 'I', regex=False)
-        
-        # SIGARA veya TUTUN içeren satırları bul
-        # NOT: MAKARON tek başına dahil DEĞİL - sadece SIGARA veya TUTUN varsa
-        mask = col_values.str.contains('SIGARA|TUTUN', case=False, na=False, regex=True)
-        sigara_mask = sigara_mask | mask
-    
-    # MAKARON'u açıkça dışarıda tut (eğer SIGARA/TUTUN yoksa)
-    # Bu satır gereksiz görünebilir ama gelecekte güvenlik sağlar
-    # Şu an mask zaten sadece SIGARA|TUTUN içerenleri yakalar
-    
-    sigara_df = df[sigara_mask].copy()
-    
-    if len(sigara_df) == 0:
-        return pd.DataFrame()
-    
-    # Net hesapla: Fark + Kısmi + Önceki
-    toplam_fark = sigara_df['Fark Miktarı'].fillna(0).sum()
-    toplam_kismi = sigara_df['Kısmi Envanter Miktarı'].fillna(0).sum()
-    toplam_onceki = sigara_df['Önceki Fark Miktarı'].fillna(0).sum()
-    net_toplam = toplam_fark + toplam_kismi + toplam_onceki
-    
-    # Eğer net toplam < 0 ise açık var
-    if net_toplam >= 0:
-        return pd.DataFrame()
-    
-    # Açık varsa, detay göster
-    results = []
-    for idx, row in sigara_df.iterrows():
-        fark = row['Fark Miktarı'] if pd.notna(row['Fark Miktarı']) else 0
-        kismi = row['Kısmi Envanter Miktarı'] if pd.notna(row['Kısmi Envanter Miktarı']) else 0
-        onceki = row['Önceki Fark Miktarı'] if pd.notna(row['Önceki Fark Miktarı']) else 0
-        urun_net = fark + kismi + onceki
-        
-        # Sadece 0 olmayan kayıtları göster
-        if fark != 0 or kismi != 0 or onceki != 0:
-            results.append({
-                'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                'Malzeme Adı': row.get('Malzeme Adı', ''),
-                'Fark': fark,
-                'Kısmi': kismi,
-                'Önceki': onceki,
-                'Ürün Toplam': urun_net,
-                'Risk': 'SİGARA'
-            })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # DUPLICATE TEMİZLEME
-        result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-        result_df = result_df.sort_values('Ürün Toplam', ascending=True)
-        # En sona toplam satırı ekle
-        toplam_row = pd.DataFrame([{
-            'Malzeme Kodu': '*** TOPLAM ***',
-            'Malzeme Adı': f'SİGARA AÇIĞI: {abs(net_toplam):.0f} adet',
-            'Fark': toplam_fark,
-            'Kısmi': toplam_kismi,
-            'Önceki': toplam_onceki,
-            'Ürün Toplam': net_toplam,
-            'Risk': '⚠️ AÇIK VAR'
-        }])
-        result_df = pd.concat([result_df, toplam_row], ignore_index=True)
-    
-    return result_df
+    file_id = getattr(dosya, 'file_id', None)
+    if file_id:
+        return str(file_id)
+    return hashlib.sha1(dosya.getvalue()).hexdigest()
 
 
-def find_product_families(df):
+@st.cache_resource(max_entries=YUKLEME_LIMITI, show_spinner="Dosya okunuyor ve veritabanına kaydediliyor...")
+def yuklenen_dosyayi_isle(anahtar, _dosya):
     """
-    Benzer ürün ailesi analizi
-    Kural: İlk 2 kelime + Son kelime (marka) + Mal Grubu + Gramaj (±%30) aynıysa = AİLE
-    """
-    df_copy = df.copy()
-    df_copy['İlk2Kelime'] = df_copy['Malzeme Adı'].apply(get_first_two_words)
-    df_copy['Marka'] = df_copy['Malzeme Adı'].apply(get_last_word)
-    df_copy['Gramaj'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[0])
-    df_copy['GramajBirim'] = df_copy['Malzeme Adı'].apply(lambda x: extract_quantity(x)[1])
-    
-    families = []
-    processed_indices = set()
-    
-    # Her ürün için potansiyel aile bul
-    for idx, row in df_copy.iterrows():
-        if idx in processed_indices:
-            continue
-        
-        ilk2 = row['İlk2Kelime']
-        marka = row['Marka']
-        urun_grubu = row['Ürün Grubu']
-        gramaj = row['Gramaj']
-        birim = row['GramajBirim']
-        
-        if not ilk2 or not marka:
-            continue
-        
-        # Aynı grup içinde benzer ürünleri bul
-        family_mask = (
-            (df_copy['İlk2Kelime'] == ilk2) & 
-            (df_copy['Marka'] == marka) & 
-            (df_copy['Ürün Grubu'] == urun_grubu)
-        )
-        
-        potential_family = df_copy[family_mask]
-        
-        if len(potential_family) <= 1:
-            continue
-        
-        # Gramaj kontrolü - benzer gramajlı olanları filtrele
-        family_members = []
-        for fam_idx, fam_row in potential_family.iterrows():
-            if is_quantity_similar(gramaj, birim, fam_row['Gramaj'], fam_row['GramajBirim']):
-                family_members.append(fam_idx)
-                processed_indices.add(fam_idx)
-        
-        if len(family_members) <= 1:
-            continue
-        
-        family_df = df_copy.loc[family_members]
-        
-        toplam_fark = family_df['Fark Miktarı'].sum()
-        toplam_kismi = family_df['Kısmi Envanter Miktarı'].sum()
-        toplam_onceki = family_df['Önceki Fark Miktarı'].sum()
-        aile_toplami = toplam_fark + toplam_kismi + toplam_onceki
-        
-        if family_df['Fark Miktarı'].abs().sum() > 0:
-            if abs(aile_toplami) <= 2:
-                sonuc = "KOD KARIŞIKLIĞI - HIRSIZLIK DEĞİL"
-                risk = "DÜŞÜK"
-            elif aile_toplami < -2:
-                sonuc = "AİLEDE NET AÇIK VAR"
-                risk = "ORTA"
-            else:
-                sonuc = "AİLEDE FAZLA VAR"
-                risk = "DÜŞÜK"
-            
-            urunler = family_df['Malzeme Adı'].tolist()
-            farklar = family_df['Fark Miktarı'].tolist()
-            
-            families.append({
-                'Mal Grubu': urun_grubu,
-                'İlk 2 Kelime': ilk2,
-                'Marka': marka,
-                'Ürün Sayısı': len(family_members),
-                'Toplam Fark': toplam_fark,
-                'Toplam Kısmi': toplam_kismi,
-                'Toplam Önceki': toplam_onceki,
-                'AİLE TOPLAMI': aile_toplami,
-                'Sonuç': sonuc,
-                'Risk': risk,
-                'Ürünler': ' | '.join([f"{u[:25]}({f})" for u, f in zip(urunler[:5], farklar[:5])])
-            })
-    
-    result_df = pd.DataFrame(families)
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('AİLE TOPLAMI', ascending=True)
-    
-    return result_df
-
-
-def detect_external_theft(df):
-    """Dış hırsızlık - açık var ama fire/iptal yok"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        if is_balanced(row):
-            continue
-        
-        if row['Fark Miktarı'] < 0 and row['Fire Miktarı'] == 0 and row['İptal Satır Miktarı'] == 0:
-            if abs(row['Fark Tutarı']) > 50:
-                results.append({
-                    'Malzeme Kodu': row.get('Malzeme Kodu', ''),
-                    'Malzeme Adı': row.get('Malzeme Adı', ''),
-                    'Ürün Grubu': row.get('Ürün Grubu', ''),
-                    'Fark Miktarı': row['Fark Miktarı'],
-                    'Fark Tutarı': row['Fark Tutarı'],
-                    'Önceki Fark': row['Önceki Fark Miktarı'],
-                    'Risk': 'DIŞ HIRSIZLIK / SAYIM HATASI'
-                })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('Fark Tutarı', ascending=True)
-    
-    return result_df
+    Yüklenen Excel dosyası başına BİR kez: sayfa seçimi, okuma, Supabase kaydı
+    ve analyze_inventory. Rerun'lar aynı sonucu paylaşır.
 
+    Args:
+        anahtar: yukleme_anahtari(dosya)
+        _dosya: Streamlit UploadedFile (hash'lenmez)
 
-def check_kasa_activity_products(df, kasa_kodlari):
-    """
-    10 TL Ürünleri Kontrolü
-    Fiyat değişikliği olan ürünlerde manipülasyon riski
-    Toplam adet ve tutar etkisini hesapla
-    FORMÜL: Fark + Kısmi (Önceki dahil değil)
+    Returns:
+        dict: bolumler (paylaşılan analiz çerçevesi üzerinde BolumluVeri -
+              hücre değiştirmeden önce .copy()), sayfa, satir, sutun,
+              kayit ((eklenen, atlanan) veya None), hata, surum
     """
-    results = []
-    
-    toplam_adet = 0
-    toplam_tutar = 0
-    eslesen_urun = 0
-    
-    for idx, row in df.iterrows():
-        # Kod eşleştirme - hem string hem int formatını dene
-        kod_raw = row.get('Malzeme Kodu', '')
-        kod_str = str(kod_raw).replace('.0', '').strip()  # Float'tan gelen .0'ı kaldır
-        
-        if kod_str in kasa_kodlari:
-            eslesen_urun += 1
-            fark = row['Fark Miktarı'] if pd.notna(row['Fark Miktarı']) else 0
-            kismi = row['Kısmi Envanter Miktarı'] if pd.notna(row['Kısmi Envanter Miktarı']) else 0
-            toplam = fark + kismi  # Önceki dahil değil!
-            
-            # Tutar hesabı - Fark + Kısmi tutarları
-            fark_tutari = row.get('Fark Tutarı', 0) or 0
-            kismi_tutari = row.get('Kısmi Envanter Tutarı', 0) or 0
-            urun_toplam_tutar = fark_tutari + kismi_tutari  # Önceki dahil değil!
-            
-            toplam_adet += toplam
-            toplam_tutar += urun_toplam_tutar
-            
-            if toplam != 0:  # Sadece sıfır olmayanları göster
-                if toplam > 0:
-                    durum = "FAZLA (+)"
-                else:
-                    durum = "AÇIK (-)"
-                
-                results.append({
-                    'Malzeme Kodu': kod_str,
-                    'Malzeme Adı': row.get('Malzeme Adı', ''),
-                    'Fark': fark,
-                    'Kısmi': kismi,
-                    'TOPLAM': toplam,
-                    'Tutar': urun_toplam_tutar,
-                    'Durum': durum
-                })
-    
-    result_df = pd.DataFrame(results)
-    if len(result_df) > 0:
-        # Önce fazla (+) olanlar, sonra açık (-) olanlar
-        result_df['_sort'] = result_df['TOPLAM'].apply(lambda x: 0 if x > 0 else 1)
-        result_df = result_df.sort_values(['_sort', 'TOPLAM'], ascending=[True, False])
-        result_df = result_df.drop('_sort', axis=1)
-    
-    # Özet bilgileri de döndür
-    summary = {
-        'toplam_urun': eslesen_urun,
-        'sorunlu_urun': len(results),
-        'toplam_adet': toplam_adet,
-        'toplam_tutar': toplam_tutar
+    xl = pd.ExcelFile(_dosya)
+
+    # En çok kolonu olan sayfa veri sayfasıdır
+    best_sheet = None
+    max_cols = 0
+    for sheet in xl.sheet_names:
+        temp_df = pd.read_excel(xl, sheet_name=sheet, nrows=5)
+        if len(temp_df.columns) > max_cols:
+            max_cols = len(temp_df.columns)
+            best_sheet = sheet
+
+    df_raw = pd.read_excel(xl, sheet_name=best_sheet)
+    satir, sutun = len(df_raw), len(df_raw.columns)
+
+    # ===== SUPABASE'E KAYIT =====
+    kayit, hata = None, None
+    try:
+        inserted, skipped, result_info = save_to_supabase(df_raw)
+        kayit = (inserted, skipped)
+    except Exception as e:
+        # Supabase hatası analizi engellemesin
+        hata = str(e)[:50]
+
+    df = analyze_inventory(df_raw)
+    del df_raw
+
+    return {
+        'bolumler': BolumluVeri(df), 'sayfa': best_sheet, 'satir': satir, 'sutun': sutun,
+        'kayit': kayit, 'hata': hata,
+        # Rapor önbelleği sürümü - yükleme kimliğinden türetilir
+        'surum': ('yukleme', anahtar),
     }
-    
-    return result_df, summary
 
 
-# 10 TL Ürünleri Ürün Kodları (209 adet)
+def is_balanced(row):
+    """Dengelenmiş mi? Fark + Kısmi + Önceki = 0"""
+    toplam = row['Fark Miktarı'] + row['Kısmi Envanter Miktarı'] + row['Önceki Fark Miktarı']
+    return abs(toplam) <= 0.01
+
+
+# 10 TL Ürünleri Ürün Kodları (kasa_aktivitesi_kodlari.json, 209 adet)
 # Bu ürünlerde fiyat değişikliği olduğu için manipülasyon riski var
-KASA_AKTIVITESI_KODLARI = {
-    '25006448', '12002256', '12002046', '22001972', '12003295', '22002759', '22002500', '11002886', '22002215', '22002214',
-    '22002259', '22002349', '16002163', '22002717', '16001587', '13001073', '30000944', '18002488', '17003609', '22002296',
-    '22002652', '24004136', '24004137', '12003073', '22002328', '24005228', '24006215', '24005232', '24005231', '24006214',
-    '24006212', '16002332', '16002342', '23001397', '16002310', '24001063', '24004020', '13002613', '13002317', '13002506',
-    '16002285', '16002219', '16002286', '16002218', '13000258', '13000257', '13000256', '13000260', '13002533', '22002611',
-    '22002579', '13002559', '13000187', '13002904', '13000189', '13000190', '13002908', '13001872', '13001874', '30000838',
-    '30000926', '22002605', '22002604', '22002603', '12003241', '16002194', '16001734', '25005580', '25000237', '25000049',
-    '16002099', '23001367', '23001510', '23001177', '23001403', '23001278', '22002732', '22002576', '22002577', '25006483',
-    '23001240', '16002317', '30000958', '30000956', '24005155', '24005154', '24005156', '24005157', '24005153', '22000280',
-    '22002773', '22002774', '22002501', '22002225', '22000397', '22001395', '22000396', '16001859', '18002956', '17003542',
-    '16002338', '16002339', '16002341', '16002009', '16000856', '22002715', '16002235', '24006067', '24006069', '24006068',
-    '24006066', '22002686', '22002687', '22002688', '16002220', '24005291', '24005290', '24006078', '24006084', '24005288',
-    '24006082', '24006079', '24005289', '24006085', '22002763', '22002762', '22001032', '18003049', '24006126', '24004420',
-    '24005183', '24005649', '24005650', '14002481', '13002315', '22001229', '13002478', '30000880', '24005798', '24005796',
-    '24005799', '24005797', '24005795', '24006159', '24003492', '24006171', '24006170', '24006174', '24006172', '24006173',
-    '22002640', '22002553', '22002764', '22002223', '22002679', '22002221', '22002224', '22002572', '27002662', '24005441',
-    '24005897', '24005898', '24005900', '24006081', '24006080', '16002087', '22002282', '22002283', '24005893', '24005894',
-    '23001198', '23001439', '23001195', '23001199', '23000843', '23000034', '23001445', '23001444', '23001443', '23001522',
-    '24004381', '24005184', '23001534', '23001533', '18001591', '27002676', '27002677', '16001956', '24003287', '24000005',
-    '24002194', '24002192', '24002764', '24003872', '16001983', '18002969', '27001340', '27001148', '27001563', '24004354',
-    '24004196', '24004115', '14002424', '24003641', '24004972', '13001481', '24003327', '24000004', '23000122',
-}
+KASA_AKTIVITESI_DOSYASI = 'kasa_aktivitesi_kodlari.json'
 
 
-def load_kasa_activity_codes():
-    """Kasa aktivitesi ürün kodlarını döndür"""
-    return KASA_AKTIVITESI_KODLARI
+def _kasa_kodlarini_yukle():
+    """Kasa aktivitesi kodlarını veri dosyasından sıralı int64 dizi olarak yükle"""
+    path = os.path.join(os.path.dirname(__file__), KASA_AKTIVITESI_DOSYASI)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return kasa_kod_dizisi(json.load(f))
+    except Exception:
+        return kasa_kod_dizisi([])
 
 
-def generate_executive_summary(df, kasa_activity_df=None, kasa_summary=None):
-    """Yönetici özeti - mal grubu bazlı yorumlar"""
-    comments = []
-    
-    # Önce toplam tutarı hesapla (Fark + Kısmi + Önceki)
-    df_copy = df.copy()
-    df_copy['Kısmi Envanter Tutarı'] = df_copy.get('Kısmi Envanter Tutarı', 0).fillna(0)
-    df_copy['Önceki Fark Tutarı'] = df_copy.get('Önceki Fark Tutarı', 0).fillna(0)
-    df_copy['Toplam Tutar'] = df_copy['Fark Tutarı'] + df_copy['Kısmi Envanter Tutarı'] + df_copy['Önceki Fark Tutarı']
-    
-    # Mal grubu bazlı analiz
-    group_stats = df_copy.groupby('Ürün Grubu').agg({
-        'Toplam Tutar': 'sum',
-        'Fire Tutarı': 'sum',
-        'Satış Tutarı': 'sum',
-        'Fark Miktarı': lambda x: (x < 0).sum()
-    }).reset_index()
-    
-    group_stats.columns = ['Ürün Grubu', 'Toplam Fark', 'Toplam Fire', 'Toplam Satış', 'Açık Ürün Sayısı']
-    group_stats['Açık Oranı'] = abs(group_stats['Toplam Fark']) / group_stats['Toplam Satış'].replace(0, 1) * 100
-    
-    # En yüksek açık
-    top_acik = group_stats.nsmallest(3, 'Toplam Fark')
-    for _, row in top_acik.iterrows():
-        if row['Toplam Fark'] < -500:
-            comments.append(f"⚠️ {row['Ürün Grubu']}: {row['Toplam Fark']:,.0f} TL açık ({row['Açık Ürün Sayısı']} ürün)")
-    
-    # En yüksek fire
-    top_fire = group_stats.nsmallest(3, 'Toplam Fire')
-    for _, row in top_fire.iterrows():
-        if row['Toplam Fire'] < -500:
-            comments.append(f"🔥 {row['Ürün Grubu']}: {row['Toplam Fire']:,.0f} TL fire")
-    
-    # 10 TL ürünleri yorumu - TOPLAM ADET VE TUTAR
-    if kasa_summary is not None:
-        toplam_adet = kasa_summary.get('toplam_adet', 0)
-        toplam_tutar = kasa_summary.get('toplam_tutar', 0)
-        
-        if toplam_adet > 0:
-            comments.append(f"💰 10 TL ÜRÜNLERİ: NET +{toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL FAZLA")
-            comments.append(f"   ⚠️ Bu fazlalık gerçek envanter açığını gizliyor olabilir!")
-        elif toplam_adet < 0:
-            comments.append(f"💰 10 TL ÜRÜNLERİ: NET {toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL AÇIK")
-    
-    return comments, group_stats
+KASA_AKTIVITESI_KODLARI = _kasa_kodlarini_yukle()
+
+
+def load_kasa_activity_codes():
+    """Kasa aktivitesi ürün kodlarını döndür (sıralı int64 dizi)"""
+    return KASA_AKTIVITESI_KODLARI
 
 
 def compute_sigara_acik_by_store(df: pd.DataFrame) -> pd.Series:
@@ -1775,32 +957,11 @@ def compute_sigara_acik_by_store(df: pd.DataFrame) -> pd.Series:
     Sigara açığını mağaza bazında vektörel hesapla (10x hızlı)
     Loop yerine tek seferde tüm mağazalar için hesaplama yapar
     """
-    # Sigara kontrol kolonları
-    cols = [c for c in ['Mal Grubu Tanımı', 'Ürün Grubu', 'Ana Grup'] if c in df.columns]
-    if not cols:
+    # Sigara mask (tekil kategori değeri başına bir kez sınıflandırılır)
+    sig_mask = sigara_maskesi(df)
+    if sig_mask is None:
         return pd.Series(dtype=float)
     
-    def norm_turkish(s: pd.Series) -> pd.Series:
-        """Türkçe karakterleri normalize et"""
-        s = s.fillna('').astype(str).str.upper()
-        return (s.str.replace('İ', 'I', regex=False)
-                 .str.replace('Ş', 'S', regex=False)
-                 .str.replace('Ğ', 'G', regex=False)
-                 .str.replace('Ü', 'U', regex=False)
-                 .str.replace('Ö', 'O', regex=False)
-                 .str.replace('Ç', 'C', regex=False)
-                 .str.replace('ı', 'I', regex=False))
-    
-    # Sigara mask oluştur
-    masks = []
-    for c in cols:
-        v = norm_turkish(df[c])
-        masks.append(v.str.contains(r'SIGARA|TUTUN', regex=True, na=False))
-    
-    sig_mask = masks[0]
-    for m in masks[1:]:
-        sig_mask = sig_mask | m
-    
     # Sigara ürünlerini filtrele
     required_cols = ['Mağaza Kodu', 'Fark Miktarı', 'Kısmi Envanter Miktarı', 'Önceki Fark Miktarı']
     available_cols = [c for c in required_cols if c in df.columns]
@@ -1880,8 +1041,8 @@ def analyze_region(df, kasa_kodlari):
     # ===== HIZLI RİSK ANALİZLERİ (vektörel) =====
     
     # 1. İç Hırsızlık - Satış Fiyatı >= 100 ve Fark < 0 olan ürün sayısı
-    if 'Satış Fiyatı' in df.columns:
-        ic_hirsizlik = df[(df['Satış Fiyatı'] >= 100) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size()
+    if 'Birim Fiyat' in df.columns:
+        ic_hirsizlik = df[(df['Birim Fiyat'] >= 100) & (df['Fark Miktarı'] < 0)].groupby('Mağaza Kodu').size()
     else:
         ic_hirsizlik = pd.Series(0, index=magazalar)
     
@@ -1901,9 +1062,9 @@ def analyze_region(df, kasa_kodlari):
     fire_manip = df[abs(df['Fire Miktarı']) > abs(df['Fark Miktarı'].fillna(0) + df['Kısmi Envanter Miktarı'].fillna(0))].groupby('Mağaza Kodu').size()
     
     # 6. 10TL Ürünleri - Kasa aktivitesi kodları
-    kasa_set = set(str(k) for k in kasa_kodlari) if kasa_kodlari else set()
-    if len(kasa_set) > 0:
-        kasa_mask = df['Malzeme Kodu'].astype(str).isin(kasa_set)
+    kasa_dizi = kasa_kod_dizisi(kasa_kodlari)
+    if len(kasa_dizi) > 0:
+        kasa_mask = np.isin(malzeme_kod_anahtari(df['Malzeme Kodu']), kasa_dizi)
         kasa_agg = df[kasa_mask].groupby('Mağaza Kodu').agg({
             'Fark Miktarı': 'sum',
             'Kısmi Envanter Miktarı': 'sum',
@@ -2045,11 +1206,16 @@ def analyze_region(df, kasa_kodlari):
     return result_df
 
 
-def aggregate_by_group(store_df, group_col):
-    """SM veya BS bazında gruplama - Satış Ağırlıklı Ortalama Risk"""
-    if group_col not in store_df.columns:
-        return pd.DataFrame()
-    
+# grup_kupu toplam ölçüleri (aggregate_by_group kolon sırası)
+GRUP_OLCULERI = ['Satış', 'Fark', 'Fire', 'Toplam Açık', 'İç Hırs.', 'Kronik', 'Sigara',
+                 '10TL Adet', '10TL Tutar', 'Toplam Gün']
+
+
+def grup_kupu(store_df):
+    """
+    Mağaza özetinden SM/BS rollup küpü - aggregate_by_group ve BS özeti bunun dilimi.
+    Ağırlıklı risk için Risk Puan x Satış ve Kritik/Riskli bayrakları toplanabilir ölçü olarak tutulur.
+    """
     # Kolon isimlerini kontrol et (VIEW vs analyze_region uyumu)
     kronik_col = 'Kronik' if 'Kronik' in store_df.columns else 'Kr.Açık'
     kasa_adet_col = 'Kasa Adet' if 'Kasa Adet' in store_df.columns else '10TL Adet'
@@ -2065,44 +1231,62 @@ def aggregate_by_group(store_df, group_col):
     if 'Gün' not in store_df.columns:
         store_df['Gün'] = 1
     
-    # Temel metrikler
-    agg_dict = {
-        'Mağaza Kodu': 'count',
-        'Satış': 'sum',
-        'Fark': 'sum',
-        'Fire': 'sum',
-        'Toplam Açık': 'sum',
-        'İç Hırs.': 'sum',
-        kronik_col: 'sum',
-        'Sigara': 'sum',
-        kasa_adet_col: 'sum',
-        kasa_tutar_col: 'sum',
-        'Gün': 'sum',
-    }
+    risk = store_df['Risk'].astype(str)
+    kup_df = pd.DataFrame({
+        'Mağaza Kodu': store_df['Mağaza Kodu'],
+        'Satış': store_df['Satış'],
+        'Fark': store_df['Fark'],
+        'Fire': store_df['Fire'],
+        'Toplam Açık': store_df['Toplam Açık'],
+        'İç Hırs.': store_df['İç Hırs.'],
+        'Kronik': store_df[kronik_col],
+        'Sigara': store_df['Sigara'],
+        '10TL Adet': store_df[kasa_adet_col],
+        '10TL Tutar': store_df[kasa_tutar_col],
+        'Toplam Gün': store_df['Gün'],
+        'Risk Puan': store_df['Risk Puan'],
+        'Risk Puan Sayısı': store_df['Risk Puan'].notna().astype(np.int64),
+        'Risk Ağırlık': store_df['Risk Puan'] * store_df['Satış'],
+        'Kritik Mağaza': risk.str.contains('KRİTİK').astype(np.int64),
+        'Riskli Mağaza': risk.str.contains('RİSKLİ').astype(np.int64),
+    }, index=store_df.index)
+    for col in ('SM', 'BS'):
+        if col in store_df.columns:
+            kup_df[col] = store_df[col]
+    
+    return RollupKupu(
+        kup_df,
+        boyutlar=['SM', 'BS'],
+        olculer=GRUP_OLCULERI + ['Risk Puan', 'Risk Puan Sayısı', 'Risk Ağırlık', 'Kritik Mağaza', 'Riskli Mağaza'],
+        nitelikler=[],
+        sayilanlar=['Mağaza Kodu']
+    )
+
+
+def aggregate_by_group(store_df, group_col, kup=None):
+    """SM veya BS bazında gruplama - Satış Ağırlıklı Ortalama Risk (grup_kupu dilimi)"""
+    if group_col not in store_df.columns:
+        return pd.DataFrame()
     
-    grouped = store_df.groupby(group_col).agg(agg_dict).reset_index()
+    if kup is None:
+        kup = grup_kupu(store_df)
     
-    grouped.columns = [group_col, 'Mağaza Sayısı', 'Satış', 'Fark', 'Fire', 'Toplam Açık',
-                       'İç Hırs.', 'Kronik', 'Sigara', '10TL Adet', '10TL Tutar', 'Toplam Gün']
+    dilim = kup.dilim([group_col])
     
-    # Satış Ağırlıklı Ortalama Risk Puanı hesapla
-    for idx, row in grouped.iterrows():
-        grup_magazalar = store_df[store_df[group_col] == row[group_col]]
-        
-        # Ağırlıklı ortalama
-        toplam_agirlik = grup_magazalar['Satış'].sum()
-        if toplam_agirlik > 0:
-            agirlikli_risk = (grup_magazalar['Risk Puan'] * grup_magazalar['Satış']).sum() / toplam_agirlik
-        else:
-            agirlikli_risk = grup_magazalar['Risk Puan'].mean()
-        
-        grouped.at[idx, 'Risk Puan'] = agirlikli_risk
-        
-        # Kritik ve Riskli mağaza sayıları
-        kritik_count = len(grup_magazalar[grup_magazalar['Risk'].str.contains('KRİTİK')])
-        riskli_count = len(grup_magazalar[grup_magazalar['Risk'].str.contains('RİSKLİ')])
-        grouped.at[idx, 'Kritik Mağaza'] = kritik_count
-        grouped.at[idx, 'Riskli Mağaza'] = riskli_count
+    grouped = dilim[[group_col, 'Mağaza Kodu'] + GRUP_OLCULERI].copy()
+    grouped.columns = [group_col, 'Mağaza Sayısı'] + GRUP_OLCULERI
+    
+    # Satış Ağırlıklı Ortalama Risk Puanı (satış toplamı 0 ise düz ortalama)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grouped['Risk Puan'] = np.where(
+            dilim['Satış'] > 0,
+            dilim['Risk Ağırlık'] / dilim['Satış'],
+            dilim['Risk Puan'] / dilim['Risk Puan Sayısı']
+        )
+    
+    # Kritik ve Riskli mağaza sayıları
+    grouped['Kritik Mağaza'] = dilim['Kritik Mağaza'].astype(float)
+    grouped['Riskli Mağaza'] = dilim['Riskli Mağaza'].astype(float)
     
     # Oranlar
     grouped['Fark %'] = abs(grouped['Fark']) / grouped['Satış'] * 100
@@ -2139,28 +1323,153 @@ def aggregate_by_group(store_df, group_col):
     return grouped
 
 
+# ==================== MAĞAZA ANALİZ ÖNBELLEĞİ ====================
+
+# Aynı anda açık tutulan mağaza paketi sayısı (LRU)
+MAGAZA_PAKET_LIMITI = 32
+
+
+@st.cache_resource
+def magaza_analiz_onbellegi():
+    """Process genelinde mağaza analiz paketi önbelleği (rerun'lar arası korunur)"""
+    return KarneOnbellegi(max_kayit=MAGAZA_PAKET_LIMITI)
+
+
+def magaza_analiz_paketi(df_mag, kasa_kodlari, magaza_kodu, donemler=None, ham=False, surum=None):
+    """
+    Tek mağaza analiz paketi - (mağaza, dönem seti, veri sürümü) başına BİR kez hesaplanır.
+    Sekme değişimi / widget tıklaması gibi rerun'lar önbellekten okur.
+
+    Args:
+        df_mag: Mağaza frame'i (ham=True ise analyze_inventory uygulanmamış)
+        donemler: Seçili dönemler (anahtar için)
+        surum: Veri seti anahtarı (ör. yükleme sürümü) - verilmezse df_mag parmak izi
+
+    Returns:
+        dict: df, tespitler, top20, exec_comments, group_stats, risk
+              Değerler paylaşılır; çağıranlar sadece okur.
+    """
+    if surum is None:
+        surum = veri_parmak_izi(df_mag)
+    anahtar = None
+    if surum is not None:
+        anahtar = (str(magaza_kodu), tuple(donemler or ()), ham, surum,
+                   kasa_kod_dizisi(kasa_kodlari).tobytes())
+        paket = magaza_analiz_onbellegi().get(anahtar)
+        if paket is not None:
+            return paket
+
+    df = analyze_inventory(df_mag) if ham else df_mag
+    tespitler = tum_tespitler(df, kasa_kodlari)
+    internal_df, chronic_df = tespitler['ic_hirsizlik'], tespitler['kronik']
+
+    internal_codes = set(internal_df['Malzeme Kodu'].astype(str).tolist()) if len(internal_df) > 0 else set()
+    chronic_codes = set(chronic_df['Malzeme Kodu'].astype(str).tolist()) if len(chronic_df) > 0 else set()
+    exec_comments, group_stats = generate_executive_summary(df, tespitler['kasa'], tespitler['kasa_ozet'])
+
+    paket = {
+        'df': df,
+        'tespitler': tespitler,
+        'top20': create_top_20_risky(df, internal_codes, chronic_codes, set()),
+        'exec_comments': exec_comments,
+        'group_stats': group_stats,
+        'risk': calculate_store_risk(df, internal_df, chronic_df, tespitler['sigara']),
+    }
+    if anahtar is not None:
+        magaza_analiz_onbellegi().put(anahtar, paket)
+    return paket
+
+
+def magaza_raporu(df_mag, kasa_kodlari, magaza_kodu, magaza_adi, params, donemler=None, ham=False):
+    """Tek mağaza Excel raporu: analiz paketi + kamera entegrasyonu -> BytesIO"""
+    paket = magaza_analiz_paketi(df_mag, kasa_kodlari, magaza_kodu, donemler, ham)
+    df = paket['df']
+    tespitler = paket['tespitler']
+    int_df = tespitler['ic_hirsizlik']
+    
+    # Kamera timestamp entegrasyonu (kategori araması için full_df geçir)
+    if len(int_df) > 0:
+        try:
+            int_df = enrich_internal_theft_with_camera(int_df, magaza_kodu, df['Envanter Tarihi'].iloc[0], full_df=df)
+        except Exception:
+            pass
+    
+    return create_excel_report(
+        df, int_df, tespitler['kronik'], tespitler['kronik_fire'], tespitler['sigara'],
+        tespitler['dis_hirsizlik'], tespitler['aile'], tespitler['fire_manipulasyon'], tespitler['kasa'],
+        paket['top20'], paket['exec_comments'], paket['group_stats'], magaza_kodu, magaza_adi, params
+    )
+
+
+def tek_magaza_rapor_uretici(magaza_kodu, magaza_adi, kasa_kodlari, params, donemler):
+    """Mağaza verisini Supabase'den çekip raporlayan üretici (rapor_indir_butonu için)"""
+    def uret():
+        df_mag = get_single_store_data(magaza_kodu, tuple(donemler) if donemler else None)
+        if len(df_mag) == 0:
+            return None
+        return magaza_raporu(df_mag, kasa_kodlari, magaza_kodu, magaza_adi, params, donemler, ham=True)
+    return uret
+
+
+def yuklu_magaza_rapor_uretici(bolumler, magaza_kodu, magaza_adi, kasa_kodlari, params):
+    """Yüklenen (analiz edilmiş) veriden tek mağaza raporu üreten üretici (rapor_indir_butonu için)"""
+    def uret():
+        df_mag = bolumler.bolum('Mağaza Kodu', magaza_kodu)
+        return magaza_raporu(df_mag, kasa_kodlari, magaza_kodu, magaza_adi, params, [params.get('donem', '')])
+    return uret
+
+
+def _rapor_dosya_adi(magaza_kodu, magaza_adi):
+    """Mağaza raporu dosya adı"""
+    mag_adi_clean = magaza_adi.replace(' ', '_').replace('/', '_')[:30] if magaza_adi else ''
+    return f"{magaza_kodu}_{mag_adi_clean}_Risk_Raporu.xlsx"
+
+
+# ==================== EXCEL RAPORLARI ====================
+
+# Risk kolonu renkleri (metinde geçen seviyeye göre, eşleşmezse TEMİZ)
+_risk_stili = icerir_stili([('KRİTİK', 'kritik'), ('RİSKLİ', 'riskli'), ('DİKKAT', 'dikkat')], 'temiz')
+_risk_yazi_stili = icerir_stili(
+    [('KRİTİK', 'kritik_yazi'), ('RİSKLİ', 'riskli_yazi'), ('DİKKAT', 'dikkat_yazi')], 'temiz_yazi'
+)
+
+
+def _tl(seri):
+    """Binlik ayraçlı TL metni (f"{x:,.0f}")"""
+    return [f"{x:,.0f}" for x in seri]
+
+
+def _yuzde(seri, basamak=1):
+    return [f"%{x:.{basamak}f}" for x in seri]
+
+
+def _grup_tablosu(grup_df, grup_kolon, baslik):
+    """SM / BS bazlı sayfa tablosu (GM raporu)"""
+    return pd.DataFrame({
+        baslik: grup_df[grup_kolon].values,
+        'Mağaza': grup_df['Mağaza Sayısı'].values,
+        'Satış': _tl(grup_df['Satış']),
+        'Fark': _tl(grup_df['Fark']),
+        'Fire': _tl(grup_df['Fire']),
+        'Toplam %': _yuzde(grup_df['Toplam %']),
+        'Sigara': grup_df['Sigara'].values,
+        'İç Hırs.': grup_df['İç Hırs.'].values,
+        'Risk Puan': [f"{x:.0f}" for x in grup_df['Risk Puan']],
+        'Risk': grup_df['Risk'].values,
+    })
+
+
 def create_gm_excel_report(store_df, sm_df, bs_df, params):
     """GM Dashboard Excel raporu"""
     
-    wb = Workbook()
-    
-    header_font = Font(bold=True, color='FFFFFF', size=10)
-    header_fill = PatternFill('solid', fgColor='1F4E79')
-    kritik_fill = PatternFill('solid', fgColor='FF4444')
-    riskli_fill = PatternFill('solid', fgColor='FF8800')
-    dikkat_fill = PatternFill('solid', fgColor='FFCC00')
-    temiz_fill = PatternFill('solid', fgColor='00CC66')
-    title_font = Font(bold=True, size=14)
-    border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                    top=Side(style='thin'), bottom=Side(style='thin'))
+    kitap = ExcelKitabi(RAPOR_STILLERI)
     
     # ===== BÖLGE ÖZETİ =====
-    ws = wb.active
-    ws.title = "BÖLGE ÖZETİ"
+    ws = kitap.sayfa("BÖLGE ÖZETİ", genislik=None)
     
-    ws['A1'] = "GM BÖLGE DASHBOARD"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Dönem: {params.get('donem', '')} | Mağaza: {len(store_df)}"
+    ws.satir(["GM BÖLGE DASHBOARD"], stil='sayfa_basligi')
+    ws.satir([f"Dönem: {params.get('donem', '')} | Mağaza: {len(store_df)}"])
+    ws.bos_satir()
     
     # Toplamlar
     toplam_satis = store_df['Satış'].sum()
@@ -2168,158 +1477,80 @@ def create_gm_excel_report(store_df, sm_df, bs_df, params):
     toplam_fire = store_df['Fire'].sum()
     toplam_acik = store_df['Toplam Açık'].sum()
     
-    ws['A4'] = "GENEL METRİKLER"
-    ws['A4'].font = Font(bold=True, size=11)
-    
-    ws['A5'] = "Toplam Satış"
-    ws['B5'] = f"{toplam_satis:,.0f} TL"
-    ws['A6'] = "Toplam Fark"
-    ws['B6'] = f"{toplam_fark:,.0f} TL"
-    ws['A7'] = "Toplam Fire"
-    ws['B7'] = f"{toplam_fire:,.0f} TL"
-    ws['A8'] = "Toplam Açık"
-    ws['B8'] = f"{toplam_acik:,.0f} TL"
-    ws['A9'] = "Kayıp Oranı"
-    ws['B9'] = f"%{abs(toplam_acik)/toplam_satis*100:.2f}" if toplam_satis > 0 else "0%"
+    ws.satir(["GENEL METRİKLER"], stil='alt_baslik')
+    ws.satir(["Toplam Satış", f"{toplam_satis:,.0f} TL"])
+    ws.satir(["Toplam Fark", f"{toplam_fark:,.0f} TL"])
+    ws.satir(["Toplam Fire", f"{toplam_fire:,.0f} TL"])
+    ws.satir(["Toplam Açık", f"{toplam_acik:,.0f} TL"])
+    ws.satir(["Kayıp Oranı", f"%{abs(toplam_acik)/toplam_satis*100:.2f}" if toplam_satis > 0 else "0%"])
+    ws.bos_satir()
     
     # Risk dağılımı
-    ws['A11'] = "RİSK DAĞILIMI"
-    ws['A11'].font = Font(bold=True, size=11)
+    ws.satir(["RİSK DAĞILIMI"], stil='alt_baslik')
     
-    kritik = len(store_df[store_df['Risk'].str.contains('KRİTİK')])
-    riskli = len(store_df[store_df['Risk'].str.contains('RİSKLİ')])
-    dikkat = len(store_df[store_df['Risk'].str.contains('DİKKAT')])
-    temiz = len(store_df[store_df['Risk'].str.contains('TEMİZ')])
-    
-    ws['A12'] = "🔴 KRİTİK"
-    ws['B12'] = kritik
-    ws['A13'] = "🟠 RİSKLİ"
-    ws['B13'] = riskli
-    ws['A14'] = "🟡 DİKKAT"
-    ws['B14'] = dikkat
-    ws['A15'] = "🟢 TEMİZ"
-    ws['B15'] = temiz
+    risk = store_df['Risk'].astype(str)
+    ws.satir(["🔴 KRİTİK", int(risk.str.contains('KRİTİK').sum())])
+    ws.satir(["🟠 RİSKLİ", int(risk.str.contains('RİSKLİ').sum())])
+    ws.satir(["🟡 DİKKAT", int(risk.str.contains('DİKKAT').sum())])
+    ws.satir(["🟢 TEMİZ", int(risk.str.contains('TEMİZ').sum())])
     
     # ===== SM BAZLI =====
     if len(sm_df) > 0:
-        ws2 = wb.create_sheet("SM BAZLI")
-        headers = ['Satış Müdürü', 'Mağaza', 'Satış', 'Fark', 'Fire', 'Toplam %', 'Sigara', 'İç Hırs.', 'Risk Puan', 'Risk']
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws2.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-        
-        for row_idx, (_, row) in enumerate(sm_df.iterrows(), start=2):
-            ws2.cell(row=row_idx, column=1, value=row['SM']).border = border
-            ws2.cell(row=row_idx, column=2, value=row['Mağaza Sayısı']).border = border
-            ws2.cell(row=row_idx, column=3, value=f"{row['Satış']:,.0f}").border = border
-            ws2.cell(row=row_idx, column=4, value=f"{row['Fark']:,.0f}").border = border
-            ws2.cell(row=row_idx, column=5, value=f"{row['Fire']:,.0f}").border = border
-            ws2.cell(row=row_idx, column=6, value=f"%{row['Toplam %']:.1f}").border = border
-            ws2.cell(row=row_idx, column=7, value=row['Sigara']).border = border
-            ws2.cell(row=row_idx, column=8, value=row['İç Hırs.']).border = border
-            ws2.cell(row=row_idx, column=9, value=f"{row['Risk Puan']:.0f}").border = border
-            risk_cell = ws2.cell(row=row_idx, column=10, value=row['Risk'])
-            risk_cell.border = border
+        ws2 = kitap.sayfa("SM BAZLI", genislik=None)
+        ws2.tablo(_grup_tablosu(sm_df, 'SM', 'Satış Müdürü'), baslik_stili='baslik', govde_stili='cerceve')
     
     # ===== BS BAZLI =====
     if len(bs_df) > 0:
-        ws3 = wb.create_sheet("BS BAZLI")
-        headers = ['Bölge Sorumlusu', 'Mağaza', 'Satış', 'Fark', 'Fire', 'Toplam %', 'Sigara', 'İç Hırs.', 'Risk Puan', 'Risk']
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws3.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-        
-        for row_idx, (_, row) in enumerate(bs_df.iterrows(), start=2):
-            ws3.cell(row=row_idx, column=1, value=row['BS']).border = border
-            ws3.cell(row=row_idx, column=2, value=row['Mağaza Sayısı']).border = border
-            ws3.cell(row=row_idx, column=3, value=f"{row['Satış']:,.0f}").border = border
-            ws3.cell(row=row_idx, column=4, value=f"{row['Fark']:,.0f}").border = border
-            ws3.cell(row=row_idx, column=5, value=f"{row['Fire']:,.0f}").border = border
-            ws3.cell(row=row_idx, column=6, value=f"%{row['Toplam %']:.1f}").border = border
-            ws3.cell(row=row_idx, column=7, value=row['Sigara']).border = border
-            ws3.cell(row=row_idx, column=8, value=row['İç Hırs.']).border = border
-            ws3.cell(row=row_idx, column=9, value=f"{row['Risk Puan']:.0f}").border = border
-            risk_cell = ws3.cell(row=row_idx, column=10, value=row['Risk'])
-            risk_cell.border = border
+        ws3 = kitap.sayfa("BS BAZLI", genislik=None)
+        ws3.tablo(_grup_tablosu(bs_df, 'BS', 'Bölge Sorumlusu'), baslik_stili='baslik', govde_stili='cerceve')
     
     # ===== TÜM MAĞAZALAR =====
-    ws4 = wb.create_sheet("TÜM MAĞAZALAR")
-    headers = ['Mağaza Kodu', 'Mağaza Adı', 'SM', 'BS', 'Satış', 'Fark', 'Fire', 'Toplam %', 
-               'Sigara', 'İç Hırs.', '10TL Adet', 'Risk Puan', 'Risk', 'Nedenler']
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws4.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-    
-    for row_idx, (_, row) in enumerate(store_df.iterrows(), start=2):
-        ws4.cell(row=row_idx, column=1, value=row['Mağaza Kodu']).border = border
-        ws4.cell(row=row_idx, column=2, value=row['Mağaza Adı']).border = border
-        ws4.cell(row=row_idx, column=3, value=row.get('SM', '')).border = border
-        ws4.cell(row=row_idx, column=4, value=row['BS']).border = border
-        ws4.cell(row=row_idx, column=5, value=f"{row['Satış']:,.0f}").border = border
-        ws4.cell(row=row_idx, column=6, value=f"{row['Fark']:,.0f}").border = border
-        ws4.cell(row=row_idx, column=7, value=f"{row['Fire']:,.0f}").border = border
-        ws4.cell(row=row_idx, column=8, value=f"%{row['Toplam %']:.1f}").border = border
-        ws4.cell(row=row_idx, column=9, value=row['Sigara']).border = border
-        ws4.cell(row=row_idx, column=10, value=row['İç Hırs.']).border = border
-        # 10TL Adet - VIEW ve analyze_region uyumu
-        kasa_adet = row.get('Kasa Adet', row.get('10TL Adet', 0))
-        ws4.cell(row=row_idx, column=11, value=kasa_adet).border = border
-        ws4.cell(row=row_idx, column=12, value=f"{row['Risk Puan']:.0f}").border = border
-        
-        risk_cell = ws4.cell(row=row_idx, column=13, value=row['Risk'])
-        risk_cell.border = border
-        if 'KRİTİK' in str(row['Risk']):
-            risk_cell.fill = kritik_fill
-        elif 'RİSKLİ' in str(row['Risk']):
-            risk_cell.fill = riskli_fill
-        elif 'DİKKAT' in str(row['Risk']):
-            risk_cell.fill = dikkat_fill
-        else:
-            risk_cell.fill = temiz_fill
-        
-        ws4.cell(row=row_idx, column=14, value=row.get('Risk Nedenleri', '')).border = border
+    ws4 = kitap.sayfa("TÜM MAĞAZALAR", genislik=None)
+    
+    def kolon_veya(col, varsayilan):
+        return store_df[col].values if col in store_df.columns else varsayilan
+    
+    # 10TL Adet - VIEW ve analyze_region uyumu
+    kasa_adet = kolon_veya('Kasa Adet', kolon_veya('10TL Adet', 0))
+    
+    tum_df = pd.DataFrame({
+        'Mağaza Kodu': store_df['Mağaza Kodu'].values,
+        'Mağaza Adı': store_df['Mağaza Adı'].values,
+        'SM': kolon_veya('SM', ''),
+        'BS': store_df['BS'].values,
+        'Satış': _tl(store_df['Satış']),
+        'Fark': _tl(store_df['Fark']),
+        'Fire': _tl(store_df['Fire']),
+        'Toplam %': _yuzde(store_df['Toplam %']),
+        'Sigara': store_df['Sigara'].values,
+        'İç Hırs.': store_df['İç Hırs.'].values,
+        '10TL Adet': kasa_adet,
+        'Risk Puan': [f"{x:.0f}" for x in store_df['Risk Puan']],
+        'Risk': store_df['Risk'].values,
+        'Nedenler': kolon_veya('Risk Nedenleri', ''),
+    })
+    ws4.tablo(tum_df, baslik_stili='baslik', govde_stili='cerceve', kosullu_stiller={'Risk': _risk_stili})
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output.getvalue()
+    return kitap.kaydet().getvalue()
 
 
 def create_region_excel_report(region_df, df_all, kasa_kodlari, params):
     """Bölge özet Excel raporu"""
     
-    wb = Workbook()
-    
-    header_font = Font(bold=True, color='FFFFFF', size=10)
-    header_fill = PatternFill('solid', fgColor='1F4E79')
-    kritik_fill = PatternFill('solid', fgColor='FF4444')
-    riskli_fill = PatternFill('solid', fgColor='FF8800')
-    dikkat_fill = PatternFill('solid', fgColor='FFCC00')
-    temiz_fill = PatternFill('solid', fgColor='00CC66')
-    title_font = Font(bold=True, size=14)
-    border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                    top=Side(style='thin'), bottom=Side(style='thin'))
+    kitap = ExcelKitabi(RAPOR_STILLERI)
     
     # ===== BÖLGE ÖZETİ =====
-    ws = wb.active
-    ws.title = "BÖLGE ÖZETİ"
+    ws = kitap.sayfa("BÖLGE ÖZETİ", genislik={
+        'A': 12, 'B': 28, 'C': 15, 'D': 12, 'E': 10,
+        'F': 10, 'G': 10, 'H': 10, 'I': 12, 'J': 35
+    })
     
-    ws['A1'] = f"BÖLGE ENVANTER ANALİZİ"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Dönem: {params.get('donem', '')} | Tarih: {params.get('tarih', '')} | Mağaza Sayısı: {len(region_df)}"
+    ws.satir(["BÖLGE ENVANTER ANALİZİ"], stil='sayfa_basligi')
+    ws.satir([f"Dönem: {params.get('donem', '')} | Tarih: {params.get('tarih', '')} | Mağaza Sayısı: {len(region_df)}"])
+    ws.bos_satir()
     
     # Bölge toplamları
-    ws['A4'] = "BÖLGE TOPLAMI"
-    ws['A4'].font = Font(bold=True, size=11)
+    ws.satir(["BÖLGE TOPLAMI"], stil='alt_baslik')
     
     toplam_satis = region_df['Satış'].sum()
     toplam_fark = region_df['Fark'].sum()
@@ -2327,122 +1558,50 @@ def create_region_excel_report(region_df, df_all, kasa_kodlari, params):
     # Kayıp Oranı = |Fark + Fire| / Satış × 100
     genel_oran = abs(toplam_fark + toplam_fire) / toplam_satis * 100 if toplam_satis > 0 else 0
     
-    ws['A5'] = "Toplam Satış"
-    ws['B5'] = f"{toplam_satis:,.0f} TL"
-    ws['A6'] = "Toplam Fark"
-    ws['B6'] = f"{toplam_fark:,.0f} TL"
-    ws['A7'] = "Toplam Fire"
-    ws['B7'] = f"{toplam_fire:,.0f} TL"
-    ws['A8'] = "Genel Kayıp Oranı"
-    ws['B8'] = f"%{genel_oran:.2f}"
+    ws.satir(["Toplam Satış", f"{toplam_satis:,.0f} TL"])
+    ws.satir(["Toplam Fark", f"{toplam_fark:,.0f} TL"])
+    ws.satir(["Toplam Fire", f"{toplam_fire:,.0f} TL"])
+    ws.satir(["Genel Kayıp Oranı", f"%{genel_oran:.2f}"])
+    ws.bos_satir()
     
     # Risk dağılımı
-    ws['A10'] = "RİSK DAĞILIMI"
-    ws['A10'].font = Font(bold=True, size=11)
-    
-    kritik_sayisi = len(region_df[region_df['Risk'].str.contains('KRİTİK')])
-    riskli_sayisi = len(region_df[region_df['Risk'].str.contains('RİSKLİ')])
-    dikkat_sayisi = len(region_df[region_df['Risk'].str.contains('DİKKAT')])
-    temiz_sayisi = len(region_df[region_df['Risk'].str.contains('TEMİZ')])
+    ws.satir(["RİSK DAĞILIMI"], stil='alt_baslik')
     
-    ws['A11'] = "🔴 KRİTİK"
-    ws['B11'] = kritik_sayisi
-    ws['A12'] = "🟠 RİSKLİ"
-    ws['B12'] = riskli_sayisi
-    ws['A13'] = "🟡 DİKKAT"
-    ws['B13'] = dikkat_sayisi
-    ws['A14'] = "🟢 TEMİZ"
-    ws['B14'] = temiz_sayisi
+    risk = region_df['Risk'].astype(str)
+    ws.satir(["🔴 KRİTİK", int(risk.str.contains('KRİTİK').sum())])
+    ws.satir(["🟠 RİSKLİ", int(risk.str.contains('RİSKLİ').sum())])
+    ws.satir(["🟡 DİKKAT", int(risk.str.contains('DİKKAT').sum())])
+    ws.satir(["🟢 TEMİZ", int(risk.str.contains('TEMİZ').sum())])
+    ws.bos_satir()
     
     # Mağaza sıralaması
-    ws['A16'] = "MAĞAZA SIRALAMASI (Risk Puanına Göre)"
-    ws['A16'].font = Font(bold=True, size=11)
-    
-    headers = ['Mağaza', 'Adı', 'Satış', 'Fark', 'Toplam %', 'İç Hırs.', 'Sigara', 'Kr.Açık', 'Risk', 'Neden']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=17, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-    
-    for row_idx, (_, row) in enumerate(region_df.iterrows(), start=18):
-        ws.cell(row=row_idx, column=1, value=row['Mağaza Kodu']).border = border
-        ws.cell(row=row_idx, column=2, value=row['Mağaza Adı'][:25]).border = border
-        ws.cell(row=row_idx, column=3, value=f"{row['Satış']:,.0f}").border = border
-        ws.cell(row=row_idx, column=4, value=f"{row['Fark']:,.0f}").border = border
-        ws.cell(row=row_idx, column=5, value=f"%{row['Toplam %']:.1f}").border = border
-        ws.cell(row=row_idx, column=6, value=row['İç Hırs.']).border = border
-        ws.cell(row=row_idx, column=7, value=row['Sigara']).border = border
-        ws.cell(row=row_idx, column=8, value=row['Kr.Açık']).border = border
-        
-        risk_cell = ws.cell(row=row_idx, column=9, value=row['Risk'])
-        risk_cell.border = border
-        if 'KRİTİK' in row['Risk']:
-            risk_cell.fill = kritik_fill
-            risk_cell.font = Font(bold=True, color='FFFFFF')
-        elif 'RİSKLİ' in row['Risk']:
-            risk_cell.fill = riskli_fill
-            risk_cell.font = Font(bold=True, color='FFFFFF')
-        elif 'DİKKAT' in row['Risk']:
-            risk_cell.fill = dikkat_fill
-            risk_cell.font = Font(bold=True)
-        else:
-            risk_cell.fill = temiz_fill
-            risk_cell.font = Font(bold=True, color='FFFFFF')
-        
-        ws.cell(row=row_idx, column=10, value=row['Risk Nedenleri']).border = border
-    
-    # Sütun genişlikleri
-    ws.column_dimensions['A'].width = 12
-    ws.column_dimensions['B'].width = 28
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 10
-    ws.column_dimensions['F'].width = 10
-    ws.column_dimensions['G'].width = 10
-    ws.column_dimensions['H'].width = 10
-    ws.column_dimensions['I'].width = 12
-    ws.column_dimensions['J'].width = 35
+    ws.satir(["MAĞAZA SIRALAMASI (Risk Puanına Göre)"], stil='alt_baslik')
+    
+    siralama_df = pd.DataFrame({
+        'Mağaza': region_df['Mağaza Kodu'].values,
+        'Adı': region_df['Mağaza Adı'].str[:25].values,
+        'Satış': _tl(region_df['Satış']),
+        'Fark': _tl(region_df['Fark']),
+        'Toplam %': _yuzde(region_df['Toplam %']),
+        'İç Hırs.': region_df['İç Hırs.'].values,
+        'Sigara': region_df['Sigara'].values,
+        'Kr.Açık': region_df['Kr.Açık'].values,
+        'Risk': region_df['Risk'].values,
+        'Neden': region_df['Risk Nedenleri'].values,
+    })
+    ws.tablo(siralama_df, baslik_stili='baslik', govde_stili='cerceve',
+             kosullu_stiller={'Risk': _risk_yazi_stili})
     
     # ===== DETAY SHEET =====
-    ws2 = wb.create_sheet("DETAY")
+    ws2 = kitap.sayfa("DETAY")
     
     detail_headers = ['Mağaza Kodu', 'Mağaza Adı', 'Satış', 'Fark', 'Fire', 'Toplam %', 
                       'İç Hırs.', 'Kr.Açık', 'Kr.Fire', 'Sigara', 'Fire Man.', 
                       '10TL Adet', '10TL Tutar', 'Risk Puan', 'Risk', 'Risk Nedenleri']
-    
-    for col, header in enumerate(detail_headers, 1):
-        cell = ws2.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-    
-    for row_idx, (_, row) in enumerate(region_df.iterrows(), start=2):
-        ws2.cell(row=row_idx, column=1, value=row['Mağaza Kodu']).border = border
-        ws2.cell(row=row_idx, column=2, value=row['Mağaza Adı']).border = border
-        ws2.cell(row=row_idx, column=3, value=row['Satış']).border = border
-        ws2.cell(row=row_idx, column=4, value=row['Fark']).border = border
-        ws2.cell(row=row_idx, column=5, value=row['Fire']).border = border
-        ws2.cell(row=row_idx, column=6, value=row['Toplam %']).border = border
-        ws2.cell(row=row_idx, column=7, value=row['İç Hırs.']).border = border
-        ws2.cell(row=row_idx, column=8, value=row['Kr.Açık']).border = border
-        ws2.cell(row=row_idx, column=9, value=row['Kr.Fire']).border = border
-        ws2.cell(row=row_idx, column=10, value=row['Sigara']).border = border
-        ws2.cell(row=row_idx, column=11, value=row['Fire Man.']).border = border
-        ws2.cell(row=row_idx, column=12, value=row['10TL Adet']).border = border
-        ws2.cell(row=row_idx, column=13, value=row['10TL Tutar']).border = border
-        ws2.cell(row=row_idx, column=14, value=row['Risk Puan']).border = border
-        ws2.cell(row=row_idx, column=15, value=row['Risk']).border = border
-        ws2.cell(row=row_idx, column=16, value=row['Risk Nedenleri']).border = border
-    
-    auto_adjust_column_width(ws2)
+    ws2.tablo(region_df[detail_headers], baslik_stili='baslik', govde_stili='cerceve')
     
     # Excel çıktısı
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return output.getvalue()
+    return kitap.kaydet().getvalue()
 
 
 def calculate_store_risk(df, internal_df, chronic_df, cigarette_df):
@@ -2474,305 +1633,30 @@ def calculate_store_risk(df, internal_df, chronic_df, cigarette_df):
         return "TEMİZ", "risk-temiz"
 
 
-def create_top_20_risky(df, internal_codes, chronic_codes, family_balanced_codes):
-    """En riskli 20 ürün"""
-    
-    # Dengelenmişleri ve aile dengelenmişlerini çıkar
-    risky_df = df[
-        (df['NET_ENVANTER_ETKİ_TUTARI'] < 0) & 
-        (~df.apply(is_balanced, axis=1)) &
-        (~df['Malzeme Kodu'].astype(str).isin(family_balanced_codes))
-    ].copy()
-    
-    if len(risky_df) == 0:
-        return pd.DataFrame()
-    
-    # DUPLICATE TEMİZLEME - önce yap
-    risky_df = risky_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
-    
-    def classify(row):
-        kod = str(row.get('Malzeme Kodu', ''))
-        
-        if kod in internal_codes:
-            return "İÇ HIRSIZLIK", "Kasa kamera incelemesi"
-        elif kod in chronic_codes:
-            return "KRONİK AÇIK", "Raf kontrolü, Sayım eğitimi"
-        elif row['Fire Miktarı'] < 0:
-            return "OPERASYONEL", "Fire kayıt kontrolü"
-        else:
-            return "DIŞ HIRSIZLIK/SAYIM", "Sayım ve kod kontrolü"
-    
-    risky_df['Risk Türü'] = risky_df.apply(lambda x: classify(x)[0], axis=1)
-    risky_df['Aksiyon'] = risky_df.apply(lambda x: classify(x)[1], axis=1)
-    
-    risky_df = risky_df.sort_values('NET_ENVANTER_ETKİ_TUTARI', ascending=True).head(20)
-    
-    result = pd.DataFrame({
-        'Sıra': range(1, len(risky_df) + 1),
-        'Malzeme Kodu': risky_df['Malzeme Kodu'].values,
-        'Malzeme Adı': risky_df['Malzeme Adı'].values,
-        'Fark Mik.': risky_df['Fark Miktarı'].values,
-        'Kısmi': risky_df['Kısmi Envanter Miktarı'].values,
-        'Önceki': risky_df['Önceki Fark Miktarı'].values,
-        'TOPLAM': risky_df['TOPLAM_MIKTAR'].values,
-        'İptal': risky_df['İptal Satır Miktarı'].values,
-        'Fire': risky_df['Fire Miktarı'].values,
-        'Fire Tutarı': risky_df['Fire Tutarı'].values,
-        'Fark Tutarı': risky_df['Fark Tutarı'].values,
-        'Risk Türü': risky_df['Risk Türü'].values,
-        'Aksiyon': risky_df['Aksiyon'].values
-    })
-    
-    return result
-
-
-def auto_adjust_column_width(ws):
-    """Excel sütun genişliklerini otomatik ayarla"""
-    for column_cells in ws.columns:
-        max_length = 0
-        column = column_cells[0].column_letter
-        
-        for cell in column_cells:
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column].width = adjusted_width
-
+# ==================== TÜM MAĞAZALAR ZIP (PARALEL) ====================
 
-def create_excel_report(df, internal_df, chronic_df, chronic_fire_df, cigarette_df, 
-                       external_df, family_df, fire_manip_df, kasa_activity_df, top20_df, 
-                       exec_comments, group_stats, magaza_kodu, magaza_adi, params):
-    """Excel raporu - tüm sheet'ler dahil"""
-    
-    wb = Workbook()
-    
-    header_font = Font(bold=True, color='FFFFFF', size=10)
-    header_fill = PatternFill('solid', fgColor='1F4E79')
-    title_font = Font(bold=True, size=14)
-    subtitle_font = Font(bold=True, size=11)
-    border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                    top=Side(style='thin'), bottom=Side(style='thin'))
-    wrap_alignment = Alignment(wrap_text=True, vertical='top')
-    
-    # ===== ÖZET =====
-    ws = wb.active
-    ws.title = "ÖZET"
-    
-    ws['A1'] = f"MAĞAZA: {magaza_kodu} - {magaza_adi}"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Dönem: {params.get('donem', '')} | Tarih: {params.get('tarih', '')}"
-    
-    ws['A4'] = "GENEL METRIKLER"
-    ws['A4'].font = subtitle_font
-    
-    toplam_satis = df['Satış Tutarı'].sum()
-    fark_tutari = df['Fark Tutarı'].fillna(0).sum()
-    kismi_tutari = df['Kısmi Envanter Tutarı'].fillna(0).sum()
-    fire_tutari = df['Fire Tutarı'].fillna(0).sum()
-    
-    # Fark = Fark Tutarı + Kısmi
-    fark = fark_tutari + kismi_tutari
-    # Toplam Açık = Fark + Fire
-    toplam_acik = fark + fire_tutari
-    
-    # Oranlar
-    fark_oran = abs(fark) / toplam_satis * 100 if toplam_satis > 0 else 0
-    fire_oran = abs(fire_tutari) / toplam_satis * 100 if toplam_satis > 0 else 0
-    toplam_oran = abs(toplam_acik) / toplam_satis * 100 if toplam_satis > 0 else 0
-    
-    metrics = [
-        ('Toplam Ürün', len(df)),
-        ('Açık Veren Ürün', len(df[df['Fark Miktarı'] < 0])),
-        ('Toplam Satış', f"{toplam_satis:,.0f} TL"),
-        ('Fark (Fark+Kısmi)', f"{fark:,.0f} TL"),
-        ('Fire', f"{fire_tutari:,.0f} TL"),
-        ('Toplam Açık', f"{toplam_acik:,.0f} TL"),
-        ('Fark Oranı', f"%{fark_oran:.2f}"),
-        ('Fire Oranı', f"%{fire_oran:.2f}"),
-        ('Toplam Oran', f"%{toplam_oran:.2f}"),
-    ]
-    
-    for i, (label, value) in enumerate(metrics, start=5):
-        ws[f'A{i}'] = label
-        ws[f'B{i}'] = value
-    
-    ws['A15'] = "RİSK DAĞILIMI"
-    ws['A15'].font = subtitle_font
-    
-    # Sigara açığı NET toplamı hesapla (satır sayısı değil!)
-    sigara_net_toplam = 0
-    if len(cigarette_df) > 0:
-        toplam_row = cigarette_df[cigarette_df['Malzeme Kodu'] == '*** TOPLAM ***']
-        if len(toplam_row) > 0:
-            sigara_net_toplam = abs(toplam_row['Ürün Toplam'].values[0])
-        else:
-            # Toplam satırı yoksa manuel hesapla
-            sigara_net_toplam = abs(cigarette_df['Ürün Toplam'].sum())
-    
-    risks = [
-        ('İç Hırsızlık (≥100TL)', len(internal_df)),
-        ('Kronik Açık', len(chronic_df)),
-        ('Kronik Fire', len(chronic_fire_df)),
-        ('Sigara Açığı', int(sigara_net_toplam)),  # NET TOPLAM, satır sayısı değil!
-        ('Fire Manipülasyonu', len(fire_manip_df)),
-    ]
-    
-    for i, (label, value) in enumerate(risks, start=16):
-        ws[f'A{i}'] = label
-        ws[f'B{i}'] = value
-        if 'Sigara' in label and value > 0:
-            ws[f'B{i}'].fill = PatternFill('solid', fgColor='FF4444')
-            ws[f'B{i}'].font = Font(bold=True, color='FFFFFF')
-    
-    ws['A22'] = "YÖNETİCİ ÖZETİ"
-    ws['A22'].font = subtitle_font
-    
-    for i, comment in enumerate(exec_comments[:10], start=23):
-        ws[f'A{i}'] = comment
-    
-    auto_adjust_column_width(ws)
-    
-    # ===== EN RİSKLİ 20 =====
-    if len(top20_df) > 0:
-        ws2 = wb.create_sheet("EN RİSKLİ 20")
-        for col, h in enumerate(top20_df.columns, 1):
-            cell = ws2.cell(row=1, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-        
-        for r_idx, row in enumerate(top20_df.values, 2):
-            for c_idx, val in enumerate(row, 1):
-                cell = ws2.cell(row=r_idx, column=c_idx, value=val)
-                cell.border = border
-                cell.alignment = wrap_alignment
-        
-        auto_adjust_column_width(ws2)
-    
-    # ===== KRONİK AÇIK =====
-    if len(chronic_df) > 0:
-        ws3 = wb.create_sheet("KRONİK AÇIK")
-        for col, h in enumerate(chronic_df.columns, 1):
-            cell = ws3.cell(row=1, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        for r_idx, row in enumerate(chronic_df.head(100).values, 2):
-            for c_idx, val in enumerate(row, 1):
-                ws3.cell(row=r_idx, column=c_idx, value=val)
-        
-        auto_adjust_column_width(ws3)
-    
-    # ===== KRONİK FİRE =====
-    if len(chronic_fire_df) > 0:
-        ws4 = wb.create_sheet("KRONİK FİRE")
-        for col, h in enumerate(chronic_fire_df.columns, 1):
-            cell = ws4.cell(row=1, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        for r_idx, row in enumerate(chronic_fire_df.head(100).values, 2):
-            for c_idx, val in enumerate(row, 1):
-                ws4.cell(row=r_idx, column=c_idx, value=val)
-        
-        auto_adjust_column_width(ws4)
-    
-    # ===== SİGARA AÇIĞI =====
-    ws5 = wb.create_sheet("SİGARA AÇIĞI")
-    ws5['A1'] = "⚠️ SİGARA AÇIĞI - YÜKSEK RİSK"
-    ws5['A1'].font = Font(bold=True, size=14, color='FF0000')
-    
-    if len(cigarette_df) > 0:
-        for col, h in enumerate(cigarette_df.columns, 1):
-            cell = ws5.cell(row=3, column=col, value=h)
-            cell.font = header_font
-            cell.fill = PatternFill('solid', fgColor='FF4444')
-        
-        for r_idx, row in enumerate(cigarette_df.values, 4):
-            for c_idx, val in enumerate(row, 1):
-                ws5.cell(row=r_idx, column=c_idx, value=val)
-        
-        auto_adjust_column_width(ws5)
-    
-    # ===== İÇ HIRSIZLIK =====
-    if len(internal_df) > 0:
-        ws6 = wb.create_sheet("İÇ HIRSIZLIK")
-        ws6['A1'] = "Satış Fiyatı ≥ 100 TL | Fark büyüdükçe risk AZALIR"
-        ws6['A1'].font = subtitle_font
-        
-        for col, h in enumerate(internal_df.columns, 1):
-            cell = ws6.cell(row=3, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        for r_idx, row in enumerate(internal_df.head(100).values, 4):
-            for c_idx, val in enumerate(row, 1):
-                ws6.cell(row=r_idx, column=c_idx, value=val)
-        
-        auto_adjust_column_width(ws6)
+def create_all_stores_zip(bolumler, magazalar, kasa_kodlari, params, zip_buffer):
+    """
+    Tüm mağazaların risk raporlarını ZIP'e yazar (utils.magaza_raporu.magazalar_zip).
     
-    # ===== AİLE ANALİZİ =====
-    if len(family_df) > 0:
-        ws7 = wb.create_sheet("AİLE ANALİZİ")
-        ws7['A1'] = "Benzer Ürün Ailesi - Kod Karışıklığı Tespiti"
-        ws7['A1'].font = subtitle_font
-        
-        for col, h in enumerate(family_df.columns, 1):
-            cell = ws7.cell(row=3, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        for r_idx, row in enumerate(family_df.head(100).values, 4):
-            for c_idx, val in enumerate(row, 1):
-                cell = ws7.cell(row=r_idx, column=c_idx, value=val)
-                cell.alignment = wrap_alignment
-        
-        auto_adjust_column_width(ws7)
+    - Mağaza frame'i görev gönderilirken bölüm pozisyonlarından take ile alınır:
+      tüm mağazaların kopyası aynı anda tutulmaz, sadece kayan penceredekiler
+    - Mağaza analizi + Excel üretimi spawn process havuzunda paralel çalışır;
+      mağaza frame'i ve iptal satırları görev argümanıyla gider
     
-    # ===== FİRE MANİPÜLASYONU =====
-    if len(fire_manip_df) > 0:
-        ws8 = wb.create_sheet("FİRE MANİPÜLASYONU")
-        for col, h in enumerate(fire_manip_df.columns, 1):
-            cell = ws8.cell(row=1, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        for r_idx, row in enumerate(fire_manip_df.head(100).values, 2):
-            for c_idx, val in enumerate(row, 1):
-                ws8.cell(row=r_idx, column=c_idx, value=val)
-        
-        auto_adjust_column_width(ws8)
+    bolumler: Yüklenen verinin BolumluVeri'si ('Mağaza Kodu' bölümleri)
+    zip_buffer: yazılabilir dosya nesnesi (diske taşan arşiv için yeni_zip_dosyasi())
+    """
+    # Kamera iptal verisi bir kez okunur, mağazalara bölünüp görevlere verilir
+    df_iptal = get_iptal_verisi_from_sheets()
+    iptal_gruplari = iptal_magaza_bolumleri(df_iptal)
+    iptal_bos = df_iptal.iloc[:0]
     
-    # ===== KASA AKTİVİTESİ =====
-    if len(kasa_activity_df) > 0:
-        ws9 = wb.create_sheet("KASA AKTİVİTESİ")
-        ws9['A1'] = "⚠️ KASA AKTİVİTESİ ÜRÜNLERİ - FAZLA (+) OLANLAR MANİPÜLASYON RİSKİ!"
-        ws9['A1'].font = Font(bold=True, size=12, color='FF0000')
-        
-        for col, h in enumerate(kasa_activity_df.columns, 1):
-            cell = ws9.cell(row=3, column=col, value=h)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        for r_idx, row in enumerate(kasa_activity_df.values, 4):
-            for c_idx, val in enumerate(row, 1):
-                cell = ws9.cell(row=r_idx, column=c_idx, value=val)
-                # Fazla olanları kırmızı yap
-                if c_idx == 6 and isinstance(val, (int, float)) and val > 0:  # TOPLAM sütunu
-                    cell.fill = PatternFill('solid', fgColor='FFCCCC')
-        
-        auto_adjust_column_width(ws9)
+    def gorev_uret(mag):
+        return (mag, bolumler.bolum('Mağaza Kodu', mag), iptal_gruplari.get(iptal_kodu(mag), iptal_bos),
+                kasa_kodlari, params)
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
+    return magazalar_zip(magazalar, gorev_uret, zip_buffer, isci=zip_isci_sayisi(len(magazalar)))
 
 
 # ===== ANA UYGULAMA =====
@@ -2975,21 +1859,15 @@ if analysis_mode == "👔 SM Özet":
                 # BS Özeti
                 st.markdown("### 👔 BS Özeti")
                 
-                bs_ozet = region_df.groupby('BS').agg({
-                    'Mağaza Kodu': 'count',
-                    'Satış': 'sum',
-                    'Fark': 'sum',
-                    'Fire': 'sum',
-                    'Toplam Açık': 'sum',
-                    'Risk Puan': 'sum',
-                    'Sigara': 'sum',
-                    'İç Hırs.': 'sum',
-                    'Kasa Tutar': 'sum'  # 10TL ürünleri
-                }).reset_index()
+                bs_ozet = grup_kupu(region_df).dilim(['BS'], olculer=[
+                    'Mağaza Kodu', 'Satış', 'Fark', 'Fire', 'Toplam Açık',
+                    'Risk Puan', 'Sigara', 'İç Hırs.', '10TL Tutar'  # 10TL ürünleri
+                ])
                 
                 bs_ozet = bs_ozet.rename(columns={
                     'Mağaza Kodu': 'Mağaza',
-                    'Toplam Açık': 'Toplam'
+                    'Toplam Açık': 'Toplam',
+                    '10TL Tutar': 'Kasa Tutar'
                 })
                 
                 bs_ozet['Kayıp %'] = abs(bs_ozet['Toplam']) / bs_ozet['Satış'] * 100
@@ -3042,61 +1920,18 @@ if analysis_mode == "👔 SM Özet":
                     mag_options = [f"{row['Mağaza Kodu']} - {row['Mağaza Adı']}" for _, row in region_df.iterrows()]
                     selected_mag_option = st.selectbox("Mağaza seçin", mag_options, key="sm_mag_select")
                     
-                    if st.button("📥 Rapor Oluştur", key="sm_create_report"):
-                        selected_mag_kod = selected_mag_option.split(" - ")[0]
-                        selected_row = region_df[region_df['Mağaza Kodu'] == selected_mag_kod].iloc[0]
-                        
-                        with st.spinner("📊 Mağaza verisi yükleniyor (bu işlem 5-10 saniye sürebilir)..."):
-                            # ⚡ HIZLI - Sadece bu mağaza için veri çek
-                            df_mag = get_single_store_data(selected_mag_kod, tuple(selected_periods) if selected_periods else None)
-                            
-                            if len(df_mag) > 0:
-                                df_mag = analyze_inventory(df_mag)
-                                mag_adi = selected_row['Mağaza Adı']
-                                
-                                # Analizleri yap
-                                int_df = detect_internal_theft(df_mag)
-                                
-                                # Kamera timestamp entegrasyonu (kategori araması için full_df geçir)
-                                if len(int_df) > 0:
-                                    try:
-                                        env_tarihi = df_mag['Envanter Tarihi'].iloc[0]
-                                        int_df = enrich_internal_theft_with_camera(int_df, selected_mag_kod, env_tarihi, full_df=df_mag)
-                                    except:
-                                        pass
-                                
-                                chr_df = detect_chronic_products(df_mag)
-                                chr_fire_df = detect_chronic_fire(df_mag)
-                                cig_df = detect_cigarette_shortage(df_mag)
-                                ext_df = detect_external_theft(df_mag)
-                                fam_df = find_product_families(df_mag)
-                                fire_df = detect_fire_manipulation(df_mag)
-                                kasa_df, kasa_sum = check_kasa_activity_products(df_mag, kasa_kodlari)
-                                
-                                int_codes = set(int_df['Malzeme Kodu'].astype(str).tolist()) if len(int_df) > 0 else set()
-                                chr_codes = set(chr_df['Malzeme Kodu'].astype(str).tolist()) if len(chr_df) > 0 else set()
-                                
-                                t20_df = create_top_20_risky(df_mag, int_codes, chr_codes, set())
-                                exec_c, grp_s = generate_executive_summary(df_mag, kasa_df, kasa_sum)
-                                
-                                report_data = create_excel_report(
-                                    df_mag, int_df, chr_df, chr_fire_df, cig_df,
-                                    ext_df, fam_df, fire_df, kasa_df, t20_df,
-                                    exec_c, grp_s, selected_mag_kod, mag_adi, params
-                                )
-                                
-                                mag_adi_clean = mag_adi.replace(' ', '_').replace('/', '_')[:30] if mag_adi else ''
-                                
-                                st.download_button(
-                                    "📥 İndir", 
-                                    data=report_data,
-                                    file_name=f"{selected_mag_kod}_{mag_adi_clean}_Risk_Raporu.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                    key="sm_download_report"
-                                )
-                                st.success("✅ Rapor hazır!")
-                            else:
-                                st.error("Veri çekilemedi!")
+                    selected_mag_kod = selected_mag_option.split(" - ")[0]
+                    mag_adi = region_df[region_df['Mağaza Kodu'] == selected_mag_kod].iloc[0]['Mağaza Adı']
+                    
+                    # ⚡ LAZY - rapor butona basılınca üretilir, sonra önbellekten indirilir
+                    rapor_indir_butonu(
+                        'magaza', (selected_mag_kod, tuple(selected_periods or ()), params), veri_surumu(region_df),
+                        tek_magaza_rapor_uretici(selected_mag_kod, mag_adi, kasa_kodlari, params, selected_periods),
+                        label="📥 İndir",
+                        file_name=_rapor_dosya_adi(selected_mag_kod, mag_adi),
+                        key="sm_download_report",
+                        hazirla_label="📥 Rapor Oluştur"
+                    )
                 
                 with tabs[1]:
                     st.subheader("🔴 Kritik Mağazalar")
@@ -3164,10 +1999,11 @@ if analysis_mode == "👔 SM Özet":
                             df_mag_detay = get_single_store_data(selected_mag_kod_detay, tuple(selected_periods) if selected_periods else None)
                             
                             if len(df_mag_detay) > 0:
-                                df_mag_detay = analyze_inventory(df_mag_detay)
+                                paket_detay = magaza_analiz_paketi(df_mag_detay, kasa_kodlari, selected_mag_kod_detay, selected_periods, ham=True)
+                                df_mag_detay = paket_detay['df']
                                 
                                 # İç Hırsızlık analizi
-                                int_df_detay = detect_internal_theft(df_mag_detay)
+                                int_df_detay = paket_detay['tespitler']['ic_hirsizlik']
                                 
                                 # Kamera entegrasyonu
                                 if len(int_df_detay) > 0:
@@ -3178,8 +2014,8 @@ if analysis_mode == "👔 SM Özet":
                                         st.warning(f"Kamera entegrasyonu hatası: {e}")
                                 
                                 # Kronik ve Sigara
-                                chr_df_detay = detect_chronic_products(df_mag_detay)
-                                cig_df_detay = detect_cigarette_shortage(df_mag_detay)
+                                chr_df_detay = paket_detay['tespitler']['kronik']
+                                cig_df_detay = paket_detay['tespitler']['sigara']
                                 
                                 # Sonuçları göster
                                 detay_tabs = st.tabs(["🔒 İç Hırsızlık", "🔄 Kronik Ürünler", "🚬 Sigara"])
@@ -3217,27 +2053,22 @@ if analysis_mode == "👔 SM Özet":
                 with tabs[5]:
                     st.subheader("📥 SM Raporu İndir")
                     
-                    # ⚡ LAZY LOAD - Excel butonu basılınca tam veri çekilir
-                    if st.button("📊 Excel Raporu Hazırla", key="prepare_sm_excel"):
-                        with st.spinner("📊 Detaylı veri yükleniyor..."):
-                            # Tam veri çek (sadece bu SM için)
-                            df_full = get_data_from_supabase(satis_muduru=selected_sm, donemler=selected_periods)
-                            
-                            if len(df_full) > 0:
-                                df_analyzed = analyze_inventory(df_full)
-                                
-                                # Excel oluştur
-                                excel_data = create_region_excel_report(region_df, df_analyzed, kasa_kodlari, params)
-                                
-                                st.download_button(
-                                    label=f"📥 {display_sm} Özet Raporu (Excel)",
-                                    data=excel_data,
-                                    file_name=f"SM_OZET_{display_sm}_{params.get('donem', '')}.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                )
-                                st.success("✅ Excel hazır!")
-                            else:
-                                st.error("Veri çekilemedi!")
+                    # ⚡ LAZY LOAD - Excel butonu basılınca tam veri çekilir, rapor önbellekte tutulur
+                    def sm_raporu_uret():
+                        # Tam veri çek (sadece bu SM için)
+                        df_full = get_data_from_supabase(satis_muduru=selected_sm, donemler=selected_periods)
+                        if len(df_full) == 0:
+                            return None
+                        return create_region_excel_report(region_df, analyze_inventory(df_full), kasa_kodlari, params)
+                    
+                    rapor_indir_butonu(
+                        'sm_ozet', (selected_sm, tuple(selected_periods), params), veri_surumu(region_df),
+                        sm_raporu_uret,
+                        label=f"📥 {display_sm} Özet Raporu (Excel)",
+                        file_name=f"SM_OZET_{display_sm}_{params.get('donem', '')}.xlsx",
+                        key="sm_excel_download",
+                        hazirla_label="📊 Excel Raporu Hazırla"
+                    )
 
 # GM Özet modu - Sadece GM için
 elif analysis_mode == "🌍 GM Özet":
@@ -3317,9 +2148,10 @@ elif analysis_mode == "🌍 GM Özet":
             if 'SM' not in region_df.columns:
                 region_df['SM'] = region_df['Satış Müdürü']
             
-            # SM ve BS agregasyonları
-            sm_df = aggregate_by_group(region_df, 'SM') if 'SM' in region_df.columns else pd.DataFrame()
-            bs_df = aggregate_by_group(region_df, 'BS') if 'BS' in region_df.columns else pd.DataFrame()
+            # SM ve BS agregasyonları - tek küpün iki dilimi
+            region_kup = grup_kupu(region_df)
+            sm_df = aggregate_by_group(region_df, 'SM', region_kup) if 'SM' in region_df.columns else pd.DataFrame()
+            bs_df = aggregate_by_group(region_df, 'BS', region_kup) if 'BS' in region_df.columns else pd.DataFrame()
             
             # ⚡ Risk puanına göre sırala (yüksekten düşüğe)
             region_df = region_df.sort_values('Risk Puan', ascending=False)
@@ -3509,10 +2341,11 @@ elif analysis_mode == "🌍 GM Özet":
                             df_mag_gm_detay = get_single_store_data(selected_mag_kod_gm_detay, tuple(selected_periods) if selected_periods else None)
                             
                             if len(df_mag_gm_detay) > 0:
-                                df_mag_gm_detay = analyze_inventory(df_mag_gm_detay)
+                                paket_gm_detay = magaza_analiz_paketi(df_mag_gm_detay, kasa_kodlari, selected_mag_kod_gm_detay, selected_periods, ham=True)
+                                df_mag_gm_detay = paket_gm_detay['df']
                                 
                                 # İç Hırsızlık analizi
-                                int_df_gm_detay = detect_internal_theft(df_mag_gm_detay)
+                                int_df_gm_detay = paket_gm_detay['tespitler']['ic_hirsizlik']
                                 
                                 # Kamera entegrasyonu
                                 if len(int_df_gm_detay) > 0:
@@ -3523,8 +2356,8 @@ elif analysis_mode == "🌍 GM Özet":
                                         st.warning(f"Kamera entegrasyonu hatası: {e}")
                                 
                                 # Kronik ve Sigara
-                                chr_df_gm_detay = detect_chronic_products(df_mag_gm_detay)
-                                cig_df_gm_detay = detect_cigarette_shortage(df_mag_gm_detay)
+                                chr_df_gm_detay = paket_gm_detay['tespitler']['kronik']
+                                cig_df_gm_detay = paket_gm_detay['tespitler']['sigara']
                                 
                                 # Sonuçları göster
                                 gm_detay_tabs = st.tabs(["🔒 İç Hırsızlık", "🔄 Kronik Ürünler", "🚬 Sigara"])
@@ -3561,14 +2394,14 @@ elif analysis_mode == "🌍 GM Özet":
                 with tabs[6]:
                     st.subheader("📥 Raporları İndir")
                     
-                    # GM Excel raporu
-                    excel_data = create_gm_excel_report(region_df, sm_df, bs_df, params)
-                    
-                    st.download_button(
+                    # GM Excel raporu (istenince üretilir, önbellekte tutulur)
+                    rapor_indir_butonu(
+                        'gm_dashboard', (tuple(selected_periods), params), veri_surumu(region_df, sm_df, bs_df),
+                        lambda: create_gm_excel_report(region_df, sm_df, bs_df, params),
                         label="📥 GM Bölge Dashboard (Excel)",
-                        data=excel_data,
                         file_name=f"GM_BOLGE_DASHBOARD_{params.get('donem', '')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        key="gm_dashboard_download",
+                        hazirla_label="📊 GM Bölge Dashboard Hazırla"
                     )
                     
                     st.markdown("---")
@@ -3579,63 +2412,17 @@ elif analysis_mode == "🌍 GM Özet":
                     mag_options_gm = [f"{row['Mağaza Kodu']} - {row['Mağaza Adı']}" for _, row in region_df.iterrows()]
                     selected_mag_gm = st.selectbox("Mağaza seçin", mag_options_gm, key="gm_mag_select")
                     
-                    if st.button("📥 Mağaza Raporu Oluştur", key="gm_create_mag_report"):
-                        selected_mag_kod_gm = selected_mag_gm.split(" - ")[0]
-                        selected_row_gm = region_df[region_df['Mağaza Kodu'] == selected_mag_kod_gm].iloc[0]
-                        
-                        with st.spinner("📊 Mağaza verisi yükleniyor (5-10 saniye)..."):
-                            # ⚡ HIZLI - Sadece bu mağaza için veri çek
-                            df_mag_gm = get_single_store_data(selected_mag_kod_gm, tuple(selected_periods) if selected_periods else None)
-                            
-                            if len(df_mag_gm) > 0:
-                                df_mag_gm = analyze_inventory(df_mag_gm)
-                                mag_adi_gm = selected_row_gm['Mağaza Adı']
-                                
-                                # Kasa kodlarını yükle
-                                kasa_kodlari_gm = load_kasa_activity_codes()
-                                
-                                # Analizleri yap
-                                int_df_gm = detect_internal_theft(df_mag_gm)
-                                
-                                if len(int_df_gm) > 0:
-                                    try:
-                                        env_tarihi_gm = df_mag_gm['Envanter Tarihi'].iloc[0]
-                                        int_df_gm = enrich_internal_theft_with_camera(int_df_gm, selected_mag_kod_gm, env_tarihi_gm, full_df=df_mag_gm)
-                                    except:
-                                        pass
-                                
-                                chr_df_gm = detect_chronic_products(df_mag_gm)
-                                chr_fire_df_gm = detect_chronic_fire(df_mag_gm)
-                                cig_df_gm = detect_cigarette_shortage(df_mag_gm)
-                                ext_df_gm = detect_external_theft(df_mag_gm)
-                                fam_df_gm = find_product_families(df_mag_gm)
-                                fire_df_gm = detect_fire_manipulation(df_mag_gm)
-                                kasa_df_gm, kasa_sum_gm = check_kasa_activity_products(df_mag_gm, kasa_kodlari_gm)
-                                
-                                int_codes_gm = set(int_df_gm['Malzeme Kodu'].astype(str).tolist()) if len(int_df_gm) > 0 else set()
-                                chr_codes_gm = set(chr_df_gm['Malzeme Kodu'].astype(str).tolist()) if len(chr_df_gm) > 0 else set()
-                                
-                                t20_df_gm = create_top_20_risky(df_mag_gm, int_codes_gm, chr_codes_gm, set())
-                                exec_c_gm, grp_s_gm = generate_executive_summary(df_mag_gm, kasa_df_gm, kasa_sum_gm)
-                                
-                                report_data_gm = create_excel_report(
-                                    df_mag_gm, int_df_gm, chr_df_gm, chr_fire_df_gm, cig_df_gm,
-                                    ext_df_gm, fam_df_gm, fire_df_gm, kasa_df_gm, t20_df_gm,
-                                    exec_c_gm, grp_s_gm, selected_mag_kod_gm, mag_adi_gm, params
-                                )
-                                
-                                mag_adi_clean_gm = mag_adi_gm.replace(' ', '_').replace('/', '_')[:30] if mag_adi_gm else ''
-                                
-                                st.download_button(
-                                    "📥 İndir", 
-                                    data=report_data_gm,
-                                    file_name=f"{selected_mag_kod_gm}_{mag_adi_clean_gm}_Risk_Raporu.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                    key="gm_download_mag_report"
-                                )
-                                st.success(f"✅ {selected_mag_kod_gm} raporu hazır!")
-                            else:
-                                st.error("Mağaza verisi bulunamadı")
+                    selected_mag_kod_gm = selected_mag_gm.split(" - ")[0]
+                    mag_adi_gm = region_df[region_df['Mağaza Kodu'] == selected_mag_kod_gm].iloc[0]['Mağaza Adı']
+                    
+                    rapor_indir_butonu(
+                        'magaza', (selected_mag_kod_gm, tuple(selected_periods or ()), params), veri_surumu(region_df),
+                        tek_magaza_rapor_uretici(selected_mag_kod_gm, mag_adi_gm, load_kasa_activity_codes(), params, selected_periods),
+                        label="📥 İndir",
+                        file_name=_rapor_dosya_adi(selected_mag_kod_gm, mag_adi_gm),
+                        key="gm_download_mag_report",
+                        hazirla_label="📥 Mağaza Raporu Oluştur"
+                    )
                     
                     st.markdown("---")
                     st.markdown("""
@@ -3648,47 +2435,38 @@ elif analysis_mode == "🌍 GM Özet":
 
 elif uploaded_file is not None:
     try:
-        xl = pd.ExcelFile(uploaded_file)
-        sheet_names = xl.sheet_names
-        
-        best_sheet = None
-        max_cols = 0
-        
-        for sheet in sheet_names:
-            temp_df = pd.read_excel(uploaded_file, sheet_name=sheet, nrows=5)
-            if len(temp_df.columns) > max_cols:
-                max_cols = len(temp_df.columns)
-                best_sheet = sheet
-        
-        df_raw = pd.read_excel(uploaded_file, sheet_name=best_sheet)
-        st.success(f"✅ {len(df_raw)} satır, {len(df_raw.columns)} sütun ({best_sheet})")
-        
-        # ===== ARKA PLANDA SUPABASE'E KAYIT =====
-        with st.spinner("Veritabanına kaydediliyor..."):
-            try:
-                inserted, skipped, result_info = save_to_supabase(df_raw)
-                if inserted > 0:
-                    st.info(f"💾 {inserted:,} kayıt eklendi | ⏭️ {skipped} envanter zaten mevcut")
-                elif skipped > 0:
-                    st.info(f"⏭️ Tüm envanterler zaten mevcut ({skipped} envanter)")
-            except Exception as e:
-                # Supabase hatası analizi engellemesin
-                st.warning(f"⚠️ Veritabanı kaydı atlandı: {str(e)[:50]}")
+        # Okuma + kayıt + analiz yükleme başına 1 kez - rerun'lar önbellekten okur
+        yukleme = yuklenen_dosyayi_isle(yukleme_anahtari(uploaded_file), uploaded_file)
+        st.success(f"✅ {yukleme['satir']} satır, {yukleme['sutun']} sütun ({yukleme['sayfa']})")
+        
+        if yukleme['kayit'] is not None:
+            inserted, skipped = yukleme['kayit']
+            if inserted > 0:
+                st.info(f"💾 {inserted:,} kayıt eklendi | ⏭️ {skipped} envanter zaten mevcut")
+            elif skipped > 0:
+                st.info(f"⏭️ Tüm envanterler zaten mevcut ({skipped} envanter)")
+        else:
+            st.warning(f"⚠️ Veritabanı kaydı atlandı: {yukleme['hata']}")
         
-        df = analyze_inventory(df_raw)
+        # Sığ kopya: kolon eklemek paylaşılan çerçeveyi değiştirmez
+        df = yukleme['bolumler'].df.copy(deep=False)
         
         # Mağaza bilgisi
         if 'Mağaza Kodu' in df.columns:
-            magazalar = df['Mağaza Kodu'].dropna().unique().tolist()
+            # Mağaza grup indeksi (yükleme başına 1 kez) - mağaza filtreleri tam tabloyu maskelemez
+            bolumler = yukleme['bolumler']
+            magazalar = bolumler.degerler('Mağaza Kodu')
             # Mağaza kod-isim eşleştirmesi
+            ilk_isimler = bolumler.ilk('Mağaza Kodu', 'Mağaza Adı') if 'Mağaza Adı' in df.columns else {}
             magaza_isimleri = {}
             for mag in magazalar:
-                isim = df[df['Mağaza Kodu'] == mag]['Mağaza Adı'].iloc[0] if 'Mağaza Adı' in df.columns else ''
+                isim = ilk_isimler.get(mag, '')
                 magaza_isimleri[mag] = f"{mag} - {isim}" if isim else str(mag)
         else:
             magazalar = ['MAGAZA']
             df['Mağaza Kodu'] = 'MAGAZA'
             magaza_isimleri = {'MAGAZA': 'MAGAZA'}
+            bolumler = BolumluVeri(df)
         
         params = {
             'donem': str(df['Envanter Dönemi'].iloc[0]) if 'Envanter Dönemi' in df.columns else '',
@@ -3701,6 +2479,7 @@ elif uploaded_file is not None:
         # ========== BÖLGE ÖZETİ MODU ==========
         if analysis_mode == "🌍 Bölge Özeti":
             # Tarih aralığı filtresi (opsiyonel)
+            tarih_araligi = None
             if 'Envanter Tarihi' in df.columns:
                 try:
                     df['Envanter Tarihi'] = pd.to_datetime(df['Envanter Tarihi'])
@@ -3733,6 +2512,9 @@ elif uploaded_file is not None:
                             if bolge_tarih_bas != min_tarih or bolge_tarih_bit != max_tarih:
                                 df = df[(df['Envanter Tarihi'].dt.date >= bolge_tarih_bas) & 
                                        (df['Envanter Tarihi'].dt.date <= bolge_tarih_bit)]
+                                # Mağaza raporları da filtrelenmiş veriden dilimlenir
+                                bolumler = BolumluVeri(df)
+                                tarih_araligi = (bolge_tarih_bas, bolge_tarih_bit)
                                 magazalar = df['Mağaza Kodu'].dropna().unique().tolist()
                                 st.info(f"📆 Filtre: {bolge_tarih_bas.strftime('%d.%m.%Y')} - {bolge_tarih_bit.strftime('%d.%m.%Y')} | {len(magazalar)} mağaza")
                 except:
@@ -3750,6 +2532,9 @@ elif uploaded_file is not None:
             if len(region_df) == 0:
                 st.warning("Analiz edilecek mağaza bulunamadı!")
             else:
+                # Veri sürümü (rapor önbelleği anahtarı): yükleme kimliği + tarih filtresi, hash yok
+                bolge_surum = (yukleme['surum'], tarih_araligi)
+                
                 # Bölge toplamları
                 toplam_satis = region_df['Satış'].sum()
                 toplam_fark = region_df['Fark'].sum()  # Fark + Kısmi
@@ -3831,50 +2616,19 @@ elif uploaded_file is not None:
                     for idx, (_, row) in enumerate(region_df.iterrows()):
                         cols = st.columns([0.4, 0.6, 1.3, 1.1, 0.8, 0.6, 0.8, 0.6, 0.5, 0.5, 0.4, 0.6, 0.5, 0.7])
                         
-                        # Mağaza verisini al ve tam rapor oluştur
+                        # Mağaza raporu - sadece 📥 tıklanınca üretilir
                         mag_kod = row['Mağaza Kodu']
-                        df_mag = df[df['Mağaza Kodu'] == mag_kod].copy()
                         mag_adi = row['Mağaza Adı']
                         
-                        # Analizleri yap
-                        int_df = detect_internal_theft(df_mag)
-                        
-                        # Kamera timestamp entegrasyonu (kategori araması için full_df geçir)
-                        if len(int_df) > 0:
-                            try:
-                                env_tarihi = df_mag['Envanter Tarihi'].iloc[0]
-                                int_df = enrich_internal_theft_with_camera(int_df, mag_kod, env_tarihi, full_df=df_mag)
-                            except:
-                                pass
-                        
-                        chr_df = detect_chronic_products(df_mag)
-                        chr_fire_df = detect_chronic_fire(df_mag)
-                        cig_df = detect_cigarette_shortage(df_mag)
-                        ext_df = detect_external_theft(df_mag)
-                        fam_df = find_product_families(df_mag)
-                        fire_df = detect_fire_manipulation(df_mag)
-                        kasa_df, kasa_sum = check_kasa_activity_products(df_mag, kasa_kodlari)
-                        
-                        int_codes = set(int_df['Malzeme Kodu'].astype(str).tolist()) if len(int_df) > 0 else set()
-                        chr_codes = set(chr_df['Malzeme Kodu'].astype(str).tolist()) if len(chr_df) > 0 else set()
-                        
-                        t20_df = create_top_20_risky(df_mag, int_codes, chr_codes, set())
-                        exec_c, grp_s = generate_executive_summary(df_mag, kasa_df, kasa_sum)
-                        
-                        # Tam rapor oluştur
-                        report_data = create_excel_report(
-                            df_mag, int_df, chr_df, chr_fire_df, cig_df,
-                            ext_df, fam_df, fire_df, kasa_df, t20_df,
-                            exec_c, grp_s, mag_kod, mag_adi, params
-                        )
-                        
-                        mag_adi_clean = mag_adi.replace(' ', '_').replace('/', '_')[:30] if mag_adi else ''
-                        
                         with cols[0]:
-                            st.download_button("📥", data=report_data, 
-                                file_name=f"{mag_kod}_{mag_adi_clean}_Risk_Raporu.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                key=f"dl_{idx}")
+                            rapor_indir_butonu(
+                                'magaza_yuklu', (mag_kod, params), bolge_surum,
+                                yuklu_magaza_rapor_uretici(bolumler, mag_kod, mag_adi, kasa_kodlari, params),
+                                label="💾",
+                                file_name=_rapor_dosya_adi(mag_kod, mag_adi),
+                                key=f"dl_{idx}",
+                                hazirla_label="📥"
+                            )
                         cols[1].write(f"{row['Mağaza Kodu']}")
                         cols[2].write(f"{row['Mağaza Adı'][:15] if row['Mağaza Adı'] else '-'}")
                         cols[3].write(f"{row['BS'][:10] if row['BS'] else '-'}")
@@ -3946,13 +2700,13 @@ elif uploaded_file is not None:
                 with tabs[5]:
                     st.subheader("📥 Bölge Raporu İndir")
                     
-                    excel_data = create_region_excel_report(region_df, df, kasa_kodlari, params)
-                    
-                    st.download_button(
+                    rapor_indir_butonu(
+                        'bolge', params, bolge_surum,
+                        lambda: create_region_excel_report(region_df, df, kasa_kodlari, params),
                         label="📥 Bölge Özet Raporu (Excel)",
-                        data=excel_data,
                         file_name=f"BOLGE_OZET_{params.get('donem', '')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        key="bolge_rapor_download",
+                        hazirla_label="📊 Bölge Özet Raporu Hazırla"
                     )
         
         # ========== TEK MAĞAZA MODU ==========
@@ -3972,7 +2726,7 @@ elif uploaded_file is not None:
                         break
                 if selected is None:
                     selected = magazalar[0]
-                df_display = df[df['Mağaza Kodu'] == selected].copy()
+                df_display = bolumler.bolum('Mağaza Kodu', selected)
                 magaza_adi = df_display['Mağaza Adı'].iloc[0] if 'Mağaza Adı' in df_display.columns and len(df_display) > 0 else ''
             else:
                 selected = magazalar[0]
@@ -3982,8 +2736,11 @@ elif uploaded_file is not None:
             # Kasa aktivitesi kodlarını yükle
             kasa_kodlari = load_kasa_activity_codes()
         
-            # Analizler
-            internal_df = detect_internal_theft(df_display)
+            # Analizler (mağaza + dönem + veri sürümü başına önbellekte)
+            paket = magaza_analiz_paketi(df_display, kasa_kodlari, selected, [params.get('donem', '')],
+                                         surum=yukleme['surum'])
+            tespitler = paket['tespitler']
+            internal_df = tespitler['ic_hirsizlik']
             
             # Kamera timestamp entegrasyonu
             st.info(f"🔍 İç Hırsızlık: {len(internal_df)} ürün bulundu")
@@ -4010,27 +2767,18 @@ elif uploaded_file is not None:
                     import traceback
                     st.code(traceback.format_exc())
             
-            chronic_df = detect_chronic_products(df_display)
-            chronic_fire_df = detect_chronic_fire(df_display)
-            cigarette_df = detect_cigarette_shortage(df_display)
-            external_df = detect_external_theft(df_display)
-            family_df = find_product_families(df_display)
-            fire_manip_df = detect_fire_manipulation(df_display)
-            kasa_activity_df, kasa_summary = check_kasa_activity_products(df_display, kasa_kodlari)
-            exec_comments, group_stats = generate_executive_summary(df_display, kasa_activity_df, kasa_summary)
-        
-            internal_codes = set(internal_df['Malzeme Kodu'].astype(str).tolist()) if len(internal_df) > 0 else set()
-            chronic_codes = set(chronic_df['Malzeme Kodu'].astype(str).tolist()) if len(chronic_df) > 0 else set()
+            chronic_df = tespitler['kronik']
+            chronic_fire_df = tespitler['kronik_fire']
+            cigarette_df = tespitler['sigara']
+            external_df = tespitler['dis_hirsizlik']
+            family_df = tespitler['aile']
+            fire_manip_df = tespitler['fire_manipulasyon']
+            kasa_activity_df, kasa_summary = tespitler['kasa'], tespitler['kasa_ozet']
+            exec_comments, group_stats = paket['exec_comments'], paket['group_stats']
         
-            # Aile dengelenmişlerini bul
-            family_balanced_codes = set()
-            if len(family_df) > 0:
-                balanced_families = family_df[family_df['Sonuç'].str.contains('KARIŞIKLIK', na=False)]
-                # Bu ailelerdeki ürünleri bul
+            top20_df = paket['top20']
         
-            top20_df = create_top_20_risky(df_display, internal_codes, chronic_codes, family_balanced_codes)
-        
-            risk_seviyesi, risk_class = calculate_store_risk(df_display, internal_df, chronic_df, cigarette_df)
+            risk_seviyesi, risk_class = paket['risk']
         
             st.markdown("---")
         
@@ -4178,67 +2926,36 @@ elif uploaded_file is not None:
             with tabs[7]:
                 st.subheader("📥 Rapor İndir")
             
-                excel_output = create_excel_report(
-                    df_display, internal_df, chronic_df, chronic_fire_df, cigarette_df,
-                    external_df, family_df, fire_manip_df, kasa_activity_df, top20_df,
-                    exec_comments, group_stats, selected, magaza_adi, params
-                )
-                
                 mag_adi_clean = magaza_adi.replace(' ', '_').replace('/', '_')[:30] if magaza_adi else ''
             
-                st.download_button(
+                rapor_indir_butonu(
+                    'magaza_tek', (selected, params), yukleme['surum'],
+                    lambda: create_excel_report(
+                        df_display, internal_df, chronic_df, chronic_fire_df, cigarette_df,
+                        external_df, family_df, fire_manip_df, kasa_activity_df, top20_df,
+                        exec_comments, group_stats, selected, magaza_adi, params
+                    ),
                     label=f"📥 {selected} Raporu İndir",
-                    data=excel_output,
                     file_name=f"{selected}_{mag_adi_clean}_Risk_Raporu.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    key="tek_magaza_rapor_download",
+                    hazirla_label=f"📊 {selected} Raporu Hazırla"
                 )
             
                 if len(magazalar) > 1:
                     st.markdown("---")
                     if st.button("🗜️ Tüm Mağazaları Hazırla (ZIP)"):
                         with st.spinner("Raporlar hazırlanıyor..."):
-                            zip_buffer = BytesIO()
-                            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                                for mag in magazalar:
-                                    df_mag = df[df['Mağaza Kodu'] == mag].copy()
-                                    mag_adi = df_mag['Mağaza Adı'].iloc[0] if 'Mağaza Adı' in df_mag.columns and len(df_mag) > 0 else ''
-                                
-                                    int_df = detect_internal_theft(df_mag)
-                                    
-                                    # Kamera timestamp entegrasyonu (kategori araması için full_df geçir)
-                                    if len(int_df) > 0:
-                                        try:
-                                            env_tarihi = df_mag['Envanter Tarihi'].iloc[0]
-                                            int_df = enrich_internal_theft_with_camera(int_df, mag, env_tarihi, full_df=df_mag)
-                                        except:
-                                            pass
-                                    
-                                    chr_df = detect_chronic_products(df_mag)
-                                    chr_fire_df = detect_chronic_fire(df_mag)
-                                    cig_df = detect_cigarette_shortage(df_mag)
-                                    ext_df = detect_external_theft(df_mag)
-                                    fam_df = find_product_families(df_mag)
-                                    fire_df = detect_fire_manipulation(df_mag)
-                                    kasa_df, kasa_sum = check_kasa_activity_products(df_mag, kasa_kodlari)
-                                
-                                    int_codes = set(int_df['Malzeme Kodu'].astype(str).tolist()) if len(int_df) > 0 else set()
-                                    chr_codes = set(chr_df['Malzeme Kodu'].astype(str).tolist()) if len(chr_df) > 0 else set()
-                                
-                                    t20_df = create_top_20_risky(df_mag, int_codes, chr_codes, set())
-                                    exec_c, grp_s = generate_executive_summary(df_mag, kasa_df, kasa_sum)
-                                
-                                    excel_data = create_excel_report(
-                                        df_mag, int_df, chr_df, chr_fire_df, cig_df,
-                                        ext_df, fam_df, fire_df, kasa_df, t20_df,
-                                        exec_c, grp_s, mag, mag_adi, params
-                                    )
-                                
-                                    zf.writestr(f"{mag}_Risk_Raporu.xlsx", excel_data.getvalue())
+                            with yeni_zip_dosyasi() as zip_dosyasi:
+                                create_all_stores_zip(bolumler, magazalar, kasa_kodlari, params, zip_dosyasi)
+                                zip_dosyasi.seek(0)
+                                # NOT: download_button veriyi bytes olarak bellekte tutar (dosya nesnesi
+                                # verilse de okur); bu adımda tepe bellek kazancı YOK. Geçici dosya
+                                # sadece üretim sırasında raporların bellekte birikmesini önler.
+                                zip_verisi = zip_dosyasi.read()
                         
-                            zip_buffer.seek(0)
                             st.download_button(
                                 label=f"📥 {len(magazalar)} Mağaza ZIP İndir",
-                                data=zip_buffer,
+                                data=zip_verisi,
                                 file_name="Tum_Magazalar_Rapor.zip",
                                 mime="application/zip"
                             )
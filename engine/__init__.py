@@ -13,26 +13,44 @@ Veri Yükleme:
 Konfigürasyon:
 - weights.py: Risk ağırlıkları ve config
   - load_weights() -> dict
+  - validate_risk_weights(weights, reference) -> hata mesajı / None
   - RISK_LEVELS, MAX_SCORE
 
 Risk Kuralları:
 - rules.py: Risk kural tanımları
-  - RiskRule dataclass
+  - RiskRule dataclass (evaluate + evaluate_vec)
   - RISK_RULES list
 
 Skorlama:
 - scorer.py: Risk hesaplama fonksiyonları
   - calculate_risk_score(row, weights) -> int
+  - calculate_magaza_features(df) -> DataFrame (ham metrikler)
+  - score_magaza_features(features, bolge_ort, weights) -> DataFrame (vektörel)
+  - get_risk_levels(scores) -> (labels, emojis)
+  - calculate_period_scores(df, weights) -> DataFrame (dönem x mağaza, uzun format)
   - get_risk_level(score) -> str
   - tespit_supheli_urun(...) -> dict
 
+Artımlı Skorlama:
+- score_cache.py: Mağaza parmak izi bazlı skor önbelleği
+  - ScoreCache.score(raw_df, weights) -> DataFrame (sadece değişenler hesaplanır)
+  - compute_store_fingerprints(df) -> dict
+
 Bootstrap:
 - bootstrap.py: Tek noktadan veri + skor
-  - build_dataset(donemler, sm) -> DataFrame (scored)
+  - build_dataset(donemler, sm, score_cache=None) -> DataFrame (scored)
+  - rescore_dataset(features_df, weights) -> DataFrame (what-if, veri yüklemeden)
+  - build_score_matrix(donemler, sm) -> (puan_matrix, seviye_matrix, metadata)
+    dönem x mağaza, tek gruplama
 """
 
-from .bootstrap import build_dataset
-from .scorer import calculate_risk_score, get_risk_level
-from .weights import load_weights
+from .bootstrap import build_dataset, build_score_matrix, rescore_dataset
+from .scorer import calculate_risk_score, get_risk_level, get_risk_levels
+from .weights import load_weights, validate_risk_weights
+from .score_cache import ScoreCache, compute_store_fingerprints
 
-__all__ = ['build_dataset', 'calculate_risk_score', 'get_risk_level', 'load_weights']
+__all__ = [
+    'build_dataset', 'build_score_matrix', 'rescore_dataset', 'calculate_risk_score',
+    'get_risk_level', 'get_risk_levels', 'load_weights', 'validate_risk_weights',
+    'ScoreCache', 'compute_store_fingerprints'
+]
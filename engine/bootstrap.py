@@ -10,14 +10,19 @@ from typing import List, Optional, Dict, Any, Tuple
 import time
 
 from .loader import load_raw_data, load_periods, load_sms
-from .scorer import calculate_magaza_scores, tespit_supheli_urun, get_risk_level
+from .scorer import (
+    calculate_magaza_scores, score_magaza_features, calculate_period_scores,
+    tespit_supheli_urun, get_risk_level
+)
 from .weights import load_weights
+from .score_cache import ScoreCache
 
 
 def build_dataset(
     client,
     donemler: List[str],
-    satis_muduru: Optional[str] = None
+    satis_muduru: Optional[str] = None,
+    score_cache: Optional[ScoreCache] = None
 ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     """
     Veri yükle ve risk skorlarını hesapla.
@@ -29,6 +34,8 @@ def build_dataset(
         client: Supabase client
         donemler: Envanter dönemleri
         satis_muduru: Opsiyonel SM filtresi
+        score_cache: Opsiyonel ScoreCache - verilirse sadece değişen
+                     mağazalar yeniden hesaplanır
 
     Returns:
         Tuple: (scored_df, metadata)
@@ -56,7 +63,10 @@ def build_dataset(
 
     # 3. Risk skorlarını hesapla
     score_start = time.perf_counter()
-    scored_df = calculate_magaza_scores(raw_df, weights.get('risk_weights', {}))
+    if score_cache is not None:
+        scored_df = score_cache.score(raw_df, weights.get('risk_weights', {}))
+    else:
+        scored_df = calculate_magaza_scores(raw_df, weights.get('risk_weights', {}))
     score_time = time.perf_counter() - score_start
 
     total_time = time.perf_counter() - start_time
@@ -68,7 +78,8 @@ def build_dataset(
         'score_time': score_time,
         'total_time': total_time,
         'donemler': donemler,
-        'satis_muduru': satis_muduru
+        'satis_muduru': satis_muduru,
+        'rescored_stores': len(score_cache.last_changed) if score_cache is not None else len(scored_df)
     }
 
     return scored_df, metadata
@@ -77,10 +88,12 @@ def build_dataset(
 def build_dataset_with_raw(
     client,
     donemler: List[str],
-    satis_muduru: Optional[str] = None
+    satis_muduru: Optional[str] = None,
+    score_cache: Optional[ScoreCache] = None
 ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
     """
     Veri yükle, ham veriyi de döndür (detay ekranları için).
+    score_cache verilirse skorlama artımlı yapılır (bkz. build_dataset).
 
     Returns:
         Tuple: (raw_df, scored_df, metadata)
@@ -106,7 +119,10 @@ def build_dataset_with_raw(
 
     # 3. Risk skorlarını hesapla
     score_start = time.perf_counter()
-    scored_df = calculate_magaza_scores(raw_df, weights.get('risk_weights', {}))
+    if score_cache is not None:
+        scored_df = score_cache.score(raw_df, weights.get('risk_weights', {}))
+    else:
+        scored_df = calculate_magaza_scores(raw_df, weights.get('risk_weights', {}))
     score_time = time.perf_counter() - score_start
 
     total_time = time.perf_counter() - start_time
@@ -118,12 +134,108 @@ def build_dataset_with_raw(
         'score_time': score_time,
         'total_time': total_time,
         'donemler': donemler,
-        'satis_muduru': satis_muduru
+        'satis_muduru': satis_muduru,
+        'rescored_stores': len(score_cache.last_changed) if score_cache is not None else len(scored_df)
     }
 
     return raw_df, scored_df, metadata
 
 
+def build_score_matrix(
+    client,
+    donemler: List[str],
+    satis_muduru: Optional[str] = None,
+    weights: Optional[Dict[str, Any]] = None,
+    raw_df: Optional[pd.DataFrame] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """
+    Çok dönemli skor matrisi: dönem x mağaza.
+
+    Tüm dönemler tek seferde yüklenir, tek groupby + tek vektörel kural
+    değerlendirmesi yapılır (dönem başına build_dataset çağırmak yerine).
+
+    Args:
+        client: Supabase client
+        donemler: Envanter dönemleri
+        satis_muduru: Opsiyonel SM filtresi
+        weights: weights.json formatı veya risk_weights (None ise weights.json)
+        raw_df: Hazır ham veri (verilirse yükleme atlanır)
+
+    Returns:
+        Tuple: (puan_matrix, seviye_matrix, metadata)
+        - puan_matrix: index=envanter_donemi, columns=magaza_kodu, değer=risk_puan
+        - seviye_matrix: aynı şekil, değer=risk_seviye
+    """
+    start_time = time.perf_counter()
+
+    load_start = time.perf_counter()
+    if raw_df is None:
+        raw_df = load_raw_data(client, donemler, satis_muduru)
+    load_time = time.perf_counter() - load_start
+
+    if raw_df.empty:
+        return pd.DataFrame(), pd.DataFrame(), {
+            'raw_rows': 0,
+            'load_time': load_time,
+            'score_time': 0,
+            'total_time': time.perf_counter() - start_time
+        }
+
+    if weights is None:
+        weights = load_weights()
+    risk_weights = weights.get('risk_weights', weights)
+
+    score_start = time.perf_counter()
+    uzun_df = calculate_period_scores(raw_df, risk_weights)
+    puan_matrix = uzun_df.pivot_table(
+        index='envanter_donemi', columns='magaza_kodu', values='risk_puan', aggfunc='max'
+    )
+    seviye_matrix = uzun_df.pivot_table(
+        index='envanter_donemi', columns='magaza_kodu', values='risk_seviye', aggfunc='first'
+    )
+    score_time = time.perf_counter() - score_start
+
+    metadata = {
+        'raw_rows': len(raw_df),
+        'scored_rows': len(uzun_df),
+        'load_time': load_time,
+        'score_time': score_time,
+        'total_time': time.perf_counter() - start_time,
+        'donemler': donemler,
+        'satis_muduru': satis_muduru
+    }
+
+    return puan_matrix, seviye_matrix, metadata
+
+
+def rescore_dataset(
+    features_df: pd.DataFrame,
+    weights: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """
+    Hazır mağaza feature'larını yeni ağırlıklarla yeniden skorla.
+
+    Veri yükleme ve gruplama YAPILMAZ; build_dataset çıktısındaki
+    scored_df (feature kolonlarını içerir) doğrudan verilebilir.
+
+    Args:
+        features_df: calculate_magaza_features çıktısı veya scored_df
+        weights: weights.json formatı ({'risk_weights': ...}) veya
+                 doğrudan risk_weights bölümü. None ise weights.json.
+
+    Returns:
+        DataFrame: Yeniden skorlanmış mağaza özeti
+    """
+    if features_df.empty:
+        return pd.DataFrame()
+
+    if weights is None:
+        weights = load_weights()
+    risk_weights = weights.get('risk_weights', weights)
+
+    return score_magaza_features(features_df, None, risk_weights)
+
+
 # Yardımcı fonksiyonlar (re-export)
 def get_periods(client) -> List[str]:
     """Mevcut dönemleri getir."""
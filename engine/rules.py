@@ -7,6 +7,8 @@ Risk hesaplama kuralları ve eşik değerleri.
 from dataclasses import dataclass
 from typing import Callable, Optional, Dict, Any
 
+import numpy as np
+
 
 @dataclass
 class RiskRule:
@@ -14,7 +16,8 @@ class RiskRule:
     name: str
     max_points: int
     description: str
-    evaluate: Callable[[Dict[str, Any]], int]
+    evaluate: Callable[[Dict[str, Any], Dict], int]
+    evaluate_vec: Optional[Callable[[Dict[str, Any], Dict], np.ndarray]] = None
 
 
 def rule_toplam_oran(data: Dict[str, Any], weights: Dict) -> int:
@@ -118,42 +121,120 @@ def rule_kasa_10tl(data: Dict[str, Any], weights: Dict) -> int:
     return 0
 
 
+# ==================== VEKTÖREL KURALLAR ====================
+# Aynı kurallar, data içindeki değerler numpy array (mağaza başına bir eleman).
+# Feature tablosu bir kez hesaplanır, ağırlık değişince sadece bunlar çalışır.
+
+def _tier(values: np.ndarray, w: Dict, tiers, defaults, strict: bool = False) -> np.ndarray:
+    """Eşik kademelerine göre puan (yüksekten düşüğe ilk tutan kademe)."""
+    conds = []
+    points = []
+    for tier in tiers:
+        threshold = w.get(tier, {}).get('threshold', defaults[tier][0])
+        conds.append(values > threshold if strict else values >= threshold)
+        points.append(w.get(tier, {}).get('points', defaults[tier][1]))
+    return np.select(conds, points, 0)
+
+
+def rule_toplam_oran_vec(data: Dict[str, Any], weights: Dict) -> np.ndarray:
+    """rule_toplam_oran - vektörel."""
+    kayip_oran = np.abs(np.asarray(data.get('toplam_pct', 0), dtype=float))
+    # bolge_kayip_oran skaler veya satır başına array olabilir (çok dönemli skor)
+    bolge_ort = np.asarray(data.get('bolge_kayip_oran', 1), dtype=float)
+    pozitif = bolge_ort > 0
+    ratio = np.where(
+        pozitif,
+        np.divide(kayip_oran, np.abs(bolge_ort), out=np.zeros_like(kayip_oran), where=pozitif),
+        kayip_oran
+    )
+    return _tier(ratio, weights.get('toplam_oran', {}), ('high', 'medium', 'low'),
+                 {'high': (2.0, 40), 'medium': (1.5, 25), 'low': (1.0, 15)})
+
+
+def rule_ic_hirsizlik_vec(data: Dict[str, Any], weights: Dict) -> np.ndarray:
+    """rule_ic_hirsizlik - vektörel."""
+    count = np.asarray(data.get('ic_hirsizlik_count', 0))
+    return _tier(count, weights.get('ic_hirsizlik', {}), ('high', 'medium', 'low'),
+                 {'high': (50, 30), 'medium': (30, 20), 'low': (15, 10)})
+
+
+def rule_sigara_vec(data: Dict[str, Any], weights: Dict) -> np.ndarray:
+    """rule_sigara - vektörel."""
+    count = np.asarray(data.get('sigara_count', 0))
+    w = weights.get('sigara', {})
+    high_t = w.get('high', {}).get('threshold', 5)
+    high_p = w.get('high', {}).get('points', 35)
+    low_t = w.get('low', {}).get('threshold', 0)
+    return np.select(
+        [count > high_t, count > low_t],
+        [high_p, np.minimum(count * 4, high_p)],
+        0
+    )
+
+
+def rule_kronik_vec(data: Dict[str, Any], weights: Dict) -> np.ndarray:
+    """rule_kronik - vektörel."""
+    count = np.asarray(data.get('kronik_count', 0))
+    return _tier(count, weights.get('kronik', {}), ('high', 'low'),
+                 {'high': (100, 15), 'low': (50, 10)})
+
+
+def rule_fire_manipulasyon_vec(data: Dict[str, Any], weights: Dict) -> np.ndarray:
+    """rule_fire_manipulasyon - vektörel."""
+    count = np.asarray(data.get('fire_manip_count', 0))
+    return _tier(count, weights.get('fire_manipulasyon', {}), ('high', 'low'),
+                 {'high': (10, 20), 'low': (5, 10)})
+
+
+def rule_kasa_10tl_vec(data: Dict[str, Any], weights: Dict) -> np.ndarray:
+    """rule_kasa_10tl - vektörel."""
+    count = np.abs(np.asarray(data.get('kasa_adet', 0)))
+    return _tier(count, weights.get('kasa_10tl', {}), ('high', 'low'),
+                 {'high': (20, 15), 'low': (10, 10)}, strict=True)
+
+
 # Tüm kurallar listesi
 RISK_RULES = [
     RiskRule(
         name="toplam_oran",
         max_points=40,
         description="Kayıp oranı (bölge ortalamasına göre)",
-        evaluate=rule_toplam_oran
+        evaluate=rule_toplam_oran,
+        evaluate_vec=rule_toplam_oran_vec
     ),
     RiskRule(
         name="ic_hirsizlik",
         max_points=30,
         description="İç hırsızlık şüphesi",
-        evaluate=rule_ic_hirsizlik
+        evaluate=rule_ic_hirsizlik,
+        evaluate_vec=rule_ic_hirsizlik_vec
     ),
     RiskRule(
         name="sigara",
         max_points=35,
         description="Sigara açığı",
-        evaluate=rule_sigara
+        evaluate=rule_sigara,
+        evaluate_vec=rule_sigara_vec
     ),
     RiskRule(
         name="kronik",
         max_points=15,
         description="Kronik açık",
-        evaluate=rule_kronik
+        evaluate=rule_kronik,
+        evaluate_vec=rule_kronik_vec
     ),
     RiskRule(
         name="fire_manipulasyon",
         max_points=20,
         description="Fire manipülasyonu",
-        evaluate=rule_fire_manipulasyon
+        evaluate=rule_fire_manipulasyon,
+        evaluate_vec=rule_fire_manipulasyon_vec
     ),
     RiskRule(
         name="kasa_10tl",
         max_points=15,
         description="10 TL altı ürünler",
-        evaluate=rule_kasa_10tl
+        evaluate=rule_kasa_10tl,
+        evaluate_vec=rule_kasa_10tl_vec
     )
 ]
@@ -0,0 +1,169 @@
+"""
+Skor Önbelleği (Artımlı Skorlama)
+=================================
+Mağaza bazlı veri parmak izi ile sadece DEĞİŞEN mağazaları yeniden hesaplar.
+Streamlit'e bağımlı DEĞİL (pure Python + pandas).
+
+Mantık:
+- Her mağazanın satırları hash'lenir -> parmak izi (fingerprint)
+- Parmak izi değişmeyen mağazanın feature'ları önbellekten gelir
+- bolge_ort (ortalama açık %) toplam/adet olarak tutulur,
+  mağaza değiştikçe O(1) güncellenir
+"""
+
+import threading
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from .scorer import calculate_magaza_features, score_magaza_features
+
+
+def compute_store_fingerprints(df: pd.DataFrame, mag_col: str = 'magaza_kodu') -> Dict[Any, Tuple[int, int]]:
+    """
+    Mağaza bazlı veri parmak izi.
+
+    Satır hash'lerinin toplamı kullanılır: satır sırası parmak izini
+    değiştirmez, tek bir hücre değişse parmak izi değişir.
+
+    Args:
+        mag_col: Mağaza kolonu ('magaza_kodu' / 'Mağaza Kodu')
+
+    Returns:
+        dict: {magaza_kodu: (hash_toplami, satir_sayisi)}
+
+    Raises:
+        TypeError: Hash'lenemeyen hücre (list, dict...)
+    """
+    if df is None or df.empty or mag_col not in df.columns:
+        return {}
+
+    row_hash = pd.util.hash_pandas_object(df, index=False)
+    grouped = row_hash.groupby(df[mag_col].values)
+    # Satır sayısını da kata: aynı satırın tekrarı da değişiklik sayılır
+    sums = grouped.sum()
+    sizes = grouped.size()
+    return {mag: (int(sums[mag]), int(sizes[mag])) for mag in sums.index}
+
+
+class ScoreCache:
+    """
+    Mağaza feature önbelleği + çalışan (running) bölge ortalaması.
+
+    Kullanım:
+        cache = ScoreCache()
+        scored_df = cache.score(raw_df, weights)      # ilk çağrı: tüm mağazalar
+        scored_df = cache.score(raw_df_yeni, weights) # sadece değişenler
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fingerprints: Dict[Any, Any] = {}
+        self._features: pd.DataFrame = pd.DataFrame()
+        self._acik_pct_toplam = 0.0
+        self._acik_pct_adet = 0
+        self.last_changed: List[Any] = []
+
+    # ---------- bölge ortalaması (running sum) ----------
+    @property
+    def bolge_ort(self) -> float:
+        """Bölge ortalama açık yüzdesi (calculate_magaza_scores ile aynı)."""
+        if self._acik_pct_adet == 0:
+            return 1
+        return self._acik_pct_toplam / self._acik_pct_adet
+
+    def _remove_stores(self, magazalar: List[Any]) -> None:
+        if self._features.empty or not magazalar:
+            return
+        mask = self._features['magaza_kodu'].isin(magazalar)
+        eski = self._features[mask]
+        self._acik_pct_toplam -= float(eski['acik_pct'].sum())
+        self._acik_pct_adet -= len(eski)
+        self._features = self._features[~mask]
+        for mag in magazalar:
+            self._fingerprints.pop(mag, None)
+
+    def _add_features(self, yeni: pd.DataFrame) -> None:
+        if yeni.empty:
+            return
+        self._acik_pct_toplam += float(yeni['acik_pct'].sum())
+        self._acik_pct_adet += len(yeni)
+        if self._features.empty:
+            self._features = yeni.reset_index(drop=True)
+        else:
+            self._features = pd.concat([self._features, yeni], ignore_index=True)
+
+    # ---------- güncelleme ----------
+    def update(self, raw_df: pd.DataFrame, full: bool = True) -> List[Any]:
+        """
+        Önbelleği yeni ham veri ile güncelle.
+
+        Args:
+            raw_df: Ham envanter verisi
+            full: True ise raw_df tüm bölgedir (raw_df'te olmayan mağazalar silinir).
+                  False ise sadece yeni yüklenen mağazaların satırlarıdır.
+
+        Returns:
+            list: Yeniden hesaplanan mağaza kodları
+        """
+        with self._lock:
+            fingerprints = compute_store_fingerprints(raw_df)
+
+            if full:
+                silinen = [m for m in self._fingerprints if m not in fingerprints]
+                self._remove_stores(silinen)
+
+            degisen = [
+                mag for mag, fp in fingerprints.items()
+                if self._fingerprints.get(mag) != fp
+            ]
+
+            if degisen:
+                self._remove_stores(degisen)
+                if len(degisen) == len(fingerprints):
+                    degisen_df = raw_df
+                else:
+                    degisen_df = raw_df[raw_df['magaza_kodu'].isin(degisen)]
+                self._add_features(calculate_magaza_features(degisen_df))
+                for mag in degisen:
+                    self._fingerprints[mag] = fingerprints[mag]
+
+            self.last_changed = degisen
+            return degisen
+
+    def features(self) -> pd.DataFrame:
+        """Önbellekteki mağaza feature'ları (kopya)."""
+        with self._lock:
+            return self._features.copy()
+
+    def score(
+        self,
+        raw_df: Optional[pd.DataFrame] = None,
+        weights: Dict[str, Any] = None,
+        full: bool = True
+    ) -> pd.DataFrame:
+        """
+        (Opsiyonel) güncelle + skorla.
+
+        Kural değerlendirmesi bolge_ort'a bağlı olduğu için tüm mağazalara
+        uygulanır; ama pahalı kısım (groupby + iç hırsızlık taraması)
+        sadece değişen mağazalar için yapılır.
+        """
+        if raw_df is not None:
+            self.update(raw_df, full=full)
+
+        with self._lock:
+            features = self._features
+            bolge_ort = self.bolge_ort
+
+        if features.empty:
+            return pd.DataFrame()
+        return score_magaza_features(features, bolge_ort, weights)
+
+    def clear(self) -> None:
+        """Önbelleği sıfırla."""
+        with self._lock:
+            self._fingerprints = {}
+            self._features = pd.DataFrame()
+            self._acik_pct_toplam = 0.0
+            self._acik_pct_adet = 0
+            self.last_changed = []
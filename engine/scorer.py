@@ -6,11 +6,14 @@ Risk puanı hesaplama fonksiyonları.
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 
 from .weights import load_weights, RISK_LEVELS, MAX_SCORE
 from .rules import RISK_RULES
 
+# score_magaza_features'ın eklediği kolonlar (feature DEĞİL)
+SCORE_COLUMNS = ['risk_puan', 'risk_seviye', 'risk_emoji']
+
 
 def get_risk_level(score: int) -> Tuple[str, str, str]:
     """
@@ -31,6 +34,20 @@ def get_risk_level(score: int) -> Tuple[str, str, str]:
     return "TEMİZ", "temiz", "🟢"
 
 
+def get_risk_levels(scores) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    get_risk_level'in vektörel hali (tüm mağazalar tek seferde).
+
+    Returns:
+        Tuple: (seviye_label_array, emoji_array)
+    """
+    scores = np.asarray(scores)
+    conds = [scores >= 60, scores >= 40, scores >= 20]
+    labels = np.select(conds, ["KRİTİK", "RİSKLİ", "DİKKAT"], "TEMİZ")
+    emojis = np.select(conds, ["🔴", "🟠", "🟡"], "🟢")
+    return labels, emojis
+
+
 def tespit_supheli_urun(
     iptal_satir_miktari: float,
     fark_miktari: float,
@@ -111,35 +128,99 @@ def calculate_risk_score(
     return total_score, details
 
 
-def calculate_magaza_scores(
-    df: pd.DataFrame,
+def calculate_risk_scores_vec(
+    data: Dict[str, Any],
     weights: Dict[str, Any] = None
-) -> pd.DataFrame:
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
     """
-    Mağaza bazlı risk skorlarını hesapla.
+    calculate_risk_score'un vektörel hali: data değerleri mağaza başına array.
+
+    Returns:
+        Tuple: (toplam_puan_array, {kural_adi: puan_array})
+    """
+    if weights is None:
+        weights = load_weights().get('risk_weights', {})
+
+    total = 0
+    details = {}
+    for rule in RISK_RULES:
+        points = rule.evaluate_vec(data, weights)
+        total = total + points
+        details[rule.name] = points
+
+    return np.minimum(MAX_SCORE, total), details
+
+
+def count_ic_hirsizlik_by_magaza(
+    df: pd.DataFrame,
+    keys: Optional[List[str]] = None
+) -> pd.Series:
+    """
+    Mağaza bazlı iç hırsızlık şüpheli satır sayısı (VEKTÖREL).
+
+    tespit_supheli_urun ile aynı kural: fiyat >= 100, fark < 0,
+    iptal != 0 ve |fark - iptal| <= 10.
 
     Args:
         df: Ham envanter verisi
-        weights: Risk ağırlıkları
+        keys: Gruplama kolonları (varsayılan ['magaza_kodu'])
 
     Returns:
-        DataFrame: Skorlanmış mağaza özeti
+        Series: index=keys, value=şüpheli satır sayısı
+    """
+    if keys is None:
+        keys = ['magaza_kodu']
+    if df.empty or any(k not in df.columns for k in keys):
+        return pd.Series(dtype=int)
+
+    def _num(col):
+        if col not in df.columns:
+            return pd.Series(0.0, index=df.index)
+        return pd.to_numeric(df[col], errors='coerce')
+
+    iptal = _num('iptal_satir_miktari')
+    fark = _num('fark_miktari')
+    fiyat = _num('satis_fiyati')
+
+    supheli = (
+        (fiyat >= 100) &
+        (fark < 0) &
+        (iptal != 0) &
+        ((fark - iptal).abs() <= 10)
+    )
+    return supheli.groupby([df[k] for k in keys]).sum().astype(int)
+
+
+def calculate_magaza_features(
+    df: pd.DataFrame,
+    extra_keys: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Mağaza bazlı ham metrikleri (feature) hesapla - puan YOK.
+
+    Args:
+        df: Ham envanter verisi (bir veya birden fazla mağaza)
+        extra_keys: Mağazanın önüne eklenecek gruplama kolonları
+                    (ör. ['envanter_donemi'] -> dönem x mağaza)
+
+    Returns:
+        DataFrame: [extra_keys], magaza_kodu, magaza_tanim, fark, fire, satis,
+                   urun_sayisi, acik, acik_pct, ic_hirsizlik_count
     """
     if df.empty:
         return pd.DataFrame()
 
-    if weights is None:
-        weights = load_weights().get('risk_weights', {})
+    extra_keys = list(extra_keys or [])
 
     # Mağaza bazlı gruplama
-    magaza_ozet = df.groupby(['magaza_kodu', 'magaza_tanim']).agg({
+    magaza_ozet = df.groupby(extra_keys + ['magaza_kodu', 'magaza_tanim']).agg({
         'fark_tutari': 'sum',
         'fire_tutari': 'sum',
         'satis_hasilati': 'sum',
         'malzeme_kodu': 'count'
     }).reset_index()
 
-    magaza_ozet.columns = ['magaza_kodu', 'magaza_tanim', 'fark', 'fire', 'satis', 'urun_sayisi']
+    magaza_ozet.columns = extra_keys + ['magaza_kodu', 'magaza_tanim', 'fark', 'fire', 'satis', 'urun_sayisi']
 
     # Açık hesapla
     magaza_ozet['acik'] = magaza_ozet['fark'] + magaza_ozet['fire']
@@ -149,46 +230,118 @@ def calculate_magaza_scores(
         0
     )
 
-    # Bölge ortalaması
-    bolge_ort = magaza_ozet['acik_pct'].mean() if len(magaza_ozet) > 0 else 1
-
-    # Her mağaza için iç hırsızlık sayısı hesapla
-    def count_ic_hirsizlik(magaza_kodu):
-        mag_df = df[df['magaza_kodu'] == magaza_kodu]
-        count = 0
-        for _, row in mag_df.iterrows():
-            result = tespit_supheli_urun(
-                row.get('iptal_satir_miktari', 0) or 0,
-                row.get('fark_miktari', 0) or 0,
-                row.get('satis_fiyati', 0) or 0
-            )
-            if result['supheli']:
-                count += 1
-        return count
-
-    # Risk skoru hesapla (vektörel olmayan kısım)
-    scores = []
-    for _, row in magaza_ozet.iterrows():
-        data = {
-            'toplam_pct': row['acik_pct'],
-            'bolge_kayip_oran': bolge_ort,
-            'ic_hirsizlik_count': count_ic_hirsizlik(row['magaza_kodu']),
-            'sigara_count': 0,  # TODO: Sigara hesabı eklenecek
-            'kronik_count': 0,  # TODO: Kronik hesabı eklenecek
-            'fire_manip_count': 0,
-            'kasa_adet': 0
-        }
-        score, details = calculate_risk_score(data, weights)
-        scores.append(score)
+    # İç hırsızlık sayısı (mağaza bazında, tek groupby)
+    keys = extra_keys + ['magaza_kodu']
+    ic_counts = count_ic_hirsizlik_by_magaza(df, keys)
+    if ic_counts.empty:
+        magaza_ozet['ic_hirsizlik_count'] = 0
+    else:
+        ic_counts = ic_counts.rename('ic_hirsizlik_count').reset_index()
+        magaza_ozet = magaza_ozet.merge(ic_counts, on=keys, how='left')
+        magaza_ozet['ic_hirsizlik_count'] = magaza_ozet['ic_hirsizlik_count'].fillna(0).astype(int)
+
+    return magaza_ozet
+
+
+def score_magaza_features(
+    features: pd.DataFrame,
+    bolge_ort: Optional[float] = None,
+    weights: Dict[str, Any] = None
+) -> pd.DataFrame:
+    """
+    Hazır mağaza feature'larına kuralları uygula (VEKTÖREL).
+
+    Veri yeniden yüklenmez/gruplanmaz; farklı ağırlık veya eşiklerle
+    "what-if" skorlama milisaniyeler sürer.
+
+    Args:
+        features: calculate_magaza_features çıktısı (veya skorlu özet)
+        bolge_ort: Bölge ortalama açık yüzdesi (None ise features'tan).
+                   Satır başına array de olabilir (çok dönemli skor).
+        weights: Risk ağırlıkları (risk_weights bölümü)
+
+    Returns:
+        DataFrame: Skorlanmış mağaza özeti (risk_puan'a göre sıralı)
+    """
+    if features.empty:
+        return pd.DataFrame()
+
+    if weights is None:
+        weights = load_weights().get('risk_weights', {})
+
+    if bolge_ort is None:
+        bolge_ort = features['acik_pct'].mean()
+
+    magaza_ozet = features.drop(
+        columns=[c for c in SCORE_COLUMNS if c in features.columns]
+    ).copy()
+
+    n = len(magaza_ozet)
+    data = {
+        'toplam_pct': magaza_ozet['acik_pct'].to_numpy(dtype=float),
+        'bolge_kayip_oran': np.asarray(bolge_ort, dtype=float),
+        'ic_hirsizlik_count': magaza_ozet['ic_hirsizlik_count'].to_numpy(),
+        'sigara_count': np.zeros(n, dtype=int),  # TODO: Sigara hesabı eklenecek
+        'kronik_count': np.zeros(n, dtype=int),  # TODO: Kronik hesabı eklenecek
+        'fire_manip_count': np.zeros(n, dtype=int),
+        'kasa_adet': np.zeros(n, dtype=int)
+    }
+    scores, _ = calculate_risk_scores_vec(data, weights)
 
     magaza_ozet['risk_puan'] = scores
 
     # Risk seviyesi
-    magaza_ozet['risk_seviye'] = magaza_ozet['risk_puan'].apply(
-        lambda x: get_risk_level(x)[0]
-    )
-    magaza_ozet['risk_emoji'] = magaza_ozet['risk_puan'].apply(
-        lambda x: get_risk_level(x)[2]
-    )
+    labels, emojis = get_risk_levels(scores)
+    magaza_ozet['risk_seviye'] = labels
+    magaza_ozet['risk_emoji'] = emojis
 
     return magaza_ozet.sort_values('risk_puan', ascending=False)
+
+
+def calculate_magaza_scores(
+    df: pd.DataFrame,
+    weights: Dict[str, Any] = None
+) -> pd.DataFrame:
+    """
+    Mağaza bazlı risk skorlarını hesapla.
+
+    Args:
+        df: Ham envanter verisi
+        weights: Risk ağırlıkları
+
+    Returns:
+        DataFrame: Skorlanmış mağaza özeti
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    features = calculate_magaza_features(df)
+
+    # Bölge ortalaması
+    bolge_ort = features['acik_pct'].mean() if len(features) > 0 else 1
+
+    return score_magaza_features(features, bolge_ort, weights)
+
+
+def calculate_period_scores(
+    df: pd.DataFrame,
+    weights: Dict[str, Any] = None,
+    period_col: str = 'envanter_donemi'
+) -> pd.DataFrame:
+    """
+    Tüm dönemler x mağazalar için risk skorları - TEK gruplama.
+
+    Her dönemin bolge_ort'u kendi mağazalarının ortalamasıdır
+    (dönem dönem calculate_magaza_scores çağırmakla aynı sonuç).
+
+    Returns:
+        DataFrame: Uzun format (period_col, magaza_kodu, ..., risk_puan, risk_seviye)
+    """
+    if df.empty or period_col not in df.columns:
+        return pd.DataFrame()
+
+    features = calculate_magaza_features(df, extra_keys=[period_col])
+    bolge_ort = features.groupby(period_col)['acik_pct'].transform('mean')
+
+    scored = score_magaza_features(features, bolge_ort.to_numpy(), weights)
+    return scored.sort_values([period_col, 'risk_puan'], ascending=[True, False])
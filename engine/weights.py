@@ -6,7 +6,7 @@ weights.json dosyasından ağırlık okuma.
 
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Varsayılan değerler
 DEFAULT_WEIGHTS = {
@@ -92,3 +92,37 @@ def get_risk_thresholds() -> Dict[str, int]:
     """Risk seviye eşiklerini döndür."""
     weights = load_weights()
     return weights.get("risk_levels", DEFAULT_WEIGHTS["risk_levels"])
+
+
+def validate_risk_weights(weights: Any, reference: Dict[str, Any]) -> Optional[str]:
+    """
+    risk_weights bölümünü referans yapıyla karşılaştır.
+
+    Kategori ve seviye anahtarları referansla aynı, threshold / points
+    sayısal olmalı.
+
+    Args:
+        weights: Doğrulanacak risk_weights (ör. kullanıcı JSON'u)
+        reference: Beklenen yapı (ör. load_weights()['risk_weights'])
+
+    Returns:
+        str: İlk hata mesajı (geçerliyse None)
+    """
+    if not isinstance(weights, dict):
+        return "risk_weights bir JSON nesnesi olmalı"
+    if set(weights) != set(reference):
+        return f"Kategoriler {sorted(reference)} olmalı"
+
+    for kategori, seviyeler in reference.items():
+        yeni_seviyeler = weights[kategori]
+        if not isinstance(yeni_seviyeler, dict) or set(yeni_seviyeler) != set(seviyeler):
+            return f"'{kategori}' seviyeleri {sorted(seviyeler)} olmalı"
+        for seviye, alanlar in seviyeler.items():
+            yeni_alanlar = yeni_seviyeler[seviye]
+            if not isinstance(yeni_alanlar, dict) or set(yeni_alanlar) != set(alanlar):
+                return f"'{kategori}.{seviye}' alanları {sorted(alanlar)} olmalı"
+            for alan, deger in yeni_alanlar.items():
+                if isinstance(deger, bool) or not isinstance(deger, (int, float)):
+                    return f"'{kategori}.{seviye}.{alan}' sayısal olmalı"
+
+    return None
@@ -22,6 +22,16 @@ from utils.risk_karnesi import (
     uret_magaza_risk_raporu_excel,
     hesapla_magaza_risk_karnesi
 )
+from utils.seri import (
+    SeriFrame, ardisik_donem_bayraklari, kronik_ilk_eslesmeler,
+    ayni_sayim_serisi, ayni_sayim_ozeti
+)
+from utils.kup import RollupKupu
+from utils.rapor_cache import veri_surumu
+from utils.karne_cache import veri_parmak_izi
+from utils.bolum import BolumluVeri
+from utils.sema import kanonik_kolonlar, kolon_eslesmesi
+from ui.rapor_indir import rapor_indir_butonu
 
 # ==================== SAYFA AYARI ====================
 st.set_page_config(
@@ -202,50 +212,22 @@ def get_risk_level(puan):
 
 TABLE_NAME = "surekli_envanter_v2"
 
-# Excel -> Supabase sütun eşleştirmesi
-COLUMN_MAPPING = {
-    'Envanter Dönemi': 'envanter_donemi',
-    'Envanter Tarihi': 'envanter_tarihi',
-    'Envanter Başlangıç Tarihi': 'envanter_baslangic_tarihi',
-    'Depolama Koşulu Grubu': 'depolama_kosulu_grubu',
-    'Depolama Koşulu': 'depolama_kosulu',
-    'Bölge Kodu': 'bolge_kodu',
-    'Bölge': 'bolge',
-    'Mağaza Kodu': 'magaza_kodu',
-    'Mağaza Tanım': 'magaza_tanim',
-    'Satış Müdürü': 'satis_muduru',
-    'Bölge Sorumlusu': 'bolge_sorumlusu',
-    'Ürün Grubu Kodu': 'urun_grubu_kodu',
-    'Ürün Grubu Tanımı': 'urun_grubu_tanimi',
-    'Mal Grubu Kodu': 'mal_grubu_kodu',
-    'Mal Grubu Tanımı': 'mal_grubu_tanimi',
-    'Malzeme Kodu': 'malzeme_kodu',
-    'Malzeme Tanımı': 'malzeme_tanimi',
-    'Satış Fiyatı': 'satis_fiyati',
-    'Envanter Sayisi': 'envanter_sayisi',
-    # Kümülatif alanlar (16 alan) - Excel'den gelen toplam değerler
-    'Sayım Miktarı': 'sayim_miktari_kum',
-    'Sayım Tutarı': 'sayim_tutari_kum',
-    'Kaydi Miktar': 'kaydi_miktar_kum',
-    'Kaydi Tutar': 'kaydi_tutar_kum',
-    'Fark Miktarı': 'fark_miktari_kum',
-    'Fark Tutarı': 'fark_tutari_kum',
-    'Fire Miktarı': 'fire_miktari_kum',
-    'Fire Tutarı': 'fire_tutari_kum',
-    'Fark+Fire+Kısmi Envanter Miktarı': 'fark_fire_kismi_miktari_kum',
-    'Fark+Fire+Kısmi Envanter Tutarı': 'fark_fire_kismi_tutari_kum',
-    'Satış Miktarı': 'satis_miktari_kum',
-    'Satış Hasılatı': 'satis_hasilati_kum',
-    'İade Miktarı': 'iade_miktari_kum',
-    'İade Tutarı': 'iade_tutari_kum',
-    'İptal Satır Miktarı': 'iptal_satir_miktari_kum',
-    'İptal Satır Tutarı': 'iptal_satir_tutari_kum',
+# Supabase'e yazılan alanlar (şema anahtarları - utils.sema; Excel başlıkları şema kaydından eşleşir)
+KAYIT_ALANLARI = [
+    'envanter_donemi', 'envanter_tarihi', 'envanter_baslangic_tarihi',
+    'depolama_kosulu_grubu', 'depolama_kosulu', 'bolge_kodu', 'bolge',
+    'magaza_kodu', 'magaza_tanim', 'satis_muduru', 'bolge_sorumlusu',
+    'urun_grubu_kodu', 'urun_grubu_tanimi', 'mal_grubu_kodu', 'mal_grubu_tanimi',
+    'malzeme_kodu', 'malzeme_tanimi', 'satis_fiyati', 'envanter_sayisi',
+    # Kümülatif alanlar (16 alan) - Excel'den gelen toplam değerler, *_kum kolonlarına yazılır
+    'sayim_miktari', 'sayim_tutari', 'kaydi_miktar', 'kaydi_tutar',
+    'fark_miktari', 'fark_tutari', 'fire_miktari', 'fire_tutari',
+    'fark_fire_kismi_miktari', 'fark_fire_kismi_tutari',
+    'satis_miktari', 'satis_hasilati', 'iade_miktari', 'iade_tutari',
+    'iptal_satir_miktari', 'iptal_satir_tutari',
     # Kümülatif takibi gerekmeyen alanlar (doğrudan kaydet)
-    'İptal Fişteki Miktar': 'iptal_fisteki_miktar',
-    'İptal Fiş Tutarı': 'iptal_fis_tutari',
-    'İptal GP Miktarı': 'iptal_gp_miktari',
-    'İptal GP TUTARI': 'iptal_gp_tutari',
-}
+    'iptal_fisteki_miktar', 'iptal_fis_tutari', 'iptal_gp_miktari', 'iptal_gp_tutari',
+]
 
 # Delta hesaplanacak kümülatif alanlar (16 alan): (kümülatif_sütun, delta_sütun)
 KUMULATIF_ALANLAR = [
@@ -267,6 +249,16 @@ KUMULATIF_ALANLAR = [
     ('iptal_satir_tutari_kum', 'iptal_satir_tutari'),
 ]
 
+def kayit_kolonlari(kolonlar) -> dict:
+    """Excel kolonu -> Supabase kolonu (şema kaydından; kümülatif alanlar *_kum kolonlarına)"""
+    kumulatif = {delta: kum for kum, delta in KUMULATIF_ALANLAR}
+    return {
+        kolon: kumulatif.get(anahtar, anahtar)
+        for kolon, anahtar in kolon_eslesmesi(kolonlar, hedef='anahtar').items()
+        if anahtar in KAYIT_ALANLARI
+    }
+
+
 def save_to_supabase(df):
     """
     Excel verisini Supabase'e kaydet (delta hesaplamalı)
@@ -291,9 +283,10 @@ def save_to_supabase(df):
         magaza_set = set()
         donem_set = set()
 
+        kayit_eslesmesi = kayit_kolonlari(df.columns)
         for _, row in df.iterrows():
             record = {}
-            for excel_col, db_col in COLUMN_MAPPING.items():
+            for excel_col, db_col in kayit_eslesmesi.items():
                 if excel_col in row.index:
                     val = row[excel_col]
                     if pd.isna(val):
@@ -443,70 +436,12 @@ def get_mevcut_envanter_sayilari(magaza_kodlari, envanter_donemi):
 
 
 # ==================== KOLON NORMALİZASYON ====================
-def _normalize_col_name(col: str) -> str:
-    """
-    Kolon ismini normalize et:
-    - Küçük harfe çevir
-    - Türkçe karakterleri dönüştür (ı->i, ş->s, ğ->g, ü->u, ö->o, ç->c, İ->i)
-    - Boşlukları _ yap
-    - Baştaki/sondaki boşlukları kaldır
-    """
-    if not isinstance(col, str):
-        return str(col).lower().strip()
-
-    col = col.lower().strip()
-    # Türkçe karakter dönüşümü
-    tr_map = {
-        'ı': 'i', 'İ': 'i', 'ş': 's', 'Ş': 's',
-        'ğ': 'g', 'Ğ': 'g', 'ü': 'u', 'Ü': 'u',
-        'ö': 'o', 'Ö': 'o', 'ç': 'c', 'Ç': 'c'
-    }
-    for tr, en in tr_map.items():
-        col = col.replace(tr, en)
-    # Boşlukları _ yap
-    col = col.replace(' ', '_')
-    return col
-
-
-# Excel kolon isimlerini iç kolon isimlerine map'le
-COLUMN_NAME_MAP = {
-    # Normalize edilmiş Excel kolon isimleri -> iç kolon isimleri
-    'magaza_kodu': 'magaza_kodu',
-    'magaza_tanim': 'magaza_tanim',
-    'satis_muduru': 'satis_muduru',
-    'bolge_sorumlusu': 'bolge_sorumlusu',
-    'malzeme_kodu': 'malzeme_kodu',
-    'malzeme_tanimi': 'malzeme_tanimi',
-    'envanter_sayisi': 'envanter_sayisi',
-    'fark_tutari': 'fark_tutari',
-    'fire_tutari': 'fire_tutari',
-    'envanter_donemi': 'envanter_donemi',
-    'satis_hasilati': 'satis_hasilati',
-    'sayim_miktari': 'sayim_miktari',
-    'satis_fiyati': 'satis_fiyati',
-    'iptal_satir_miktari': 'iptal_satir_miktari',
-    'fark_miktari': 'fark_miktari',
-    'depolama_kosulu': 'depolama_kosulu',
-}
-
-
 def normalize_dataframe_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
-    DataFrame kolon isimlerini normalize et ve standart isimlere map'le.
+    DataFrame kolonlarını şema kaydındaki anahtarlara çevir (utils.sema, yerinde tek rename).
+    Şemada olmayan kolonlar snake_case normalize edilir.
     """
-    if df is None or df.empty:
-        return df
-
-    # Kolon isimlerini normalize et
-    new_columns = {}
-    for col in df.columns:
-        norm_col = _normalize_col_name(col)
-        if norm_col in COLUMN_NAME_MAP:
-            new_columns[col] = COLUMN_NAME_MAP[norm_col]
-        else:
-            new_columns[col] = norm_col
-
-    return df.rename(columns=new_columns)
+    return kanonik_kolonlar(df, hedef='anahtar', bilinmeyen_normalize=True)
 
 
 def check_required_columns(df: pd.DataFrame, required: list) -> tuple:
@@ -521,7 +456,58 @@ def check_required_columns(df: pd.DataFrame, required: list) -> tuple:
     return len(missing) == 0, missing
 
 
-# ==================== KRONİK HESAPLAMA HELPER (VEKTÖREL + ÖN FİLTRELEME) ====================
+# ==================== KRONİK HESAPLAMA HELPER (ORTAK SERİ KERNEL) ====================
+KRONIK_BILGI_KOLONLARI = ['magaza_tanim', 'satis_muduru', 'bolge_sorumlusu', 'malzeme_tanimi']
+KRONIK_DEGER_ADI = {'fark_tutari': 'acik', 'fire_tutari': 'fire'}
+
+
+# Process genelinde tutulan GM seri indeksi / kronik bayrak sayısı (veri sürümü x mod)
+SERI_ONBELLEK_LIMITI = 4
+
+
+@st.cache_resource(ttl=600, max_entries=SERI_ONBELLEK_LIMITI, show_spinner=False)
+def _seri_frame_onbellegi(veri_anahtari, envanter_doldur, _gm_df: pd.DataFrame) -> SeriFrame:
+    """Veri sürümü + doldurma modu başına TEK SeriFrame - tüm oturumlar paylaşır (_gm_df hash'lenmez)"""
+    return SeriFrame(_gm_df, envanter_doldur=envanter_doldur)
+
+
+@st.cache_resource(ttl=600, max_entries=SERI_ONBELLEK_LIMITI, show_spinner=False)
+def _kronik_bayrak_onbellegi(veri_anahtari, threshold: float, _gm_df: pd.DataFrame):
+    """Veri sürümü + eşik başına TEK kronik bayrak tablosu - tüm oturumlar paylaşır"""
+    return ardisik_donem_bayraklari(
+        None, threshold, ek_kolonlar=KRONIK_BILGI_KOLONLARI, seri_frame=_get_seri_frame(_gm_df)
+    )
+
+
+def _get_seri_frame(gm_df: pd.DataFrame, envanter_doldur=None) -> SeriFrame:
+    """
+    GM verisi için ön-sıralı seri indeksi - veri sürümü ve doldurma modu başına BİR kez
+    kurulur, oturumlar aynı nesneyi okur (salt okunur).
+
+    envanter_doldur:
+        None: envanter_sayisi boş satırlar atılır (kronik açık/fire, risk karnesi)
+        0: boşlar 0 sayılır (find_ayni_sayim)
+    """
+    # gm_cache_key = (dönemler, veri sürümü): yeni tutamaç / yeni oturum indeksi yeniden kurdurmaz
+    anahtar = st.session_state.get("gm_cache_key")
+    if anahtar is None:
+        return SeriFrame(gm_df, envanter_doldur=envanter_doldur)
+    return _seri_frame_onbellegi(anahtar, envanter_doldur, gm_df)
+
+
+def _get_kronik_bayraklari(gm_df: pd.DataFrame, threshold: float):
+    """
+    Ortak seri kernel çıktısı (kronik açık + kronik fire bayrakları).
+    Paylaşılan SeriFrame üzerinden: Kronik Açık ve Kronik Fire sekmeleri aynı sonucu kullanır.
+    """
+    anahtar = st.session_state.get("gm_cache_key")
+    if anahtar is None:
+        return ardisik_donem_bayraklari(
+            None, threshold, ek_kolonlar=KRONIK_BILGI_KOLONLARI, seri_frame=_get_seri_frame(gm_df)
+        )
+    return _kronik_bayrak_onbellegi(anahtar, threshold, gm_df)
+
+
 def _find_kronik_fast(gm_df: pd.DataFrame, value_col: str, threshold: float):
     """
     Ardışık iki envanter sayımında (envanter_sayisi ardışık) DELTA value_col < threshold koşulunu sağlayan
@@ -529,7 +515,7 @@ def _find_kronik_fast(gm_df: pd.DataFrame, value_col: str, threshold: float):
     value_col: 'fark_tutari' veya 'fire_tutari' (kümülatif değerler)
     threshold: ör. -500
 
-    Optimizasyon: Önce delta hesapla, sonra threshold altındakileri filtrele.
+    Hesap utils.seri ortak kernelinden gelir (risk karnesi ile aynı kural).
     """
     need_cols = [
         'magaza_kodu', 'magaza_tanim',
@@ -541,57 +527,27 @@ def _find_kronik_fast(gm_df: pd.DataFrame, value_col: str, threshold: float):
         if c not in gm_df.columns:
             return []
 
-    # ADIM 1: Sadece gerekli kolonları al ve tip dönüşümü yap
-    base = gm_df[need_cols].copy()
-    base[value_col] = pd.to_numeric(base[value_col], errors='coerce').fillna(0)
-    base['envanter_sayisi'] = pd.to_numeric(base['envanter_sayisi'], errors='coerce')
-    base = base[base['envanter_sayisi'].notna()].copy()
-
-    if base.empty:
-        return []
-
-    # ADIM 2: Sort ve DELTA hesapla (kümülatif -> delta)
-    base = base.sort_values(['magaza_kodu', 'malzeme_kodu', 'envanter_sayisi'])
-
-    g = base.groupby(['magaza_kodu', 'malzeme_kodu'], sort=False)
-    base['_prev_kum'] = g[value_col].shift(1)  # Önceki kümülatif değer
-    base['_prev_env'] = g['envanter_sayisi'].shift(1)
-
-    # Delta = mevcut kümülatif - önceki kümülatif
-    base['_delta'] = base[value_col] - base['_prev_kum'].fillna(0)
-    base['_prev_delta'] = g['_delta'].shift(1)
-
-    # ADIM 3: Ardışık envanter + ikisi de delta eşikten kötü
-    mask = (
-        base['_prev_delta'].notna() &
-        (base['_prev_delta'] < threshold) &
-        (base['_delta'] < threshold) &
-        (base['envanter_sayisi'] == (base['_prev_env'] + 1))
-    )
-
-    hits = base[mask].copy()
+    ad = KRONIK_DEGER_ADI[value_col]
+    hits = kronik_ilk_eslesmeler(_get_kronik_bayraklari(gm_df, threshold), ad)
     if hits.empty:
         return []
 
-    # Her mağaza+ürün için ilk eşleşmeyi al (kronolojik olarak)
-    hits = hits.groupby(['magaza_kodu', 'malzeme_kodu'], sort=False).head(1)
-
-    out = []
-    for _, r in hits.iterrows():
-        out.append({
-            'magaza_kodu': str(r['magaza_kodu']),
-            'magaza_adi': str(r.get('magaza_tanim') or '')[:30],
-            'sm': str(r.get('satis_muduru') or ''),
-            'bs': str(r.get('bolge_sorumlusu') or ''),
-            'malzeme_kodu': str(r['malzeme_kodu']),
-            'malzeme_adi': str(r.get('malzeme_tanimi') or '')[:40],
-            'onceki_env': int(r['_prev_env']),
-            'sonraki_env': int(r['envanter_sayisi']),
-            'onceki_val': float(r['_prev_delta']),  # Delta değeri
-            'sonraki_val': float(r['_delta']),       # Delta değeri
-            'toplam': float(r['_prev_delta'] + r['_delta']),
-        })
-    return out
+    onceki = hits[f'{ad}_onceki_delta'].astype(float)
+    sonraki = hits[f'{ad}_delta'].astype(float)
+    out = pd.DataFrame({
+        'magaza_kodu': hits['magaza_kodu'].astype(str),
+        'magaza_adi': hits['magaza_tanim'].fillna('').astype(str).str[:30],
+        'sm': hits['satis_muduru'].fillna('').astype(str),
+        'bs': hits['bolge_sorumlusu'].fillna('').astype(str),
+        'malzeme_kodu': hits['malzeme_kodu'].astype(str),
+        'malzeme_adi': hits['malzeme_tanimi'].fillna('').astype(str).str[:40],
+        'onceki_env': hits['onceki_env'].astype(int),
+        'sonraki_env': hits['envanter_sayisi'].astype(int),
+        'onceki_val': onceki,   # Delta değeri
+        'sonraki_val': sonraki,  # Delta değeri
+        'toplam': onceki + sonraki,
+    })
+    return out.to_dict('records')
 
 
 def detect_envanter_degisimi(df, mevcut_sayilar):
@@ -632,11 +588,17 @@ def get_available_sms():
     """Mevcut SM listesini getir - PURE DATA cache"""
     return fetch_sms()
 
-@st.cache_data(ttl=600, show_spinner="Veri yükleniyor...")  # 10 dk cache
-def get_gm_ozet_data(donemler: tuple):
-    """GM Özet için verileri getir - PURE DATA cache"""
+@st.cache_resource(ttl=600, show_spinner="Veri yükleniyor...")  # 10 dk cache
+def get_gm_ozet_surumu(donemler: tuple):
+    """
+    GM Özet verisi - dönem seti başına process genelinde TEK normalize kopya.
+    cache_resource: isabette kopya / deserileştirme yok, oturumlar aynı nesneyi paylaşır.
+
+    Returns:
+        tuple: (sürüm anahtarı, paylaşılan DataFrame) (veri yoksa (None, None))
+    """
     if not donemler:
-        return None
+        return None, None
 
     columns = 'magaza_kodu,magaza_tanim,satis_muduru,bolge_sorumlusu,depolama_kosulu,mal_grubu_tanimi,fark_tutari,fire_tutari,satis_hasilati,sayim_miktari,envanter_sayisi,malzeme_kodu,malzeme_tanimi,satis_fiyati'
     all_data = fetch_data_for_periods(list(donemler), columns=columns)
@@ -647,8 +609,24 @@ def get_gm_ozet_data(donemler: tuple):
             df['bolge_sorumlusu'] = ''
         else:
             df['bolge_sorumlusu'] = df['bolge_sorumlusu'].fillna('')
-        return df
-    return None
+
+        # Kolon isimlerini normalize et (1 kez); sürüm yükleme başına bir kez hesaplanır
+        df = normalize_dataframe_columns(df)
+        return veri_parmak_izi(df), df
+    return None, None
+
+
+@st.cache_resource(ttl=600, show_spinner=False)  # 10 dk cache
+def get_gm_bolumler(donemler: tuple):
+    """GM verisinin mağaza / SM / BS bölüm indeksi - dönem seti başına 1 kez, oturumlar paylaşır"""
+    _, df = get_gm_ozet_surumu(donemler)
+    return BolumluVeri(df if df is not None else pd.DataFrame())
+
+
+def get_gm_ozet_data(donemler: tuple):
+    """GM Özet için verileri getir - paylaşılan kopyanın salt okunur tutamacı (değiştirmeden önce .copy())"""
+    _, df = get_gm_ozet_surumu(donemler)
+    return None if df is None else df.copy(deep=False)
 
 # get_onceki_envanter artık kullanılmıyor - veri zaten gm_df'de
 
@@ -676,34 +654,32 @@ def get_envanter_serisi(magaza_kodu, malzeme_kodu):
     if not raw_data:
         return []
 
-    # Delta hesapla
-    seri = []
-    onceki_kum = 0
-    onceki_fark = 0
-    onceki_fire = 0
-    for kayit in raw_data:
-        env_sayisi = kayit.get('envanter_sayisi', 0) or 0
-        kumulatif = float(kayit.get('sayim_miktari', 0) or 0)
-        fark_kum = float(kayit.get('fark_tutari', 0) or 0)
-        fire_kum = float(kayit.get('fire_tutari', 0) or 0)
-        delta = kumulatif - onceki_kum
-        fark_delta = fark_kum - onceki_fark
-        fire_delta = fire_kum - onceki_fire
-        seri.append({
-            'envanter': env_sayisi,
+    # Delta hesapla (SeriFrame: tek seri, envanter sırası)
+    df = pd.DataFrame(raw_data).assign(malzeme_kodu=malzeme_kodu)
+    sf = SeriFrame(df, mag_col=None, envanter_doldur=0)
+    donemler = sf.kolon('envanter_donemi')
+    if donemler is None:
+        donemler = [''] * len(sf)
+
+    return [
+        {
+            'envanter': int(env),
             'delta': delta,
             'kumulatif': kumulatif,
             'fark_tutari': fark_delta,
             'fark_kumulatif': fark_kum,
             'fire_tutari': fire_delta,
             'fire_kumulatif': fire_kum,
-            'donem': kayit.get('envanter_donemi', '')
-        })
-        onceki_kum = kumulatif
-        onceki_fark = fark_kum
-        onceki_fire = fire_kum
-
-    return seri
+            'donem': donem if isinstance(donem, str) else ''
+        }
+        for env, delta, kumulatif, fark_delta, fark_kum, fire_delta, fire_kum, donem in zip(
+            sf.env,
+            sf.delta(['sayim_miktari']).tolist(), sf.sayisal(['sayim_miktari']).tolist(),
+            sf.delta(['fark_tutari']).tolist(), sf.sayisal(['fark_tutari']).tolist(),
+            sf.delta(['fire_tutari']).tolist(), sf.sayisal(['fire_tutari']).tolist(),
+            donemler
+        )
+    ]
 
 
 def get_iptal_timestamps_for_magaza(magaza_kodu, malzeme_kodlari):
@@ -1023,90 +999,67 @@ def find_tam_sayili_sayim(gm_df: pd.DataFrame) -> list:
     return result
 
 
-def find_ayni_sayim(gm_df: pd.DataFrame) -> list:
+def find_ayni_sayim(gm_df: pd.DataFrame, seri_frame: SeriFrame = None) -> list:
     """
     Aynı sayım şüphelilerini bul.
     Envanter serisinde 2+ ardışık sayımda aynı miktar = kafadan sayım şüphesi.
-    NOT: Bu fonksiyon envanter serisini çekmek zorunda, performans için batch işlem.
+    Tüm mağaza+ürün serileri utils.seri RLE kernel ile tek geçişte taranır;
+    seri_frame verilirse (GM verisi için bir kez kurulan, envanter_doldur=0) yeniden sort YOK.
     """
-    if gm_df is None or gm_df.empty:
+    if gm_df is None or gm_df.empty or 'depolama_kosulu' not in gm_df.columns:
         return []
 
-    # Meyve/Sebz ve Et-Tavuk filtrele (sadece bunlarda kontrol)
-    gm_df = gm_df.copy()
-    gm_df['depolama'] = gm_df['depolama_kosulu'].fillna('').str.upper()
-    ilgili_mask = (
-        gm_df['depolama'].str.contains('MEYVE', na=False) |
-        gm_df['depolama'].str.contains('SEBZ', na=False) |
-        gm_df['depolama'].str.contains('ET', na=False) |
-        gm_df['depolama'].str.contains('TAVUK', na=False)
-    )
-
-    # En az 2 envanter kaydı olan ürünleri bul
-    gm_df['envanter_sayisi'] = pd.to_numeric(gm_df['envanter_sayisi'], errors='coerce').fillna(0)
-    count_df = gm_df[ilgili_mask].groupby(['magaza_kodu', 'malzeme_kodu']).size().reset_index(name='kayit_sayisi')
-    coklu = count_df[count_df['kayit_sayisi'] >= 2]
-
-    if coklu.empty:
+    sf = seri_frame if seri_frame is not None else SeriFrame(gm_df, envanter_doldur=0)
+    if sf.bos or sf.mag_col is None:
         return []
 
-    # Sadece son fark tutarı için indexleri al
-    idx = gm_df.groupby(['magaza_kodu', 'malzeme_kodu'])['envanter_sayisi'].idxmax()
-    son_fark_df = gm_df.loc[idx][['magaza_kodu', 'malzeme_kodu', 'fark_tutari', 'magaza_tanim',
-                                   'satis_muduru', 'bolge_sorumlusu', 'malzeme_tanimi', 'depolama_kosulu']].copy()
-
-    result = []
-
-    # Her mağaza+ürün için envanter serisini kontrol et
-    for _, row in coklu.iterrows():
-        mag = row['magaza_kodu']
-        mal = row['malzeme_kodu']
-
-        # Bu ürünün tüm kayıtlarını al
-        urun_df = gm_df[(gm_df['magaza_kodu'] == mag) & (gm_df['malzeme_kodu'] == mal)].sort_values('envanter_sayisi')
-
-        if len(urun_df) < 2:
-            continue
+    seri = ayni_sayim_serisi(None, seri_frame=sf)
+    ozet = ayni_sayim_ozeti(seri, seri_frame=sf)
 
-        # Sayım miktarlarını al
-        sayimlar = pd.to_numeric(urun_df['sayim_miktari'], errors='coerce').fillna(0).tolist()
-        envanter_numaralari = urun_df['envanter_sayisi'].tolist()
-
-        # Ardışık aynı sayımları bul
-        ayni_sayim_var = False
-        ayni_count = 0
-        for i in range(1, len(sayimlar)):
-            if sayimlar[i] == sayimlar[i-1] and sayimlar[i] > 0:
-                ayni_sayim_var = True
-                ayni_count += 1
-
-        if ayni_sayim_var:
-            # Detay bilgilerini al
-            son_kayit = son_fark_df[(son_fark_df['magaza_kodu'] == mag) & (son_fark_df['malzeme_kodu'] == mal)]
-            if son_kayit.empty:
-                continue
+    # Meyve/Sebz ve Et-Tavuk: seride en az 2 ilgili kayıt olmalı
+    depolama = pd.Series(sf.kolon('depolama_kosulu')).fillna('').str.upper()
+    ilgili = depolama.str.contains('MEYVE|SEBZ|ET|TAVUK', na=False).to_numpy()
+    ilgili_adet = sf.grup_topla(ilgili.astype(np.int64))
 
-            son = son_kayit.iloc[0]
-            fark = float(son.get('fark_tutari', 0) or 0)
-
-            # Seri string oluştur
-            seri_str = " → ".join([f"{int(e)}.:{int(s)}" for e, s in zip(envanter_numaralari, sayimlar)])
-
-            result.append({
-                'magaza_kodu': str(mag),
-                'magaza_adi': str(son.get('magaza_tanim', ''))[:25],
-                'sm': str(son.get('satis_muduru', '')),
-                'bs': str(son.get('bolge_sorumlusu', '')),
-                'malzeme_kodu': str(mal),
-                'malzeme_adi': str(son.get('malzeme_tanimi', ''))[:35],
-                'depolama': str(son.get('depolama_kosulu', '')),
-                'seri': seri_str,
-                'ayni_count': ayni_count,
-                'fark_tutari': fark,
-                'risk': 'BÜYÜK RİSK' if fark == 0 else 'RİSK'
-            })
+    secili = (ilgili_adet >= 2) & (ozet['ayni_adet'].to_numpy() > 0)
+    if not secili.any():
+        return []
 
-    return result
+    satir_mask = secili[sf.grup_no]
+    grup = sf.grup_no[satir_mask]
+    seri_str = (
+        pd.Series(sf.env[satir_mask]).astype(int).astype(str) + '.:' +
+        pd.Series(seri['sayim'].to_numpy()[satir_mask]).astype(int).astype(str)
+    ).groupby(grup, sort=False).agg(' → '.join).to_numpy()
+
+    # Son kayıt: en büyük envanter_sayisi (eşitlikte ilk satır)
+    son_aday = np.flatnonzero(satir_mask & (sf.env == sf.grup_max(sf.env)[sf.grup_no]))
+    _, ilk = np.unique(sf.grup_no[son_aday], return_index=True)
+    son = son_aday[ilk]
+
+    def _bilgi(col):
+        values = sf.kolon(col)
+        if values is None:
+            return pd.Series([''] * len(son))
+        return pd.Series(values[son])
+
+    fark = pd.to_numeric(_bilgi('fark_tutari'), errors='coerce') \
+        if 'fark_tutari' in gm_df.columns else pd.Series(0.0, index=range(len(son)))
+
+    out = pd.DataFrame({
+        'magaza_kodu': _bilgi('magaza_kodu').map(str).values,
+        'magaza_adi': _bilgi('magaza_tanim').map(str).str[:25].values,
+        'sm': _bilgi('satis_muduru').map(str).values,
+        'bs': _bilgi('bolge_sorumlusu').map(str).values,
+        'malzeme_kodu': _bilgi('malzeme_kodu').map(str).values,
+        'malzeme_adi': _bilgi('malzeme_tanimi').map(str).str[:35].values,
+        'depolama': _bilgi('depolama_kosulu').map(str).values,
+        'seri': seri_str,
+        'ayni_count': ozet['ayni_adet'].to_numpy()[secili].astype(int),
+        'fark_tutari': fark.astype(float).values,
+    })
+    out['risk'] = np.where(out['fark_tutari'] == 0, 'BÜYÜK RİSK', 'RİSK')
+    return out.to_dict('records')
 
 
 def hesapla_ic_hirsizlik_sayisi(df, birim_col, birim_value):
@@ -1280,28 +1233,35 @@ def main_app():
             st.warning("Henüz veri yüklenmemiş. SM'ler Excel yükledikçe veriler burada görünecek.")
 
         if selected_periods:
-            # Veriyi çek (tuple for cache)
-            gm_df = get_gm_ozet_data(tuple(selected_periods))
+            # Veriyi çek (tuple for cache) - paylaşılan, normalize edilmiş kopya
+            gm_surum, gm_df = get_gm_ozet_surumu(tuple(selected_periods))
+            gm_df = None if gm_df is None else gm_df.copy(deep=False)
 
             if gm_df is not None and len(gm_df) > 0:
                 # ========== TÜM HESAPLAMALARI CACHE'LE ==========
-                period_key = tuple(selected_periods)
+                # Anahtar veri sürümü: aynı dönemler yeniden yüklenip değişirse özetler de yenilenir
+                period_key = (tuple(selected_periods), gm_surum)
 
                 if st.session_state.get("gm_cache_key") != period_key:
                     st.session_state["gm_cache_key"] = period_key
 
-                    # Kolon isimlerini normalize et (1 kez)
-                    gm_df = normalize_dataframe_columns(gm_df)
-                    st.session_state["gm_df_normalized"] = gm_df
+                    # Rollup küpü (1 kez) - tüm SM/BS/mağaza/kategori özetleri bunun dilimi
+                    gm_kup = RollupKupu(gm_df)
+                    st.session_state["gm_kup"] = gm_kup
+
+                    # Veri sürümü (rapor önbelleği anahtarı) - kayıt sürümünden, yeniden hash yok
+                    st.session_state["gm_veri_surumu"] = veri_surumu(gm_surum)
 
                     # Temel istatistikler (1 kez)
                     st.session_state["magaza_sayisi"] = gm_df['magaza_kodu'].nunique()
-                    st.session_state["toplam_fark"] = gm_df['fark_tutari'].sum() if 'fark_tutari' in gm_df.columns else 0
-                    st.session_state["toplam_fire"] = gm_df['fire_tutari'].sum() if 'fire_tutari' in gm_df.columns else 0
-                    st.session_state["toplam_satis"] = gm_df['satis_hasilati'].sum() if 'satis_hasilati' in gm_df.columns else 0
-
-                # Cache'den oku
-                gm_df = st.session_state.get("gm_df_normalized", gm_df)
+                    st.session_state["toplam_fark"] = gm_kup.toplam('fark_tutari')
+                    st.session_state["toplam_fire"] = gm_kup.toplam('fire_tutari')
+                    st.session_state["toplam_satis"] = gm_kup.toplam('satis_hasilati')
+
+                # Cache'den oku (gm_df zaten normalize - oturumda kopya tutulmaz)
+                gm_kup = st.session_state.get("gm_kup")
+                if gm_kup is None:
+                    gm_kup = RollupKupu(gm_df)
                 magaza_sayisi = st.session_state.get("magaza_sayisi", 0)
                 toplam_fark = st.session_state.get("toplam_fark", 0)
                 toplam_fire = st.session_state.get("toplam_fire", 0)
@@ -1329,11 +1289,7 @@ def main_app():
                 # Kategori bazlı hesapla
                 kat_data = {}
                 if 'depolama_kosulu' in gm_df.columns:
-                    kat_ozet = gm_df.groupby('depolama_kosulu').agg({
-                        'fark_tutari': 'sum',
-                        'fire_tutari': 'sum',
-                        'satis_hasilati': 'sum'
-                    }).reset_index()
+                    kat_ozet = gm_kup.dilim(['depolama_kosulu'])
 
                     for _, row in kat_ozet.iterrows():
                         kat = str(row['depolama_kosulu'] or '').upper()
@@ -1430,12 +1386,7 @@ def main_app():
                     # SM özet cache kontrolü
                     if st.session_state.get("sm_ozet_cache_key") != period_key:
                         # SM bazlı grupla (1 kez)
-                        sm_ozet = gm_df.groupby('satis_muduru').agg({
-                            'magaza_kodu': 'nunique',
-                            'fark_tutari': 'sum',
-                            'fire_tutari': 'sum',
-                            'satis_hasilati': 'sum'
-                        }).reset_index()
+                        sm_ozet = gm_kup.dilim(['satis_muduru'], say='magaza_kodu', olculer=['fark_tutari', 'fire_tutari', 'satis_hasilati'])
                         sm_ozet.columns = ['Satış Müdürü', 'Mağaza', 'Fark', 'Fire', 'Satış']
                         sm_ozet['Açık'] = sm_ozet['Fark'] + sm_ozet['Fire']
                         sm_ozet['Açık%'] = (sm_ozet['Açık'] / sm_ozet['Satış'] * 100).round(2)
@@ -1444,9 +1395,7 @@ def main_app():
                         # SM + Kategori bazlı açık oranları hesapla
                         sm_kat_oranlar = {}
                         if 'depolama_kosulu' in gm_df.columns:
-                            sm_kat_df = gm_df.groupby(['satis_muduru', 'depolama_kosulu']).agg({
-                                'fark_tutari': 'sum', 'fire_tutari': 'sum', 'satis_hasilati': 'sum'
-                            }).reset_index()
+                            sm_kat_df = gm_kup.dilim(['satis_muduru', 'depolama_kosulu'])
 
                             for _, r in sm_kat_df.iterrows():
                                 sm = r['satis_muduru']
@@ -1504,15 +1453,13 @@ def main_app():
                         expander_title = f"👔 {sm_name} | {row['Mağaza']} mğz | {kat_str} | Açık: {acik_pct:.1f}%"
 
                         with st.expander(expander_title):
-                            # Bu SM'in verilerini al
-                            sm_df = gm_df[gm_df['satis_muduru'] == sm_name]
+                            # Bu SM'in küp dilimi
+                            sm_kup = gm_kup.filtrele({'satis_muduru': sm_name})
 
                             # SM kategori kırılımı
                             sm_kat = {}
-                            if 'depolama_kosulu' in sm_df.columns:
-                                for _, kr in sm_df.groupby('depolama_kosulu').agg({
-                                    'fark_tutari': 'sum', 'fire_tutari': 'sum', 'satis_hasilati': 'sum'
-                                }).reset_index().iterrows():
+                            if 'depolama_kosulu' in gm_df.columns:
+                                for _, kr in sm_kup.dilim(['depolama_kosulu']).iterrows():
                                     k = str(kr['depolama_kosulu'] or '').upper()
                                     s = kr['satis_hasilati']
                                     if 'ET' in k or 'TAVUK' in k: e = '🐓'
@@ -1551,13 +1498,7 @@ def main_app():
 
                             # Bu SM'in mağazaları
                             st.markdown("**🏪 Mağazalar**")
-                            sm_magazalar = gm_df[gm_df['satis_muduru'] == sm_name].groupby(
-                                ['magaza_kodu', 'magaza_tanim']
-                            ).agg({
-                                'fark_tutari': 'sum',
-                                'fire_tutari': 'sum',
-                                'satis_hasilati': 'sum'
-                            }).reset_index()
+                            sm_magazalar = sm_kup.dilim(['magaza_kodu', 'magaza_tanim'])
                             sm_magazalar['Açık'] = sm_magazalar['fark_tutari'] + sm_magazalar['fire_tutari']
                             sm_magazalar = sm_magazalar.sort_values('Açık', ascending=True)
 
@@ -1582,18 +1523,13 @@ def main_app():
                 bs_var = False
                 if gm_df is not None and len(gm_df) > 0 and 'bolge_sorumlusu' in gm_df.columns:
                     # Boş olmayan BS'ler
-                    bs_df = gm_df[gm_df['bolge_sorumlusu'].notna() & (gm_df['bolge_sorumlusu'] != '')]
-                    if len(bs_df) > 0:
+                    bs_kup = gm_kup.dolu('bolge_sorumlusu')
+                    if len(bs_kup) > 0:
                         bs_var = True
 
                 if bs_var:
                     # BS bazlı grupla - sadece dolu olanları
-                    bs_ozet = bs_df.groupby('bolge_sorumlusu').agg({
-                        'magaza_kodu': 'nunique',
-                        'fark_tutari': 'sum',
-                        'fire_tutari': 'sum',
-                        'satis_hasilati': 'sum'
-                    }).reset_index()
+                    bs_ozet = bs_kup.dilim(['bolge_sorumlusu'], say='magaza_kodu', olculer=['fark_tutari', 'fire_tutari', 'satis_hasilati'])
                     bs_ozet.columns = ['Bölge Sorumlusu', 'Mağaza', 'Fark', 'Fire', 'Satış']
                     bs_ozet['Açık'] = bs_ozet['Fark'] + bs_ozet['Fire']
                     bs_ozet['Açık%'] = (bs_ozet['Açık'] / bs_ozet['Satış'] * 100).round(2)
@@ -1601,10 +1537,12 @@ def main_app():
 
                     # BS + Kategori bazlı açık oranları hesapla
                     bs_kat_oranlar = {}
-                    if 'depolama_kosulu' in bs_df.columns:
-                        bs_kat_df = bs_df.groupby(['bolge_sorumlusu', 'depolama_kosulu']).agg({
-                            'fark_tutari': 'sum', 'fire_tutari': 'sum', 'satis_hasilati': 'sum'
-                        }).reset_index()
+                    mag_kat_gruplari = {}
+                    if 'depolama_kosulu' in gm_df.columns:
+                        bs_kat_df = bs_kup.dilim(['bolge_sorumlusu', 'depolama_kosulu'])
+
+                        # Mağaza + kategori kırılımı (expander'lar için tek dilim)
+                        mag_kat_gruplari = dict(tuple(bs_kup.dilim(['magaza_kodu', 'depolama_kosulu']).groupby('magaza_kodu')))
 
                         for _, r in bs_kat_df.iterrows():
                             bs = r['bolge_sorumlusu']
@@ -1656,13 +1594,7 @@ def main_app():
 
                         with st.expander(expander_title):
                             # Bu BS'in mağazaları
-                            bs_magazalar = bs_df[bs_df['bolge_sorumlusu'] == bs_name].groupby(
-                                ['magaza_kodu', 'magaza_tanim']
-                            ).agg({
-                                'fark_tutari': 'sum',
-                                'fire_tutari': 'sum',
-                                'satis_hasilati': 'sum'
-                            }).reset_index()
+                            bs_magazalar = bs_kup.dilim(['magaza_kodu', 'magaza_tanim'], filtre={'bolge_sorumlusu': bs_name})
                             bs_magazalar['Açık'] = bs_magazalar['fark_tutari'] + bs_magazalar['fire_tutari']
                             bs_magazalar['Açık%'] = (bs_magazalar['Açık'] / bs_magazalar['satis_hasilati'] * 100).round(2)
                             bs_magazalar = bs_magazalar.sort_values('Açık', ascending=True)
@@ -1676,12 +1608,9 @@ def main_app():
                                 mag_tanim = mag['magaza_tanim']
 
                                 # Bu mağazanın kategori kırılımını hesapla
-                                mag_df = bs_df[bs_df['magaza_kodu'] == mag_kodu]
                                 mag_kat = {}
-                                if 'depolama_kosulu' in mag_df.columns:
-                                    for _, kr in mag_df.groupby('depolama_kosulu').agg({
-                                        'fark_tutari': 'sum', 'fire_tutari': 'sum', 'satis_hasilati': 'sum'
-                                    }).reset_index().iterrows():
+                                if mag_kodu in mag_kat_gruplari:
+                                    for _, kr in mag_kat_gruplari[mag_kodu].iterrows():
                                         k = str(kr['depolama_kosulu'] or '').upper()
                                         s = kr['satis_hasilati']
                                         if 'ET' in k or 'TAVUK' in k: e = '🐓'
@@ -1798,11 +1727,7 @@ def main_app():
 
                 if gm_df is not None and len(gm_df) > 0:
                     # Mağaza bazlı grupla
-                    mag_ozet = gm_df.groupby(['magaza_kodu', 'magaza_tanim']).agg({
-                        'fark_tutari': 'sum',
-                        'fire_tutari': 'sum',
-                        'satis_hasilati': 'sum'
-                    }).reset_index()
+                    mag_ozet = gm_kup.dilim(['magaza_kodu', 'magaza_tanim'], olculer=['fark_tutari', 'fire_tutari', 'satis_hasilati'])
                     mag_ozet['Toplam Açık'] = mag_ozet['fark_tutari'] + mag_ozet['fire_tutari']
                     mag_ozet = mag_ozet.sort_values('Toplam Açık', ascending=True)
 
@@ -1853,17 +1778,18 @@ def main_app():
                                 key="encok_view_select"
                             )
 
-                        # SM/BS seçimi için filtre
-                        filtered_df = gm_df.copy()
+                        # SM/BS seçimi için filtre (bölüm indeksinden - tam tablo kopyası / maskesi yok)
+                        filtered_df = gm_df
+                        gm_bolumler = get_gm_bolumler(tuple(selected_periods))
 
                         if encok_view == "SM" and 'satis_muduru' in gm_df.columns:
-                            sm_list = sorted(gm_df['satis_muduru'].dropna().unique().tolist())
+                            sm_list = sorted(gm_bolumler.degerler('satis_muduru'))
                             selected_sm = st.selectbox("Satış Müdürü", sm_list, key="encok_sm_select")
-                            filtered_df = gm_df[gm_df['satis_muduru'] == selected_sm]
+                            filtered_df = gm_bolumler.bolum('satis_muduru', selected_sm)
                         elif encok_view == "BS" and 'bolge_sorumlusu' in gm_df.columns:
-                            bs_list = sorted(gm_df['bolge_sorumlusu'].dropna().unique().tolist())
+                            bs_list = sorted(gm_bolumler.degerler('bolge_sorumlusu'))
                             selected_bs = st.selectbox("Bölge Sorumlusu", bs_list, key="encok_bs_select")
-                            filtered_df = gm_df[gm_df['bolge_sorumlusu'] == selected_bs]
+                            filtered_df = gm_bolumler.bolum('bolge_sorumlusu', selected_bs)
 
                         # Daha fazla göster checkbox
                         show_more = st.checkbox("Daha fazla göster (50)", key="encok_show_more")
@@ -1915,10 +1841,7 @@ def main_app():
 
                 if gm_df is not None and len(gm_df) > 0:
                     # Mağaza bazlı grupla ve top 10
-                    mag_top = gm_df.groupby(['magaza_kodu', 'magaza_tanim']).agg({
-                        'fark_tutari': 'sum',
-                        'fire_tutari': 'sum'
-                    }).reset_index()
+                    mag_top = gm_kup.dilim(['magaza_kodu', 'magaza_tanim'], olculer=['fark_tutari', 'fire_tutari'])
                     mag_top['Toplam Açık'] = mag_top['fark_tutari'] + mag_top['fire_tutari']
                     mag_top = mag_top.nsmallest(10, 'Toplam Açık')  # En düşük (en negatif) 10
 
@@ -2279,9 +2202,9 @@ def main_app():
                         st.session_state["risk_cache_key"] = period_key
 
                         # Bölge toplamları
-                        bolge_toplam_satis = gm_df['satis_hasilati'].sum()
-                        bolge_toplam_fark = gm_df['fark_tutari'].sum()
-                        bolge_toplam_fire = gm_df['fire_tutari'].sum()
+                        bolge_toplam_satis = gm_kup.toplam('satis_hasilati')
+                        bolge_toplam_fark = gm_kup.toplam('fark_tutari')
+                        bolge_toplam_fire = gm_kup.toplam('fire_tutari')
                         bolge_toplam_acik = bolge_toplam_fark + bolge_toplam_fire
                         bolge_acik_oran = (bolge_toplam_acik / bolge_toplam_satis * 100) if bolge_toplam_satis else 0
 
@@ -2324,10 +2247,7 @@ def main_app():
                         # SM verileri
                         sm_riskler = []
                         if 'satis_muduru' in gm_df.columns:
-                            sm_risk_df = gm_df.groupby('satis_muduru').agg({
-                                'fark_tutari': 'sum', 'fire_tutari': 'sum',
-                                'satis_hasilati': 'sum', 'magaza_kodu': 'nunique'
-                            }).reset_index()
+                            sm_risk_df = gm_kup.dilim(['satis_muduru'], say='magaza_kodu')
                             for _, row in sm_risk_df.iterrows():
                                 sm_acik = row['fark_tutari'] + row['fire_tutari']
                                 sm_name = row['satis_muduru']
@@ -2349,12 +2269,9 @@ def main_app():
                         # BS verileri
                         bs_riskler = []
                         if 'bolge_sorumlusu' in gm_df.columns:
-                            bs_df_risk = gm_df[gm_df['bolge_sorumlusu'].notna() & (gm_df['bolge_sorumlusu'] != '')]
-                            if len(bs_df_risk) > 0:
-                                bs_risk_df = bs_df_risk.groupby('bolge_sorumlusu').agg({
-                                    'fark_tutari': 'sum', 'fire_tutari': 'sum',
-                                    'satis_hasilati': 'sum', 'magaza_kodu': 'nunique'
-                                }).reset_index()
+                            bs_kup_risk = gm_kup.dolu('bolge_sorumlusu')
+                            if len(bs_kup_risk) > 0:
+                                bs_risk_df = bs_kup_risk.dilim(['bolge_sorumlusu'], say='magaza_kodu')
                                 for _, row in bs_risk_df.iterrows():
                                     bs_acik = row['fark_tutari'] + row['fire_tutari']
                                     bs_name = row['bolge_sorumlusu']
@@ -2375,9 +2292,7 @@ def main_app():
 
                         # Mağaza verileri
                         mag_riskler = []
-                        mag_risk_df = gm_df.groupby(['magaza_kodu', 'magaza_tanim']).agg({
-                            'fark_tutari': 'sum', 'fire_tutari': 'sum', 'satis_hasilati': 'sum'
-                        }).reset_index()
+                        mag_risk_df = gm_kup.dilim(['magaza_kodu', 'magaza_tanim'])
                         for _, row in mag_risk_df.iterrows():
                             mag_acik = row['fark_tutari'] + row['fire_tutari']
                             mag_kodu = row['magaza_kodu']
@@ -3030,7 +2945,7 @@ def main_app():
 
                         if st.button("🔄 Aynı Sayım Hesapla", key="btn_ayni_sayim"):
                             with st.spinner("Hesaplanıyor..."):
-                                st.session_state["ayni_sayim_urunler"] = find_ayni_sayim(gm_df)
+                                st.session_state["ayni_sayim_urunler"] = find_ayni_sayim(gm_df, _get_seri_frame(gm_df, envanter_doldur=0))
 
                         ayni_sayim_urunler = st.session_state.get("ayni_sayim_urunler")
 
@@ -3134,37 +3049,35 @@ def main_app():
                         st.markdown("### 🌍 Bölge Raporu")
                         st.caption("Tüm mağazaların Risk Karnesi özeti")
 
-                        if st.button("📊 Bölge Risk Karnesi Oluştur", key="btn_bolge_indir"):
-                            with st.spinner("Bölge raporu hazırlanıyor..."):
-                                try:
-                                    donem = selected_periods[0] if selected_periods else datetime.now().strftime('%Y%m')
-                                    excel_bytes = uret_bolge_risk_karnesi_excel(gm_df, "Bölge", donem)
-                                    if excel_bytes:
-                                        st.download_button(
-                                            label="💾 İndir (Excel)",
-                                            data=excel_bytes,
-                                            file_name=f"Risk_Karnesi_{donem}.xlsx",
-                                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                            key="download_bolge_excel"
-                                        )
-                                        st.success("✅ Bölge Risk Karnesi hazır!")
-                                    else:
-                                        st.error("Rapor oluşturulamadı")
-                                except Exception as e:
-                                    st.error(f"Hata: {str(e)}")
+                        gm_surum = st.session_state.get("gm_veri_surumu")
+                        donem = selected_periods[0] if selected_periods else datetime.now().strftime('%Y%m')
+
+                        # Rapor sadece istenince üretilir; (dönem, veri sürümü) başına 1 kez
+                        try:
+                            rapor_indir_butonu(
+                                'bolge_risk_karnesi', (tuple(selected_periods), donem), gm_surum,
+                                lambda: uret_bolge_risk_karnesi_excel(gm_df, "Bölge", donem, seri_frame=_get_seri_frame(gm_df)),
+                                label="💾 İndir (Excel)",
+                                file_name=f"Risk_Karnesi_{donem}.xlsx",
+                                key="download_bolge_excel",
+                                hazirla_label="📊 Bölge Risk Karnesi Oluştur"
+                            )
+                        except Exception as e:
+                            st.error(f"Hata: {str(e)}")
 
                     with col2:
                         st.markdown("### 🏪 Mağaza Raporu")
                         st.caption("Tek mağaza detaylı Risk Raporu")
 
                         # SM filtresi
-                        sm_list = gm_df['satis_muduru'].dropna().unique().tolist() if 'satis_muduru' in gm_df.columns else []
+                        gm_bolumler = get_gm_bolumler(tuple(selected_periods))
+                        sm_list = gm_bolumler.degerler('satis_muduru') if 'satis_muduru' in gm_df.columns else []
                         selected_sm_karne = st.selectbox("👔 SM Filtre:", ["Tümü"] + sorted(sm_list), key="karne_sm_filter")
 
-                        # Mağaza listesi (filtrelenmiş)
-                        mag_df = gm_df.copy()
+                        # Mağaza listesi (filtrelenmiş) - bölüm indeksinden, kopya yok
+                        mag_df = gm_df
                         if selected_sm_karne != "Tümü":
-                            mag_df = mag_df[mag_df['satis_muduru'] == selected_sm_karne]
+                            mag_df = gm_bolumler.bolum('satis_muduru', selected_sm_karne)
 
                         magaza_list = mag_df.groupby(['magaza_kodu', 'magaza_tanim']).size().reset_index()[['magaza_kodu', 'magaza_tanim']]
                         magaza_options = [f"{row['magaza_kodu']} - {row['magaza_tanim']}" for _, row in magaza_list.iterrows()]
@@ -3172,39 +3085,34 @@ def main_app():
                         if magaza_options:
                             selected_magaza_karne = st.selectbox("🏪 Mağaza Seç:", magaza_options, key="karne_magaza_select")
 
-                            if st.button("📋 Mağaza Risk Raporu Oluştur", key="btn_magaza_indir"):
-                                magaza_kodu = selected_magaza_karne.split(" - ")[0]
-                                magaza_adi = selected_magaza_karne.split(" - ")[1] if " - " in selected_magaza_karne else ""
-
-                                with st.spinner(f"{magaza_kodu} raporu hazırlanıyor..."):
-                                    try:
-                                        df_tek_magaza = gm_df[gm_df['magaza_kodu'] == magaza_kodu]
-                                        donem = selected_periods[0] if selected_periods else datetime.now().strftime('%Y%m')
-
-                                        magaza_bilgi = {
-                                            'kodu': magaza_kodu,
-                                            'adi': magaza_adi,
-                                            'sm': df_tek_magaza['satis_muduru'].iloc[0] if len(df_tek_magaza) > 0 and 'satis_muduru' in df_tek_magaza.columns else '',
-                                            'bs': df_tek_magaza['bolge_sorumlusu'].iloc[0] if len(df_tek_magaza) > 0 and 'bolge_sorumlusu' in df_tek_magaza.columns else '',
-                                            'bolge': 'Bölge',
-                                            'donem': donem
-                                        }
+                            magaza_kodu = selected_magaza_karne.split(" - ")[0]
+                            magaza_adi = selected_magaza_karne.split(" - ")[1] if " - " in selected_magaza_karne else ""
 
-                                        excel_bytes = uret_magaza_risk_raporu_excel(df_tek_magaza, magaza_bilgi, bolge_acik_oran)
-
-                                        if excel_bytes:
-                                            st.download_button(
-                                                label="💾 İndir (Excel)",
-                                                data=excel_bytes,
-                                                file_name=f"{magaza_kodu}_{magaza_adi.replace(' ', '_')}_Risk_Raporu.xlsx",
-                                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                                key="download_magaza_excel"
-                                            )
-                                            st.success(f"✅ {magaza_kodu} Risk Raporu hazır!")
-                                        else:
-                                            st.error("Rapor oluşturulamadı")
-                                    except Exception as e:
-                                        st.error(f"Hata: {str(e)}")
+                            def magaza_karnesi_uret():
+                                df_tek_magaza = gm_bolumler.bolum('magaza_kodu', magaza_kodu)
+
+                                magaza_bilgi = {
+                                    'kodu': magaza_kodu,
+                                    'adi': magaza_adi,
+                                    'sm': df_tek_magaza['satis_muduru'].iloc[0] if len(df_tek_magaza) > 0 and 'satis_muduru' in df_tek_magaza.columns else '',
+                                    'bs': df_tek_magaza['bolge_sorumlusu'].iloc[0] if len(df_tek_magaza) > 0 and 'bolge_sorumlusu' in df_tek_magaza.columns else '',
+                                    'bolge': 'Bölge',
+                                    'donem': donem
+                                }
+
+                                return uret_magaza_risk_raporu_excel(df_tek_magaza, magaza_bilgi, bolge_acik_oran)
+
+                            try:
+                                rapor_indir_butonu(
+                                    'magaza_risk_raporu', (magaza_kodu, tuple(selected_periods), donem), gm_surum,
+                                    magaza_karnesi_uret,
+                                    label="💾 İndir (Excel)",
+                                    file_name=f"{magaza_kodu}_{magaza_adi.replace(' ', '_')}_Risk_Raporu.xlsx",
+                                    key="download_magaza_excel",
+                                    hazirla_label="📋 Mağaza Risk Raporu Oluştur"
+                                )
+                            except Exception as e:
+                                st.error(f"Hata: {str(e)}")
                         else:
                             st.warning("Mağaza bulunamadı")
 
@@ -3213,7 +3121,7 @@ def main_app():
                     st.markdown("### 📊 Risk Özeti")
 
                     try:
-                        ozet_df, _ = hesapla_tum_magazalar_risk(gm_df)
+                        ozet_df, _ = hesapla_tum_magazalar_risk(gm_df, seri_frame=_get_seri_frame(gm_df))
                         if not ozet_df.empty:
                             kritik = len(ozet_df[ozet_df['seviye'] == 'KRİTİK'])
                             riskli = len(ozet_df[ozet_df['seviye'] == 'RİSKLİ'])
@@ -3399,6 +3307,8 @@ def main_app():
                                     st.success(f"💾 {eklenen} yeni kayıt eklendi (delta hesaplandı)")
                                     # Cache'leri temizle - yeni veriyi görmek için
                                     st.cache_data.clear()
+                                    get_gm_ozet_surumu.clear()
+                                    get_gm_bolumler.clear()
                                     # Session state cache key'lerini sıfırla
                                     for key in ["gm_cache_key", "sm_ozet_cache_key", "risk_cache_key"]:
                                         if key in st.session_state:
@@ -15,14 +15,22 @@ import streamlit as st
 import pandas as pd
 import os
 import sys
+import time
 
 # Modül yolunu ekle
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Engine ve UI modülleri
-from engine.bootstrap import build_dataset_with_raw, get_periods, get_sms
+import json
+
+from engine.bootstrap import build_dataset_with_raw, rescore_dataset, get_periods, get_sms
+from engine.score_cache import ScoreCache
 from engine.loader import get_supabase_client
 from engine.scorer import get_risk_level
+from engine.weights import load_weights, validate_risk_weights
+from utils.kup import RollupKupu
+from utils.bolum import BolumluVeri
+from utils.rapor_cache import veri_surumu
 from ui.tab_gm import render_gm_tab
 from ui.tab_sm import render_sm_tab
 from ui.tab_bs import render_bs_tab
@@ -125,20 +133,56 @@ if not st.session_state.logged_in:
     st.stop()
 
 # ==================== VERİ YÜKLEME (CACHED) ====================
-@st.cache_data(ttl=600, show_spinner=False)
-def load_data_cached(donemler_tuple, satis_muduru=None):
+# Aynı anda tutulan dönem+SM skor önbelleği sayısı (en eski seçim düşer)
+SKOR_ONBELLEK_LIMITI = 32
+
+@st.cache_resource(max_entries=SKOR_ONBELLEK_LIMITI)
+def get_score_cache(donemler_tuple, satis_muduru=None):
     """
-    Veri yükle ve skorla - CACHED.
-    donemler_tuple: Cache key için tuple olmalı.
+    Dönem+SM başına skor önbelleği - tüm oturumlar paylaşır.
+    TTL dolup veri yeniden çekildiğinde sadece değişen mağazalar skorlanır.
+    """
+    return ScoreCache()
+
+@st.cache_resource(ttl=600, show_spinner=False)
+def load_data_shared(donemler_tuple, satis_muduru=None):
+    """
+    Veri yükle ve skorla - process genelinde TEK kopya.
+    cache_resource: isabette kopya / deserileştirme yok; (dönemler, SM) başına
+    tüm oturumların paylaştığı tek kopya.
+    metadata['veri_surumu']: yükleme başına sabit anahtar (rapor önbelleği için, rerun'da hash yok).
     """
     client = get_client()
     if client is None:
         return pd.DataFrame(), pd.DataFrame(), {}
 
     donemler = list(donemler_tuple)
-    raw_df, scored_df, metadata = build_dataset_with_raw(client, donemler, satis_muduru)
+    score_cache = get_score_cache(donemler_tuple, satis_muduru)
+    raw_df, scored_df, metadata = build_dataset_with_raw(client, donemler, satis_muduru, score_cache)
+    # TTL sonrası yeniden yükleme yeni anahtar alır
+    metadata['veri_surumu'] = (donemler_tuple, satis_muduru, time.time_ns())
     return raw_df, scored_df, metadata
 
+def load_data_cached(donemler_tuple, satis_muduru=None):
+    """
+    Veri yükle ve skorla - paylaşılan kopyaların salt okunur tutamaçları (sığ kopya).
+    donemler_tuple: Cache key için tuple olmalı.
+    """
+    raw_df, scored_df, metadata = load_data_shared(donemler_tuple, satis_muduru)
+    return raw_df.copy(deep=False), scored_df.copy(deep=False), dict(metadata)
+
+@st.cache_resource(ttl=600, show_spinner=False)
+def get_kup_cached(donemler_tuple, satis_muduru=None):
+    """Ham verinin rollup küpü - veri seti başına 1 kez (load_data_cached ile aynı anahtar)."""
+    raw_df, _, _ = load_data_cached(donemler_tuple, satis_muduru)
+    return RollupKupu(raw_df)
+
+@st.cache_resource(ttl=600, show_spinner=False)
+def get_bolumler_cached(donemler_tuple, satis_muduru=None):
+    """Ham verinin mağaza / SM bölüm indeksi - veri seti başına 1 kez (load_data_cached ile aynı anahtar)."""
+    raw_df, _, _ = load_data_shared(donemler_tuple, satis_muduru)
+    return BolumluVeri(raw_df)
+
 @st.cache_data(ttl=300)
 def get_periods_cached():
     """Dönemleri getir - CACHED."""
@@ -189,6 +233,27 @@ def main():
         elif st.session_state.user_sm:
             selected_sm = st.session_state.user_sm
 
+        # Ağırlık simülasyonu (GM) - veri yeniden yüklenmez, sadece puanlar
+        whatif_weights = None
+        if is_gm:
+            with st.expander("⚖️ Ağırlık Simülasyonu"):
+                mevcut_agirliklar = load_weights().get('risk_weights', {})
+                varsayilan = json.dumps(mevcut_agirliklar, ensure_ascii=False, indent=1)
+                weights_text = st.text_area("risk_weights (JSON)", varsayilan, height=250, key="whatif_weights")
+                if weights_text.strip() != varsayilan.strip():
+                    try:
+                        aday = json.loads(weights_text)
+                    except json.JSONDecodeError as e:
+                        st.error(f"JSON hatası: {e}")
+                    else:
+                        # Yapı mevcut ağırlıklarla aynı olmalı (kategori / seviye anahtarları, sayısal değerler)
+                        hata = validate_risk_weights(aday, mevcut_agirliklar)
+                        if hata:
+                            st.error(f"Ağırlık hatası: {hata}")
+                        else:
+                            whatif_weights = aday
+                            st.caption("✅ Simülasyon ağırlıkları aktif")
+
         st.markdown("---")
         if st.button("🚪 Çıkış", use_container_width=True):
             st.session_state.logged_in = False
@@ -207,6 +272,16 @@ def main():
             selected_sm
         )
 
+    # What-if: hazır feature'lar yeni ağırlıklarla skorlanır (ms)
+    if whatif_weights is not None and not scored_df.empty:
+        try:
+            scored_df = rescore_dataset(scored_df, whatif_weights)
+        except Exception as e:
+            st.error(f"Simülasyon skorlanamadı, mevcut ağırlıklar kullanılıyor: {str(e)[:100]}")
+
+    # Rapor önbelleği sürümü: yükleme anahtarı + simülasyon ağırlıkları
+    rapor_surumu = veri_surumu(metadata.get('veri_surumu'), whatif_weights) if metadata else None
+
     # Debug bilgisi (opsiyonel)
     if metadata:
         st.sidebar.caption(f"📊 {metadata.get('raw_rows', 0):,} satır | ⏱️ {metadata.get('total_time', 0):.2f}s")
@@ -218,19 +293,21 @@ def main():
 
     elif analysis_mode == "👔 SM Özet":
         st.title("👔 SM Özet")
-        render_sm_tab(scored_df, raw_df, selected_sm)
+        render_sm_tab(scored_df, raw_df, selected_sm, surum=rapor_surumu)
 
     elif analysis_mode == "📋 BS Özet":
         st.title("📋 BS Özet")
-        render_bs_tab(scored_df, raw_df)
+        kup = get_kup_cached(tuple(selected_periods), selected_sm) if not raw_df.empty else None
+        render_bs_tab(scored_df, raw_df, kup)
 
     elif analysis_mode == "🏪 Mağaza Detay":
         st.title("🏪 Mağaza Detay")
-        render_magaza_tab(raw_df)
+        bolumler = get_bolumler_cached(tuple(selected_periods), selected_sm) if not raw_df.empty else None
+        render_magaza_tab(raw_df, bolumler=bolumler)
 
     elif analysis_mode == "📥 Rapor":
         st.title("📥 Rapor İndir")
-        render_rapor_tab(scored_df, raw_df, metadata)
+        render_rapor_tab(scored_df, raw_df, metadata, surum=rapor_surumu)
 
     elif analysis_mode == "🔧 Debug":
         st.title("🔧 Debug / Performans")
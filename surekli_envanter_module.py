@@ -9,6 +9,9 @@ from datetime import datetime
 import json
 import os
 
+from utils.kategori import MetinSiniflandirici
+from utils.kup import RollupKupu
+
 # ==================== JSON'DAN VERİ YÜKLEME ====================
 
 def load_json_data(filename):
@@ -47,6 +50,8 @@ KATEGORI_KEYWORDS = {
     'Ekmek': ['UN VE UNLU MAMULLER', 'EKMEK', 'LAVAŞ', 'BAZLAMA', 'PİDE', 'SIMIT'],
     'Meyve/Sebze': ['MEYVE', 'SEBZE', 'YAŞ MEYVE', 'YAŞ SEBZE']
 }
+KATEGORI_KOLONLARI = ['Ürün Grubu Tanımı', 'Mal Grubu Tanımı', 'Malzeme Tanımı']
+KATEGORI_SINIFLANDIRICI = MetinSiniflandirici(KATEGORI_KEYWORDS, varsayilan='Diğer')
 
 # Risk puan ağırlıkları (toplam 97) - ESKİ KRİTERLER
 RISK_WEIGHTS = {
@@ -97,17 +102,12 @@ def get_magaza_adi_col(df):
 
 def detect_kategori(row):
     """Satırdan kategori tespit et"""
-    text = ' '.join([
-        str(row.get('Ürün Grubu Tanımı', '')),
-        str(row.get('Mal Grubu Tanımı', '')),
-        str(row.get('Malzeme Tanımı', ''))
-    ]).upper()
-    
-    for kategori, keywords in KATEGORI_KEYWORDS.items():
-        for kw in keywords:
-            if kw in text:
-                return kategori
-    return 'Diğer'
+    text = ' '.join(str(row.get(col, '')) for col in KATEGORI_KOLONLARI)
+    return KATEGORI_SINIFLANDIRICI.metin_etiketi(text)
+
+def detect_kategori_serisi(df):
+    """Tüm satırlar için kategori (vektörel, tekil grup+ürün metni başına bir kez)"""
+    return pd.Series(KATEGORI_SINIFLANDIRICI.siniflandir(df, KATEGORI_KOLONLARI), index=df.index)
 
 # ==================== ENVANTER TİPİ TESPİTİ ====================
 
@@ -143,13 +143,14 @@ def prepare_detay_kayitlar(df):
     else:
         envanter_donemi = datetime.now().strftime('%Y%m')
     
-    for _, row in df.iterrows():
+    kategoriler = detect_kategori_serisi(df)
+    
+    for (_, row), kategori in zip(df.iterrows(), kategoriler):
         magaza_kodu = str(row.get('Mağaza Kodu', ''))
         if not magaza_kodu:
             continue
             
         magaza_bilgi = get_magaza_bilgi(magaza_kodu)
-        kategori = detect_kategori(row)
         
         # Envanter sayısı
         env_sayisi = int(row.get('Envanter Sayisi', 1) or 1)
@@ -806,21 +807,37 @@ def hesapla_risk_skoru(df, df_onceki=None, urun_medianlar=None):
 # ==================== ÖZET FONKSİYONLARI ====================
 
 def hesapla_kategori_ozet(df):
-    """Kategori bazlı özet hesapla"""
+    """Kategori bazlı özet hesapla (vektörel)"""
     ozet = {}
-    
-    for _, row in df.iterrows():
-        kategori = detect_kategori(row)
-        if kategori == 'Diğer':
-            continue
-        
-        if kategori not in ozet:
-            ozet[kategori] = {'fark': 0, 'fire': 0, 'satis': 0, 'urun_sayisi': 0}
-        
-        ozet[kategori]['fark'] += float(row.get('Fark Tutarı', 0) or 0)
-        ozet[kategori]['fire'] += float(row.get('Fire Tutarı', 0) or 0)
-        ozet[kategori]['satis'] += float(row.get('Satış Hasılatı', 0) or 0)
-        ozet[kategori]['urun_sayisi'] += 1
+    if df is None or df.empty:
+        return ozet
+    
+    kategori = detect_kategori_serisi(df)
+    secili = (kategori != 'Diğer').to_numpy()
+    
+    def _tutar(col):
+        if col not in df.columns:
+            return pd.Series(0.0, index=df.index)
+        # Boş / metin hücre 0 sayılır (satır bazlı float(x or 0) gibi hata vermez)
+        return pd.to_numeric(df[col], errors='coerce').fillna(0)
+    
+    ozet_df = pd.DataFrame({
+        'kategori': kategori,
+        'fark': _tutar('Fark Tutarı'),
+        'fire': _tutar('Fire Tutarı'),
+        'satis': _tutar('Satış Hasılatı'),
+    })[secili]
+    grup = ozet_df.groupby('kategori', sort=False)
+    toplam = grup[['fark', 'fire', 'satis']].sum()
+    adet = grup.size()
+    
+    for kat in toplam.index:
+        ozet[kat] = {
+            'fark': float(toplam.at[kat, 'fark']),
+            'fire': float(toplam.at[kat, 'fire']),
+            'satis': float(toplam.at[kat, 'satis']),
+            'urun_sayisi': int(adet[kat])
+        }
     
     # Oran hesapla
     for kat in ozet:
@@ -830,34 +847,41 @@ def hesapla_kategori_ozet(df):
     
     return ozet
 
-def hesapla_magaza_ozet(df):
+def hesapla_magaza_kupu(df):
+    """Mağaza rollup küpü - özetler bunun dilimi (veri seti başına 1 kez kurulabilir)"""
+    magaza_adi_col = get_magaza_adi_col(df)
+    return RollupKupu(
+        df,
+        boyutlar=['Mağaza Kodu', 'Depolama Koşulu Grubu', 'Envanter Dönemi'],
+        olculer=['Fark Tutarı', 'Fire Tutarı', 'Satış Hasılatı'],
+        nitelikler=[magaza_adi_col] if magaza_adi_col else [],
+        sayilanlar=['Malzeme Kodu']
+    )
+
+def hesapla_magaza_ozet(df, kup=None):
     """Mağaza bazlı özet hesapla"""
     magaza_adi_col = get_magaza_adi_col(df)
+    if kup is None:
+        kup = hesapla_magaza_kupu(df)
     
-    agg_dict = {
-        'Fark Tutarı': 'sum',
-        'Fire Tutarı': 'sum',
-        'Satış Hasılatı': 'sum',
-        'Malzeme Kodu': 'count'
-    }
+    ozet = kup.dilim(['Mağaza Kodu'], olculer=['Fark Tutarı', 'Fire Tutarı', 'Satış Hasılatı', 'Malzeme Kodu'])
     if magaza_adi_col:
-        agg_dict[magaza_adi_col] = 'first'
-    
-    ozet = df.groupby('Mağaza Kodu').agg(agg_dict).reset_index()
+        ozet[magaza_adi_col] = ozet['Mağaza Kodu'].map(kup.ilk('Mağaza Kodu', magaza_adi_col))
     ozet.columns = ['Mağaza Kodu', 'Fark', 'Fire', 'Satış', 'Ürün Sayısı'] + (['Mağaza Adı'] if magaza_adi_col else [])
     
     ozet['Kayıp'] = abs(ozet['Fark']) + abs(ozet['Fire'])
     ozet['Oran'] = np.where(ozet['Satış'] > 0, ozet['Kayıp'] / ozet['Satış'] * 100, 0)
     
-    # SM/BS ekle
-    ozet['SM'] = ozet['Mağaza Kodu'].apply(lambda x: get_magaza_bilgi(x)['sm'])
-    ozet['BS'] = ozet['Mağaza Kodu'].apply(lambda x: get_magaza_bilgi(x)['bs'])
+    # SM/BS ekle (mağaza başına 1 lookup)
+    bilgi = [get_magaza_bilgi(x) for x in ozet['Mağaza Kodu']]
+    ozet['SM'] = [b['sm'] for b in bilgi]
+    ozet['BS'] = [b['bs'] for b in bilgi]
     
     return ozet.sort_values('Oran', ascending=False)
 
-def hesapla_sm_ozet(df):
+def hesapla_sm_ozet(df, kup=None):
     """SM bazlı özet hesapla"""
-    magaza_ozet = hesapla_magaza_ozet(df)
+    magaza_ozet = hesapla_magaza_ozet(df, kup)
     
     sm_ozet = magaza_ozet.groupby('SM').agg({
         'Mağaza Kodu': 'nunique',
@@ -872,9 +896,9 @@ def hesapla_sm_ozet(df):
     
     return sm_ozet.sort_values('Oran', ascending=False)
 
-def hesapla_top10(df):
+def hesapla_top10(df, kup=None):
     """Top 10 listelerini hesapla"""
-    magaza_ozet = hesapla_magaza_ozet(df)
+    magaza_ozet = hesapla_magaza_ozet(df, kup)
     
     sonuc = {
         'top10_magaza': magaza_ozet.nlargest(10, 'Oran'),
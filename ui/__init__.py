@@ -15,6 +15,7 @@ from .tab_bs import render_bs_tab
 from .tab_magaza import render_magaza_tab
 from .tab_rapor import render_rapor_tab
 from .tab_debug import render_debug_tab
+from .rapor_indir import rapor_indir_butonu
 
 __all__ = [
     'render_gm_tab',
@@ -22,5 +23,6 @@ __all__ = [
     'render_bs_tab',
     'render_magaza_tab',
     'render_rapor_tab',
-    'render_debug_tab'
+    'render_debug_tab',
+    'rapor_indir_butonu'
 ]
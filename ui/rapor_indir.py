@@ -0,0 +1,56 @@
+"""
+Tembel Rapor İndirme
+====================
+Rapor ilk istekte üretilir, sonraki rerun'larda önbellekten indirilir.
+"""
+
+import streamlit as st
+from typing import Any, Callable, Optional
+
+from utils.rapor_cache import hazir_rapor, rapor_uret
+
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def rapor_indir_butonu(
+    tur: str,
+    parametreler: Any,
+    surum: Optional[tuple],
+    uret: Callable[[], Any],
+    label: str,
+    file_name: str,
+    key: str,
+    hazirla_label: Optional[str] = None,
+    mime: str = XLSX_MIME,
+    **kwargs
+) -> bool:
+    """
+    Tembel indirme butonu.
+
+    Rapor hazır değilse sadece "Hazırla" butonu çizilir; tıklanınca uret()
+    çağrılır ve sonuç (tür, parametreler, sürüm) anahtarıyla önbelleğe girer.
+    Hazır raporlar doğrudan download_button olarak çizilir.
+
+    Args:
+        tur: Rapor türü (anahtar)
+        parametreler: Raporu belirleyen parametreler (anahtar)
+        surum: Veri sürümü (utils.rapor_cache.veri_surumu)
+        uret: Parametresiz üretici -> bytes / BytesIO
+        key: Widget anahtarı (Hazırla butonu key + '_hazirla')
+
+    Returns:
+        bool: İndirme butonu çizildi mi
+    """
+    veri = hazir_rapor(tur, parametreler, surum)
+    if veri is None:
+        if not st.button(hazirla_label or f"📊 {label} - Hazırla", key=f"{key}_hazirla"):
+            return False
+        with st.spinner("📊 Rapor hazırlanıyor..."):
+            veri = rapor_uret(tur, parametreler, surum, uret)
+        if veri is None:
+            st.error("Rapor oluşturulamadı")
+            return False
+
+    st.download_button(label=label, data=veri, file_name=file_name, mime=mime, key=key, **kwargs)
+    return True
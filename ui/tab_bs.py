@@ -8,6 +8,8 @@ import streamlit as st
 import pandas as pd
 from typing import Optional
 
+from utils.kup import RollupKupu
+
 
 def format_currency(value: float) -> str:
     """Para formatı."""
@@ -20,7 +22,8 @@ def format_currency(value: float) -> str:
 
 def render_bs_tab(
     scored_df: pd.DataFrame,
-    raw_df: Optional[pd.DataFrame] = None
+    raw_df: Optional[pd.DataFrame] = None,
+    kup: Optional[RollupKupu] = None
 ) -> None:
     """
     BS Özet sekmesini render et.
@@ -28,6 +31,7 @@ def render_bs_tab(
     Args:
         scored_df: Risk skorlu mağaza özeti
         raw_df: Ham veri (BS bilgisi için gerekli)
+        kup: raw_df'in rollup küpü (verilmezse burada kurulur)
     """
     if raw_df is None or raw_df.empty:
         st.warning("BS özeti için ham veri gerekli.")
@@ -38,20 +42,17 @@ def render_bs_tab(
         st.warning("Veri setinde 'bolge_sorumlusu' sütunu bulunamadı.")
         return
 
-    # Boş BS'leri filtrele
-    bs_df = raw_df[raw_df['bolge_sorumlusu'].notna() & (raw_df['bolge_sorumlusu'] != '')]
+    # Boş BS'leri filtrele (küp dilimi)
+    if kup is None:
+        kup = RollupKupu(raw_df)
+    bs_kup = kup.dolu('bolge_sorumlusu')
 
-    if bs_df.empty:
+    if len(bs_kup) == 0:
         st.warning("Bölge sorumlusu verisi bulunamadı.")
         return
 
     # BS bazlı gruplama
-    bs_ozet = bs_df.groupby('bolge_sorumlusu').agg({
-        'magaza_kodu': 'nunique',
-        'fark_tutari': 'sum',
-        'fire_tutari': 'sum',
-        'satis_hasilati': 'sum'
-    }).reset_index()
+    bs_ozet = bs_kup.dilim(['bolge_sorumlusu'], say='magaza_kodu', olculer=['fark_tutari', 'fire_tutari', 'satis_hasilati'])
 
     bs_ozet.columns = ['Bölge Sorumlusu', 'Mağaza', 'Fark', 'Fire', 'Satış']
     bs_ozet['Açık'] = bs_ozet['Fark'] + bs_ozet['Fire']
@@ -91,13 +92,7 @@ def render_bs_tab(
 
             # Bu BS'in mağazaları
             st.markdown("**Mağazalar:**")
-            bs_magazalar = bs_df[bs_df['bolge_sorumlusu'] == bs_name].groupby(
-                ['magaza_kodu', 'magaza_tanim']
-            ).agg({
-                'fark_tutari': 'sum',
-                'fire_tutari': 'sum',
-                'satis_hasilati': 'sum'
-            }).reset_index()
+            bs_magazalar = bs_kup.dilim(['magaza_kodu', 'magaza_tanim'], filtre={'bolge_sorumlusu': bs_name})
 
             bs_magazalar['Açık'] = bs_magazalar['fark_tutari'] + bs_magazalar['fire_tutari']
             bs_magazalar['Açık%'] = (bs_magazalar['Açık'] / bs_magazalar['satis_hasilati'] * 100).round(2)
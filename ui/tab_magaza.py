@@ -8,6 +8,8 @@ import streamlit as st
 import pandas as pd
 from typing import Optional, List
 
+from utils.bolum import BolumluVeri
+
 
 def format_currency(value: float) -> str:
     """Para formatı."""
@@ -20,7 +22,8 @@ def format_currency(value: float) -> str:
 
 def render_magaza_tab(
     raw_df: pd.DataFrame,
-    magaza_listesi: Optional[List[str]] = None
+    magaza_listesi: Optional[List[str]] = None,
+    bolumler: Optional[BolumluVeri] = None
 ) -> None:
     """
     Mağaza detay sekmesini render et.
@@ -28,11 +31,15 @@ def render_magaza_tab(
     Args:
         raw_df: Ham envanter verisi
         magaza_listesi: Opsiyonel mağaza listesi (dropdown için)
+        bolumler: raw_df'in mağaza bölüm indeksi (yoksa bu render için kurulur)
     """
     if raw_df.empty:
         st.warning("Veri bulunamadı.")
         return
 
+    if bolumler is None:
+        bolumler = BolumluVeri(raw_df)
+
     # Mağaza seçimi
     if magaza_listesi is None:
         if 'magaza_kodu' in raw_df.columns:
@@ -46,10 +53,9 @@ def render_magaza_tab(
 
     # Mağaza adlarını da göster
     if 'magaza_tanim' in raw_df.columns:
-        magaza_options = []
-        for kod in magaza_listesi:
-            tanim = raw_df[raw_df['magaza_kodu'] == kod]['magaza_tanim'].iloc[0] if len(raw_df[raw_df['magaza_kodu'] == kod]) > 0 else ""
-            magaza_options.append(f"{kod} - {tanim}")
+        # Mağaza başına ilk satırın adı - tam tablo maskesi yok
+        tanimlar = bolumler.ilk('magaza_kodu', 'magaza_tanim')
+        magaza_options = [f"{kod} - {tanimlar.get(kod, '')}" for kod in magaza_listesi]
     else:
         magaza_options = magaza_listesi
 
@@ -63,7 +69,7 @@ def render_magaza_tab(
     selected_magaza = selected_option.split(" - ")[0] if " - " in selected_option else selected_option
 
     # Mağaza verisini filtrele
-    magaza_df = raw_df[raw_df['magaza_kodu'] == selected_magaza]
+    magaza_df = bolumler.bolum('magaza_kodu', selected_magaza)
 
     if magaza_df.empty:
         st.warning(f"{selected_magaza} için veri bulunamadı.")
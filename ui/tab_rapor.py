@@ -9,11 +9,55 @@ import pandas as pd
 from io import BytesIO
 from typing import Optional, Dict, Any
 
+from utils.rapor_cache import veri_surumu
+from .rapor_indir import rapor_indir_butonu
+
+
+# Ham veri sayfası satır sınırı
+HAM_VERI_LIMITI = 50000
+
+
+def _rapor_excel(scored_df: pd.DataFrame, raw_df: Optional[pd.DataFrame], rapor_turu: str) -> bytes:
+    """Seçilen rapor türünün Excel çıktısı"""
+    output = BytesIO()
+
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        if rapor_turu == "Mağaza Özeti":
+            scored_df.to_excel(writer, sheet_name='Mağaza Özeti', index=False)
+
+        elif rapor_turu == "Detaylı Rapor":
+            scored_df.to_excel(writer, sheet_name='Mağaza Özeti', index=False)
+
+            # Risk dağılımı sayfası
+            if 'risk_puan' in scored_df.columns:
+                risk_dist = pd.DataFrame({
+                    'Seviye': ['KRİTİK', 'RİSKLİ', 'DİKKAT', 'TEMİZ'],
+                    'Sayı': [
+                        len(scored_df[scored_df['risk_puan'] >= 60]),
+                        len(scored_df[(scored_df['risk_puan'] >= 40) & (scored_df['risk_puan'] < 60)]),
+                        len(scored_df[(scored_df['risk_puan'] >= 20) & (scored_df['risk_puan'] < 40)]),
+                        len(scored_df[scored_df['risk_puan'] < 20])
+                    ]
+                })
+                risk_dist.to_excel(writer, sheet_name='Risk Dağılımı', index=False)
+
+        elif rapor_turu == "Tüm Veriler":
+            scored_df.to_excel(writer, sheet_name='Mağaza Özeti', index=False)
+            if raw_df is not None and not raw_df.empty:
+                # Ham veri çok büyükse ilk 50K satır
+                if len(raw_df) > HAM_VERI_LIMITI:
+                    raw_df.head(HAM_VERI_LIMITI).to_excel(writer, sheet_name='Ham Veri (İlk 50K)', index=False)
+                else:
+                    raw_df.to_excel(writer, sheet_name='Ham Veri', index=False)
+
+    return output.getvalue()
+
 
 def render_rapor_tab(
     scored_df: pd.DataFrame,
     raw_df: Optional[pd.DataFrame] = None,
-    metadata: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = None,
+    surum: Optional[tuple] = None
 ) -> None:
     """
     Rapor sekmesini render et.
@@ -22,6 +66,7 @@ def render_rapor_tab(
         scored_df: Risk skorlu mağaza özeti
         raw_df: Ham veri (opsiyonel)
         metadata: Yükleme istatistikleri (opsiyonel)
+        surum: Veri seti sürümü (rapor önbelleği anahtarı) - verilmezse çerçevelerden hesaplanır
     """
     st.subheader("📥 Rapor İndir")
 
@@ -49,48 +94,21 @@ def render_rapor_tab(
         horizontal=True
     )
 
-    # Excel oluştur
-    output = BytesIO()
+    ham_dahil = rapor_turu == "Tüm Veriler" and raw_df is not None and not raw_df.empty
+    if ham_dahil and len(raw_df) > HAM_VERI_LIMITI:
+        st.warning(f"Ham veri {len(raw_df):,} satır. İlk 50,000 satır dahil edildi.")
+
+    # Excel sadece istenince oluşturulur; (tür, veri sürümü) başına 1 kez
+    if surum is None:
+        surum = veri_surumu(scored_df, raw_df) if ham_dahil else veri_surumu(scored_df)
 
     try:
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            if rapor_turu == "Mağaza Özeti":
-                scored_df.to_excel(writer, sheet_name='Mağaza Özeti', index=False)
-
-            elif rapor_turu == "Detaylı Rapor":
-                scored_df.to_excel(writer, sheet_name='Mağaza Özeti', index=False)
-
-                # Risk dağılımı sayfası
-                if 'risk_puan' in scored_df.columns:
-                    risk_dist = pd.DataFrame({
-                        'Seviye': ['KRİTİK', 'RİSKLİ', 'DİKKAT', 'TEMİZ'],
-                        'Sayı': [
-                            len(scored_df[scored_df['risk_puan'] >= 60]),
-                            len(scored_df[(scored_df['risk_puan'] >= 40) & (scored_df['risk_puan'] < 60)]),
-                            len(scored_df[(scored_df['risk_puan'] >= 20) & (scored_df['risk_puan'] < 40)]),
-                            len(scored_df[scored_df['risk_puan'] < 20])
-                        ]
-                    })
-                    risk_dist.to_excel(writer, sheet_name='Risk Dağılımı', index=False)
-
-            elif rapor_turu == "Tüm Veriler":
-                scored_df.to_excel(writer, sheet_name='Mağaza Özeti', index=False)
-                if raw_df is not None and not raw_df.empty:
-                    # Ham veri çok büyükse ilk 50K satır
-                    if len(raw_df) > 50000:
-                        raw_df.head(50000).to_excel(writer, sheet_name='Ham Veri (İlk 50K)', index=False)
-                        st.warning(f"Ham veri {len(raw_df):,} satır. İlk 50,000 satır dahil edildi.")
-                    else:
-                        raw_df.to_excel(writer, sheet_name='Ham Veri', index=False)
-
-        output.seek(0)
-
-        # İndirme butonu
-        st.download_button(
+        rapor_indir_butonu(
+            'tab_rapor', rapor_turu, surum,
+            lambda: _rapor_excel(scored_df, raw_df, rapor_turu),
             label=f"📥 {rapor_turu} İndir",
-            data=output.getvalue(),
             file_name=f"surekli_envanter_{rapor_turu.lower().replace(' ', '_')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key=f"tab_rapor_{rapor_turu}",
             use_container_width=True
         )
 
@@ -6,8 +6,12 @@ Satış Müdürü bazlı özet.
 
 import streamlit as st
 import pandas as pd
+from io import BytesIO
 from typing import Optional
 
+from utils.rapor_cache import veri_surumu
+from .rapor_indir import rapor_indir_butonu
+
 
 def format_currency(value: float) -> str:
     """Para formatı."""
@@ -18,10 +22,19 @@ def format_currency(value: float) -> str:
     return f"{value:,.0f}"
 
 
+def _ozet_excel(scored_df: pd.DataFrame) -> bytes:
+    """Özet tablonun Excel çıktısı."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        scored_df.to_excel(writer, sheet_name='Özet', index=False)
+    return output.getvalue()
+
+
 def render_sm_tab(
     scored_df: pd.DataFrame,
     raw_df: Optional[pd.DataFrame] = None,
-    selected_sm: Optional[str] = None
+    selected_sm: Optional[str] = None,
+    surum: Optional[tuple] = None
 ) -> None:
     """
     SM Özet sekmesini render et.
@@ -30,6 +43,7 @@ def render_sm_tab(
         scored_df: Risk skorlu mağaza özeti
         raw_df: Ham veri (opsiyonel)
         selected_sm: Seçili SM (opsiyonel, filtre için)
+        surum: Veri seti sürümü (rapor önbelleği anahtarı) - verilmezse scored_df'ten hesaplanır
     """
     if scored_df.empty:
         st.warning("Veri bulunamadı.")
@@ -123,16 +137,10 @@ def render_sm_tab(
 
         # Excel export
         if not scored_df.empty:
-            from io import BytesIO
-
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                scored_df.to_excel(writer, sheet_name='Özet', index=False)
-            output.seek(0)
-
-            st.download_button(
+            rapor_indir_butonu(
+                'sm_tab_ozet', selected_sm, surum if surum is not None else veri_surumu(scored_df),
+                lambda: _ozet_excel(scored_df),
                 label="📥 Excel İndir",
-                data=output.getvalue(),
                 file_name="sm_ozet_rapor.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                key="sm_tab_excel_download"
             )
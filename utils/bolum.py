@@ -0,0 +1,121 @@
+"""
+Bölümlü Veri (Pre-partitioned Views)
+Mağaza / SM / dönem gibi anahtar kolonlar için önceden kurulmuş grup indeksleri.
+
+Mantık:
+- Kolon başına BİR kez: factorize + kararlı argsort -> değer başına satır pozisyonları
+- Filtre = pozisyon dilimi + take: tam tabloyu maskelemez / kopyalamaz,
+  maliyet seçilen satır sayısıyla orantılı
+- İndeksler ilk kullanımda kurulur (thread-safe), veri seti ömrünce paylaşılır
+- Sonuç satırları orijinal sırada ve orijinal index ile döner (maske ile aynı çıktı)
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class BolumluVeri:
+    """
+    Veri seti başına kurulan bölüm indeksi.
+
+    Kullanım:
+        bolumler = BolumluVeri(df)
+        magaza_df = bolumler.bolum('magaza_kodu', '1234')
+        sm_df = bolumler.sec({'satis_muduru': 'ALİ', 'envanter_donemi': ['202401', '202402']})
+        adlar = bolumler.ilk('magaza_kodu', 'magaza_tanim')
+
+    Not: Dönen DataFrame'ler yeni nesnedir; paylaşılan df'e yazılmaz.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._lock = threading.Lock()
+        self._indeksler = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _indeks(self, kolon):
+        """Kolonun grup indeksi: (değer -> grup no, sıralı pozisyonlar, grup sınırları)"""
+        indeks = self._indeksler.get(kolon)
+        if indeks is not None:
+            return indeks
+        with self._lock:
+            indeks = self._indeksler.get(kolon)
+            if indeks is None:
+                kodlar, tekiller = pd.factorize(self.df[kolon])
+                sira = np.argsort(kodlar, kind='stable')
+                # NaN (-1) satırları başta: sınırlar 1 kaydırılmış sayımlardan
+                sinirlar = np.concatenate(([0], np.cumsum(np.bincount(kodlar + 1, minlength=len(tekiller) + 1))))
+                grup_no = {deger: i for i, deger in enumerate(tekiller)}
+                indeks = (grup_no, sira, sinirlar, tekiller)
+                self._indeksler[kolon] = indeks
+        return indeks
+
+    def pozisyonlar(self, kolon, degerler):
+        """
+        Kolonu verilen değer(ler)e eşit satırların pozisyonları (artan sırada).
+
+        Args:
+            degerler: Tek değer veya değer listesi (isin eşdeğeri)
+        """
+        grup_no, sira, sinirlar, _ = self._indeks(kolon)
+        if not isinstance(degerler, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+            degerler = [degerler]
+
+        parcalar = []
+        for deger in degerler:
+            try:
+                g = grup_no.get(deger)
+            except TypeError:
+                g = None
+            if g is not None:
+                parcalar.append(sira[sinirlar[g + 1]:sinirlar[g + 2]])
+
+        if not parcalar:
+            return np.empty(0, dtype=np.intp)
+        if len(parcalar) == 1:
+            return parcalar[0]
+        return np.sort(np.concatenate(parcalar))
+
+    def bolum(self, kolon, deger):
+        """Kolonu deger'e eşit satırlar (df[df[kolon] == deger] eşdeğeri)"""
+        return self.df.take(self.pozisyonlar(kolon, deger))
+
+    def sec(self, filtre):
+        """
+        Birden çok eşitlik / isin filtresi - en seçici bölümden başlayıp kesişim alınır.
+
+        Args:
+            filtre: {kolon: değer veya değer listesi}; None / boş değerler atlanır
+        """
+        filtre = {k: v for k, v in filtre.items()
+                  if v is not None and not (isinstance(v, (list, tuple, set)) and len(v) == 0)}
+        if not filtre:
+            return self.df.copy(deep=False)
+
+        pozisyon_listesi = sorted((self.pozisyonlar(k, v) for k, v in filtre.items()), key=len)
+        pozisyon = pozisyon_listesi[0]
+        for diger in pozisyon_listesi[1:]:
+            if len(pozisyon) == 0:
+                break
+            pozisyon = np.intersect1d(pozisyon, diger, assume_unique=True)
+        return self.df.take(pozisyon)
+
+    def degerler(self, kolon):
+        """Kolonun tekil (NaN olmayan) değerleri, ilk görülme sırasında"""
+        return pd.Index(self._indeks(kolon)[3]).tolist()
+
+    def ilk(self, kolon, nitelik):
+        """
+        Kolon değeri başına ilk satırın nitelik değeri
+        (df[df[kolon] == d][nitelik].iloc[0] eşdeğeri, tüm değerler için tek seferde).
+
+        Returns:
+            dict: {değer: nitelik}
+        """
+        _, sira, sinirlar, tekiller = self._indeks(kolon)
+        ilk_satir = sira[sinirlar[1:-1]]
+        return dict(zip(tekiller, self.df[nitelik].to_numpy()[ilk_satir]))
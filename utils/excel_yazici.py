@@ -0,0 +1,237 @@
+"""
+Akışlı Excel Yazıcı
+Tüm Excel raporları için ortak yazma katmanı.
+
+- Workbook(write_only=True): satırlar hücre nesnesi biriktirilmeden akıtılır
+- Stiller NamedStyle olarak kitaba BİR KEZ kaydedilir, kolon bazında uygulanır
+  (hücre başına Font/Fill/Border nesnesi YOK)
+- Kolon genişlikleri yazma sırasında string uzunluklarından (kolon bazlı,
+  vektörel) hesaplanır; sonradan tüm hücreleri tekrar tarama YOK
+
+Kullanım:
+    kitap = ExcelKitabi({'baslik': {'font': Font(bold=True)}})
+    ws = kitap.sayfa("ÖZET")
+    ws.satir(["RAPOR"], stil='baslik')
+    ws.bos_satir()
+    ws.tablo(df, baslik_stili='baslik', govde_stili='cerceve')
+    output = kitap.kaydet()  # BytesIO
+"""
+
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+
+
+def _dolu(v):
+    """Genişlik hesabına giren değer mi (boş / None / NaN / 0 / False sayılmaz)"""
+    try:
+        return v is not None and v == v and bool(v)
+    except (TypeError, ValueError):
+        return True
+
+
+class ExcelSayfasi:
+    """
+    Akışlı sayfa. İçerik (satırlar ve DataFrame tabloları) sırayla tanımlanır,
+    kitap kaydedilirken genişlikler hesaplanıp satırlar tek geçişte yazılır.
+    DataFrame'ler kopyalanmaz, referans olarak tutulur.
+    """
+
+    def __init__(self, ws, genislik='oto', min_genislik=0, max_genislik=50, pay=2):
+        """
+        Args:
+            genislik: 'oto' (içerikten), dict {kolon_harfi: genislik} (sabit) veya None
+            min_genislik / max_genislik / pay: 'oto' için min(max, max(min, uzunluk + pay))
+        """
+        self._ws = ws
+        self._parcalar = []
+        self.genislik = genislik
+        self.min_genislik = min_genislik
+        self.max_genislik = max_genislik
+        self.pay = pay
+
+    # ---------- içerik ----------
+    def satir(self, degerler, stil=None):
+        """
+        Tek satır ekle.
+        stil: tüm dolu hücrelere tek stil adı veya hücre başına stil listesi
+        """
+        self._parcalar.append(('satir', list(degerler), stil))
+
+    def bos_satir(self, adet=1):
+        for _ in range(adet):
+            self._parcalar.append(('satir', [], None))
+
+    def tablo(self, df, baslik_stili=None, govde_stili=None, kolon_stilleri=None,
+              kosullu_stiller=None, basliklar=True, genislige_kat=True):
+        """
+        DataFrame'i başlık + gövde olarak ekle.
+
+        Args:
+            baslik_stili: Başlık satırı stili (basliklar=False ise başlık yazılmaz)
+            govde_stili: Tüm gövde hücreleri için varsayılan stil
+            kolon_stilleri: {kolon: stil} varsayılanı ezer
+            kosullu_stiller: {kolon: fonksiyon(Series) -> stil adı Series/array}
+                             satır bazında stil (ör. risk seviyesine göre renk)
+            genislige_kat: False ise tablo 'oto' genişlik hesabına katılmaz
+        """
+        self._parcalar.append(('tablo', df, {
+            'baslik_stili': baslik_stili,
+            'govde_stili': govde_stili,
+            'kolon_stilleri': kolon_stilleri or {},
+            'kosullu_stiller': kosullu_stiller or {},
+            'basliklar': basliklar,
+            'genislige_kat': genislige_kat
+        }))
+
+    # ---------- genişlik ----------
+    def _uzunluklar(self):
+        """Kolon bazlı en uzun string (boş/None/NaN/0 sayılmaz)"""
+        uzunluk = {}
+
+        def guncelle(j, n):
+            if n and n > uzunluk.get(j, 0):
+                uzunluk[j] = n
+
+        for tur, icerik, ayar in self._parcalar:
+            if tur == 'satir':
+                for j, v in enumerate(icerik, 1):
+                    if _dolu(v):
+                        guncelle(j, len(str(v)))
+                continue
+            if not ayar['genislige_kat']:
+                continue
+            for j, kolon in enumerate(icerik.columns, 1):
+                if ayar['basliklar']:
+                    guncelle(j, len(str(kolon)))
+                seri = icerik.iloc[:, j - 1]
+                if seri.empty:
+                    continue
+                metin = seri.astype(str)
+                dolu = seri.notna() & (metin != '') & (seri != 0).to_numpy()
+                n = metin.str.len().where(dolu).max()
+                if pd.notna(n):
+                    guncelle(j, int(n))
+        return uzunluk
+
+    def _genislikleri_uygula(self):
+        if self.genislik is None:
+            return
+        if isinstance(self.genislik, dict):
+            for harf, g in self.genislik.items():
+                self._ws.column_dimensions[harf].width = g
+            return
+        for j, n in self._uzunluklar().items():
+            g = min(self.max_genislik, max(self.min_genislik, n + self.pay))
+            self._ws.column_dimensions[get_column_letter(j)].width = g
+
+    # ---------- yazma ----------
+    def _hucre(self, stil, deger):
+        c = WriteOnlyCell(self._ws, deger)
+        c.style = stil
+        return c
+
+    def _satir_yaz(self, degerler, stil):
+        if stil is None:
+            self._ws.append(degerler)
+            return
+        stiller = stil if isinstance(stil, (list, tuple)) else [stil] * len(degerler)
+        self._ws.append([
+            v if (s is None or v is None) else self._hucre(s, v)
+            for v, s in zip(degerler, stiller)
+        ])
+
+    def _tablo_yaz(self, df, ayar):
+        kolonlar = list(df.columns)
+        if ayar['basliklar']:
+            self._satir_yaz(kolonlar, ayar['baslik_stili'])
+
+        # Kolon başına sabit stil veya satır başına stil dizisi
+        sabit = [ayar['kolon_stilleri'].get(k, ayar['govde_stili']) for k in kolonlar]
+        satir_bazli = {}
+        for k, fonksiyon in ayar['kosullu_stiller'].items():
+            if k in df.columns:
+                satir_bazli[kolonlar.index(k)] = np.asarray(fonksiyon(df[k]), dtype=object)
+
+        # Stil başına TEK hücre nesnesi; değer her satırda güncellenir.
+        # write_only modunda satır append() içinde hemen serileştirildiği için güvenli.
+        hazir = {}
+
+        def hucre(j, s):
+            anahtar = (j, s)
+            c = hazir.get(anahtar)
+            if c is None:
+                c = hazir[anahtar] = self._hucre(s, None)
+            return c
+
+        for i, degerler in enumerate(df.itertuples(index=False, name=None)):
+            satir = []
+            for j, v in enumerate(degerler):
+                s = satir_bazli[j][i] if j in satir_bazli else sabit[j]
+                if s is None:
+                    satir.append(v)
+                else:
+                    c = hucre(j, s)
+                    c.value = None if (v is None or (isinstance(v, float) and v != v)) else v
+                    satir.append(c)
+            self._ws.append(satir)
+
+    def _yaz(self):
+        self._genislikleri_uygula()
+        for tur, icerik, ayar in self._parcalar:
+            if tur == 'satir':
+                self._satir_yaz(icerik, ayar)
+            else:
+                self._tablo_yaz(icerik, ayar)
+        self._parcalar = []
+
+
+class ExcelKitabi:
+    """
+    write_only Workbook + kayıtlı NamedStyle'lar.
+
+    stiller: {ad: {'font': Font, 'fill': PatternFill, 'border': Border,
+                   'alignment': Alignment, 'number_format': str}}
+    """
+
+    def __init__(self, stiller=None):
+        self._wb = Workbook(write_only=True)
+        self._sayfalar = []
+        for ad, ozellikler in (stiller or {}).items():
+            # Font verilmeyen stil varsayılan yazı tipini (Calibri 11) korur
+            ozellikler = {'font': DEFAULT_FONT, **ozellikler}
+            self._wb.add_named_style(NamedStyle(name=ad, **ozellikler))
+
+    def sayfa(self, baslik, **genislik_ayari):
+        """Yeni sayfa (sekme sırası çağrı sırasıdır). genislik_ayari: ExcelSayfasi'na bkz."""
+        ws = self._wb.create_sheet(baslik)
+        sayfa = ExcelSayfasi(ws, **genislik_ayari)
+        self._sayfalar.append(sayfa)
+        return sayfa
+
+    def kaydet(self):
+        """Tüm sayfaları akıt, BytesIO döndür (başa sarılmış)"""
+        for sayfa in self._sayfalar:
+            sayfa._yaz()
+        output = BytesIO()
+        self._wb.save(output)
+        output.seek(0)
+        return output
+
+
+def icerir_stili(eslesmeler, varsayilan=None):
+    """
+    Kosullu stil fonksiyonu: değer metni anahtarı içeriyorsa ilgili stil (sırayla).
+    eslesmeler: [(alt_metin, stil_adi), ...]
+    """
+    def stil(seri):
+        metin = seri.astype(str).fillna('')
+        kosullar = [metin.str.contains(alt, regex=False).to_numpy() for alt, _ in eslesmeler]
+        return np.select(kosullar, [s for _, s in eslesmeler], default=varsayilan)
+    return stil
@@ -0,0 +1,139 @@
+"""
+Risk Karnesi Önbelleği
+Mağaza satırlarının parmak izi + MAX_KATKI konfigürasyonu ile anahtarlanan,
+process genelinde (rerun / oturum / sekme arası) paylaşılan karne önbelleği.
+
+Mantık:
+- Her mağazanın satırları hash'lenir -> parmak izi (engine.score_cache.compute_store_fingerprints)
+- Parmak izi + konfigürasyon değişmeyen mağazanın karnesi yeniden hesaplanmaz
+- Bölgeye bağlı kısım (açık oranı katsayısı, toplam puan) her çağrıda
+  kolon bazlı uygulanır, önbelleğe girmez
+"""
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from engine.score_cache import compute_store_fingerprints
+
+
+def magaza_parmak_izleri(df, mag_col):
+    """
+    Mağaza bazlı veri parmak izi (engine.score_cache.compute_store_fingerprints).
+
+    Returns:
+        dict: {magaza_kodu: (hash_toplami, satir_sayisi)} (hash'lenemezse None)
+    """
+    try:
+        return compute_store_fingerprints(df, mag_col)
+    except TypeError:
+        return None  # Hash'lenemeyen hücre (list, dict...) -> önbelleksiz hesap
+
+
+def veri_parmak_izi(df):
+    """
+    Tüm DataFrame için parmak izi (kolon adları dahil).
+
+    Returns:
+        tuple: (kolonlar, hash_toplami, satir_sayisi) (hash'lenemezse None)
+    """
+    if df is None:
+        return None
+    try:
+        satir_hash = pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        return None
+    return (tuple(df.columns), int(satir_hash.sum()), len(df))
+
+
+class KarneOnbellegi:
+    """
+    Thread-safe, boyutu sınırlı (LRU) anahtar -> değer önbelleği.
+
+    Değerler paylaşılır (kopyalanmaz); çağıranlar sadece okur. Değiştirilebilir
+    sonuç döndüren kullanıcılar (ör. hesapla_magaza_risk_karnesi) çağırana kopya verir.
+
+    max_grup: put(..., grup=g) ile aynı büyük nesneyi (ör. bölge frame'i) paylaşan
+    kayıtlar gruplanır; en fazla max_grup grup tutulur, en eski grubun tüm
+    kayıtları birlikte düşer (paylaşılan nesne bırakılır).
+    """
+
+    def __init__(self, max_kayit=1000, max_grup=None):
+        self._lock = threading.Lock()
+        self._kayitlar = OrderedDict()
+        self._gruplar = OrderedDict()
+        self._anahtar_grubu = {}
+        self.max_kayit = max_kayit
+        self.max_grup = max_grup
+        self.isabet = 0
+        self.iska = 0
+
+    def get(self, anahtar, varsayilan=None):
+        with self._lock:
+            if anahtar not in self._kayitlar:
+                self.iska += 1
+                return varsayilan
+            self._kayitlar.move_to_end(anahtar)
+            self.isabet += 1
+            return self._kayitlar[anahtar]
+
+    def put(self, anahtar, deger, grup=None):
+        with self._lock:
+            self._grubdan_cikar(anahtar)
+            self._kayitlar[anahtar] = deger
+            self._kayitlar.move_to_end(anahtar)
+            if grup is not None:
+                self._gruplar.setdefault(grup, set()).add(anahtar)
+                self._gruplar.move_to_end(grup)
+                self._anahtar_grubu[anahtar] = grup
+                while self.max_grup is not None and len(self._gruplar) > self.max_grup:
+                    _, anahtarlar = self._gruplar.popitem(last=False)
+                    for eski in anahtarlar:
+                        self._kayitlar.pop(eski, None)
+                        self._anahtar_grubu.pop(eski, None)
+            while len(self._kayitlar) > self.max_kayit:
+                eski, _ = self._kayitlar.popitem(last=False)
+                self._grubdan_cikar(eski)
+
+    def _grubdan_cikar(self, anahtar):
+        """Anahtarı grubundan çıkar; boşalan grup silinir (kilit altında çağrılır)"""
+        grup = self._anahtar_grubu.pop(anahtar, None)
+        if grup is not None:
+            anahtarlar = self._gruplar[grup]
+            anahtarlar.discard(anahtar)
+            if not anahtarlar:
+                del self._gruplar[grup]
+
+    def __contains__(self, anahtar):
+        with self._lock:
+            return anahtar in self._kayitlar
+
+    def __len__(self):
+        with self._lock:
+            return len(self._kayitlar)
+
+    def clear(self):
+        """Önbelleği sıfırla."""
+        with self._lock:
+            self._kayitlar.clear()
+            self._gruplar.clear()
+            self._anahtar_grubu.clear()
+            self.isabet = 0
+            self.iska = 0
+
+
+# Process genelinde paylaşılan önbellekler
+# Mağaza kategori satırı + tembel detaylar (hesapla_tum_magazalar_risk). Detaylar
+# hesaplandıkları bölge frame'ini tutar: en fazla KATEGORI_TABAN_LIMITI hesaplama
+# (frame) bellekte kalır, eskisi kayıtlarıyla birlikte düşer
+KATEGORI_TABAN_LIMITI = 4
+KATEGORI_ONBELLEGI = KarneOnbellegi(max_kayit=20000, max_grup=KATEGORI_TABAN_LIMITI)
+# Tam mağaza karnesi (hesapla_magaza_risk_karnesi)
+KARNE_ONBELLEGI = KarneOnbellegi(max_kayit=512)
+
+
+def temizle_karne_onbellegi():
+    """Tüm karne önbelleklerini sıfırla."""
+    KATEGORI_ONBELLEGI.clear()
+    KARNE_ONBELLEGI.clear()
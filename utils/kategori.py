@@ -0,0 +1,116 @@
+"""
+Metin Sınıflandırıcı
+Anahtar kelime kurallarıyla kategori / bayrak tespiti - tekil değer başına BİR kez.
+
+Mantık:
+- Kolon(lar) factorize edilir; normalizasyon ve regex sadece tekil metinlerde çalışır
+- Kural başına tek derlenmiş alternation regex (KW1|KW2|...), öncelik sırası korunur
+- Sonuç kodlar üzerinden satırlara yayılır: maliyet satır sayısıyla değil,
+  tekil değer sayısıyla orantılı
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Türkçe büyük harf normalizasyonu (upper() sonrası): İ->I, Ş->S, Ğ->G, Ü->U, Ö->O, Ç->C, ı->I
+TURKCE_CEVIRI = str.maketrans({'İ': 'I', 'Ş': 'S', 'Ğ': 'G', 'Ü': 'U', 'Ö': 'O', 'Ç': 'C', 'ı': 'I'})
+
+
+def turkce_normalize(metin):
+    """Tek metin: büyük harf + Türkçe karakterler ASCII karşılığına"""
+    return str(metin).upper().translate(TURKCE_CEVIRI)
+
+
+def tekil_kodla(df, kolonlar):
+    """
+    Birden fazla kolonu tek tekil anahtara indir.
+
+    Returns:
+        tuple: (satır kodları, [kolon başına tekil metin dizisi]) - boş/NaN hücre ve eksik kolon ''
+    """
+    kod = np.zeros(len(df), dtype=np.int64)
+    parcalar = []
+    for col in kolonlar:
+        if col not in df.columns:
+            parcalar.append((np.full(len(df), -1), np.array([''], dtype=object)))
+            continue
+        col_kod, tekiller = pd.factorize(df[col])
+        metin = np.array([str(v) for v in np.asarray(tekiller, dtype=object)] + [''], dtype=object)
+        parcalar.append((col_kod, metin))
+        kod, _ = pd.factorize(kod * len(metin) + (col_kod + 1))
+        kod = kod.astype(np.int64)
+
+    if not parcalar:
+        return kod, []
+    _, ilk = np.unique(kod, return_index=True)
+    # Kodlar 0..k-1 ve np.unique sıralı -> ilk[i] i. kodun ilk satırı
+    return kod, [metin[col_kod[ilk]] for col_kod, metin in parcalar]
+
+
+class MetinSiniflandirici:
+    """
+    Öncelik sıralı anahtar kelime sınıflandırıcı.
+
+    kurallar: {etiket: [anahtar kelimeler]} - metin bir anahtar kelimeyi İÇERİYORSA
+    etiket atanır, ilk eşleşen etiket kazanır; hiçbiri yoksa varsayilan.
+
+    Kullanım:
+        SINIF = MetinSiniflandirici({'Et': ['TAVUK', 'KIYMA']}, varsayilan='Diğer')
+        df['kategori'] = SINIF.siniflandir(df, ['Mal Grubu Tanımı', 'Malzeme Tanımı'])
+    """
+
+    def __init__(self, kurallar, varsayilan=None, normalize=False, ayrac=' '):
+        """
+        Args:
+            normalize: True ise metin ve anahtar kelimeler Türkçe normalize edilir
+                       (False: sadece upper())
+            ayrac: Çok kolonlu sınıflandırmada kolon metinlerini birleştiren ayraç
+        """
+        self.etiketler = list(kurallar)
+        self.varsayilan = varsayilan
+        self.normalize = normalize
+        self.ayrac = ayrac
+        self._desenler = [
+            re.compile('|'.join(re.escape(self._hazirla(kw)) for kw in kelimeler))
+            for kelimeler in kurallar.values()
+        ]
+
+    def _hazirla(self, metin):
+        return turkce_normalize(metin) if self.normalize else str(metin).upper()
+
+    def metin_etiketi(self, metin):
+        """Tek metin için etiket"""
+        metin = self._hazirla(metin)
+        for etiket, desen in zip(self.etiketler, self._desenler):
+            if desen.search(metin):
+                return etiket
+        return self.varsayilan
+
+    def tekil_etiketler(self, metinler):
+        """Tekil metin dizisi -> etiket dizisi (vektörel)"""
+        metinler = pd.Series(metinler, dtype=object).str.upper()
+        if self.normalize:
+            metinler = metinler.str.translate(TURKCE_CEVIRI)
+        kosullar = [metinler.str.contains(desen, na=False).to_numpy() for desen in self._desenler]
+        return np.select(kosullar, self.etiketler, default=self.varsayilan) if kosullar \
+            else np.full(len(metinler), self.varsayilan, dtype=object)
+
+    def siniflandir(self, df, kolonlar):
+        """
+        Satır bazlı etiketler (ndarray). Kolon metinleri ayrac ile birleştirilir;
+        eksik kolon / boş hücre '' sayılır.
+        """
+        kod, parcalar = tekil_kodla(df, kolonlar)
+        if not parcalar:
+            return np.full(len(df), self.varsayilan, dtype=object)
+        metin = parcalar[0]
+        for parca in parcalar[1:]:
+            metin = metin + self.ayrac + parca
+        return np.asarray(self.tekil_etiketler(metin), dtype=object)[kod]
+
+    def eslesir(self, df, kolonlar):
+        """Satır bazlı bool maske: herhangi bir etiket atandı mı"""
+        return pd.Series(self.siniflandir(df, kolonlar) != self.varsayilan, index=df.index)
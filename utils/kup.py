@@ -0,0 +1,114 @@
+"""
+Rollup Küpü
+Hiyerarşik özet tabloları (SM / BS / Mağaza / Depolama / Dönem) için ön-toplanmış küp.
+
+Mantık:
+- Ham veri boyut kolonlarının tam kombinasyonu üzerinde TEK kez gruplanır (taban küp)
+- Ölçüler toplanabilir: tutar toplamları + dolu hücre sayıları
+- Her özet tablo tabandan bir dilimdir: satır taraması yok, maliyet küp boyutuyla orantılı
+- Toplanamayan ölçüler (oran, ağırlıklı ortalama) dilim üzerinde toplamlardan türetilir
+"""
+
+import numpy as np
+
+
+# Varsayılan hiyerarşi ve ölçüler (sürekli envanter normalize kolon adları)
+KUP_BOYUTLARI = ['satis_muduru', 'bolge_sorumlusu', 'magaza_kodu', 'depolama_kosulu', 'envanter_donemi']
+KUP_OLCULERI = ['fark_tutari', 'fire_tutari', 'satis_hasilati']
+
+# Boyuta bağlı nitelikler (mağaza adı gibi) - gruplama anahtarına eklenir, küpü büyütmez
+KUP_NITELIKLERI = ['magaza_tanim']
+
+SATIR_SAYISI = 'satir_sayisi'
+
+
+class RollupKupu:
+    """
+    Veri seti başına BİR kez kurulan rollup küpü.
+
+    Kullanım:
+        kup = RollupKupu(gm_df)
+        sm_ozet = kup.dilim(['satis_muduru'], say='magaza_kodu')
+        sm_kat = kup.dilim(['depolama_kosulu'], filtre={'satis_muduru': sm_name})
+        bs_kup = kup.dolu('bolge_sorumlusu')
+
+    Not: Veride olmayan boyut / ölçü kolonları küpe alınmaz.
+    """
+
+    def __init__(self, df, boyutlar=None, olculer=None, nitelikler=None, sayilanlar=(), _taban=None):
+        """
+        Args:
+            boyutlar: Hiyerarşi kolonları (varsayılan KUP_BOYUTLARI)
+            olculer: Toplanacak sayısal kolonlar (varsayılan KUP_OLCULERI)
+            nitelikler: Boyuta bağlı ek anahtar kolonlar (varsayılan KUP_NITELIKLERI)
+            sayilanlar: Dolu hücre sayısı tutulacak kolonlar (ölçü adı = kolon adı)
+        """
+        if _taban is not None:
+            self.boyutlar, self.olculer, self.taban = _taban
+            return
+
+        kolonlar = set(df.columns)
+        self.boyutlar = [c for c in (KUP_BOYUTLARI if boyutlar is None else boyutlar) if c in kolonlar] + \
+                        [c for c in (KUP_NITELIKLERI if nitelikler is None else nitelikler) if c in kolonlar]
+        toplamlar = [c for c in (KUP_OLCULERI if olculer is None else olculer) if c in kolonlar]
+        sayimlar = [c for c in sayilanlar if c in kolonlar and c not in self.boyutlar]
+        self.olculer = toplamlar + sayimlar + [SATIR_SAYISI]
+
+        degerler = df[toplamlar].copy()
+        for col in sayimlar:
+            degerler[col] = df[col].notna().astype(np.int64)
+        degerler[SATIR_SAYISI] = 1
+
+        if self.boyutlar:
+            anahtarlar = [df[c] for c in self.boyutlar]
+            self.taban = degerler.groupby(anahtarlar, dropna=False, sort=False, observed=True).sum().reset_index()
+        else:
+            self.taban = degerler.sum().to_frame().T
+
+    def __len__(self):
+        return len(self.taban)
+
+    def _alt(self, maske):
+        return RollupKupu(None, _taban=(self.boyutlar, self.olculer, self.taban[maske].reset_index(drop=True)))
+
+    def filtrele(self, filtre):
+        """Boyut eşitlikleriyle alt küp: {'satis_muduru': 'ALİ'}"""
+        maske = np.ones(len(self.taban), dtype=bool)
+        for col, deger in filtre.items():
+            maske &= (self.taban[col] == deger).to_numpy()
+        return self._alt(maske)
+
+    def dolu(self, boyut):
+        """Boyutu boş / NaN olmayan satırların alt küpü"""
+        deger = self.taban[boyut]
+        return self._alt((deger.notna() & (deger != '')).to_numpy())
+
+    def toplam(self, olcu):
+        """Tüm küp üzerinde ölçü toplamı"""
+        return self.taban[olcu].sum() if olcu in self.taban.columns else 0
+
+    def ilk(self, seviye, nitelik):
+        """
+        Seviye değeri başına ilk dolu nitelik (groupby(seviye)[nitelik].first() eşdeğeri).
+        Taban satırları ham verideki ilk görülme sırasında tutulur.
+        """
+        return self.taban.groupby(seviye)[nitelik].first()
+
+    def dilim(self, seviyeler, say=None, filtre=None, olculer=None):
+        """
+        Seviyeler üzerinde toplanmış özet (groupby(seviyeler).sum() eşdeğeri, sıralı).
+        Boş (NaN) seviye değerleri dışarıda kalır.
+
+        Args:
+            seviyeler: Gruplama boyutları
+            say: Tekil sayısı eklenecek boyut (ör. 'magaza_kodu' -> kolon adı 'magaza_kodu')
+            filtre: Dilimden önce uygulanacak boyut eşitlikleri
+            olculer: Dönecek ölçüler ve sırası (varsayılan hepsi)
+        """
+        kup = self.filtrele(filtre) if filtre else self
+        taban = kup.taban
+        gruplar = taban.groupby(list(seviyeler), observed=True)
+        sonuc = gruplar[[c for c in (self.olculer if olculer is None else olculer) if c not in seviyeler]].sum()
+        if say is not None:
+            sonuc.insert(0, say, gruplar[say].nunique())
+        return sonuc.reset_index()
@@ -0,0 +1,1114 @@
+"""
+Mağaza Raporu Modülü
+Envanter Risk Analizi - Tek mağaza tespitleri, Excel raporu ve tüm mağazalar ZIP'i
+
+Streamlit'ten bağımsızdır: process havuzu işçileri (spawn) bu modülü import ederek
+mağaza raporunu üretir. Google Sheets iptal verisi gibi önbellekli girdiler
+çağıran tarafından okunup parametre olarak verilir.
+"""
+
+import pandas as pd
+import numpy as np
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+import logging
+import multiprocessing
+import os
+import tempfile
+import zipfile
+
+from .seri import iki_donem_kronik
+from .excel_yazici import ExcelKitabi
+from .urun_adi import aile_uyelikleri
+from .urun_boyutu import urun_ozellikleri, malzeme_kod_anahtari
+from .kategori import MetinSiniflandirici
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== TESPİTLER ====================
+
+def is_balanced_mask(df):
+    """is_balanced'ın vektörel karşılığı (satır bazlı bool Series)"""
+    toplam = df['Fark Miktarı'] + df['Kısmi Envanter Miktarı'] + df['Önceki Fark Miktarı']
+    return toplam.abs() <= 0.01
+
+
+def detect_internal_theft(df, maskeler=None):
+    """
+    İÇ HIRSIZLIK TESPİTİ:
+    - Satış Fiyatı >= 100 TL
+    - Dengelenmemiş (Fark + Kısmi + Önceki ≠ 0)
+    - |Toplam| ≈ İptal Satır, fark büyüdükçe risk AZALIR
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    satis_fiyati = m['birim_fiyat']
+    toplam = m['toplam']
+    iptal = m['iptal']
+    fark_mutlak = (toplam.abs() - iptal).abs()
+
+    mask = (~m['dengeli'] & ~(satis_fiyati < 100) & (toplam < 0) & (iptal > 0) &
+            (fark_mutlak <= 10))
+    if not mask.any():
+        return pd.DataFrame()
+
+    d = df[mask]
+    fm = fark_mutlak[mask]
+    kosullar = [fm == 0, fm <= 2, fm <= 5]
+    risk = np.select(kosullar, ["ÇOK YÜKSEK", "YÜKSEK", "ORTA"], default="DÜŞÜK-ORTA")
+    esitlik = np.select(kosullar, ["TAM EŞİT", "YAKIN (±2)", "YAKIN (±5)"],
+                        default=("FARK: " + fm.map(str)).to_numpy(dtype=object))
+
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _kolon_veya(d, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _kolon_veya(d, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(d),
+        'Satış Fiyatı': satis_fiyati[mask],
+        'Fark Miktarı': d['Fark Miktarı'],
+        'Kısmi Env.': d['Kısmi Envanter Miktarı'],
+        'Önceki Fark': d['Önceki Fark Miktarı'],
+        'TOPLAM': toplam[mask],
+        'İptal Satır': iptal[mask],
+        'Fark': fm,
+        'Durum': esitlik,
+        'Fark Tutarı (TL)': d['Fark Tutarı'],
+        'Risk': risk
+    }).reset_index(drop=True)
+
+    # DUPLICATE TEMİZLEME - Aynı malzeme kodu sadece 1 kez görünsün
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+
+    # Risk sıralaması
+    risk_order = {'ÇOK YÜKSEK': 0, 'YÜKSEK': 1, 'ORTA': 2, 'DÜŞÜK-ORTA': 3}
+    result_df['_risk_sort'] = result_df['Risk'].map(risk_order)
+    result_df = result_df.sort_values(['_risk_sort', 'Fark Tutarı (TL)'], ascending=[True, True])
+    result_df = result_df.drop('_risk_sort', axis=1)
+
+    return result_df
+
+
+def _kolon_veya(df, col, default=0):
+    """Kolon varsa Series, yoksa sabit değerli Series (row.get(col, default) karşılığı)"""
+    if col in df.columns:
+        return df[col]
+    return pd.Series(default, index=df.index)
+
+
+def _urun_grubu(df):
+    """Ürün Grubu (şema kaydında Mal Grubu Tanımı bu ada eşlenir), yoksa boş"""
+    return _kolon_veya(df, 'Ürün Grubu', '')
+
+
+# ==================== TESPİT MASKELERİ (TEK GEÇİŞ) ====================
+
+SIGARA_KONTROL_KOLONLARI = ['Ürün Grubu', 'Ana Grup']
+
+# SIGARA veya TUTUN içeren kategori (Türkçe normalize). Kolonlar ayrı ayrı aranır:
+# ayraç kolonlar arası eşleşmeyi engeller
+SIGARA_SINIFLANDIRICI = MetinSiniflandirici({'SİGARA': ['SIGARA', 'TUTUN']}, normalize=True, ayrac='\x1f')
+
+
+def _kasa_kod_metni(df):
+    """Malzeme Kodu -> görüntü metni ('.0' atılmış); str dönüşümü tekil değer başına bir kez"""
+    kod = _kolon_veya(df, 'Malzeme Kodu', '')
+    kodlar, tekiller = pd.factorize(kod, use_na_sentinel=False)
+    metin = np.array([str(k).replace('.0', '').strip() for k in tekiller], dtype=object)
+    return pd.Series(metin[kodlar], index=df.index)
+
+
+def sigara_maskesi(df):
+    """
+    Sigara satırları: kategori kolonlarında 'SİGARA' veya 'TÜTÜN' geçenler (CONTAINS).
+    Türkçe normalizasyon tekil değer başına bir kez yapılır. Kolon yoksa None.
+    NOT: Malzeme Adı dahil değil; MAKARON tek başına sigara DEĞİLDİR.
+    """
+    check_cols = [col for col in SIGARA_KONTROL_KOLONLARI if col in df.columns]
+    if not check_cols:
+        return None
+    return SIGARA_SINIFLANDIRICI.eslesir(df, check_cols)
+
+
+def tespit_maskeleri(df):
+    """
+    Tüm tespitlerin ortak kolon ve maskeleri - mağaza frame'i üzerinde TEK vektörel geçiş.
+    detect_* fonksiyonları maskeler=... ile bu sözlüğü paylaşır (bkz. tum_tespitler).
+    """
+    fark = df['Fark Miktarı']
+    kismi = df['Kısmi Envanter Miktarı']
+    onceki = df['Önceki Fark Miktarı']
+    toplam = fark + kismi + onceki
+    return {
+        'fark': fark,
+        'kismi': kismi,
+        'onceki': onceki,
+        'onceki_fark': onceki,
+        'fire': df['Fire Miktarı'],
+        'onceki_fire': _kolon_veya(df, 'Önceki Fire Miktarı'),
+        'iptal': df['İptal Satır Miktarı'],
+        'birim_fiyat': _kolon_veya(df, 'Birim Fiyat'),
+        'toplam': toplam,
+        'dengeli': toplam.abs() <= 0.01,  # is_balanced
+        # Önceki Fark + Fark = 0 -> iki dönem arası dengelenmiş (fire tespitleri)
+        'donem_dengeli': (onceki + fark).abs() <= 0.01,
+        'kod_anahtari': malzeme_kod_anahtari(_kolon_veya(df, 'Malzeme Kodu', '')),
+        'sigara': sigara_maskesi(df),
+    }
+
+
+def tum_tespitler(df, kasa_kodlari):
+    """
+    Mağaza frame'i için tüm tespitler: maskeler bir kez hesaplanır,
+    her tespit kendi sonuç tablosunu bu maskelerden üretir.
+
+    Returns:
+        dict: ic_hirsizlik, kronik, kronik_fire, sigara, dis_hirsizlik,
+              aile, fire_manipulasyon, kasa, kasa_ozet
+    """
+    m = tespit_maskeleri(df)
+    kasa_df, kasa_sum = check_kasa_activity_products(df, kasa_kodlari, m)
+    return {
+        'ic_hirsizlik': detect_internal_theft(df, m),
+        'kronik': detect_chronic_products(df, m),
+        'kronik_fire': detect_chronic_fire(df, m),
+        'sigara': detect_cigarette_shortage(df, m),
+        'dis_hirsizlik': detect_external_theft(df, m),
+        'aile': find_product_families(df),
+        'fire_manipulasyon': detect_fire_manipulation(df, m),
+        'kasa': kasa_df,
+        'kasa_ozet': kasa_sum,
+    }
+
+
+def detect_chronic_products(df, maskeler=None):
+    """Kronik açık - her iki dönemde de Fark < 0 (vektörel, ortak kronik kuralı)"""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    mask = ~m['dengeli'] & iki_donem_kronik(m['onceki'], m['fark'], 0)
+    if not mask.any():
+        return pd.DataFrame()
+
+    d = df[mask]
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _kolon_veya(d, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _kolon_veya(d, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(d),
+        'Bu Dönem Fark': d['Fark Miktarı'],
+        'Bu Dönem Tutar': d['Fark Tutarı'],
+        'Önceki Fark': d['Önceki Fark Miktarı'],
+        'Önceki Tutar': d['Önceki Fark Tutarı'],
+        'Toplam Tutar': d['Fark Tutarı'] + d['Önceki Fark Tutarı']
+    }).reset_index(drop=True)
+
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Bu Dönem Tutar', ascending=True)
+
+    return result_df
+
+
+def detect_chronic_fire(df, maskeler=None):
+    """Kronik Fire - her iki dönemde de fire var VE dengelenmemiş (vektörel)"""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    onceki_fire = m['onceki_fire']
+    bu_fire = m['fire']
+
+    # Her iki dönemde de fire var; Önceki Fark + Fark = 0 ise dengelenmiş, kronik değil
+    mask = (onceki_fire != 0) & (bu_fire != 0) & ~m['donem_dengeli']
+    if not mask.any():
+        return pd.DataFrame()
+
+    d = df[mask]
+    onceki_fire_tutar = _kolon_veya(d, 'Önceki Fire Tutarı')
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _kolon_veya(d, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _kolon_veya(d, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(d),
+        'Bu Dönem Fire': bu_fire[mask],
+        'Bu Dönem Fire Tutarı': d['Fire Tutarı'],
+        'Önceki Fire': onceki_fire[mask],
+        'Önceki Fire Tutarı': onceki_fire_tutar,
+        'Toplam Fire Tutarı': d['Fire Tutarı'] + onceki_fire_tutar
+    }).reset_index(drop=True)
+
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Bu Dönem Fire Tutarı', ascending=True)
+
+    return result_df
+
+
+def detect_fire_manipulation(df, maskeler=None):
+    """Fire manipülasyonu: Fire var AMA Fark+Kısmi > 0 VE dengelenmemiş (vektörel)"""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    fark_kismi = m['fark'] + m['kismi']
+    # Önceki Fark + Fark = 0 ise dengelenmiş, manipülasyon değil
+    mask = ~m['donem_dengeli'] & (m['fire'] < 0) & (fark_kismi > 0)
+    if not mask.any():
+        return pd.DataFrame()
+
+    d = df[mask]
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _kolon_veya(d, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _kolon_veya(d, 'Malzeme Adı', ''),
+        'Ürün Grubu': _urun_grubu(d),
+        'Fark Miktarı': d['Fark Miktarı'],
+        'Kısmi Env.': d['Kısmi Envanter Miktarı'],
+        'Önceki Fark': m['onceki_fark'][mask],
+        'Fark + Kısmi': fark_kismi[mask],
+        'Fire Miktarı': d['Fire Miktarı'],
+        'Fire Tutarı': d['Fire Tutarı'],
+        'Sonuç': 'FAZLA FİRE GİRİLMİŞ'
+    }).reset_index(drop=True)
+
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Fire Tutarı', ascending=True)
+
+    return result_df
+
+
+def detect_cigarette_shortage(df, maskeler=None):
+    """
+    Sigara açığı - Tüm sigaraların TOPLAM (Fark + Kısmi + Önceki) değerine bakılır
+    Eğer toplam < 0 ise sigara açığı var demektir
+    
+    NET = Fark Miktarı + Kısmi Envanter Miktarı + Önceki Fark Miktarı
+    
+    Sigara tespiti kuralları:
+    - Ürün Grubu (Mal Grubu Tanımı) veya Ana Grup içinde 'SİGARA' veya 'TÜTÜN' geçenler
+    - MAKARON tek başına sigara DEĞİLDİR (bilinçli olarak dışarıda tutulur)
+    - "MAKARON JEL KALEM" gibi ürünler yanlışlıkla yakalanmasın diye MAKARON dahil edilmez
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    # Sigara mask - CONTAINS (eşitlik değil!), bkz. sigara_maskesi
+    sigara_mask = m['sigara']
+    if sigara_mask is None or not sigara_mask.any():
+        return pd.DataFrame()
+
+    sigara_df = df[sigara_mask]
+
+    # Net hesapla: Fark + Kısmi + Önceki
+    fark = sigara_df['Fark Miktarı'].fillna(0)
+    kismi = sigara_df['Kısmi Envanter Miktarı'].fillna(0)
+    onceki = sigara_df['Önceki Fark Miktarı'].fillna(0)
+    toplam_fark = fark.sum()
+    toplam_kismi = kismi.sum()
+    toplam_onceki = onceki.sum()
+    net_toplam = toplam_fark + toplam_kismi + toplam_onceki
+
+    # Eğer net toplam < 0 ise açık var
+    if net_toplam >= 0:
+        return pd.DataFrame()
+
+    # Açık varsa, detay göster - sadece 0 olmayan kayıtlar
+    hareketli = (fark != 0) | (kismi != 0) | (onceki != 0)
+    if not hareketli.any():
+        return pd.DataFrame()
+
+    d = sigara_df[hareketli]
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _kolon_veya(d, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _kolon_veya(d, 'Malzeme Adı', ''),
+        'Fark': fark[hareketli],
+        'Kısmi': kismi[hareketli],
+        'Önceki': onceki[hareketli],
+        'Ürün Toplam': fark[hareketli] + kismi[hareketli] + onceki[hareketli],
+        'Risk': 'SİGARA'
+    }).reset_index(drop=True)
+
+    # DUPLICATE TEMİZLEME
+    result_df = result_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    result_df = result_df.sort_values('Ürün Toplam', ascending=True)
+    # En sona toplam satırı ekle
+    toplam_row = pd.DataFrame([{
+        'Malzeme Kodu': '*** TOPLAM ***',
+        'Malzeme Adı': f'SİGARA AÇIĞI: {abs(net_toplam):.0f} adet',
+        'Fark': toplam_fark,
+        'Kısmi': toplam_kismi,
+        'Önceki': toplam_onceki,
+        'Ürün Toplam': net_toplam,
+        'Risk': '⚠️ AÇIK VAR'
+    }])
+    result_df = pd.concat([result_df, toplam_row], ignore_index=True)
+
+    return result_df
+
+
+def find_product_families(df):
+    """
+    Benzer ürün ailesi analizi
+    Kural: İlk 2 kelime + Son kelime (marka) + Mal Grubu + Gramaj (±%30) aynıysa = AİLE
+    Ad özellikleri ürün boyutundan gelir (utils.urun_boyutu), ürünler hash kovalarına
+    ayrılır (utils.urun_adi), aile toplamları groupby ile hesaplanır.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+
+    ozellik = urun_ozellikleri(df)
+    aile_no, pozisyon, tohum = aile_uyelikleri(ozellik, df['Ürün Grubu'])
+    if len(tohum) == 0:
+        return pd.DataFrame()
+
+    uyeler = pd.DataFrame({
+        'aile': aile_no,
+        'Malzeme Adı': df['Malzeme Adı'].to_numpy()[pozisyon],
+        'Fark Miktarı': df['Fark Miktarı'].to_numpy()[pozisyon],
+        'Kısmi Envanter Miktarı': df['Kısmi Envanter Miktarı'].to_numpy()[pozisyon],
+        'Önceki Fark Miktarı': df['Önceki Fark Miktarı'].to_numpy()[pozisyon],
+    })
+    grup = uyeler.groupby('aile', sort=True)
+    toplam = grup[['Fark Miktarı', 'Kısmi Envanter Miktarı', 'Önceki Fark Miktarı']].sum()
+    hareket = uyeler['Fark Miktarı'].abs().groupby(uyeler['aile']).sum()
+
+    # Ürünler: ilk 5 üye "AD(fark)"
+    ilk5 = grup.head(5)
+    urunler = (ilk5['Malzeme Adı'].str[:25] + '(' + ilk5['Fark Miktarı'].map(str) + ')') \
+        .groupby(ilk5['aile']).agg(' | '.join)
+
+    toplam_fark = toplam['Fark Miktarı']
+    toplam_kismi = toplam['Kısmi Envanter Miktarı']
+    toplam_onceki = toplam['Önceki Fark Miktarı']
+    aile_toplami = toplam_fark + toplam_kismi + toplam_onceki
+
+    sonuc = np.select([aile_toplami.abs() <= 2, aile_toplami < -2],
+                      ["KOD KARIŞIKLIĞI - HIRSIZLIK DEĞİL", "AİLEDE NET AÇIK VAR"],
+                      default="AİLEDE FAZLA VAR")
+    risk = np.where(aile_toplami < -2, "ORTA", "DÜŞÜK")
+
+    result_df = pd.DataFrame({
+        'Mal Grubu': df['Ürün Grubu'].to_numpy()[tohum],
+        'İlk 2 Kelime': ozellik['İlk2Kelime'].to_numpy()[tohum],
+        'Marka': ozellik['Marka'].to_numpy()[tohum],
+        'Ürün Sayısı': grup.size().to_numpy(),
+        'Toplam Fark': toplam_fark.to_numpy(),
+        'Toplam Kısmi': toplam_kismi.to_numpy(),
+        'Toplam Önceki': toplam_onceki.to_numpy(),
+        'AİLE TOPLAMI': aile_toplami.to_numpy(),
+        'Sonuç': sonuc,
+        'Risk': risk,
+        'Ürünler': urunler.to_numpy()
+    })
+    # Sadece içinde fark olan aileler
+    result_df = result_df[(hareket > 0).to_numpy()].reset_index(drop=True)
+    if len(result_df) == 0:
+        return pd.DataFrame()
+    result_df = result_df.sort_values('AİLE TOPLAMI', ascending=True)
+
+    return result_df
+
+
+def detect_external_theft(df, maskeler=None):
+    """Dış hırsızlık - açık var ama fire/iptal yok (vektörel)"""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    mask = (~m['dengeli'] & (m['fark'] < 0) & (m['fire'] == 0) & (m['iptal'] == 0) &
+            (df['Fark Tutarı'].abs() > 50))
+    if not mask.any():
+        return pd.DataFrame()
+
+    d = df[mask]
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': _kolon_veya(d, 'Malzeme Kodu', ''),
+        'Malzeme Adı': _kolon_veya(d, 'Malzeme Adı', ''),
+        'Ürün Grubu': _kolon_veya(d, 'Ürün Grubu', ''),
+        'Fark Miktarı': d['Fark Miktarı'],
+        'Fark Tutarı': d['Fark Tutarı'],
+        'Önceki Fark': d['Önceki Fark Miktarı'],
+        'Risk': 'DIŞ HIRSIZLIK / SAYIM HATASI'
+    }).reset_index(drop=True)
+    result_df = result_df.sort_values('Fark Tutarı', ascending=True)
+
+    return result_df
+
+
+def check_kasa_activity_products(df, kasa_kodlari, maskeler=None):
+    """
+    10 TL Ürünleri Kontrolü
+    Fiyat değişikliği olan ürünlerde manipülasyon riski
+    Toplam adet ve tutar etkisini hesapla
+    FORMÜL: Fark + Kısmi (Önceki dahil değil)
+    """
+    summary = {'toplam_urun': 0, 'sorunlu_urun': 0, 'toplam_adet': 0, 'toplam_tutar': 0}
+    if df is None or df.empty:
+        return pd.DataFrame(), summary
+    m = maskeler if maskeler is not None else tespit_maskeleri(df)
+
+    # Kod eşleştirme - int64 ürün anahtarı, sıralı kasa kod dizisinde (tek vektörel adım)
+    eslesen = pd.Series(np.isin(m['kod_anahtari'], kasa_kod_dizisi(kasa_kodlari)), index=df.index)
+    if not eslesen.any():
+        return pd.DataFrame(), summary
+    kod_str = _kasa_kod_metni(df[eslesen])
+
+    fark = m['fark'][eslesen].fillna(0)
+    kismi = m['kismi'][eslesen].fillna(0)
+    toplam = fark + kismi  # Önceki dahil değil!
+
+    # Tutar hesabı - Fark + Kısmi tutarları
+    urun_toplam_tutar = (_kolon_veya(df, 'Fark Tutarı')[eslesen] +
+                         _kolon_veya(df, 'Kısmi Envanter Tutarı')[eslesen])  # Önceki dahil değil!
+
+    sorunlu = toplam != 0  # Sadece sıfır olmayanları göster
+    result_df = pd.DataFrame({
+        'Malzeme Kodu': kod_str[sorunlu],
+        'Malzeme Adı': _kolon_veya(df, 'Malzeme Adı', '')[eslesen][sorunlu],
+        'Fark': fark[sorunlu],
+        'Kısmi': kismi[sorunlu],
+        'TOPLAM': toplam[sorunlu],
+        'Tutar': urun_toplam_tutar[sorunlu],
+        'Durum': np.where(toplam[sorunlu] > 0, "FAZLA (+)", "AÇIK (-)")
+    }).reset_index(drop=True)
+
+    if len(result_df) > 0:
+        # Önce fazla (+) olanlar, sonra açık (-) olanlar
+        result_df['_sort'] = np.where(result_df['TOPLAM'] > 0, 0, 1)
+        result_df = result_df.sort_values(['_sort', 'TOPLAM'], ascending=[True, False])
+        result_df = result_df.drop('_sort', axis=1)
+    else:
+        result_df = pd.DataFrame()
+
+    # Özet bilgileri de döndür
+    summary = {
+        'toplam_urun': int(eslesen.sum()),
+        'sorunlu_urun': int(sorunlu.sum()),
+        'toplam_adet': toplam.sum(),
+        'toplam_tutar': urun_toplam_tutar.sum(skipna=False)
+    }
+
+    return result_df, summary
+
+
+def kasa_kod_dizisi(kasa_kodlari):
+    """Kasa aktivitesi kodları -> sıralı tekil int64 dizi (set / liste / dizi kabul eder)"""
+    if isinstance(kasa_kodlari, np.ndarray) and kasa_kodlari.dtype == np.int64:
+        return kasa_kodlari
+    if kasa_kodlari is None or len(kasa_kodlari) == 0:
+        return np.array([], dtype=np.int64)
+    anahtar = malzeme_kod_anahtari(pd.Series(list(kasa_kodlari), dtype=object))
+    return np.unique(anahtar[anahtar >= 0])
+
+
+def generate_executive_summary(df, kasa_activity_df=None, kasa_summary=None):
+    """Yönetici özeti - mal grubu bazlı yorumlar"""
+    comments = []
+    
+    # Önce toplam tutarı hesapla (Fark + Kısmi + Önceki)
+    df_copy = df.copy()
+    df_copy['Kısmi Envanter Tutarı'] = df_copy.get('Kısmi Envanter Tutarı', 0).fillna(0)
+    df_copy['Önceki Fark Tutarı'] = df_copy.get('Önceki Fark Tutarı', 0).fillna(0)
+    df_copy['Toplam Tutar'] = df_copy['Fark Tutarı'] + df_copy['Kısmi Envanter Tutarı'] + df_copy['Önceki Fark Tutarı']
+    
+    # Mal grubu bazlı analiz
+    group_stats = df_copy.groupby('Ürün Grubu').agg({
+        'Toplam Tutar': 'sum',
+        'Fire Tutarı': 'sum',
+        'Satış Tutarı': 'sum',
+        'Fark Miktarı': lambda x: (x < 0).sum()
+    }).reset_index()
+    
+    group_stats.columns = ['Ürün Grubu', 'Toplam Fark', 'Toplam Fire', 'Toplam Satış', 'Açık Ürün Sayısı']
+    group_stats['Açık Oranı'] = abs(group_stats['Toplam Fark']) / group_stats['Toplam Satış'].replace(0, 1) * 100
+    
+    # En yüksek açık
+    top_acik = group_stats.nsmallest(3, 'Toplam Fark')
+    for _, row in top_acik.iterrows():
+        if row['Toplam Fark'] < -500:
+            comments.append(f"⚠️ {row['Ürün Grubu']}: {row['Toplam Fark']:,.0f} TL açık ({row['Açık Ürün Sayısı']} ürün)")
+    
+    # En yüksek fire
+    top_fire = group_stats.nsmallest(3, 'Toplam Fire')
+    for _, row in top_fire.iterrows():
+        if row['Toplam Fire'] < -500:
+            comments.append(f"🔥 {row['Ürün Grubu']}: {row['Toplam Fire']:,.0f} TL fire")
+    
+    # 10 TL ürünleri yorumu - TOPLAM ADET VE TUTAR
+    if kasa_summary is not None:
+        toplam_adet = kasa_summary.get('toplam_adet', 0)
+        toplam_tutar = kasa_summary.get('toplam_tutar', 0)
+        
+        if toplam_adet > 0:
+            comments.append(f"💰 10 TL ÜRÜNLERİ: NET +{toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL FAZLA")
+            comments.append(f"   ⚠️ Bu fazlalık gerçek envanter açığını gizliyor olabilir!")
+        elif toplam_adet < 0:
+            comments.append(f"💰 10 TL ÜRÜNLERİ: NET {toplam_adet:.0f} adet / {toplam_tutar:,.0f} TL AÇIK")
+    
+    return comments, group_stats
+
+
+# ==================== KAMERA ENTEGRASYONU (İPTAL VERİSİ) ====================
+
+def iptal_kodu(x):
+    """Mağaza / malzeme kodu temizliği ('.0' ve boşluklar atılır)"""
+    return str(x).strip().replace('.0', '')
+
+
+def _iptal_kolonlari(df_iptal):
+    """İptal tablosunun kolon adları; sabit isim yoksa index ile dene"""
+    cols = df_iptal.columns.tolist()
+    kolonlar = {
+        'magaza': 'Mağaza - Anahtar',
+        'malzeme': 'Malzeme - Anahtar',
+        'tarih': 'Tarih - Anahtar',  # Tarih boş, Tarih - Anahtar dolu
+        'saat': 'Fiş Saati',
+        'miktar': 'Miktar',
+        'islem_no': 'İşlem Numarası',
+    }
+    for alan, sira in (('magaza', 7), ('malzeme', 17), ('tarih', 3), ('saat', 31), ('islem_no', 36)):
+        if kolonlar[alan] not in cols and len(cols) > sira:
+            kolonlar[alan] = cols[sira]
+    return kolonlar
+
+
+def iptal_magaza_bolumleri(df_iptal):
+    """
+    İptal verisini mağazalara böler: {temiz mağaza kodu: mağazanın iptal satırları}.
+    Process havuzu görevlerine tüm tablo yerine yalnızca ilgili mağazanın satırları verilir.
+    """
+    if df_iptal is None or df_iptal.empty:
+        return {}
+    magaza = df_iptal[_iptal_kolonlari(df_iptal)['magaza']].map(iptal_kodu)
+    return {kod: df_iptal.iloc[poz] for kod, poz in magaza.groupby(magaza, sort=False).indices.items()}
+
+
+def iptal_kayitlari(df_iptal, magaza_kodu, malzeme_kodlari):
+    """
+    Belirli mağaza ve ürünler için iptal timestamp bilgilerini döner.
+    df_iptal değiştirilmez (paylaşılan önbellek nesnesi olabilir).
+
+    Returns:
+        dict: {malzeme kodu: [{'tarih', 'saat', 'miktar', 'islem_no'}, ...]}
+    """
+    if df_iptal is None or df_iptal.empty:
+        return {}
+
+    k = _iptal_kolonlari(df_iptal)
+    magaza = df_iptal[k['magaza']].map(iptal_kodu)
+    df_mag = df_iptal[magaza == iptal_kodu(magaza_kodu)]
+
+    if df_mag.empty:
+        return {}
+
+    malzeme_set = set(iptal_kodu(m) for m in malzeme_kodlari)
+
+    result = {}
+
+    for _, row in df_mag.iterrows():
+        malzeme = iptal_kodu(row[k['malzeme']])
+
+        if malzeme not in malzeme_set:
+            continue
+
+        result.setdefault(malzeme, []).append({
+            'tarih': row.get(k['tarih'], ''),
+            'saat': row.get(k['saat'], ''),
+            'miktar': row.get(k['miktar'], 0),
+            'islem_no': row.get(k['islem_no'], '')
+        })
+
+    return result
+
+
+def kamera_kontrolu_ekle(internal_df, magaza_kodu, envanter_tarihi, df_iptal, full_df=None):
+    """
+    İç hırsızlık tablosuna kamera kontrol bilgisi ekler
+    Eğer ürünün kendisi için iptal yoksa, aynı kategorideki 100+ TL ürünlerde iptal arar
+    
+    df_iptal: Google Sheets iptal verisi (tüm tablo veya mağazanın bölümü)
+    full_df: Tüm envanter verisi (kategori araması için gerekli)
+    """
+    if internal_df.empty:
+        return internal_df
+    
+    df = internal_df.copy()
+    
+    # Envanter tarihini datetime'a çevir
+    if isinstance(envanter_tarihi, str):
+        try:
+            envanter_tarihi = datetime.strptime(envanter_tarihi, '%Y-%m-%d')
+        except:
+            try:
+                envanter_tarihi = datetime.strptime(envanter_tarihi, '%d.%m.%Y')
+            except:
+                envanter_tarihi = datetime.now()
+    elif hasattr(envanter_tarihi, 'to_pydatetime'):
+        envanter_tarihi = envanter_tarihi.to_pydatetime()
+    
+    # 15 gün öncesi (kamera erişim limiti)
+    kamera_limit = envanter_tarihi - timedelta(days=15)
+    
+    # Malzeme kodlarını al
+    malzeme_kodlari = df['Malzeme Kodu'].astype(str).tolist()
+    
+    # Kategori bilgisini al (Ürün Grubu = şema kaydındaki Mal Grubu Tanımı)
+    kategori_col = None
+    for col in ['Ürün Grubu', 'Ana Grup']:
+        if col in df.columns:
+            kategori_col = col
+            break
+    
+    # Kategorideki tüm 100+ TL ürünleri bul (alternatif arama için)
+    kategori_urunleri = {}
+    if kategori_col and full_df is not None:
+        for _, row in df.iterrows():
+            kategori = row.get(kategori_col, '')
+            if kategori and kategori not in kategori_urunleri:
+                # Bu kategorideki 100+ TL ürünleri bul
+                if kategori_col in full_df.columns and 'Birim Fiyat' in full_df.columns:
+                    kat_mask = (full_df[kategori_col] == kategori) & (full_df['Birim Fiyat'] >= 100)
+                    kat_urunler = full_df.loc[kat_mask, 'Malzeme Kodu'].astype(str).unique().tolist()
+                    kategori_urunleri[kategori] = kat_urunler
+    
+    # Tüm kategori ürünlerinin iptal verilerini çek
+    tum_kategori_kodlari = set()
+    for kodlar in kategori_urunleri.values():
+        tum_kategori_kodlari.update(kodlar)
+    
+    # İptal verilerini çek (hem direkt ürünler hem kategori ürünleri)
+    tum_kodlar = list(set(malzeme_kodlari) | tum_kategori_kodlari)
+    iptal_data = iptal_kayitlari(df_iptal, magaza_kodu, tum_kodlar)
+    
+    # Yeni sütunlar
+    kamera_kontrol = []
+    
+    for _, row in df.iterrows():
+        malzeme_kodu = str(row['Malzeme Kodu']).strip()
+        kategori = row.get(kategori_col, '') if kategori_col else ''
+        
+        # Önce direkt ürün için iptal ara
+        sonuc = _ara_iptal_kaydi(malzeme_kodu, iptal_data, kamera_limit)
+        
+        if sonuc['bulundu']:
+            # Ürünün kendisi için kayıt var
+            kamera_kontrol.append(sonuc['detay'])
+        else:
+            # Ürün için kayıt yok, kategorideki diğer 100+ TL ürünlere bak
+            alternatif_bulundu = False
+            alternatif_detay = ""
+            
+            if kategori and kategori in kategori_urunleri:
+                for alt_kod in kategori_urunleri[kategori]:
+                    if alt_kod != malzeme_kodu:
+                        alt_sonuc = _ara_iptal_kaydi(alt_kod, iptal_data, kamera_limit)
+                        if alt_sonuc['bulundu']:
+                            alternatif_bulundu = True
+                            # Alternatif ürün adını bul
+                            alt_ad = ""
+                            if full_df is not None:
+                                alt_rows = full_df[full_df['Malzeme Kodu'].astype(str) == alt_kod]
+                                if len(alt_rows) > 0:
+                                    alt_ad = alt_rows['Malzeme Adı'].iloc[0] if 'Malzeme Adı' in alt_rows.columns else alt_kod
+                            
+                            alternatif_detay = f"🔄 KATEGORİ: {alt_ad[:30] if alt_ad else alt_kod} → {alt_sonuc['detay']}"
+                            break
+            
+            if alternatif_bulundu:
+                kamera_kontrol.append(alternatif_detay)
+            else:
+                # Ne ürün ne kategori için kayıt yok
+                kamera_kontrol.append(f"❌ {kategori} kategorisinde 100+ TL iptal yok" if kategori else "❌ İptal kaydı yok")
+    
+    df['KAMERA KONTROL DETAY'] = kamera_kontrol
+    
+    return df
+
+
+def _ara_iptal_kaydi(malzeme_kodu, iptal_data, kamera_limit):
+    """Bir ürün için iptal kaydı ara ve formatla"""
+    if malzeme_kodu not in iptal_data:
+        return {'bulundu': False, 'detay': ''}
+    
+    iptaller = iptal_data[malzeme_kodu]
+    son_15_gun = []
+    
+    for iptal in iptaller:
+        tarih_str = str(iptal['tarih'])
+        
+        try:
+            for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y']:
+                try:
+                    tarih = datetime.strptime(tarih_str.split()[0], fmt)
+                    break
+                except:
+                    continue
+            else:
+                continue
+            
+            if tarih >= kamera_limit:
+                son_15_gun.append({**iptal, 'tarih_dt': tarih})
+        except:
+            pass
+    
+    if not son_15_gun:
+        return {'bulundu': False, 'detay': ''}
+    
+    # Tarihe göre sırala ve formatla
+    son_15_gun_sorted = sorted(son_15_gun, key=lambda x: x['tarih_dt'], reverse=True)
+    
+    detaylar = []
+    for iptal in son_15_gun_sorted[:3]:  # En fazla 3 kayıt göster
+        tarih = iptal['tarih_dt'].strftime('%d.%m.%Y')
+        saat = str(iptal.get('saat', ''))[:8]
+        islem_no = str(iptal.get('islem_no', ''))
+        
+        # İşlem numarasından kasa numarasını çıkar (örn: 79150012711503250661 -> pozisyon 4-5)
+        kasa_no = ""
+        if len(islem_no) >= 6:
+            try:
+                kasa_no = f"Kasa:{int(islem_no[4:6])}"
+            except:
+                kasa_no = ""
+        
+        detaylar.append(f"{tarih} {saat} {kasa_no}".strip())
+    
+    return {
+        'bulundu': True,
+        'detay': "✅ KAMERA BAK " + " | ".join(detaylar)
+    }
+
+
+# ==================== EXCEL RAPORU ====================
+
+_INCE_KENAR = Border(left=Side(style='thin'), right=Side(style='thin'),
+                     top=Side(style='thin'), bottom=Side(style='thin'))
+_BASLIK_FONT = Font(bold=True, color='FFFFFF', size=10)
+_BASLIK_DOLGU = PatternFill('solid', fgColor='1F4E79')
+
+# Akışlı yazıcı için NamedStyle'lar (kitaba bir kez kaydedilir)
+RAPOR_STILLERI = {
+    'baslik': {'font': _BASLIK_FONT, 'fill': _BASLIK_DOLGU, 'border': _INCE_KENAR},
+    'baslik_kenarsiz': {'font': _BASLIK_FONT, 'fill': _BASLIK_DOLGU},
+    'sigara_baslik': {'font': _BASLIK_FONT, 'fill': PatternFill('solid', fgColor='FF4444')},
+    'cerceve': {'border': _INCE_KENAR},
+    'cerceve_sarmal': {'border': _INCE_KENAR, 'alignment': Alignment(wrap_text=True, vertical='top')},
+    'sarmal': {'alignment': Alignment(wrap_text=True, vertical='top')},
+    'kritik': {'fill': PatternFill('solid', fgColor='FF4444'), 'border': _INCE_KENAR},
+    'riskli': {'fill': PatternFill('solid', fgColor='FF8800'), 'border': _INCE_KENAR},
+    'dikkat': {'fill': PatternFill('solid', fgColor='FFCC00'), 'border': _INCE_KENAR},
+    'temiz': {'fill': PatternFill('solid', fgColor='00CC66'), 'border': _INCE_KENAR},
+    'kritik_yazi': {'fill': PatternFill('solid', fgColor='FF4444'), 'border': _INCE_KENAR,
+                    'font': Font(bold=True, color='FFFFFF')},
+    'riskli_yazi': {'fill': PatternFill('solid', fgColor='FF8800'), 'border': _INCE_KENAR,
+                    'font': Font(bold=True, color='FFFFFF')},
+    'dikkat_yazi': {'fill': PatternFill('solid', fgColor='FFCC00'), 'border': _INCE_KENAR,
+                    'font': Font(bold=True)},
+    'temiz_yazi': {'fill': PatternFill('solid', fgColor='00CC66'), 'border': _INCE_KENAR,
+                   'font': Font(bold=True, color='FFFFFF')},
+    'sayfa_basligi': {'font': Font(bold=True, size=14)},
+    'alt_baslik': {'font': Font(bold=True, size=11)},
+    'uyari_deger': {'fill': PatternFill('solid', fgColor='FF4444'), 'font': Font(bold=True, color='FFFFFF')},
+    'uyari_basligi': {'font': Font(bold=True, size=14, color='FF0000')},
+    'kasa_basligi': {'font': Font(bold=True, size=12, color='FF0000')},
+    'kasa_fazla': {'fill': PatternFill('solid', fgColor='FFCCCC')},
+}
+
+
+def create_top_20_risky(df, internal_codes, chronic_codes, family_balanced_codes):
+    """En riskli 20 ürün"""
+    
+    # Dengelenmişleri ve aile dengelenmişlerini çıkar
+    risky_df = df[
+        (df['NET_ENVANTER_ETKİ_TUTARI'] < 0) & 
+        (~is_balanced_mask(df)) &
+        (~df['Malzeme Kodu'].astype(str).isin(family_balanced_codes))
+    ].copy()
+    
+    if len(risky_df) == 0:
+        return pd.DataFrame()
+    
+    # DUPLICATE TEMİZLEME - önce yap
+    risky_df = risky_df.drop_duplicates(subset=['Malzeme Kodu'], keep='first')
+    
+    kod = _kolon_veya(risky_df, 'Malzeme Kodu', '').map(str)
+    kosullar = [kod.isin(internal_codes), kod.isin(chronic_codes), risky_df['Fire Miktarı'] < 0]
+    risky_df['Risk Türü'] = np.select(
+        kosullar, ["İÇ HIRSIZLIK", "KRONİK AÇIK", "OPERASYONEL"], default="DIŞ HIRSIZLIK/SAYIM")
+    risky_df['Aksiyon'] = np.select(
+        kosullar, ["Kasa kamera incelemesi", "Raf kontrolü, Sayım eğitimi", "Fire kayıt kontrolü"],
+        default="Sayım ve kod kontrolü")
+    
+    risky_df = risky_df.sort_values('NET_ENVANTER_ETKİ_TUTARI', ascending=True).head(20)
+    
+    result = pd.DataFrame({
+        'Sıra': range(1, len(risky_df) + 1),
+        'Malzeme Kodu': risky_df['Malzeme Kodu'].values,
+        'Malzeme Adı': risky_df['Malzeme Adı'].values,
+        'Fark Mik.': risky_df['Fark Miktarı'].values,
+        'Kısmi': risky_df['Kısmi Envanter Miktarı'].values,
+        'Önceki': risky_df['Önceki Fark Miktarı'].values,
+        'TOPLAM': risky_df['TOPLAM_MIKTAR'].values,
+        'İptal': risky_df['İptal Satır Miktarı'].values,
+        'Fire': risky_df['Fire Miktarı'].values,
+        'Fire Tutarı': risky_df['Fire Tutarı'].values,
+        'Fark Tutarı': risky_df['Fark Tutarı'].values,
+        'Risk Türü': risky_df['Risk Türü'].values,
+        'Aksiyon': risky_df['Aksiyon'].values
+    })
+    
+    return result
+
+
+def create_excel_report(df, internal_df, chronic_df, chronic_fire_df, cigarette_df, 
+                       external_df, family_df, fire_manip_df, kasa_activity_df, top20_df, 
+                       exec_comments, group_stats, magaza_kodu, magaza_adi, params):
+    """Excel raporu - tüm sheet'ler dahil"""
+    
+    kitap = ExcelKitabi(RAPOR_STILLERI)
+    
+    # ===== ÖZET =====
+    ws = kitap.sayfa("ÖZET")
+    
+    ws.satir([f"MAĞAZA: {magaza_kodu} - {magaza_adi}"], stil='sayfa_basligi')
+    ws.satir([f"Dönem: {params.get('donem', '')} | Tarih: {params.get('tarih', '')}"])
+    ws.bos_satir()
+    
+    ws.satir(["GENEL METRIKLER"], stil='alt_baslik')
+    
+    toplam_satis = df['Satış Tutarı'].sum()
+    fark_tutari = df['Fark Tutarı'].fillna(0).sum()
+    kismi_tutari = df['Kısmi Envanter Tutarı'].fillna(0).sum()
+    fire_tutari = df['Fire Tutarı'].fillna(0).sum()
+    
+    # Fark = Fark Tutarı + Kısmi
+    fark = fark_tutari + kismi_tutari
+    # Toplam Açık = Fark + Fire
+    toplam_acik = fark + fire_tutari
+    
+    # Oranlar
+    fark_oran = abs(fark) / toplam_satis * 100 if toplam_satis > 0 else 0
+    fire_oran = abs(fire_tutari) / toplam_satis * 100 if toplam_satis > 0 else 0
+    toplam_oran = abs(toplam_acik) / toplam_satis * 100 if toplam_satis > 0 else 0
+    
+    metrics = [
+        ('Toplam Ürün', len(df)),
+        ('Açık Veren Ürün', len(df[df['Fark Miktarı'] < 0])),
+        ('Toplam Satış', f"{toplam_satis:,.0f} TL"),
+        ('Fark (Fark+Kısmi)', f"{fark:,.0f} TL"),
+        ('Fire', f"{fire_tutari:,.0f} TL"),
+        ('Toplam Açık', f"{toplam_acik:,.0f} TL"),
+        ('Fark Oranı', f"%{fark_oran:.2f}"),
+        ('Fire Oranı', f"%{fire_oran:.2f}"),
+        ('Toplam Oran', f"%{toplam_oran:.2f}"),
+    ]
+    
+    for label, value in metrics:
+        ws.satir([label, value])
+    ws.bos_satir()
+    
+    ws.satir(["RİSK DAĞILIMI"], stil='alt_baslik')
+    
+    # Sigara açığı NET toplamı hesapla (satır sayısı değil!)
+    sigara_net_toplam = 0
+    if len(cigarette_df) > 0:
+        toplam_row = cigarette_df[cigarette_df['Malzeme Kodu'] == '*** TOPLAM ***']
+        if len(toplam_row) > 0:
+            sigara_net_toplam = abs(toplam_row['Ürün Toplam'].values[0])
+        else:
+            # Toplam satırı yoksa manuel hesapla
+            sigara_net_toplam = abs(cigarette_df['Ürün Toplam'].sum())
+    
+    risks = [
+        ('İç Hırsızlık (≥100TL)', len(internal_df)),
+        ('Kronik Açık', len(chronic_df)),
+        ('Kronik Fire', len(chronic_fire_df)),
+        ('Sigara Açığı', int(sigara_net_toplam)),  # NET TOPLAM, satır sayısı değil!
+        ('Fire Manipülasyonu', len(fire_manip_df)),
+    ]
+    
+    for label, value in risks:
+        uyari = 'Sigara' in label and value > 0
+        ws.satir([label, value], stil=[None, 'uyari_deger' if uyari else None])
+    ws.bos_satir()
+    
+    ws.satir(["YÖNETİCİ ÖZETİ"], stil='alt_baslik')
+    
+    for comment in exec_comments[:10]:
+        ws.satir([comment])
+    
+    # ===== EN RİSKLİ 20 =====
+    if len(top20_df) > 0:
+        ws2 = kitap.sayfa("EN RİSKLİ 20")
+        ws2.tablo(top20_df, baslik_stili='baslik', govde_stili='cerceve_sarmal')
+    
+    # ===== KRONİK AÇIK =====
+    if len(chronic_df) > 0:
+        ws3 = kitap.sayfa("KRONİK AÇIK")
+        ws3.tablo(chronic_df.head(100), baslik_stili='baslik_kenarsiz')
+    
+    # ===== KRONİK FİRE =====
+    if len(chronic_fire_df) > 0:
+        ws4 = kitap.sayfa("KRONİK FİRE")
+        ws4.tablo(chronic_fire_df.head(100), baslik_stili='baslik_kenarsiz')
+    
+    # ===== SİGARA AÇIĞI =====
+    ws5 = kitap.sayfa("SİGARA AÇIĞI", genislik='oto' if len(cigarette_df) > 0 else None)
+    ws5.satir(["⚠️ SİGARA AÇIĞI - YÜKSEK RİSK"], stil='uyari_basligi')
+    
+    if len(cigarette_df) > 0:
+        ws5.bos_satir()
+        ws5.tablo(cigarette_df, baslik_stili='sigara_baslik')
+    
+    # ===== İÇ HIRSIZLIK =====
+    if len(internal_df) > 0:
+        ws6 = kitap.sayfa("İÇ HIRSIZLIK")
+        ws6.satir(["Satış Fiyatı ≥ 100 TL | Fark büyüdükçe risk AZALIR"], stil='alt_baslik')
+        ws6.bos_satir()
+        ws6.tablo(internal_df.head(100), baslik_stili='baslik_kenarsiz')
+    
+    # ===== AİLE ANALİZİ =====
+    if len(family_df) > 0:
+        ws7 = kitap.sayfa("AİLE ANALİZİ")
+        ws7.satir(["Benzer Ürün Ailesi - Kod Karışıklığı Tespiti"], stil='alt_baslik')
+        ws7.bos_satir()
+        ws7.tablo(family_df.head(100), baslik_stili='baslik_kenarsiz', govde_stili='sarmal')
+    
+    # ===== FİRE MANİPÜLASYONU =====
+    if len(fire_manip_df) > 0:
+        ws8 = kitap.sayfa("FİRE MANİPÜLASYONU")
+        ws8.tablo(fire_manip_df.head(100), baslik_stili='baslik_kenarsiz')
+    
+    # ===== KASA AKTİVİTESİ =====
+    if len(kasa_activity_df) > 0:
+        ws9 = kitap.sayfa("KASA AKTİVİTESİ")
+        ws9.satir(["⚠️ KASA AKTİVİTESİ ÜRÜNLERİ - FAZLA (+) OLANLAR MANİPÜLASYON RİSKİ!"], stil='kasa_basligi')
+        ws9.bos_satir()
+        
+        # Fazla olanları kırmızı yap (6. sütun: TOPLAM)
+        kosullu = {}
+        if len(kasa_activity_df.columns) >= 6:
+            kosullu[kasa_activity_df.columns[5]] = lambda s: [
+                'kasa_fazla' if isinstance(v, (int, float, np.number)) and v > 0 else None for v in s
+            ]
+        ws9.tablo(kasa_activity_df, baslik_stili='baslik_kenarsiz', kosullu_stiller=kosullu)
+    
+    return kitap.kaydet()
+
+
+# ==================== TEK MAĞAZA RAPORU ====================
+
+def magaza_rapor_dosyasi(gorev):
+    """
+    Tek mağaza: tüm tespitler + Excel raporu -> (dosya adı, bytes).
+    Process havuzu işçisidir; tüm girdiler görev argümanıyla gelir (modül durumu okunmaz).
+
+    Args:
+        gorev: (mağaza kodu, mağaza frame'i, mağazanın iptal satırları, kasa kodları, params)
+    """
+    mag, df_mag, df_iptal, kasa_kodlari, params = gorev
+    mag_adi = df_mag['Mağaza Adı'].iloc[0] if 'Mağaza Adı' in df_mag.columns and len(df_mag) > 0 else ''
+    
+    tespitler = tum_tespitler(df_mag, kasa_kodlari)
+    int_df = tespitler['ic_hirsizlik']
+    
+    # Kamera timestamp entegrasyonu (kategori araması için full_df geçir)
+    if len(int_df) > 0:
+        try:
+            env_tarihi = df_mag['Envanter Tarihi'].iloc[0]
+            int_df = kamera_kontrolu_ekle(int_df, mag, env_tarihi, df_iptal, full_df=df_mag)
+        except Exception:
+            logger.warning("Mağaza %s: kamera kontrol bilgisi eklenemedi", mag, exc_info=True)
+    
+    chr_df = tespitler['kronik']
+    chr_fire_df = tespitler['kronik_fire']
+    cig_df = tespitler['sigara']
+    ext_df = tespitler['dis_hirsizlik']
+    fam_df = tespitler['aile']
+    fire_df = tespitler['fire_manipulasyon']
+    kasa_df, kasa_sum = tespitler['kasa'], tespitler['kasa_ozet']
+    
+    int_codes = set(int_df['Malzeme Kodu'].astype(str).tolist()) if len(int_df) > 0 else set()
+    chr_codes = set(chr_df['Malzeme Kodu'].astype(str).tolist()) if len(chr_df) > 0 else set()
+    
+    t20_df = create_top_20_risky(df_mag, int_codes, chr_codes, set())
+    exec_c, grp_s = generate_executive_summary(df_mag, kasa_df, kasa_sum)
+    
+    excel_data = create_excel_report(
+        df_mag, int_df, chr_df, chr_fire_df, cig_df,
+        ext_df, fam_df, fire_df, kasa_df, t20_df,
+        exec_c, grp_s, mag, mag_adi, params
+    )
+    return f"{mag}_Risk_Raporu.xlsx", excel_data.getvalue()
+
+
+# ==================== TÜM MAĞAZALAR ZIP (PARALEL) ====================
+
+ZIP_PARALEL_MIN_MAGAZA = 8
+ZIP_BELLEK_ESIGI = 16 * 1024 * 1024  # Bu boyutun üstündeki arşiv diske taşar
+
+
+def yeni_zip_dosyasi():
+    """ZIP arşivi için geçici dosya: ZIP_BELLEK_ESIGI'ne kadar bellekte, üstü diskte"""
+    return tempfile.SpooledTemporaryFile(max_size=ZIP_BELLEK_ESIGI, mode='w+b')
+
+
+def zip_isci_sayisi(magaza_sayisi):
+    """Kullanılabilir CPU (affinity) kadar işçi; az mağazada 1 (seri)"""
+    if magaza_sayisi < ZIP_PARALEL_MIN_MAGAZA:
+        return 1
+    cpu = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    return max(1, min(cpu, magaza_sayisi))
+
+
+def magazalar_zip(magazalar, gorev_uret, zip_buffer, isci=1):
+    """
+    Mağaza raporlarını (magaza_rapor_dosyasi) mağaza sırasıyla ZIP'e yazar.
+
+    - isci > 1 ise raporlar bu çağrıya ait spawn process havuzunda üretilir
+      (Streamlit thread'leriyle güvenli; işçiler önceki / başka oturumun
+      verisini görmez, her şey görev argümanıyla gider)
+    - Kayan pencere: aynı anda en fazla isci*2 görev / rapor bellekte bekler,
+      biten rapor ZIP'e yazılıp hemen bırakılır
+    - Havuz kurulamazsa / işçi çökerse uyarı loglanır, yazılmayan mağazalar seri üretilir
+
+    Args:
+        magazalar: Mağaza kodları (ZIP sırası)
+        gorev_uret: mağaza kodu -> magaza_rapor_dosyasi görev tuple'ı (gönderim anında çağrılır)
+        zip_buffer: yazılabilir dosya nesnesi (diske taşan arşiv için yeni_zip_dosyasi())
+        isci: İşçi sayısı (zip_isci_sayisi)
+    """
+    yazilan = 0
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if isci > 1:
+            havuz = None
+            try:
+                havuz = ProcessPoolExecutor(max_workers=isci, mp_context=multiprocessing.get_context('spawn'))
+                sira = iter(magazalar)
+                bekleyen = deque(havuz.submit(magaza_rapor_dosyasi, gorev_uret(mag))
+                                 for mag in islice(sira, isci * 2))
+                while bekleyen:
+                    dosya_adi, veri = bekleyen.popleft().result()
+                    zf.writestr(dosya_adi, veri)
+                    del veri
+                    yazilan += 1
+                    for mag in islice(sira, 1):
+                        bekleyen.append(havuz.submit(magaza_rapor_dosyasi, gorev_uret(mag)))
+            except Exception:
+                logger.warning("ZIP process havuzu kullanılamadı, kalan %d mağaza seri üretiliyor",
+                               len(magazalar) - yazilan, exc_info=True)
+            finally:
+                if havuz is not None:
+                    havuz.shutdown(wait=True, cancel_futures=True)
+        
+        for mag in magazalar[yazilan:]:
+            dosya_adi, veri = magaza_rapor_dosyasi(gorev_uret(mag))
+            zf.writestr(dosya_adi, veri)
+            del veri
+    
+    return zip_buffer
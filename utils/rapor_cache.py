@@ -0,0 +1,95 @@
+"""
+Rapor Önbelleği
+İndirme butonlarının Excel çıktıları - (rapor türü, parametreler, veri sürümü) başına BİR kez üretilir.
+
+Mantık:
+- Rapor sadece istendiğinde üretilir (buton); sayfa etkileşimleri rapor maliyeti ödemez
+- Üretilen bytes process genelinde (rerun / oturum arası) LRU önbellekte tutulur
+- Veri sürümü kaynak DataFrame'lerin parmak izidir: veri değişince anahtar değişir
+"""
+
+from io import BytesIO
+
+import pandas as pd
+
+from .karne_cache import KarneOnbellegi, veri_parmak_izi
+
+
+# Önbellekte tutulan rapor sayısı (LRU)
+RAPOR_LIMITI = 64
+
+RAPOR_ONBELLEGI = KarneOnbellegi(max_kayit=RAPOR_LIMITI)
+
+
+def _dondur(deger):
+    """Parametreleri hash'lenebilir hale getir (dict / list / set -> tuple)"""
+    if isinstance(deger, dict):
+        return tuple(sorted((str(k), _dondur(v)) for k, v in deger.items()))
+    if isinstance(deger, (list, tuple)):
+        return tuple(_dondur(v) for v in deger)
+    if isinstance(deger, (set, frozenset)):
+        return tuple(sorted(_dondur(v) for v in deger))
+    return deger
+
+
+def veri_surumu(*kaynaklar):
+    """
+    Kaynakların veri sürümü: DataFrame -> veri_parmak_izi, diğerleri olduğu gibi.
+
+    Returns:
+        tuple (hash'lenemeyen kaynak varsa None -> rapor önbelleğe alınmaz)
+    """
+    surum = []
+    for kaynak in kaynaklar:
+        if isinstance(kaynak, pd.DataFrame):
+            kaynak = veri_parmak_izi(kaynak)
+            if kaynak is None:
+                return None
+        surum.append(_dondur(kaynak))
+    surum = tuple(surum)
+    try:
+        hash(surum)
+    except TypeError:
+        return None
+    return surum
+
+
+def rapor_anahtari(tur, parametreler, surum):
+    """Önbellek anahtarı (surum None ise None)"""
+    if surum is None:
+        return None
+    try:
+        anahtar = (tur, _dondur(parametreler), surum)
+        hash(anahtar)
+    except TypeError:
+        return None
+    return anahtar
+
+
+def hazir_rapor(tur, parametreler, surum):
+    """Daha önce üretilmiş rapor bytes'ı (yoksa None)"""
+    anahtar = rapor_anahtari(tur, parametreler, surum)
+    return None if anahtar is None else RAPOR_ONBELLEGI.get(anahtar)
+
+
+def rapor_uret(tur, parametreler, surum, uret):
+    """
+    Raporu üret ve önbelleğe al (varsa önbellekten dön).
+
+    Args:
+        uret: Parametresiz fonksiyon -> bytes / BytesIO (boş/None: rapor yok, önbelleğe girmez)
+    """
+    veri = hazir_rapor(tur, parametreler, surum)
+    if veri is not None:
+        return veri
+
+    veri = uret()
+    if isinstance(veri, BytesIO):
+        veri = veri.getvalue()
+    if not veri:
+        return None
+
+    anahtar = rapor_anahtari(tur, parametreler, surum)
+    if anahtar is not None:
+        RAPOR_ONBELLEGI.put(anahtar, veri)
+    return veri
@@ -10,12 +10,25 @@ ChatGPT Standardı:
 
 import pandas as pd
 import numpy as np
-from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.utils.dataframe import dataframe_to_rows
-from io import BytesIO
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+import threading
+
+from .seri import (
+    KRONIK_ESIK, KRONIK_DEGER_KOLONLARI,
+    ardisik_donem_bayraklari, kronik_ilk_eslesmeler,
+    SeriFrame, ayni_sayim_serisi, ayni_sayim_ozeti
+)
+from .excel_yazici import ExcelKitabi, icerir_stili
+from .karne_cache import (
+    KATEGORI_ONBELLEGI, KARNE_ONBELLEGI,
+    magaza_parmak_izleri, veri_parmak_izi
+)
 
 # ==================== CHATGPT STANDARDI: MAX KATKI PUANLARI ====================
 MAX_KATKI = {
@@ -32,6 +45,11 @@ MAX_KATKI = {
 # Toplam max = 280, normalize edilecek (0-100 arası)
 TOPLAM_MAX_KATKI = sum(MAX_KATKI.values())  # 280
 
+
+def karne_config_anahtari():
+    """Önbellek anahtarı için puanlama konfigürasyonu (MAX_KATKI değişirse önbellek geçersiz)"""
+    return (tuple(sorted(MAX_KATKI.items())), TOPLAM_MAX_KATKI)
+
 # ==================== EXCEL STİLLERİ ====================
 HEADER_FILL = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
 HEADER_FONT = Font(bold=True, color="FFFFFF", size=11)
@@ -213,82 +231,50 @@ def hesapla_yuksek_sayim_raw(df_magaza):
     }
 
 
-# ==================== 4. KRONİK AÇIK PUANI (RAW: 0-100) ====================
+# ==================== 4-5. KRONİK AÇIK / FİRE PUANI (RAW: 0-100) ====================
 
-def hesapla_kronik_acik_raw(df_magaza):
-    """
-    Kronik Açık RAW Puanı (0-100)
+def _kronik_detay_df(hits, ad, mag_col=None):
+    """Seri kernel eşleşmelerinden kronik detay tablosu"""
+    detay = pd.DataFrame({
+        'malzeme_kodu': hits['malzeme_kodu'].values,
+        'malzeme_tanimi': hits['malzeme_tanimi'].values if 'malzeme_tanimi' in hits.columns else '',
+        'onceki_env': hits['onceki_env'].astype(int).values,
+        'sonraki_env': hits['envanter_sayisi'].astype(int).values,
+        'onceki_delta': hits[f'{ad}_onceki_delta'].values,
+        'sonraki_delta': hits[f'{ad}_delta'].values,
+        'toplam': (hits[f'{ad}_onceki_delta'] + hits[f'{ad}_delta']).values
+    })
+    if mag_col:
+        detay.insert(0, mag_col, hits[mag_col].values)
+    return detay
 
-    Kural: Ardışık 2 envanterde fark_tutari < -500 TL (delta bazlı)
-    RAW = MIN(100, kronik_urun × 10)
 
-    Not: Seri verisi yoksa 0 döner
-    """
-    KRONIK_ESIK = -500
+def _hesapla_kronik_raw(df_magaza, ad, risk_key):
+    """Kronik açık/fire ortak hesabı (seri kernel, ürün döngüsü YOK)"""
+    bos = {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
 
     if df_magaza is None or df_magaza.empty:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    # Gerekli kolonlar
-    if 'malzeme_kodu' not in df_magaza.columns or 'envanter_sayisi' not in df_magaza.columns:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    df = df_magaza.copy()
-    df['envanter_sayisi'] = pd.to_numeric(df['envanter_sayisi'], errors='coerce')
-    df['fark_tutari'] = get_numeric_col(df, ['fark_tutari', 'Fark Tutarı'])
-    df = df.dropna(subset=['envanter_sayisi'])
+        return bos
 
-    if df.empty:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
+    # Tek mağaza: seri sadece ürün bazında gruplanır
+    bayraklar = ardisik_donem_bayraklari(
+        df_magaza, KRONIK_ESIK, {ad: KRONIK_DEGER_KOLONLARI[ad]},
+        mag_col=None, ek_kolonlar=['malzeme_tanimi']
+    )
+    if bayraklar.empty:
+        return bos
 
     # Seri var mı kontrol (en az 2 farklı envanter_sayisi)
-    unique_env = df['envanter_sayisi'].nunique()
-    if unique_env < 2:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    df = df.sort_values(['malzeme_kodu', 'envanter_sayisi'])
-
-    kronik_urunler = []
-
-    for malzeme, grup in df.groupby('malzeme_kodu'):
-        if len(grup) < 2:
-            continue
+    if bayraklar['envanter_sayisi'].nunique() < 2:
+        return bos
 
-        grup = grup.sort_values('envanter_sayisi').reset_index(drop=True)
-
-        # Delta hesapla
-        grup['prev_fark'] = grup['fark_tutari'].shift(1)
-        grup['delta'] = grup['fark_tutari'] - grup['prev_fark'].fillna(0)
-        grup['prev_delta'] = grup['delta'].shift(1)
-        grup['prev_env'] = grup['envanter_sayisi'].shift(1)
-
-        # Ardışık kontrol
-        ardisik_mask = (
-            grup['prev_delta'].notna() &
-            (grup['prev_delta'] < KRONIK_ESIK) &
-            (grup['delta'] < KRONIK_ESIK) &
-            (grup['envanter_sayisi'] == grup['prev_env'] + 1)
-        )
-
-        if ardisik_mask.any():
-            hit = grup[ardisik_mask].iloc[0]
-            kronik_urunler.append({
-                'malzeme_kodu': malzeme,
-                'malzeme_tanimi': hit.get('malzeme_tanimi', ''),
-                'onceki_env': int(hit['prev_env']),
-                'sonraki_env': int(hit['envanter_sayisi']),
-                'onceki_delta': hit['prev_delta'],
-                'sonraki_delta': hit['delta'],
-                'toplam': hit['prev_delta'] + hit['delta']
-            })
-
-    urun_sayisi = len(kronik_urunler)
-    toplam_tutar = sum(u['toplam'] for u in kronik_urunler) if kronik_urunler else 0
+    hits = kronik_ilk_eslesmeler(bayraklar, ad, mag_col=None)
+    urun_sayisi = len(hits)
+    detay_df = _kronik_detay_df(hits, ad) if urun_sayisi else pd.DataFrame()
+    toplam_tutar = detay_df['toplam'].sum() if urun_sayisi else 0
 
     raw_puan = min(100, urun_sayisi * 10)
-    katki_puan = round(raw_puan / 100 * MAX_KATKI['kronik_acik'], 2)
-
-    detay_df = pd.DataFrame(kronik_urunler) if kronik_urunler else pd.DataFrame()
+    katki_puan = round(raw_puan / 100 * MAX_KATKI[risk_key], 2)
 
     return {
         'raw_puan': round(raw_puan, 2),
@@ -300,7 +286,17 @@ def hesapla_kronik_acik_raw(df_magaza):
     }
 
 
-# ==================== 5. KRONİK FİRE PUANI (RAW: 0-100) ====================
+def hesapla_kronik_acik_raw(df_magaza):
+    """
+    Kronik Açık RAW Puanı (0-100)
+
+    Kural: Ardışık 2 envanterde fark_tutari < -500 TL (delta bazlı)
+    RAW = MIN(100, kronik_urun × 10)
+
+    Not: Seri verisi yoksa 0 döner
+    """
+    return _hesapla_kronik_raw(df_magaza, 'acik', 'kronik_acik')
+
 
 def hesapla_kronik_fire_raw(df_magaza):
     """
@@ -309,76 +305,7 @@ def hesapla_kronik_fire_raw(df_magaza):
     Kural: Ardışık 2 envanterde fire_tutari < -500 TL (delta bazlı)
     RAW = MIN(100, kronik_urun × 10)
     """
-    KRONIK_ESIK = -500
-
-    if df_magaza is None or df_magaza.empty:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    if 'malzeme_kodu' not in df_magaza.columns or 'envanter_sayisi' not in df_magaza.columns:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    df = df_magaza.copy()
-    df['envanter_sayisi'] = pd.to_numeric(df['envanter_sayisi'], errors='coerce')
-    df['fire_tutari'] = get_numeric_col(df, ['fire_tutari', 'Fire Tutarı'])
-    df = df.dropna(subset=['envanter_sayisi'])
-
-    if df.empty:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    unique_env = df['envanter_sayisi'].nunique()
-    if unique_env < 2:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'toplam_tutar': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
-
-    df = df.sort_values(['malzeme_kodu', 'envanter_sayisi'])
-
-    kronik_urunler = []
-
-    for malzeme, grup in df.groupby('malzeme_kodu'):
-        if len(grup) < 2:
-            continue
-
-        grup = grup.sort_values('envanter_sayisi').reset_index(drop=True)
-
-        grup['prev_fire'] = grup['fire_tutari'].shift(1)
-        grup['delta'] = grup['fire_tutari'] - grup['prev_fire'].fillna(0)
-        grup['prev_delta'] = grup['delta'].shift(1)
-        grup['prev_env'] = grup['envanter_sayisi'].shift(1)
-
-        ardisik_mask = (
-            grup['prev_delta'].notna() &
-            (grup['prev_delta'] < KRONIK_ESIK) &
-            (grup['delta'] < KRONIK_ESIK) &
-            (grup['envanter_sayisi'] == grup['prev_env'] + 1)
-        )
-
-        if ardisik_mask.any():
-            hit = grup[ardisik_mask].iloc[0]
-            kronik_urunler.append({
-                'malzeme_kodu': malzeme,
-                'malzeme_tanimi': hit.get('malzeme_tanimi', ''),
-                'onceki_env': int(hit['prev_env']),
-                'sonraki_env': int(hit['envanter_sayisi']),
-                'onceki_delta': hit['prev_delta'],
-                'sonraki_delta': hit['delta'],
-                'toplam': hit['prev_delta'] + hit['delta']
-            })
-
-    urun_sayisi = len(kronik_urunler)
-    toplam_tutar = sum(u['toplam'] for u in kronik_urunler) if kronik_urunler else 0
-
-    raw_puan = min(100, urun_sayisi * 10)
-    katki_puan = round(raw_puan / 100 * MAX_KATKI['kronik_fire'], 2)
-
-    detay_df = pd.DataFrame(kronik_urunler) if kronik_urunler else pd.DataFrame()
-
-    return {
-        'raw_puan': round(raw_puan, 2),
-        'katki_puan': katki_puan,
-        'urun_sayisi': urun_sayisi,
-        'toplam_tutar': round(toplam_tutar, 2),
-        'seri_var': True,
-        'detay_df': detay_df
-    }
+    return _hesapla_kronik_raw(df_magaza, 'fire', 'kronik_fire')
 
 
 # ==================== 6. TAM SAYILI SAYIM PUANI (RAW: 0-100) ====================
@@ -456,71 +383,145 @@ def hesapla_tam_sayili_raw(df_magaza):
 
 # ==================== 7. AYNI SAYIM PUANI (RAW: 0-100) ====================
 
-def hesapla_ayni_sayim_raw(df_magaza):
+def _seri_metinleri(env, sayim, sinirlar):
     """
-    Aynı Sayım RAW Puanı (0-100)
+    Seri gösterimi ('1:5 → 2:5 → 3:5'), sinirlar ile ayrılmış ardışık gruplar için.
+    Metin tekil envanter / sayım değeri başına bir kez üretilir; birleştirme
+    liste dilimleri üzerinden (groupby.agg yok).
+    """
+    env_kod, env_tekil = pd.factorize(env, use_na_sentinel=False)
+    sayim_kod, sayim_tekil = pd.factorize(sayim, use_na_sentinel=False)
+    env_metin = np.array([str(int(e)) for e in env_tekil], dtype=object)
+    sayim_metin = np.array(['{:.0f}'.format(s) for s in sayim_tekil], dtype=object)
+    parcalar = (env_metin[env_kod] + ':' + sayim_metin[sayim_kod]).tolist()
+    sinirlar = np.asarray(sinirlar).tolist()
+    return [' → '.join(parcalar[bas:son]) for bas, son in zip(sinirlar[:-1], sinirlar[1:])]
 
-    Kural: Aynı ürün için ardışık 2+ envanterde aynı sayım miktarı
-    RAW = MIN(100, urun_sayisi × 5)
 
-    Not: Seri verisi yoksa 0 döner
+class SeriMetni:
+    """
+    Aynı sayım 'seri' kolonunun sıkıştırılmış kaynağı: seçili serilerin
+    envanter / sayım dizileri + seri sınırları. Metin sadece istenen
+    ürünler için üretilir (drill-down / Excel).
     """
-    if df_magaza is None or df_magaza.empty:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
 
-    if 'malzeme_kodu' not in df_magaza.columns or 'envanter_sayisi' not in df_magaza.columns:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
+    __slots__ = ('env', 'sayim', 'sinirlar')
+
+    def __init__(self, env, sayim, sinirlar):
+        self.env = env
+        self.sayim = sayim
+        self.sinirlar = sinirlar
+
+    def __len__(self):
+        return len(self.sinirlar) - 1
+
+    def metinler(self, secim=None):
+        """Seri metinleri (secim: ürün pozisyonları, None: hepsi)"""
+        if secim is None:
+            return _seri_metinleri(self.env, self.sayim, self.sinirlar)
+        bas = self.sinirlar[:-1][secim]
+        uzunluk = self.sinirlar[1:][secim] - bas
+        yeni_sinirlar = np.concatenate(([0], np.cumsum(uzunluk)))
+        # Seçili serilerin satırları: seri başı + seri içi sıra
+        satirlar = np.repeat(bas - yeni_sinirlar[:-1], uzunluk) + np.arange(yeni_sinirlar[-1])
+        return _seri_metinleri(self.env[satirlar], self.sayim[satirlar], yeni_sinirlar)
+
+    @classmethod
+    def birlestir(cls, parcalar):
+        """Parça kaynaklarını (process havuzu) tek kaynakta birleştir"""
+        kaydir = np.cumsum([0] + [p.sinirlar[-1] for p in parcalar[:-1]])
+        return cls(
+            np.concatenate([p.env for p in parcalar]),
+            np.concatenate([p.sayim for p in parcalar]),
+            np.concatenate([[0]] + [p.sinirlar[1:] + k for p, k in zip(parcalar, kaydir)])
+        )
 
-    df = df_magaza.copy()
-    df['sayim'] = get_numeric_col(df, ['sayim_miktari', 'Sayım Miktarı'])
-    df['envanter_sayisi'] = pd.to_numeric(df['envanter_sayisi'], errors='coerce')
-    df = df.dropna(subset=['envanter_sayisi'])
 
-    if df.empty:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
+AYNI_SAYIM_BILGI = ['malzeme_tanimi', 'depolama_kosulu']
 
-    unique_env = df['envanter_sayisi'].nunique()
-    if unique_env < 2:
-        return {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
 
-    df = df.sort_values(['malzeme_kodu', 'envanter_sayisi'])
+def _ayni_sayim_tablosu(df, mag_col=None, seri_frame=None, magazalar=None):
+    """
+    Aynı sayım ürünleri - 'seri' kolonu hariç tablo + seri kaynağı (SeriMetni).
+    Boşsa (boş DataFrame, None).
+    """
+    sf = seri_frame if seri_frame is not None else SeriFrame(df, mag_col=mag_col)
+    seri = ayni_sayim_serisi(None, ek_kolonlar=AYNI_SAYIM_BILGI, seri_frame=sf)
+    if seri.empty:
+        return pd.DataFrame(), None
+
+    ozet = ayni_sayim_ozeti(seri, seri_frame=sf)
+    secili = (ozet['max_ardisik'] >= 2).to_numpy()
+    if magazalar is not None and sf.mag_col:
+        secili = secili & ozet[sf.mag_col].isin(magazalar).to_numpy()
+    if not secili.any():
+        return pd.DataFrame(), None
+
+    satir_mask = secili[sf.grup_no]
+    sub = seri[satir_mask]
+    for col in AYNI_SAYIM_BILGI:
+        if col not in sub.columns:
+            sub = sub.assign(**{col: ''})
+    # Seçili seriler sıralı tabloda ardışık: sınırlar seri uzunluklarından
+    sinirlar = np.concatenate(([0], np.cumsum(np.diff(sf.offsets)[secili])))
+    metin = SeriMetni(sub['envanter_sayisi'].to_numpy(), sub['sayim'].to_numpy(), sinirlar)
+
+    # Ürün bilgisi: serinin ilk satırı
+    detay = sub[sf.ilk[satir_mask]][sf.keys + AYNI_SAYIM_BILGI].reset_index(drop=True)
+    detay['ardisik_adet'] = ozet['max_ardisik'].to_numpy()[secili]
+    detay['fark_tutari'] = sf.grup_topla(sf.sayisal(['fark_tutari', 'Fark Tutarı']))[secili]
+    return detay, metin
+
+
+def _ayni_sayim_kolonlari(detay):
+    """Aynı sayım detay kolon sırası ('seri' bilgi kolonlarından sonra)"""
+    kolonlar = [c for c in detay.columns if c not in ('seri', 'ardisik_adet', 'fark_tutari')]
+    return kolonlar + ['seri', 'ardisik_adet', 'fark_tutari']
+
+
+def _ayni_sayim_detay(df, mag_col=None, seri_frame=None, magazalar=None):
+    """
+    Aynı sayım ürünleri (RLE seri kernel, ürün döngüsü YOK).
+    mag_col verilirse tüm bölge için mağaza+ürün bazında hesaplanır.
 
-    ayni_urunler = []
+    Args:
+        seri_frame: Hazır SeriFrame (verilirse yeniden sort YOK)
+        magazalar: Sadece bu mağazaların serileri (opsiyonel)
+    """
+    detay, metin = _ayni_sayim_tablosu(df, mag_col, seri_frame, magazalar)
+    if metin is None:
+        return detay
+    detay['seri'] = metin.metinler()
+    return detay[_ayni_sayim_kolonlari(detay)]
+
+
+def hesapla_ayni_sayim_raw(df_magaza):
+    """
+    Aynı Sayım RAW Puanı (0-100)
 
-    for malzeme, grup in df.groupby('malzeme_kodu'):
-        if len(grup) < 2:
-            continue
+    Kural: Aynı ürün için ardışık 2+ envanterde aynı sayım miktarı
+    RAW = MIN(100, urun_sayisi × 5)
 
-        grup = grup.sort_values('envanter_sayisi').reset_index(drop=True)
-        sayimlar = grup['sayim'].tolist()
+    Not: Seri verisi yoksa 0 döner
+    """
+    bos = {'raw_puan': 0, 'katki_puan': 0, 'urun_sayisi': 0, 'seri_var': False, 'detay_df': pd.DataFrame()}
 
-        ardisik_ayni = 0
-        max_ardisik = 0
+    if df_magaza is None or df_magaza.empty:
+        return bos
 
-        for i in range(1, len(sayimlar)):
-            if sayimlar[i] == sayimlar[i-1] and sayimlar[i] > 0:
-                ardisik_ayni += 1
-                max_ardisik = max(max_ardisik, ardisik_ayni + 1)
-            else:
-                ardisik_ayni = 0
+    if 'malzeme_kodu' not in df_magaza.columns or 'envanter_sayisi' not in df_magaza.columns:
+        return bos
 
-        if max_ardisik >= 2:
-            ayni_urunler.append({
-                'malzeme_kodu': malzeme,
-                'malzeme_tanimi': grup.iloc[0].get('malzeme_tanimi', ''),
-                'depolama_kosulu': grup.iloc[0].get('depolama_kosulu', ''),
-                'seri': ' → '.join([f"{int(e)}:{s:.0f}" for e, s in zip(grup['envanter_sayisi'], grup['sayim'])]),
-                'ardisik_adet': max_ardisik,
-                'fark_tutari': get_numeric_col(grup, ['fark_tutari', 'Fark Tutarı']).sum()
-            })
+    env = pd.to_numeric(df_magaza['envanter_sayisi'], errors='coerce')
+    if env.nunique() < 2:
+        return bos
 
-    urun_sayisi = len(ayni_urunler)
+    detay_df = _ayni_sayim_detay(df_magaza)
+    urun_sayisi = len(detay_df)
 
     raw_puan = min(100, urun_sayisi * 5)
     katki_puan = round(raw_puan / 100 * MAX_KATKI['ayni_sayim'], 2)
 
-    detay_df = pd.DataFrame(ayni_urunler) if ayni_urunler else pd.DataFrame()
-
     return {
         'raw_puan': round(raw_puan, 2),
         'katki_puan': katki_puan,
@@ -637,9 +638,34 @@ def hesapla_magaza_risk_karnesi(df_magaza, bolge_acik_oran):
     """
     Mağaza için tüm risk kategorilerini hesaplar.
 
+    Sonuç, mağaza satırlarının parmak izi + bölge oranı + MAX_KATKI
+    konfigürasyonu ile process genelinde önbelleklenir (rerun/oturum/sekme).
+
     Returns:
-        dict: Tüm risk kategorileri, RAW puanlar, KATKI puanlar ve toplam
+        dict: Tüm risk kategorileri, RAW puanlar, KATKI puanlar ve toplam.
+              Her çağrıda yeni dict (kategori dict'leri dahil); detay
+              DataFrame'leri önbellekle paylaşılır, salt okunur.
     """
+    iz = veri_parmak_izi(df_magaza)
+    anahtar = None if iz is None else (iz, float(bolge_acik_oran), karne_config_anahtari())
+    if anahtar is not None:
+        karne = KARNE_ONBELLEGI.get(anahtar)
+        if karne is not None:
+            return _karne_kopyasi(karne)
+
+    karne = _hesapla_magaza_risk_karnesi(df_magaza, bolge_acik_oran)
+    if anahtar is not None:
+        KARNE_ONBELLEGI.put(anahtar, karne)
+    return _karne_kopyasi(karne)
+
+
+def _karne_kopyasi(karne):
+    """Önbellekteki karnenin çağırana ait kopyası (kategori dict'leri de kopyalanır)"""
+    return {k: type(v)(v) if isinstance(v, dict) else v for k, v in karne.items()}
+
+
+def _hesapla_magaza_risk_karnesi(df_magaza, bolge_acik_oran):
+    """hesapla_magaza_risk_karnesi'nin önbelleksiz hesabı"""
     # Mağaza açık oranı hesapla
     satis = get_numeric_col(df_magaza, ['satis_hasilati', 'Satış Hasılatı']).sum()
     fark = get_numeric_col(df_magaza, ['fark_tutari', 'Fark Tutarı']).sum()
@@ -730,10 +756,686 @@ def hesapla_magaza_risk_karnesi(df_magaza, bolge_acik_oran):
 
 # ==================== VEKTÖREL HESAPLAMA (TÜM MAĞAZALAR) ====================
 
-def hesapla_tum_magazalar_risk(df_bolge):
+# Karne sırası: top3 eşitlikte bu sırayı korur (hesapla_magaza_risk_karnesi ile aynı)
+KATEGORI_SIRASI = [
+    ('ic_hirsizlik', 'İç Hırsızlık'),
+    ('acik_orani', 'Açık Oranı'),
+    ('sayim_disiplini', 'Sayım Disiplini'),
+    ('kronik_acik', 'Kronik Açık'),
+    ('kronik_fire', 'Kronik Fire'),
+    ('yuksek_sayim', 'Yüksek Sayım'),
+    ('ayni_sayim', 'Aynı Sayım'),
+    ('tam_sayili', 'Tam Sayılı')
+]
+
+ACIK_ORANI_X = [0.5, 1.0, 1.5, 2.0, 2.5]
+ACIK_ORANI_Y = [0, 20, 45, 70, 100]
+
+
+def _katki(raw, risk_key):
+    """RAW (0-100) kolonundan KATKI kolonu - MAX_KATKI ile kolon bazlı"""
+    return np.round(raw / 100 * MAX_KATKI[risk_key], 2)
+
+
+def _ilk_kolon(df, col_names):
+    """Listede DataFrame'de bulunan ilk kolon adı (yoksa None)"""
+    for col in col_names:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _icerir(seri, desen):
+    """seri.str.contains(desen, case=False, na=False) - desen tekil değer başına bir kez aranır"""
+    kodlar, tekiller = pd.factorize(seri)
+    eslesme = pd.Series(tekiller, dtype=object).str.contains(desen, case=False, na=False).to_numpy(dtype=bool)
+    # NaN (-1) -> son eleman (False)
+    return pd.Series(np.append(eslesme, False)[kodlar], index=seri.index)
+
+
+def _hesapla_kategoriler(df_bolge, mag_col, seri_frame=None):
+    """
+    8 risk kategorisinin tüm mağazalar için RAW/KATKI tablosu (bölgeden bağımsız kısım).
+    Seri kategorileri (kronik açık/fire, aynı sayım) tek SeriFrame üzerinden.
+    Açık oranı puanı ve toplamlar _puanla_tablo'da eklenir.
+
+    Returns:
+        tablo: index=mağaza kodu, kategori metrikleri (kolon bazlı)
+        parcalar: kategori -> bölge çapı DetayKaynagi (mag_col içerir); detay
+                  satırları df_bolge pozisyonları olarak tutulur, kopyalanmaz
+    """
+    gecerli = df_bolge[mag_col].notna().to_numpy()
+    if gecerli.all():
+        df, gecerli_poz = df_bolge, None
+    else:
+        df, gecerli_poz = df_bolge[gecerli], np.flatnonzero(gecerli)
+
+    def satirlar(mask):
+        """df maskesi -> detay satırlarının df_bolge pozisyonları"""
+        poz = np.flatnonzero(np.asarray(mask))
+        return poz if gecerli_poz is None else gecerli_poz[poz]
+
+    # Mağaza kodu bir kez tamsayıya çevrilir: gruplamalar metin yerine kod üzerinden
+    mag_kod, mag_tekil = pd.factorize(df[mag_col])
+    magazalar = pd.Index(mag_tekil)
+    kod = pd.Series(mag_kod, index=df.index)
+    kod_araligi = pd.RangeIndex(len(magazalar))
+    tablo = pd.DataFrame(index=magazalar)
+    parcalar = {}
+
+    def magaza_bazli(sonuc, fill_value=0):
+        """Mağaza kodu (tamsayı) indeksli sonuç -> mağaza indeksli, eksik mağazalar fill_value"""
+        return sonuc.reindex(kod_araligi, fill_value=fill_value).set_axis(magazalar)
+
+    def topla(seri):
+        return magaza_bazli(seri.groupby(kod, sort=False).sum())
+
+    # --- Açık oranı ---
+    satis = topla(get_numeric_col(df, ['satis_hasilati', 'Satış Hasılatı']))
+    fark = topla(get_numeric_col(df, ['fark_tutari', 'Fark Tutarı']))
+    fire = topla(get_numeric_col(df, ['fire_tutari', 'Fire Tutarı']))
+    toplam_acik = fark + fire
+    acik_oran = pd.Series(
+        np.where(satis > 0, (toplam_acik / satis.where(satis > 0, 1)).abs(), 0),
+        index=magazalar
+    )
+    tablo['toplam_satis'] = satis
+    tablo['toplam_acik'] = toplam_acik
+    tablo['acik_oran'] = acik_oran
+
+    # --- İç hırsızlık ---
+    iptal_tutar = get_numeric_col(df, ['iptal_satir_tutari', 'İptal Satır Tutarı'])
+    iptal_miktar = get_numeric_col(df, ['iptal_satir_miktari', 'İptal Satır Miktarı'])
+    fark_miktar = get_numeric_col(df, ['fark_miktari', 'Fark Miktarı'])
+    temel_mask = (iptal_tutar <= -200) & (fark_miktar < 0) & (iptal_miktar != 0)
+    cok_buyuk_mask = temel_mask & ((fark_miktar - iptal_miktar).abs() < 0.01)
+    supheli = topla(temel_mask.astype(int))
+    cok_buyuk = topla(cok_buyuk_mask.astype(int))
+    raw_ic = np.minimum(100, supheli * 2 + cok_buyuk * 8)
+    tablo['ic_supheli_satir'] = supheli
+    tablo['ic_cok_buyuk'] = cok_buyuk
+    tablo['raw_ic_hirsizlik'] = raw_ic
+    tablo['katki_ic_hirsizlik'] = _katki(raw_ic, 'ic_hirsizlik')
+    if temel_mask.any():
+        parcalar['ic_hirsizlik'] = DetayKaynagi(df_bolge, satirlar(temel_mask), {
+            'risk_seviyesi': np.where(cok_buyuk_mask[temel_mask], 'ÇOK BÜYÜK RİSK', 'YÜKSEK RİSK')
+        })
+
+    # --- Yüksek sayım ---
+    sayim = get_numeric_col(df, ['sayim_miktari', 'Sayım Miktarı'])
+    yuksek_mask = sayim >= 50
+    yuksek_urun = topla(yuksek_mask.astype(int))
+    max_sayim = magaza_bazli(sayim[yuksek_mask].groupby(kod[yuksek_mask], sort=False).max())
+    raw_yuksek = np.minimum(100, yuksek_urun * 5)
+    tablo['yuksek_sayim_urun'] = yuksek_urun
+    tablo['yuksek_max_sayim'] = np.round(max_sayim, 2)
+    tablo['raw_yuksek_sayim'] = raw_yuksek
+    tablo['katki_yuksek_sayim'] = _katki(raw_yuksek, 'yuksek_sayim')
+    if yuksek_mask.any():
+        parcalar['yuksek_sayim'] = DetayKaynagi(df_bolge, satirlar(yuksek_mask), {
+            'sayim_miktari_calc': sayim[yuksek_mask].to_numpy()
+        })
+
+    # --- Seri (en az 2 farklı envanter_sayisi olan mağazalar) ---
+    if 'malzeme_kodu' in df.columns and 'envanter_sayisi' in df.columns:
+        env_num = pd.to_numeric(df['envanter_sayisi'], errors='coerce')
+        seri_var = (magaza_bazli(env_num.groupby(kod, sort=False).nunique()) >= 2)
+    else:
+        seri_var = pd.Series(False, index=magazalar)
+    tablo['seri_var'] = seri_var
+
+    # --- Kronik açık / kronik fire (seri kernel: tek sort, iki bayrak) ---
+    if seri_frame is None:
+        seri_frame = SeriFrame(df, mag_col=mag_col)
+    bayraklar = ardisik_donem_bayraklari(None, KRONIK_ESIK, ek_kolonlar=['malzeme_tanimi'], seri_frame=seri_frame)
+    for risk_key, ad in [('kronik_acik', 'acik'), ('kronik_fire', 'fire')]:
+        hits = kronik_ilk_eslesmeler(bayraklar, ad, mag_col=mag_col)
+        if hits.empty:
+            urun = pd.Series(0, index=magazalar)
+            tutar = pd.Series(0.0, index=magazalar)
+        else:
+            hits = _kronik_detay_df(hits, ad, mag_col)
+            hg = hits.groupby(mag_col, sort=False)
+            urun = hg.size().reindex(magazalar, fill_value=0)
+            tutar = hg['toplam'].sum().reindex(magazalar, fill_value=0)
+            parcalar[risk_key] = DetayKaynagi.tablo(hits)
+        raw = np.minimum(100, urun * 10)
+        tablo[f'{risk_key}_urun'] = urun
+        tablo[f'{risk_key}_tutar'] = np.round(tutar, 2)
+        tablo[f'raw_{risk_key}'] = raw
+        tablo[f'katki_{risk_key}'] = _katki(raw, risk_key)
+
+    # --- Tam sayılı ---
+    depolama_col = _ilk_kolon(df, ['depolama_kosulu', 'Depolama Koşulu'])
+    if depolama_col is not None:
+        depolama = df[depolama_col]
+        tam_kapsam = _icerir(depolama, 'Meyve|Sebz|Et|Tavuk')
+        tam_mask = tam_kapsam & (sayim > 0) & (sayim % 1 == 0)
+        malzeme_col = _ilk_kolon(df, ['malzeme_tanimi', 'Malzeme Tanımı'])
+        if malzeme_col:
+            istisna_pattern = r'PAKET|FİLE|ADET|BÜTÜN|TABAK|500G|1KG|250G|300G|380G|200G'
+            tam_mask = tam_mask & ~_icerir(df[malzeme_col], istisna_pattern)
+        fark_tutar = get_numeric_col(df, ['fark_tutari', 'Fark Tutarı'])
+        tam_urun = topla(tam_mask.astype(int))
+        tam_buyuk = topla((tam_mask & (fark_tutar == 0)).astype(int))
+        if tam_mask.any():
+            parcalar['tam_sayili'] = DetayKaynagi(df_bolge, satirlar(tam_mask))
+    else:
+        tam_urun = pd.Series(0, index=magazalar)
+        tam_buyuk = pd.Series(0, index=magazalar)
+    raw_tam = np.minimum(100, tam_urun * 4)
+    tablo['tam_sayili_urun'] = tam_urun
+    tablo['tam_sayili_buyuk_risk'] = tam_buyuk
+    tablo['raw_tam_sayili'] = raw_tam
+    tablo['katki_tam_sayili'] = _katki(raw_tam, 'tam_sayili')
+
+    # --- Aynı sayım ---
+    # 'seri' metni sadece açılan mağazalar için üretilir (SeriMetni)
+    ayni, ayni_metin = _ayni_sayim_tablosu(None, seri_frame=seri_frame, magazalar=seri_var[seri_var].index)
+    if ayni.empty:
+        ayni_urun = pd.Series(0, index=magazalar)
+    else:
+        ayni_urun = ayni.groupby(mag_col, sort=False).size().reindex(magazalar, fill_value=0)
+        parcalar['ayni_sayim'] = DetayKaynagi.tablo(ayni, {'seri': ayni_metin}, _ayni_sayim_kolonlari(ayni))
+    raw_ayni = np.minimum(100, ayni_urun * 5)
+    tablo['ayni_sayim_urun'] = ayni_urun
+    tablo['raw_ayni_sayim'] = raw_ayni
+    tablo['katki_ayni_sayim'] = _katki(raw_ayni, 'ayni_sayim')
+
+    # --- Sayım disiplini ---
+    if depolama_col is not None:
+        dis_kapsam = _icerir(df[depolama_col], 'Meyve|Sebz|Et|Tavuk|Ekmek')
+        env = get_numeric_col(df, ['envanter_sayisi', 'Envanter Sayisi']).astype(int)
+        env_k = env[dis_kapsam]
+        kod_k = kod[dis_kapsam]
+        dis_toplam = magaza_bazli(env_k.groupby(kod_k, sort=False).size())
+        beklenen = env_k.groupby(kod_k, sort=False).max().clip(upper=4).clip(lower=1)
+        beklenen_satir = kod_k.map(beklenen)
+        beklenen = magaza_bazli(beklenen, fill_value=1)
+        sifir_mask = env_k == 0
+        eksik_mask = (env_k > 0) & (env_k < beklenen_satir)
+        tam_d_mask = env_k >= beklenen_satir
+        dis_sifir = magaza_bazli(sifir_mask.groupby(kod_k, sort=False).sum())
+        dis_eksik = magaza_bazli(eksik_mask.groupby(kod_k, sort=False).sum())
+        dis_tam = magaza_bazli(tam_d_mask.groupby(kod_k, sort=False).sum())
+        if dis_kapsam.any():
+            kapsam_poz = satirlar(dis_kapsam)
+            env_kapsam = env_k.to_numpy()
+            for kategori, alt_mask in [('disiplin_sifir', sifir_mask), ('disiplin_eksik', eksik_mask)]:
+                alt = alt_mask.to_numpy()
+                if alt.any():
+                    parcalar[kategori] = DetayKaynagi(df_bolge, kapsam_poz[alt], {'envanter': env_kapsam[alt]})
+    else:
+        dis_toplam = dis_sifir = dis_eksik = dis_tam = pd.Series(0, index=magazalar)
+        beklenen = pd.Series(1, index=magazalar)
+
+    payda = dis_toplam.where(dis_toplam > 0, 1)
+    r0 = np.where(dis_toplam > 0, dis_sifir / payda, 0)
+    rmiss = np.where(dis_toplam > 0, dis_eksik / payda, 0)
+    hic_yapmadi = (r0 == 1) & (dis_toplam > 0)
+    raw_dis = np.minimum(100, 100 * (0.65 * r0 + 0.35 * rmiss) + np.where(hic_yapmadi, 15, 0))
+    tablo['disiplin_toplam'] = dis_toplam
+    tablo['disiplin_sifir'] = dis_sifir
+    tablo['disiplin_eksik'] = dis_eksik
+    tablo['disiplin_tam'] = dis_tam
+    tablo['disiplin_sifir_oran'] = np.round(r0, 4)
+    tablo['disiplin_eksik_oran'] = np.round(rmiss, 4)
+    tablo['disiplin_hic_yapmadi'] = hic_yapmadi
+    tablo['disiplin_beklenen'] = beklenen
+    tablo['raw_sayim_disiplini'] = np.round(raw_dis, 2)
+    tablo['katki_sayim_disiplini'] = _katki(raw_dis, 'sayim_disiplini')
+
+    return tablo, parcalar
+
+
+def _puanla_tablo(tablo, bolge_acik_oran):
+    """
+    Bölgeye bağlı kısım: açık oranı katsayısı (bölge oranına göre), toplam
+    puan, seviye, top3 ve teşhis. Kolon bazlı; mağaza kategori tablosu
+    (bölgeden bağımsız, önbelleklenebilir) üzerine uygulanır.
+    """
+    tablo = tablo.copy()
+
+    # --- Açık oranı (bölge oranına göre katsayı) ---
+    bolge_payda = bolge_acik_oran if bolge_acik_oran != 0 else 0.001
+    katsayi = tablo['acik_oran'].abs() / abs(bolge_payda)
+    raw_acik = pd.Series(np.interp(katsayi, ACIK_ORANI_X, ACIK_ORANI_Y), index=tablo.index)
+    tablo['katsayi'] = np.round(katsayi, 4)
+    tablo['raw_acik_orani'] = np.round(raw_acik, 2)
+    tablo['katki_acik_orani'] = _katki(raw_acik, 'acik_orani')
+    tablo['bolge_oran'] = round(bolge_payda * 100, 2)
+
+    # --- Toplam: KATKI toplamı -> TOPLAM_MAX_KATKI ile normalize (0-100) ---
+    katki_cols = [f'katki_{k}' for k, _ in KATEGORI_SIRASI]
+    toplam_katki = tablo[katki_cols].sum(axis=1)
+    tablo['toplam_katki'] = np.round(toplam_katki, 2)
+    tablo['toplam_puan'] = np.minimum(100, np.round(toplam_katki / TOPLAM_MAX_KATKI * 100, 2))
+
+    puan = tablo['toplam_puan']
+    kosullar = [puan >= 60, puan >= 40, puan >= 20]
+    tablo['seviye'] = np.select(kosullar, ['KRİTİK', 'RİSKLİ', 'DİKKAT'], 'TEMİZ')
+    tablo['emoji'] = np.select(kosullar, ['🔴', '🟠', '🟡'], '🟢')
+
+    # Top 3 (RAW puana göre, eşitlikte karne sırası)
+    raw_matris = tablo[[f'raw_{k}' for k, _ in KATEGORI_SIRASI]].to_numpy(dtype=float)
+    sira = np.argsort(-raw_matris, axis=1, kind='stable')[:, :3]
+    isimler = [ad for _, ad in KATEGORI_SIRASI]
+    tablo['top3'] = [
+        ' | '.join(f"{isimler[j]}:{raw_matris[i, j]:.0f}" for j in sira[i] if raw_matris[i, j] > 0)
+        for i in range(len(tablo))
+    ]
+
+    # Teşhis cümlesi
+    teshisler = []
+    for ic_n, acik_raw, kat, hic, sifir_o, yuksek_n, tam_n in zip(
+        tablo['ic_supheli_satir'], tablo['raw_acik_orani'], tablo['katsayi'],
+        tablo['disiplin_hic_yapmadi'], tablo['disiplin_sifir_oran'],
+        tablo['yuksek_sayim_urun'], tablo['tam_sayili_urun']
+    ):
+        parts = []
+        if ic_n > 0:
+            parts.append(f"İç hırsızlık şüphesi: {ic_n} satır")
+        if acik_raw > 50:
+            parts.append(f"Yüksek açık oranı (katsayı: {kat:.1f}x)")
+        if hic:
+            parts.append("HİÇ SAYIM YAPMAMIŞ!")
+        elif sifir_o > 0.3:
+            parts.append(f"Sayım disiplini zayıf (%{sifir_o*100:.0f} sıfır)")
+        if yuksek_n > 0:
+            parts.append(f"Yüksek sayım: {yuksek_n} ürün")
+        if tam_n > 0:
+            parts.append(f"Tam sayılı şüphe: {tam_n} ürün")
+        teshisler.append(' | '.join(parts) if parts else 'Normal')
+    tablo['teshis'] = teshisler
+
+    return tablo
+
+
+# ==================== PARALEL HESAPLAMA (PROCESS POOL) ====================
+# Büyük bölgelerde (GM: binlerce mağaza) kategori hesabı mağaza bazlı
+# bölümlenip process havuzuna dağıtılır. Her mağaza tek parçadadır;
+# bölge açık oranı gibi bölge geneli girdiler tüm parçalara aynen gider.
+
+PARALEL_MIN_MAGAZA = 400
+
+_havuz = None
+_havuz_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _kullanilabilir_cpu():
+    """Konteynerde kullanılabilir CPU sayısı (affinity esas alınır)"""
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def _get_havuz(max_workers):
+    """
+    Süreç boyu tekrar kullanılan process havuzu (spawn: Streamlit thread'leriyle güvenli).
+
+    Havuz süreç başına BİR kez boyutlanır (CPU sayısı veya ilk istenen işçi sayısı,
+    hangisi büyükse). Farklı max_workers isteyen çağrılar aynı havuzu kullanır,
+    parça sayısını kendileri belirler: başka oturumun işi sürerken havuz
+    kapatılmaz / değiştirilmez. Sadece bozulan havuz (_havuzu_birak) yenilenir.
+    """
+    global _havuz
+    with _havuz_lock:
+        if _havuz is None:
+            _havuz = ProcessPoolExecutor(
+                max_workers=max(max_workers, _kullanilabilir_cpu()),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _havuz
+
+
+def _havuzu_birak(havuz):
+    """Bozulan havuzu (BrokenProcessPool) bırak: kapatılır, sonraki çağrı yenisini kurar"""
+    global _havuz
+    with _havuz_lock:
+        if _havuz is havuz:
+            _havuz = None
+    havuz.shutdown(wait=False, cancel_futures=True)
+
+
+def _kategori_parcasi(args):
+    """
+    Havuz işçisi: bir mağaza parçası için kategori tablosu.
+    Parça verisine bağlı detay kaynakları bölge pozisyonlarına çevrilip tabansız
+    döner (parça kopyası geri taşınmaz); ana süreç tabanı df_bolge yapar.
+    """
+    df_parca, mag_col, bolge_poz = args
+    tablo, parcalar = _hesapla_kategoriler(df_parca, mag_col)
+    for kaynak in parcalar.values():
+        if kaynak.taban is df_parca:
+            kaynak.taban = None
+            kaynak.pozisyonlar = bolge_poz[kaynak.pozisyonlar]
+    return tablo, parcalar
+
+
+def _hesapla_kategoriler_paralel(df_bolge, mag_col, max_workers):
+    """
+    _hesapla_kategoriler'in process havuzunda mağaza bölümlemeli çalışan hali.
+    Sonuç seri hesapla birebir aynıdır (mağaza sırası korunur).
+    """
+    gecerli_poz = np.flatnonzero(df_bolge[mag_col].notna().to_numpy())
+    mag = df_bolge[mag_col].take(gecerli_poz)
+    magazalar = pd.Index(mag.unique())
+    parca_sayisi = min(max_workers * 2, len(magazalar))
+
+    # Mağazalar parçalara sırayla dağıtılır (yük dengesi), tek groupby ile bölünür
+    parca_no = pd.Series(np.arange(len(magazalar)) % parca_sayisi, index=magazalar)
+    parca = mag.map(parca_no).to_numpy()
+    parca_indeksleri = pd.Series(parca).groupby(parca).indices
+    gorevler = []
+    for _, yerel in sorted(parca_indeksleri.items()):
+        bolge_poz = gecerli_poz[yerel]
+        gorevler.append((df_bolge.take(bolge_poz), mag_col, bolge_poz))
+
+    havuz = _get_havuz(max_workers)
+    try:
+        sonuclar = list(havuz.map(_kategori_parcasi, gorevler))
+    except BrokenProcessPool:
+        # Ölü işçili havuz tekrar kullanılmaz; bu çağrı seri hesaba düşer
+        _havuzu_birak(havuz)
+        raise
+
+    tablo = pd.concat([t for t, _ in sonuclar]).reindex(magazalar)
+    parcalar = {}
+    for kategori in {k for _, p in sonuclar for k in p}:
+        kaynaklar = [p[kategori] for _, p in sonuclar if kategori in p]
+        for kaynak in kaynaklar:
+            if kaynak.taban is None:
+                kaynak.taban = df_bolge
+        parcalar[kategori] = DetayKaynagi.birlestir(kaynaklar)
+    return tablo, parcalar
+
+
+def _paralel_isci_sayisi(df_bolge, mag_col, max_workers):
+    """Kullanılacak işçi sayısı (1 = seri hesap)"""
+    if max_workers is None:
+        if df_bolge[mag_col].nunique() < PARALEL_MIN_MAGAZA:
+            return 1
+        max_workers = _kullanilabilir_cpu()
+    return max(1, min(int(max_workers), df_bolge[mag_col].nunique()))
+
+
+# ==================== TEMBEL DETAY (LAZY DRILL-DOWN) ====================
+
+class DetayKaynagi:
+    """
+    Bölge çapı detay tablosunun tarifi - DataFrame ÜRETİLMEZ.
+
+    taban: Satırların alındığı DataFrame (bölge verisinin kendisi veya
+           kronik / aynı sayım gibi küçük türetilmiş tablo)
+    pozisyonlar: Detay satırlarının taban içindeki pozisyonları
+    ek: kolon -> pozisyonlarla hizalı dizi (ör. risk_seviyesi) veya SeriMetni
+    kolonlar: Sonuç kolon sırası (None: taban kolonları + ek)
+
+    Not: Bölge verisine referans tutar (kopya değil); kaynak yaşadıkça bölge
+    verisi de bellekte kalır. Karne önbelleği bu yüzden en fazla
+    KATEGORI_TABAN_LIMITI hesaplamanın kaynaklarını tutar (bkz. karne_cache).
+    """
+
+    __slots__ = ('taban', 'pozisyonlar', 'ek', 'kolonlar')
+
+    def __init__(self, taban, pozisyonlar, ek=None, kolonlar=None):
+        self.taban = taban
+        self.pozisyonlar = pozisyonlar
+        self.ek = ek or {}
+        self.kolonlar = kolonlar
+
+    @classmethod
+    def tablo(cls, df, ek=None, kolonlar=None):
+        """Türetilmiş tablonun tüm satırları"""
+        return cls(df, np.arange(len(df)), ek, kolonlar)
+
+    def __len__(self):
+        return len(self.pozisyonlar)
+
+    def degerler(self, kolon):
+        """Detay satırlarının kolon değerleri (DataFrame üretmeden)"""
+        return self.taban[kolon].to_numpy()[self.pozisyonlar]
+
+    def uret(self, secim=None):
+        """Detay DataFrame'i (secim: detay içi pozisyonlar, None: hepsi) - her çağrıda yeni kopya"""
+        pozisyonlar = self.pozisyonlar if secim is None else self.pozisyonlar[secim]
+        df = self.taban.take(pozisyonlar)
+        for kolon, deger in self.ek.items():
+            if isinstance(deger, SeriMetni):
+                df[kolon] = deger.metinler(secim)
+            else:
+                df[kolon] = deger if secim is None else deger[secim]
+        if self.kolonlar is not None:
+            df = df[self.kolonlar]
+        return df
+
+    @classmethod
+    def birlestir(cls, kaynaklar):
+        """Parça kaynaklarını (process havuzu) parça sırasıyla tek kaynakta birleştir"""
+        ilk = kaynaklar[0]
+        if len(kaynaklar) == 1:
+            return ilk
+        if all(k.taban is ilk.taban for k in kaynaklar):
+            taban = ilk.taban
+            pozisyonlar = np.concatenate([k.pozisyonlar for k in kaynaklar])
+        else:
+            taban = pd.concat([k.taban for k in kaynaklar])
+            kaydir = np.cumsum([0] + [len(k.taban) for k in kaynaklar[:-1]])
+            pozisyonlar = np.concatenate([k.pozisyonlar + d for k, d in zip(kaynaklar, kaydir)])
+        ek = {}
+        for kolon, deger in ilk.ek.items():
+            parcalar = [k.ek[kolon] for k in kaynaklar]
+            ek[kolon] = SeriMetni.birlestir(parcalar) if isinstance(deger, SeriMetni) else np.concatenate(parcalar)
+        return cls(taban, pozisyonlar, ek, ilk.kolonlar)
+
+
+class TembelDetay:
+    """
+    Tek mağazanın detay tablosu: kaynak (DetayKaynagi) + mağazanın detay içi pozisyonları.
+
+    DataFrame sadece olustur() çağrıldığında (drill-down / Excel) üretilir;
+    karne sonucu mağaza başına kopya yerine pozisyon dizisi tutar.
+    """
+
+    __slots__ = ('_kaynak', '_pozisyonlar', '_drop_col')
+
+    def __init__(self, kaynak, pozisyonlar, drop_col=None):
+        self._kaynak = kaynak
+        self._pozisyonlar = pozisyonlar
+        self._drop_col = drop_col
+
+    def __len__(self):
+        return len(self._pozisyonlar)
+
+    @property
+    def empty(self):
+        return len(self._pozisyonlar) == 0
+
+    def olustur(self):
+        """Detay DataFrame'ini üret (her çağrıda yeni kopya)"""
+        df = self._kaynak.uret(self._pozisyonlar)
+        if self._drop_col is not None:
+            df = df.drop(columns=[self._drop_col]).reset_index(drop=True)
+        return df
+
+
+def _detay_degeri(deger):
+    return deger.olustur() if isinstance(deger, TembelDetay) else deger
+
+
+class KarneKategori(dict):
+    """
+    Karne kategori dict'i: TembelDetay değerleri erişimde DataFrame'e dönüşür.
+    Mevcut kullanım (karne['risk_x']['detay_df']) aynen çalışır.
+    """
+
+    def __getitem__(self, anahtar):
+        return _detay_degeri(dict.__getitem__(self, anahtar))
+
+    def get(self, anahtar, varsayilan=None):
+        return _detay_degeri(dict.get(self, anahtar, varsayilan))
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def olustur(self):
+        """Tüm detayları üretilmiş düz dict"""
+        return dict(self.items())
+
+
+def _karne_from_tablo(t, detay):
+    """
+    Vektörel tablonun bir satırından hesapla_magaza_risk_karnesi formatında dict.
+    detay: kategori -> o mağazanın TembelDetay'ı (erişimde DataFrame üretilir)
+    """
+    bos = pd.DataFrame()
+    return {
+        'toplam_puan': t['toplam_puan'],
+        'toplam_katki': t['toplam_katki'],
+        'seviye': t['seviye'],
+        'emoji': t['emoji'],
+        'top3_str': t['top3'],
+        'teshis': t['teshis'],
+        'toplam_satis': t['toplam_satis'],
+        'toplam_acik': t['toplam_acik'],
+        'acik_oran': t['acik_oran'],
+        'risk_acik_orani': {
+            'raw_puan': t['raw_acik_orani'], 'katki_puan': t['katki_acik_orani'],
+            'katsayi': t['katsayi'], 'magaza_oran': round(t['acik_oran'] * 100, 2),
+            'bolge_oran': t['bolge_oran']
+        },
+        'risk_ic_hirsizlik': KarneKategori({
+            'raw_puan': t['raw_ic_hirsizlik'], 'katki_puan': t['katki_ic_hirsizlik'],
+            'supheli_satir': t['ic_supheli_satir'], 'cok_buyuk_risk': t['ic_cok_buyuk'],
+            'detay_df': detay.get('ic_hirsizlik', bos)
+        }),
+        'risk_yuksek_sayim': KarneKategori({
+            'raw_puan': t['raw_yuksek_sayim'], 'katki_puan': t['katki_yuksek_sayim'],
+            'urun_sayisi': t['yuksek_sayim_urun'], 'max_sayim': t['yuksek_max_sayim'],
+            'detay_df': detay.get('yuksek_sayim', bos)
+        }),
+        'risk_kronik_acik': KarneKategori({
+            'raw_puan': t['raw_kronik_acik'], 'katki_puan': t['katki_kronik_acik'],
+            'urun_sayisi': t['kronik_acik_urun'], 'toplam_tutar': t['kronik_acik_tutar'],
+            'seri_var': t['seri_var'], 'detay_df': detay.get('kronik_acik', bos)
+        }),
+        'risk_kronik_fire': KarneKategori({
+            'raw_puan': t['raw_kronik_fire'], 'katki_puan': t['katki_kronik_fire'],
+            'urun_sayisi': t['kronik_fire_urun'], 'toplam_tutar': t['kronik_fire_tutar'],
+            'seri_var': t['seri_var'], 'detay_df': detay.get('kronik_fire', bos)
+        }),
+        'risk_tam_sayili': KarneKategori({
+            'raw_puan': t['raw_tam_sayili'], 'katki_puan': t['katki_tam_sayili'],
+            'urun_sayisi': t['tam_sayili_urun'], 'buyuk_risk': t['tam_sayili_buyuk_risk'],
+            'detay_df': detay.get('tam_sayili', bos)
+        }),
+        'risk_ayni_sayim': KarneKategori({
+            'raw_puan': t['raw_ayni_sayim'], 'katki_puan': t['katki_ayni_sayim'],
+            'urun_sayisi': t['ayni_sayim_urun'], 'seri_var': t['seri_var'],
+            'detay_df': detay.get('ayni_sayim', bos)
+        }),
+        'risk_sayim_disiplini': KarneKategori({
+            'raw_puan': t['raw_sayim_disiplini'], 'katki_puan': t['katki_sayim_disiplini'],
+            'toplam_urun': t['disiplin_toplam'], 'sifir_urun': t['disiplin_sifir'],
+            'eksik_urun': t['disiplin_eksik'], 'tam_urun': t['disiplin_tam'],
+            'sifir_oran': t['disiplin_sifir_oran'], 'eksik_oran': t['disiplin_eksik_oran'],
+            'hic_yapmadi': t['disiplin_hic_yapmadi'], 'beklenen': t['disiplin_beklenen'],
+            'detay_sifir_df': detay.get('disiplin_sifir', bos),
+            'detay_eksik_df': detay.get('disiplin_eksik', bos)
+        })
+    }
+
+
+def _detaylari_bol(parcalar, mag_col, magazalar):
+    """
+    Bölge çapı detay kaynakları mağazaya tek groupby ile bölünür.
+    Kopya YOK: mağaza başına sadece detay içi pozisyonlar (TembelDetay) tutulur.
+    """
+    detay_map = {mag: {} for mag in magazalar}
+    for kategori, kaynak in parcalar.items():
+        drop_col = mag_col if kategori in ('kronik_acik', 'kronik_fire', 'ayni_sayim') else None
+        mag = pd.DataFrame({mag_col: kaynak.degerler(mag_col)})
+        for deger, pozisyonlar in mag.groupby(mag_col, sort=False).indices.items():
+            if deger in detay_map:
+                detay_map[deger][kategori] = TembelDetay(kaynak, pozisyonlar, drop_col)
+    return detay_map
+
+
+def _hesapla_kategori_detay(df, mag_col, seri_frame, max_workers):
+    """Kategori tablosu + mağaza detayları (gerekirse process havuzunda)"""
+    isci = _paralel_isci_sayisi(df, mag_col, max_workers)
+    tablo = None
+    if isci > 1:
+        try:
+            tablo, parcalar = _hesapla_kategoriler_paralel(df, mag_col, isci)
+        except Exception:
+            # Havuz kullanılamazsa seri hesaba düş
+            logger.warning("Risk karnesi process havuzu kullanılamadı, seri hesaplanıyor", exc_info=True)
+            tablo = None
+    if tablo is None:
+        tablo, parcalar = _hesapla_kategoriler(df, mag_col, seri_frame)
+    return tablo, _detaylari_bol(parcalar, mag_col, tablo.index)
+
+
+def _kategori_tablosu(df_bolge, mag_col, seri_frame, max_workers, onbellek):
+    """
+    Bölgeden bağımsız kategori tablosu + mağaza detayları, mağaza önbelleği ile.
+
+    Her mağazanın satırları hash'lenir; parmak izi + MAX_KATKI konfigürasyonu
+    önbellekte olan mağazalar yeniden hesaplanmaz. Sadece eksik mağazaların
+    satırları hesaplanır, sonuç mağaza görünüm sırasıyla birleştirilir.
+    """
+    izler = magaza_parmak_izleri(df_bolge, mag_col) if onbellek else None
+    if not izler:
+        return _hesapla_kategori_detay(df_bolge, mag_col, seri_frame, max_workers)
+
+    config = karne_config_anahtari()
+    kolonlar = tuple(df_bolge.columns)
+    anahtarlar = {mag: (mag_col, kolonlar, iz, config) for mag, iz in izler.items()}
+    kayitlar = {mag: KATEGORI_ONBELLEGI.get(a) for mag, a in anahtarlar.items()}
+    eksik = [mag for mag, kayit in kayitlar.items() if kayit is None]
+
+    if eksik:
+        if len(eksik) == len(anahtarlar):
+            df_eksik = df_bolge
+        else:
+            df_eksik = df_bolge[df_bolge[mag_col].isin(eksik)]
+            seri_frame = None  # Ön kurulu seri df_bolge içindir
+        tablo, detay_map = _hesapla_kategori_detay(df_eksik, mag_col, seri_frame, max_workers)
+        # Bu hesaplamanın kayıtları tek grup: aynı taban frame'ini paylaşırlar,
+        # grup düşünce taban da bırakılır
+        taban = object()
+        for mag, satir in zip(tablo.index, tablo.to_dict('records')):
+            kayit = (satir, detay_map[mag])
+            KATEGORI_ONBELLEGI.put(anahtarlar[mag], kayit, grup=taban)
+            kayitlar[mag] = kayit
+        if len(eksik) == len(anahtarlar):
+            return tablo, detay_map
+
+    magazalar = pd.Index([mag for mag in df_bolge[mag_col].unique() if kayitlar.get(mag) is not None])
+    tablo = pd.DataFrame([kayitlar[mag][0] for mag in magazalar], index=magazalar)
+    return tablo, {mag: kayitlar[mag][1] for mag in magazalar}
+
+
+def hesapla_tum_magazalar_risk(df_bolge, seri_frame=None, max_workers=None, onbellek=True):
     """
     Bölgedeki tüm mağazalar için risk karnesi hesapla (vektörel).
 
+    8 kategori tüm mağazalar için groupby ile tek geçişte hesaplanır;
+    MAX_KATKI ve TOPLAM_MAX_KATKI normalizasyonu kolon bazlı uygulanır.
+    Mağaza başına maske + hesapla_magaza_risk_karnesi çağrısı YOK.
+
+    Args:
+        df_bolge: Bölge verisi
+        seri_frame: df_bolge için önceden kurulmuş SeriFrame (opsiyonel)
+        max_workers: Process havuzu işçi sayısı. None: PARALEL_MIN_MAGAZA ve
+                     üzeri mağazada CPU sayısı kadar, altında seri. 1: hep seri.
+        onbellek: True ise mağaza parmak izi ile process genelindeki karne
+                  önbelleği kullanılır; sadece değişen mağazalar hesaplanır.
+
     Returns:
         pd.DataFrame: Mağaza bazlı özet
         dict: Mağaza detayları
@@ -749,76 +1451,49 @@ def hesapla_tum_magazalar_risk(df_bolge):
     bolge_acik_oran = abs(bolge_acik / bolge_satis) if bolge_satis > 0 else 0
 
     # Mağaza kodu kontrolü
-    mag_col = None
-    for col in ['magaza_kodu', 'Mağaza Kodu']:
-        if col in df_bolge.columns:
-            mag_col = col
-            break
-
+    mag_col = _ilk_kolon(df_bolge, ['magaza_kodu', 'Mağaza Kodu'])
     if mag_col is None:
         return pd.DataFrame(), {}
 
-    magazalar = df_bolge[mag_col].unique()
+    tablo, detay_map = _kategori_tablosu(df_bolge, mag_col, seri_frame, max_workers, onbellek)
+    if tablo.empty:
+        return pd.DataFrame(), {}
+    tablo = _puanla_tablo(tablo, bolge_acik_oran)
+
+    # Mağaza bilgileri (ilk satır)
+    df = df_bolge[df_bolge[mag_col].notna()]
+    bilgi_cols = [c for c in ['magaza_tanim', 'satis_muduru', 'bolge_sorumlusu'] if c in df.columns]
+    bilgi = df.groupby(mag_col, sort=False)[bilgi_cols].first().reindex(tablo.index) if bilgi_cols else pd.DataFrame(index=tablo.index)
+
+    def bilgi_kolon(col):
+        return bilgi[col].values if col in bilgi.columns else ''
+
+    ozet_df = pd.DataFrame({
+        'magaza_kodu': tablo.index,
+        'magaza_adi': bilgi_kolon('magaza_tanim'),
+        'satis_muduru': bilgi_kolon('satis_muduru'),
+        'bolge_sorumlusu': bilgi_kolon('bolge_sorumlusu'),
+        'satis': tablo['toplam_satis'].values,
+        'toplam_acik': tablo['toplam_acik'].values,
+        'acik_oran': np.round(tablo['acik_oran'].values * 100, 2),
+        'toplam_puan': tablo['toplam_puan'].values,
+        'seviye': tablo['seviye'].values,
+        'emoji': tablo['emoji'].values,
+        'top3': tablo['top3'].values,
+        'teshis': tablo['teshis'].values
+    })
+    for k, _ in KATEGORI_SIRASI:
+        ozet_df[f'raw_{k}'] = tablo[f'raw_{k}'].values
+    for k, _ in KATEGORI_SIRASI:
+        ozet_df[f'katki_{k}'] = tablo[f'katki_{k}'].values
+    for col in ['ic_supheli_satir', 'ic_cok_buyuk', 'yuksek_sayim_urun', 'tam_sayili_urun',
+                'disiplin_sifir', 'disiplin_eksik', 'disiplin_toplam', 'disiplin_hic_yapmadi']:
+        ozet_df[col] = tablo[col].values
 
-    sonuclar = []
     detaylar = {}
+    for mag, t in zip(tablo.index, tablo.to_dict('records')):
+        detaylar[mag] = _karne_from_tablo(t, detay_map[mag])
 
-    for mag_kodu in magazalar:
-        df_mag = df_bolge[df_bolge[mag_col] == mag_kodu]
-
-        # Mağaza bilgileri
-        mag_adi = df_mag['magaza_tanim'].iloc[0] if 'magaza_tanim' in df_mag.columns else ''
-        sm = df_mag['satis_muduru'].iloc[0] if 'satis_muduru' in df_mag.columns else ''
-        bs = df_mag['bolge_sorumlusu'].iloc[0] if 'bolge_sorumlusu' in df_mag.columns else ''
-
-        # Risk karnesi hesapla
-        karne = hesapla_magaza_risk_karnesi(df_mag, bolge_acik_oran)
-
-        sonuclar.append({
-            'magaza_kodu': mag_kodu,
-            'magaza_adi': mag_adi,
-            'satis_muduru': sm,
-            'bolge_sorumlusu': bs,
-            'satis': karne['toplam_satis'],
-            'toplam_acik': karne['toplam_acik'],
-            'acik_oran': round(karne['acik_oran'] * 100, 2),
-            'toplam_puan': karne['toplam_puan'],
-            'seviye': karne['seviye'],
-            'emoji': karne['emoji'],
-            'top3': karne['top3_str'],
-            'teshis': karne['teshis'],
-            # RAW puanlar
-            'raw_ic_hirsizlik': karne['risk_ic_hirsizlik']['raw_puan'],
-            'raw_acik_orani': karne['risk_acik_orani']['raw_puan'],
-            'raw_sayim_disiplini': karne['risk_sayim_disiplini']['raw_puan'],
-            'raw_kronik_acik': karne['risk_kronik_acik']['raw_puan'],
-            'raw_kronik_fire': karne['risk_kronik_fire']['raw_puan'],
-            'raw_yuksek_sayim': karne['risk_yuksek_sayim']['raw_puan'],
-            'raw_ayni_sayim': karne['risk_ayni_sayim']['raw_puan'],
-            'raw_tam_sayili': karne['risk_tam_sayili']['raw_puan'],
-            # Katkı puanlar
-            'katki_ic_hirsizlik': karne['risk_ic_hirsizlik']['katki_puan'],
-            'katki_acik_orani': karne['risk_acik_orani']['katki_puan'],
-            'katki_sayim_disiplini': karne['risk_sayim_disiplini']['katki_puan'],
-            'katki_kronik_acik': karne['risk_kronik_acik']['katki_puan'],
-            'katki_kronik_fire': karne['risk_kronik_fire']['katki_puan'],
-            'katki_yuksek_sayim': karne['risk_yuksek_sayim']['katki_puan'],
-            'katki_ayni_sayim': karne['risk_ayni_sayim']['katki_puan'],
-            'katki_tam_sayili': karne['risk_tam_sayili']['katki_puan'],
-            # Detay sayılar
-            'ic_supheli_satir': karne['risk_ic_hirsizlik']['supheli_satir'],
-            'ic_cok_buyuk': karne['risk_ic_hirsizlik']['cok_buyuk_risk'],
-            'yuksek_sayim_urun': karne['risk_yuksek_sayim']['urun_sayisi'],
-            'tam_sayili_urun': karne['risk_tam_sayili']['urun_sayisi'],
-            'disiplin_sifir': karne['risk_sayim_disiplini']['sifir_urun'],
-            'disiplin_eksik': karne['risk_sayim_disiplini']['eksik_urun'],
-            'disiplin_toplam': karne['risk_sayim_disiplini']['toplam_urun'],
-            'disiplin_hic_yapmadi': karne['risk_sayim_disiplini']['hic_yapmadi']
-        })
-
-        detaylar[mag_kodu] = karne
-
-    ozet_df = pd.DataFrame(sonuclar)
     ozet_df = ozet_df.sort_values('toplam_puan', ascending=False).reset_index(drop=True)
 
     return ozet_df, detaylar
@@ -826,34 +1501,82 @@ def hesapla_tum_magazalar_risk(df_bolge):
 
 # ==================== EXCEL ÜRETME FONKSİYONLARI ====================
 
-def _style_header(ws, row, col_count):
-    """Header satırını stillendir"""
-    for col in range(1, col_count + 1):
-        cell = ws.cell(row=row, column=col)
-        cell.fill = HEADER_FILL
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        cell.border = THIN_BORDER
-
-
-def _auto_column_width(ws):
-    """Kolon genişliklerini otomatik ayarla"""
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        adjusted_width = min(50, max(10, max_length + 2))
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-
-def uret_bolge_risk_karnesi_excel(df_bolge, bolge_adi, donem):
+# Akışlı yazıcı için NamedStyle'lar (kitaba bir kez kaydedilir)
+RK_STILLER = {
+    'rk_baslik': {
+        'fill': HEADER_FILL, 'font': HEADER_FONT, 'border': THIN_BORDER,
+        'alignment': Alignment(horizontal='center', vertical='center', wrap_text=True)
+    },
+    'rk_cerceve': {'border': THIN_BORDER},
+    'rk_kritik': {'fill': KRITIK_FILL, 'border': THIN_BORDER},
+    'rk_riskli': {'fill': RISKLI_FILL, 'border': THIN_BORDER},
+    'rk_dikkat': {'fill': DIKKAT_FILL, 'border': THIN_BORDER},
+    'rk_temiz': {'fill': TEMIZ_FILL, 'border': THIN_BORDER},
+    'rk_kritik_dolgu': {'fill': KRITIK_FILL},
+    'rk_riskli_dolgu': {'fill': RISKLI_FILL},
+    'rk_dikkat_dolgu': {'fill': DIKKAT_FILL},
+    'rk_temiz_dolgu': {'fill': TEMIZ_FILL},
+    'rk_kalin': {'font': Font(bold=True)},
+    'rk_kalin12': {'font': Font(bold=True, size=12)},
+    'rk_kalin14': {'font': Font(bold=True, size=14)},
+    'rk_kalin16': {'font': Font(bold=True, size=16)},
+    'rk_italik10': {'font': Font(italic=True, size=10)},
+}
+
+# Seviye kolonu: metinde geçen seviyeye göre dolgu (eşleşmezse TEMİZ)
+_seviye_stili = icerir_stili(
+    [('KRİTİK', 'rk_kritik'), ('RİSKLİ', 'rk_riskli'), ('DİKKAT', 'rk_dikkat')],
+    varsayilan='rk_temiz'
+)
+
+# Kolon genişliği: min(50, max(10, uzunluk + 2))
+_GENISLIK = {'min_genislik': 10, 'max_genislik': 50, 'pay': 2}
+
+
+def _detay_sayfasi(kitap, sekme, baslik, df, kosullu_stiller=None):
+    """Başlık + (satır 3'te) stilli tablo içeren detay sekmesi"""
+    ws = kitap.sayfa(sekme, **_GENISLIK)
+    ws.satir([baslik], stil='rk_kalin14')
+    ws.bos_satir()
+    ws.tablo(df, baslik_stili='rk_baslik', govde_stili='rk_cerceve', kosullu_stiller=kosullu_stiller)
+    return ws
+
+
+def _ic_hirsizlik_detay(ozet_df, detaylar, satir_limiti=50):
+    """İç hırsızlık detayı: mağaza başına ilk satir_limiti satır, tek concat"""
+    parcalar = []
+    for mag_kodu, karne in detaylar.items():
+        detay_df = karne['risk_ic_hirsizlik']['detay_df']
+        if not detay_df.empty:
+            parcalar.append((mag_kodu, detay_df.head(satir_limiti)))
+    if not parcalar:
+        return pd.DataFrame()
+
+    mag_kodlari = np.repeat([m for m, _ in parcalar], [len(d) for _, d in parcalar])
+    bilgi = ozet_df.drop_duplicates('magaza_kodu').set_index('magaza_kodu')
+
+    def kolon(col, varsayilan):
+        return np.concatenate([
+            d[col].to_numpy(dtype=object) if col in d.columns else np.full(len(d), varsayilan, dtype=object)
+            for _, d in parcalar
+        ])
+
+    return pd.DataFrame({
+        'Mağaza Kodu': mag_kodlari,
+        'Mağaza Adı': bilgi['magaza_adi'].reindex(mag_kodlari).fillna('').to_numpy(),
+        'SM': bilgi['satis_muduru'].reindex(mag_kodlari).fillna('').to_numpy(),
+        'Malzeme Kodu': kolon('malzeme_kodu', ''),
+        'Malzeme Tanımı': kolon('malzeme_tanimi', ''),
+        'İptal Tutarı': kolon('iptal_satir_tutari', 0),
+        'Fark Miktarı': kolon('fark_miktari', 0),
+        'Risk Seviyesi': kolon('risk_seviyesi', '')
+    })
+
+
+def uret_bolge_risk_karnesi_excel(df_bolge, bolge_adi, donem, seri_frame=None):
     """
     Bölge bazlı Risk Karnesi Excel dosyası üretir.
+    seri_frame: df_bolge için önceden kurulmuş SeriFrame (opsiyonel)
 
     Sekmeler:
     - 00_ÖZET: Tüm mağazalar özet
@@ -867,24 +1590,14 @@ def uret_bolge_risk_karnesi_excel(df_bolge, bolge_adi, donem):
     - 08_TAM_SAYILI: Detay
     """
     # Hesapla
-    ozet_df, detaylar = hesapla_tum_magazalar_risk(df_bolge)
+    ozet_df, detaylar = hesapla_tum_magazalar_risk(df_bolge, seri_frame=seri_frame)
 
     if ozet_df.empty:
         return None
 
-    wb = Workbook()
+    kitap = ExcelKitabi(RK_STILLER)
 
     # ==================== 00_ÖZET ====================
-    ws = wb.active
-    ws.title = "00_ÖZET"
-
-    # Başlık
-    ws['A1'] = f"RİSK KARNESİ - {bolge_adi}"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A2'] = f"Dönem: {donem} | Oluşturma: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    ws['A2'].font = Font(italic=True, size=10)
-
-    # Özet tablosu
     ozet_kolonlar = [
         'magaza_kodu', 'magaza_adi', 'satis_muduru', 'bolge_sorumlusu',
         'satis', 'toplam_acik', 'acik_oran', 'toplam_puan', 'seviye',
@@ -897,163 +1610,75 @@ def uret_bolge_risk_karnesi_excel(df_bolge, bolge_adi, donem):
         'katki_ayni_sayim', 'katki_tam_sayili'
     ]
 
-    header_row = 4
-    for col, kolon in enumerate(ozet_kolonlar, 1):
-        ws.cell(row=header_row, column=col, value=kolon.upper().replace('_', ' '))
-    _style_header(ws, header_row, len(ozet_kolonlar))
-
-    for row_idx, row_data in ozet_df[ozet_kolonlar].iterrows():
-        for col, value in enumerate(row_data, 1):
-            cell = ws.cell(row=header_row + 1 + row_idx, column=col, value=value)
-            cell.border = THIN_BORDER
-            # Seviye kolonunu renklendir
-            if ozet_kolonlar[col-1] == 'seviye':
-                seviye_str = str(value)
-                if 'KRİTİK' in seviye_str:
-                    cell.fill = KRITIK_FILL
-                elif 'RİSKLİ' in seviye_str:
-                    cell.fill = RISKLI_FILL
-                elif 'DİKKAT' in seviye_str:
-                    cell.fill = DIKKAT_FILL
-                else:
-                    cell.fill = TEMIZ_FILL
-
-    _auto_column_width(ws)
+    ws = kitap.sayfa("00_ÖZET", **_GENISLIK)
+    ws.satir([f"RİSK KARNESİ - {bolge_adi}"], stil='rk_kalin14')
+    ws.satir([f"Dönem: {donem} | Oluşturma: {datetime.now().strftime('%Y-%m-%d %H:%M')}"], stil='rk_italik10')
+    ws.bos_satir()
+    ozet_tablo = ozet_df[ozet_kolonlar]
+    ozet_tablo.columns = [k.upper().replace('_', ' ') for k in ozet_kolonlar]
+    ws.tablo(ozet_tablo, baslik_stili='rk_baslik', govde_stili='rk_cerceve',
+             kosullu_stiller={'SEVIYE': _seviye_stili})
 
     # ==================== 01_İÇ_HIRSIZLIK ====================
-    ws_ic = wb.create_sheet("01_İÇ_HIRSIZLIK")
-    ws_ic['A1'] = "İÇ HIRSIZLIK RİSKİ - DETAY"
-    ws_ic['A1'].font = Font(bold=True, size=14)
-
-    ic_rows = []
-    for mag_kodu, karne in detaylar.items():
-        detay_df = karne['risk_ic_hirsizlik']['detay_df']
-        if not detay_df.empty:
-            for _, row in detay_df.head(50).iterrows():  # İlk 50 satır
-                ic_rows.append({
-                    'Mağaza Kodu': mag_kodu,
-                    'Mağaza Adı': ozet_df[ozet_df['magaza_kodu']==mag_kodu]['magaza_adi'].iloc[0] if len(ozet_df[ozet_df['magaza_kodu']==mag_kodu]) > 0 else '',
-                    'SM': ozet_df[ozet_df['magaza_kodu']==mag_kodu]['satis_muduru'].iloc[0] if len(ozet_df[ozet_df['magaza_kodu']==mag_kodu]) > 0 else '',
-                    'Malzeme Kodu': row.get('malzeme_kodu', ''),
-                    'Malzeme Tanımı': row.get('malzeme_tanimi', ''),
-                    'İptal Tutarı': row.get('iptal_satir_tutari', 0),
-                    'Fark Miktarı': row.get('fark_miktari', 0),
-                    'Risk Seviyesi': row.get('risk_seviyesi', '')
-                })
-
-    if ic_rows:
-        ic_df = pd.DataFrame(ic_rows)
-        for col, header in enumerate(ic_df.columns, 1):
-            ws_ic.cell(row=3, column=col, value=header)
-        _style_header(ws_ic, 3, len(ic_df.columns))
-
-        for row_idx, row_data in ic_df.iterrows():
-            for col, value in enumerate(row_data, 1):
-                ws_ic.cell(row=4 + row_idx, column=col, value=value).border = THIN_BORDER
-        _auto_column_width(ws_ic)
+    ic_df = _ic_hirsizlik_detay(ozet_df, detaylar)
+    if not ic_df.empty:
+        _detay_sayfasi(kitap, "01_İÇ_HIRSIZLIK", "İÇ HIRSIZLIK RİSKİ - DETAY", ic_df)
     else:
-        ws_ic['A3'] = "Şüpheli satır bulunamadı."
+        ws_ic = kitap.sayfa("01_İÇ_HIRSIZLIK", genislik=None)
+        ws_ic.satir(["İÇ HIRSIZLIK RİSKİ - DETAY"], stil='rk_kalin14')
+        ws_ic.bos_satir()
+        ws_ic.satir(["Şüpheli satır bulunamadı."])
 
     # ==================== DİĞER SEKMELER (Benzer yapıda) ====================
 
     # 02_AÇIK_ORANI
-    ws_acik = wb.create_sheet("02_AÇIK_ORANI")
-    ws_acik['A1'] = "AÇIK ORANI RİSKİ - DETAY"
-    ws_acik['A1'].font = Font(bold=True, size=14)
-
-    acik_rows = []
-    for _, row in ozet_df.iterrows():
-        acik_rows.append({
-            'Mağaza Kodu': row['magaza_kodu'],
-            'Mağaza Adı': row['magaza_adi'],
-            'SM': row['satis_muduru'],
-            'BS': row['bolge_sorumlusu'],
-            'Satış': row['satis'],
-            'Toplam Açık': row['toplam_acik'],
-            'Açık Oranı %': row['acik_oran'],
-            'RAW Puan': row['raw_acik_orani'],
-            'Katkı Puan': row['katki_acik_orani']
-        })
-
-    acik_df = pd.DataFrame(acik_rows)
-    for col, header in enumerate(acik_df.columns, 1):
-        ws_acik.cell(row=3, column=col, value=header)
-    _style_header(ws_acik, 3, len(acik_df.columns))
-
-    for row_idx, row_data in acik_df.iterrows():
-        for col, value in enumerate(row_data, 1):
-            ws_acik.cell(row=4 + row_idx, column=col, value=value).border = THIN_BORDER
-    _auto_column_width(ws_acik)
+    acik_df = pd.DataFrame({
+        'Mağaza Kodu': ozet_df['magaza_kodu'],
+        'Mağaza Adı': ozet_df['magaza_adi'],
+        'SM': ozet_df['satis_muduru'],
+        'BS': ozet_df['bolge_sorumlusu'],
+        'Satış': ozet_df['satis'],
+        'Toplam Açık': ozet_df['toplam_acik'],
+        'Açık Oranı %': ozet_df['acik_oran'],
+        'RAW Puan': ozet_df['raw_acik_orani'],
+        'Katkı Puan': ozet_df['katki_acik_orani']
+    })
+    _detay_sayfasi(kitap, "02_AÇIK_ORANI", "AÇIK ORANI RİSKİ - DETAY", acik_df)
 
     # 03_SAYIM_DİSİPLİNİ
-    ws_dis = wb.create_sheet("03_SAYIM_DİSİPLİNİ")
-    ws_dis['A1'] = "SAYIM DİSİPLİNİ RİSKİ - DETAY"
-    ws_dis['A1'].font = Font(bold=True, size=14)
-
-    dis_rows = []
-    for _, row in ozet_df.iterrows():
-        dis_rows.append({
-            'Mağaza Kodu': row['magaza_kodu'],
-            'Mağaza Adı': row['magaza_adi'],
-            'SM': row['satis_muduru'],
-            'Toplam Ürün': row['disiplin_toplam'],
-            'Sıfır Ürün': row['disiplin_sifir'],
-            'Eksik Ürün': row['disiplin_eksik'],
-            'Hiç Yapmadı': 'EVET' if row['disiplin_hic_yapmadi'] else 'HAYIR',
-            'RAW Puan': row['raw_sayim_disiplini'],
-            'Katkı Puan': row['katki_sayim_disiplini']
-        })
-
-    dis_df = pd.DataFrame(dis_rows)
-    for col, header in enumerate(dis_df.columns, 1):
-        ws_dis.cell(row=3, column=col, value=header)
-    _style_header(ws_dis, 3, len(dis_df.columns))
-
-    for row_idx, row_data in dis_df.iterrows():
-        for col, value in enumerate(row_data, 1):
-            cell = ws_dis.cell(row=4 + row_idx, column=col, value=value)
-            cell.border = THIN_BORDER
-            if dis_df.columns[col-1] == 'Hiç Yapmadı' and value == 'EVET':
-                cell.fill = KRITIK_FILL
-    _auto_column_width(ws_dis)
+    dis_df = pd.DataFrame({
+        'Mağaza Kodu': ozet_df['magaza_kodu'],
+        'Mağaza Adı': ozet_df['magaza_adi'],
+        'SM': ozet_df['satis_muduru'],
+        'Toplam Ürün': ozet_df['disiplin_toplam'],
+        'Sıfır Ürün': ozet_df['disiplin_sifir'],
+        'Eksik Ürün': ozet_df['disiplin_eksik'],
+        'Hiç Yapmadı': np.where(ozet_df['disiplin_hic_yapmadi'].astype(bool), 'EVET', 'HAYIR'),
+        'RAW Puan': ozet_df['raw_sayim_disiplini'],
+        'Katkı Puan': ozet_df['katki_sayim_disiplini']
+    })
+    _detay_sayfasi(kitap, "03_SAYIM_DİSİPLİNİ", "SAYIM DİSİPLİNİ RİSKİ - DETAY", dis_df,
+                   kosullu_stiller={'Hiç Yapmadı': lambda s: np.where(s == 'EVET', 'rk_kritik', 'rk_cerceve')})
 
     # 04-08 Diğer sekmeler (basitleştirilmiş)
-    for i, (sekme, risk_key, baslik) in enumerate([
+    for sekme, risk_key, baslik in [
         ("04_KRONİK_AÇIK", "kronik_acik", "KRONİK AÇIK"),
         ("05_KRONİK_FİRE", "kronik_fire", "KRONİK FİRE"),
         ("06_YÜKSEK_SAYIM", "yuksek_sayim", "YÜKSEK SAYIM"),
         ("07_AYNI_SAYIM", "ayni_sayim", "AYNI SAYIM"),
         ("08_TAM_SAYILI", "tam_sayili", "TAM SAYILI")
-    ], 4):
-        ws_x = wb.create_sheet(sekme)
-        ws_x['A1'] = f"{baslik} RİSKİ - DETAY"
-        ws_x['A1'].font = Font(bold=True, size=14)
-
-        rows = []
-        for _, row in ozet_df.iterrows():
-            rows.append({
-                'Mağaza Kodu': row['magaza_kodu'],
-                'Mağaza Adı': row['magaza_adi'],
-                'SM': row['satis_muduru'],
-                'RAW Puan': row[f'raw_{risk_key}'],
-                'Katkı Puan': row[f'katki_{risk_key}']
-            })
-
-        temp_df = pd.DataFrame(rows)
-        for col, header in enumerate(temp_df.columns, 1):
-            ws_x.cell(row=3, column=col, value=header)
-        _style_header(ws_x, 3, len(temp_df.columns))
-
-        for row_idx, row_data in temp_df.iterrows():
-            for col, value in enumerate(row_data, 1):
-                ws_x.cell(row=4 + row_idx, column=col, value=value).border = THIN_BORDER
-        _auto_column_width(ws_x)
+    ]:
+        temp_df = pd.DataFrame({
+            'Mağaza Kodu': ozet_df['magaza_kodu'],
+            'Mağaza Adı': ozet_df['magaza_adi'],
+            'SM': ozet_df['satis_muduru'],
+            'RAW Puan': ozet_df[f'raw_{risk_key}'],
+            'Katkı Puan': ozet_df[f'katki_{risk_key}']
+        })
+        _detay_sayfasi(kitap, sekme, f"{baslik} RİSKİ - DETAY", temp_df)
 
     # Kaydet
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
+    return kitap.kaydet()
 
 
 def uret_magaza_risk_raporu_excel(df_magaza, magaza_bilgi, bolge_acik_oran):
@@ -1062,59 +1687,36 @@ def uret_magaza_risk_raporu_excel(df_magaza, magaza_bilgi, bolge_acik_oran):
     """
     karne = hesapla_magaza_risk_karnesi(df_magaza, bolge_acik_oran)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "00_ÖZET"
+    kitap = ExcelKitabi(RK_STILLER)
+    ws = kitap.sayfa("00_ÖZET", **_GENISLIK)
 
     # Başlık
-    ws['A1'] = f"MAĞAZA RİSK KARNESİ"
-    ws['A1'].font = Font(bold=True, size=16)
-    ws['A2'] = f"{magaza_bilgi.get('kodu', '')} - {magaza_bilgi.get('adi', '')}"
-    ws['A2'].font = Font(bold=True, size=14)
-
-    # Bilgiler
-    ws['A4'] = "Bölge:"
-    ws['B4'] = magaza_bilgi.get('bolge', '')
-    ws['A5'] = "SM:"
-    ws['B5'] = magaza_bilgi.get('sm', '')
-    ws['A6'] = "BS:"
-    ws['B6'] = magaza_bilgi.get('bs', '')
-    ws['A7'] = "Dönem:"
-    ws['B7'] = magaza_bilgi.get('donem', '')
-
-    # KPI
-    ws['D4'] = "Satış:"
-    ws['E4'] = f"₺{karne['toplam_satis']:,.0f}"
-    ws['D5'] = "Toplam Açık:"
-    ws['E5'] = f"₺{karne['toplam_acik']:,.0f}"
-    ws['D6'] = "Açık Oranı:"
-    ws['E6'] = f"%{karne['acik_oran']*100:.2f}"
+    ws.satir(["MAĞAZA RİSK KARNESİ"], stil='rk_kalin16')
+    ws.satir([f"{magaza_bilgi.get('kodu', '')} - {magaza_bilgi.get('adi', '')}"], stil='rk_kalin14')
+    ws.bos_satir()
+
+    # Bilgiler + KPI
+    ws.satir(["Bölge:", magaza_bilgi.get('bolge', ''), None, "Satış:", f"₺{karne['toplam_satis']:,.0f}"])
+    ws.satir(["SM:", magaza_bilgi.get('sm', ''), None, "Toplam Açık:", f"₺{karne['toplam_acik']:,.0f}"])
+    ws.satir(["BS:", magaza_bilgi.get('bs', ''), None, "Açık Oranı:", f"%{karne['acik_oran']*100:.2f}"])
+    ws.satir(["Dönem:", magaza_bilgi.get('donem', '')])
+    ws.bos_satir()
 
     # Risk Puanı
-    ws['A9'] = "TOPLAM RİSK PUANI:"
-    ws['A9'].font = Font(bold=True, size=12)
-    ws['B9'] = karne['toplam_puan']
-    ws['B9'].font = Font(bold=True, size=14)
-    ws['C9'] = karne['seviye']
-    seviye, fill, _ = get_seviye(karne['toplam_puan'])
-    ws['C9'].fill = fill
-
-    # Top 3
-    ws['A11'] = "En Yüksek 3 Risk:"
-    ws['B11'] = karne['top3_str']
-
-    # Teşhis
-    ws['A12'] = "Teşhis:"
-    ws['B12'] = karne['teshis']
+    seviye, _, _ = get_seviye(karne['toplam_puan'])
+    seviye_stili = {'KRİTİK': 'rk_kritik_dolgu', 'RİSKLİ': 'rk_riskli_dolgu',
+                    'DİKKAT': 'rk_dikkat_dolgu'}.get(seviye, 'rk_temiz_dolgu')
+    ws.satir(["TOPLAM RİSK PUANI:", karne['toplam_puan'], karne['seviye']],
+             stil=['rk_kalin12', 'rk_kalin14', seviye_stili])
+    ws.bos_satir()
+
+    # Top 3 + Teşhis
+    ws.satir(["En Yüksek 3 Risk:", karne['top3_str']])
+    ws.satir(["Teşhis:", karne['teshis']])
+    ws.bos_satir()
 
     # Risk Kırılımı Tablosu
-    ws['A14'] = "RİSK KIRILIMI"
-    ws['A14'].font = Font(bold=True, size=12)
-
-    headers = ['Risk Tipi', 'RAW Puan (0-100)', 'Max Katkı', 'Katkı Puan']
-    for col, h in enumerate(headers, 1):
-        ws.cell(row=15, column=col, value=h)
-    _style_header(ws, 15, len(headers))
+    ws.satir(["RİSK KIRILIMI"], stil='rk_kalin12')
 
     risk_items = [
         ('İç Hırsızlık', karne['risk_ic_hirsizlik']['raw_puan'], MAX_KATKI['ic_hirsizlik'], karne['risk_ic_hirsizlik']['katki_puan']),
@@ -1126,20 +1728,11 @@ def uret_magaza_risk_raporu_excel(df_magaza, magaza_bilgi, bolge_acik_oran):
         ('Aynı Sayım', karne['risk_ayni_sayim']['raw_puan'], MAX_KATKI['ayni_sayim'], karne['risk_ayni_sayim']['katki_puan']),
         ('Tam Sayılı', karne['risk_tam_sayili']['raw_puan'], MAX_KATKI['tam_sayili'], karne['risk_tam_sayili']['katki_puan']),
     ]
-
-    for row_idx, item in enumerate(risk_items, 16):
-        for col, val in enumerate(item, 1):
-            ws.cell(row=row_idx, column=col, value=val).border = THIN_BORDER
+    kirilim_df = pd.DataFrame(risk_items, columns=['Risk Tipi', 'RAW Puan (0-100)', 'Max Katkı', 'Katkı Puan'])
+    ws.tablo(kirilim_df, baslik_stili='rk_baslik', govde_stili='rk_cerceve')
 
     # Toplam
-    ws.cell(row=24, column=1, value="TOPLAM").font = Font(bold=True)
-    ws.cell(row=24, column=3, value=TOPLAM_MAX_KATKI)
-    ws.cell(row=24, column=4, value=karne['toplam_katki'])
-
-    _auto_column_width(ws)
+    ws.satir(["TOPLAM", None, TOPLAM_MAX_KATKI, karne['toplam_katki']], stil=['rk_kalin', None, None, None])
 
     # Kaydet
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
+    return kitap.kaydet()
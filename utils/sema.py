@@ -0,0 +1,149 @@
+"""
+Şema Kaydı
+Envanter alanlarının TEK tanımı: her kaynak başlığı (Excel, CSV, Supabase) -> kanonik ad.
+
+Mantık:
+- Her alanın iki kanonik adı var:
+  * anahtar: Supabase / sürekli envanter kolon adı ('satis_fiyati')
+  * ad: analiz (app) kolon adı ('Birim Fiyat')
+- Kaynak başlıkları Türkçe karakter / büyük-küçük harf / boşluk duyarsız eşleşir
+  ('İptal GP TUTARI' == 'İptal GP Tutarı' == 'iptal_gp_tutari')
+- Yeniden adlandırma tek seferde, yerinde yapılır: kolon kopyalanmaz, çift kolon oluşmaz
+"""
+
+from typing import NamedTuple, Tuple
+
+
+class Alan(NamedTuple):
+    anahtar: str
+    ad: str
+    basliklar: Tuple[str, ...] = ()
+
+
+# (anahtar, app adı, ek kaynak başlıkları) - anahtar ve ad da kaynak başlığı sayılır
+ALANLAR = [
+    Alan('envanter_donemi', 'Envanter Dönemi'),
+    Alan('envanter_tarihi', 'Envanter Tarihi'),
+    Alan('envanter_baslangic_tarihi', 'Envanter Başlangıç Tarihi'),
+    Alan('envanter_sayisi', 'Envanter Sayisi'),
+    Alan('depolama_kosulu_grubu', 'Depolama Koşulu Grubu'),
+    Alan('depolama_kosulu', 'Depolama Koşulu'),
+    Alan('bolge_kodu', 'Bölge Kodu'),
+    Alan('bolge', 'Bölge'),
+    Alan('magaza_kodu', 'Mağaza Kodu'),
+    Alan('magaza_tanim', 'Mağaza Adı', ('Mağaza Tanım',)),
+    Alan('satis_muduru', 'Satış Müdürü'),
+    Alan('bolge_sorumlusu', 'Bölge Sorumlusu'),
+    Alan('urun_grubu_kodu', 'Ürün Grubu Kodu'),
+    Alan('urun_grubu_tanimi', 'Ana Grup', ('Ürün Grubu Tanımı',)),
+    Alan('mal_grubu_kodu', 'Mal Grubu Kodu'),
+    Alan('mal_grubu_tanimi', 'Ürün Grubu', ('Mal Grubu Tanımı',)),
+    Alan('malzeme_kodu', 'Malzeme Kodu'),
+    Alan('malzeme_tanimi', 'Malzeme Adı', ('Malzeme Tanımı',)),
+    Alan('satis_fiyati', 'Birim Fiyat', ('Satış Fiyatı',)),
+    Alan('sayim_miktari', 'Sayım Miktarı'),
+    Alan('sayim_tutari', 'Sayım Tutarı'),
+    Alan('kaydi_miktar', 'Kaydi Miktar'),
+    Alan('kaydi_tutar', 'Kaydi Tutar'),
+    Alan('fark_miktari', 'Fark Miktarı'),
+    Alan('fark_tutari', 'Fark Tutarı'),
+    Alan('kismi_envanter_miktari', 'Kısmi Envanter Miktarı'),
+    Alan('kismi_envanter_tutari', 'Kısmi Envanter Tutarı'),
+    Alan('fire_miktari', 'Fire Miktarı'),
+    Alan('fire_tutari', 'Fire Tutarı'),
+    Alan('fark_fire_kismi_miktari', 'Fark+Fire+Kısmi Envanter Miktarı'),
+    Alan('fark_fire_kismi_tutari', 'NET_ENVANTER_ETKİ_TUTARI', ('Fark+Fire+Kısmi Envanter Tutarı',)),
+    Alan('onceki_fark_miktari', 'Önceki Fark Miktarı'),
+    Alan('onceki_fark_tutari', 'Önceki Fark Tutarı'),
+    Alan('onceki_fire_miktari', 'Önceki Fire Miktarı'),
+    Alan('onceki_fire_tutari', 'Önceki Fire Tutarı'),
+    Alan('satis_miktari', 'Satış Miktarı'),
+    Alan('satis_hasilati', 'Satış Tutarı', ('Satış Hasılatı',)),
+    Alan('iade_miktari', 'İade Miktarı'),
+    Alan('iade_tutari', 'İade Tutarı'),
+    Alan('iptal_fisteki_miktar', 'İptal Fişteki Miktar'),
+    Alan('iptal_fis_tutari', 'İptal Fiş Tutarı'),
+    Alan('iptal_gp_miktari', 'İptal GP Miktarı'),
+    Alan('iptal_gp_tutari', 'İptal GP Tutarı'),
+    Alan('iptal_satir_miktari', 'İptal Satır Miktarı'),
+    Alan('iptal_satir_tutari', 'İptal Satır Tutarı'),
+]
+
+_TR_HARF = str.maketrans({
+    'ı': 'i', 'İ': 'i', 'ş': 's', 'Ş': 's', 'ğ': 'g', 'Ğ': 'g',
+    'ü': 'u', 'Ü': 'u', 'ö': 'o', 'Ö': 'o', 'ç': 'c', 'Ç': 'c',
+})
+
+
+def baslik_anahtari(baslik) -> str:
+    """
+    Başlığın eşleştirme anahtarı:
+    Türkçe karakter dönüşümü, küçük harf, baş/son boşluk yok, boşluk -> _
+    """
+    return str(baslik).translate(_TR_HARF).lower().strip().replace(' ', '_')
+
+
+# Eşleştirme anahtarı -> Alan (anahtar, ad ve tüm kaynak başlıkları)
+_BASLIK_INDEKSI = {}
+for _alan in ALANLAR:
+    for _baslik in (_alan.anahtar, _alan.ad) + _alan.basliklar:
+        _BASLIK_INDEKSI.setdefault(baslik_anahtari(_baslik), _alan)
+del _alan, _baslik
+
+
+def alan_bul(baslik):
+    """Başlığın şema alanı (tanımsızsa None)"""
+    return _BASLIK_INDEKSI.get(baslik_anahtari(baslik))
+
+
+def kolon_eslesmesi(kolonlar, hedef='ad', bilinmeyen_normalize=False):
+    """
+    Kolon -> kanonik ad eşlemesi.
+
+    Args:
+        hedef: 'ad' (app kolon adları) veya 'anahtar' (Supabase / sürekli envanter)
+        bilinmeyen_normalize: Şemada olmayan kolonlar baslik_anahtari ile normalize edilsin mi
+                              (False: olduğu gibi kalır)
+
+    Returns:
+        dict: {kolon: yeni ad} - sadece adı değişen / eşleşen kolonlar
+    """
+    eslesme = {}
+    for kolon in kolonlar:
+        alan = alan_bul(kolon)
+        if alan is not None:
+            eslesme[kolon] = getattr(alan, hedef)
+        elif bilinmeyen_normalize:
+            eslesme[kolon] = baslik_anahtari(kolon)
+    return eslesme
+
+
+def kanonik_kolonlar(df, hedef='ad', bilinmeyen_normalize=False):
+    """
+    DataFrame kolonlarını yerinde kanonik adlara çevir (tek rename, veri kopyalanmaz).
+
+    Aynı kanonik ada düşen birden çok kolon varsa: kaynak başlıklı kolon kazanır
+    (ör. 'Satış Fiyatı' varken gelen 'Birim Fiyat' atılır), kalanlar arasında ilk kolon.
+    Bu durumda atılan kolonlar dışındakilerle yeni nesne döner.
+
+    Returns:
+        df (çakışma yoksa aynı nesne)
+    """
+    if df is None:
+        return df
+
+    eslesme = kolon_eslesmesi(df.columns, hedef, bilinmeyen_normalize)
+    yeni = [eslesme.get(kolon, kolon) for kolon in df.columns]
+
+    if len(set(yeni)) < len(yeni):
+        # Çakışma: hedef adıyla zaten gelen kolon, kaynak başlıklı kolona yer açar
+        secilen = {}
+        for i, (kolon, ad) in enumerate(zip(df.columns, yeni)):
+            if ad not in secilen or (df.columns[secilen[ad]] == ad and kolon != ad):
+                secilen[ad] = i
+        tut = sorted(secilen.values())
+        df = df.take(tut, axis=1)
+        yeni = [yeni[i] for i in tut]
+
+    df.columns = yeni
+    return df
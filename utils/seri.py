@@ -0,0 +1,366 @@
+"""
+Seri Kernel Modülü
+Sürekli Envanter Analizi - Mağaza+Ürün Envanter Serileri Üzerinde Vektörel Hesaplar
+
+Mantık:
+- Veri (magaza, malzeme, envanter_sayisi) sırasına TEK kez sıralanır (SeriFrame)
+- Her mağaza+ürün serisinin sınırları offset dizisinde tutulur
+- Delta, kronik (açık + fire) ve aynı sayım hesapları yeniden sort/groupby
+  yapmadan bu diziler üzerinden çalışır (ürün döngüsü YOK)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Varsayılan kronik değer kolonları: ad -> (olası kolon adları)
+KRONIK_DEGER_KOLONLARI = {
+    'acik': ['fark_tutari', 'Fark Tutarı'],
+    'fire': ['fire_tutari', 'Fire Tutarı']
+}
+
+KRONIK_ESIK = -500
+
+SAYIM_KOLONLARI = ['sayim_miktari', 'Sayım Miktarı']
+
+
+def seri_anahtarlari(df, mag_col='magaza_kodu'):
+    """Seri gruplama anahtarları: mağaza kolonu varsa (mağaza, ürün), yoksa sadece ürün"""
+    if mag_col and mag_col in df.columns:
+        return [mag_col, 'malzeme_kodu']
+    return ['malzeme_kodu']
+
+
+def iki_donem_kronik(onceki, simdiki, esik):
+    """
+    Kronik koşulu: iki ardışık dönemin ikisi de eşikten kötü.
+    Skaler veya vektör (Series/ndarray) ile çalışır.
+    """
+    return (onceki < esik) & (simdiki < esik)
+
+
+# ==================== SERİ İNDEKSİ ====================
+
+class SeriFrame:
+    """
+    Ön-sıralı seri indeksi - veri seti başına BİR kez kurulur.
+
+    Satırlar (magaza, malzeme, envanter_sayisi) sırasına dizilir (stabil);
+    her mağaza+ürün serisinin başlangıcı offsets dizisinde tutulur.
+    Kolonlar ilk istendiğinde sıralı diziye çevrilip önbelleğe alınır.
+
+    Kullanım:
+        sf = SeriFrame(gm_df)
+        fark_delta = sf.delta(['fark_tutari'])
+        bayraklar = ardisik_donem_bayraklari(None, seri_frame=sf)
+        seri = ayni_sayim_serisi(None, seri_frame=sf)
+
+    Not: envanter_sayisi boş satırlar (envanter_doldur verilmezse) ve
+    mağaza / malzeme kodu boş satırlar seriye alınmaz.
+    """
+
+    def __init__(self, df, mag_col='magaza_kodu', envanter_doldur=None):
+        self.df = df
+        self._cache = {}
+        self._grup_pozisyon = None
+
+        if df is None or df.empty or 'malzeme_kodu' not in df.columns or 'envanter_sayisi' not in df.columns:
+            self.keys = ['malzeme_kodu']
+            self.pos = np.empty(0, dtype=np.int64)
+            self.index = pd.Index([])
+            self.env = np.empty(0, dtype=float)
+            self.ilk = np.empty(0, dtype=bool)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.grup_no = np.empty(0, dtype=np.int64)
+            self._anahtarlar = pd.DataFrame(columns=self.keys)
+            return
+
+        self.keys = seri_anahtarlari(df, mag_col)
+
+        env = pd.to_numeric(df['envanter_sayisi'], errors='coerce')
+        if envanter_doldur is not None:
+            env = env.fillna(envanter_doldur)
+
+        siralama = pd.DataFrame({k: df[k].values for k in self.keys})
+        siralama['envanter_sayisi'] = env.values
+        # Boş anahtarlı satırlar (mağaza veya malzeme) seriye girmez (groupby dropna ile aynı)
+        gecerli = siralama['envanter_sayisi'].notna()
+        for k in self.keys:
+            gecerli &= siralama[k].notna()
+        siralama = siralama[gecerli.values]
+        siralama = siralama.sort_values(self.keys + ['envanter_sayisi'], kind='mergesort')
+
+        n = len(siralama)
+        self.pos = siralama.index.to_numpy()
+        self.index = df.index[self.pos]
+        self.env = siralama['envanter_sayisi'].to_numpy(dtype=float)
+
+        # Seri sınırları: anahtarlardan biri değişirse yeni seri
+        ilk = np.zeros(n, dtype=bool)
+        if n:
+            ilk[0] = True
+        for k in self.keys:
+            a = siralama[k].to_numpy()
+            ilk[1:] |= np.asarray(a[1:] != a[:-1], dtype=bool)
+        self.ilk = ilk
+        self.offsets = np.append(np.flatnonzero(ilk), n).astype(np.int64)
+        self.grup_no = np.cumsum(ilk) - 1
+        self._anahtarlar = siralama[self.keys].iloc[self.offsets[:-1]].reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.pos)
+
+    @property
+    def bos(self):
+        return len(self.pos) == 0
+
+    @property
+    def mag_col(self):
+        return self.keys[0] if len(self.keys) == 2 else None
+
+    @property
+    def grup_sayisi(self):
+        return len(self.offsets) - 1
+
+    # ---------- kolonlar (sıralı, önbellekli) ----------
+    def kolon(self, col):
+        """Kolonun sıralı değerleri (kolon yoksa None)"""
+        if col not in self.df.columns:
+            return None
+        key = ('kolon', col)
+        if key not in self._cache:
+            self._cache[key] = self.df[col].to_numpy()[self.pos]
+        return self._cache[key]
+
+    def sayisal(self, col_names):
+        """Listede bulunan ilk kolonun sıralı sayısal değerleri (boş = 0, kolon yoksa 0)"""
+        key = ('sayisal', tuple(col_names))
+        if key not in self._cache:
+            for col in col_names:
+                if col in self.df.columns:
+                    values = pd.to_numeric(self.df[col], errors='coerce').fillna(0).to_numpy(dtype=float)
+                    self._cache[key] = values[self.pos]
+                    break
+            else:
+                self._cache[key] = np.zeros(len(self.pos))
+        return self._cache[key]
+
+    def tablo(self, kolonlar):
+        """İstenen (mevcut) kolonlardan sıralı DataFrame (index = orijinal index)"""
+        data = {}
+        for col in kolonlar:
+            if col not in data and col in self.df.columns:
+                data[col] = self.kolon(col)
+        return pd.DataFrame(data, index=self.index)
+
+    # ---------- seri içi işlemler ----------
+    def onceki(self, values):
+        """Aynı serideki bir önceki değer (serinin ilk satırında NaN)"""
+        out = np.empty(len(values), dtype=float)
+        if len(values):
+            out[1:] = values[:-1]
+            out[self.ilk] = np.nan
+        return out
+
+    def delta(self, col_names):
+        """Kümülatif kolondan delta (ilk sayımda kümülatifin kendisi)"""
+        key = ('delta', tuple(col_names))
+        if key not in self._cache:
+            values = self.sayisal(col_names)
+            self._cache[key] = values - np.nan_to_num(self.onceki(values), nan=0.0)
+        return self._cache[key]
+
+    def grup_topla(self, values):
+        """Seri bazlı toplam (grup sırasıyla)"""
+        if self.bos:
+            return np.empty(0)
+        return np.add.reduceat(np.asarray(values), self.offsets[:-1])
+
+    def grup_max(self, values):
+        """Seri bazlı maksimum (grup sırasıyla)"""
+        if self.bos:
+            return np.empty(0)
+        return np.maximum.reduceat(np.asarray(values), self.offsets[:-1])
+
+    def grup_uzunluk(self):
+        """Seri başına kayıt sayısı"""
+        return np.diff(self.offsets)
+
+    def anahtarlar(self):
+        """Seri anahtarları (grup sırasıyla)"""
+        return self._anahtarlar.copy()
+
+    # ---------- tek seri erişimi ----------
+    def grup_araligi(self, *anahtar):
+        """Seri için (başlangıç, bitiş) offset'i; seri yoksa None"""
+        if self._grup_pozisyon is None:
+            self._grup_pozisyon = {
+                row: i for i, row in enumerate(self._anahtarlar.itertuples(index=False, name=None))
+            }
+        i = self._grup_pozisyon.get(tuple(anahtar))
+        if i is None:
+            return None
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def grup(self, *anahtar):
+        """Tek serinin satırları (envanter sırasıyla); yoksa boş DataFrame"""
+        aralik = self.grup_araligi(*anahtar)
+        if aralik is None:
+            return self.df.iloc[0:0]
+        bas, son = aralik
+        return self.df.iloc[self.pos[bas:son]]
+
+
+def _seri_frame(df, seri_frame, mag_col, envanter_doldur=None):
+    """Hazır SeriFrame varsa onu, yoksa df'ten yenisini döner"""
+    if seri_frame is not None:
+        return seri_frame
+    return SeriFrame(df, mag_col=mag_col, envanter_doldur=envanter_doldur)
+
+
+# ==================== KRONİK (ARDIŞIK DÖNEM) KERNEL ====================
+
+def ardisik_donem_bayraklari(df, esik=KRONIK_ESIK, deger_kolonlari=None, mag_col='magaza_kodu',
+                             ek_kolonlar=None, seri_frame=None):
+    """
+    Ardışık envanter dönemi bayrakları (kronik açık + kronik fire tek geçişte).
+
+    Her değer kolonu için:
+        {ad}_delta         = kümülatif - önceki kümülatif (ilk sayımda kümülatif)
+        {ad}_onceki_delta  = aynı ürünün bir önceki sayımındaki delta
+        {ad}_kronik        = önceki sayım ardışık (env == önceki_env + 1) VE
+                             iki delta da eşikten küçük
+
+    Args:
+        df: Envanter verisi (malzeme_kodu, envanter_sayisi gerekli)
+        esik: Delta eşiği (varsayılan -500 TL)
+        deger_kolonlari: {ad: [olası kolon adları]} (varsayılan açık + fire)
+        mag_col: Mağaza kolonu (None/yoksa tek mağaza kabul edilir)
+        ek_kolonlar: Sonuca taşınacak bilgi kolonları (varsa; ör. malzeme_tanimi)
+        seri_frame: Hazır SeriFrame (verilirse df/mag_col kullanılmaz, sort YOK)
+
+    Returns:
+        pd.DataFrame: Sıralı seri tablosu, index = orijinal satır indexi.
+                      Gerekli kolonlar yoksa boş DataFrame.
+    """
+    sf = _seri_frame(df, seri_frame, mag_col)
+    if sf.bos:
+        return pd.DataFrame()
+
+    if deger_kolonlari is None:
+        deger_kolonlari = KRONIK_DEGER_KOLONLARI
+
+    out = sf.tablo(sf.keys + list(ek_kolonlar or []))
+    out['envanter_sayisi'] = sf.env
+    onceki_env = sf.onceki(sf.env)
+    out['onceki_env'] = onceki_env
+    ardisik = sf.env == onceki_env + 1
+
+    for ad, kolonlar in deger_kolonlari.items():
+        delta = sf.delta(kolonlar)
+        onceki_delta = sf.onceki(delta)
+        out[f'{ad}_delta'] = delta
+        out[f'{ad}_onceki_delta'] = onceki_delta
+        out[f'{ad}_kronik'] = ~np.isnan(onceki_delta) & ardisik & iki_donem_kronik(onceki_delta, delta, esik)
+
+    return out
+
+
+def kronik_ilk_eslesmeler(bayraklar, ad, mag_col='magaza_kodu'):
+    """
+    Her mağaza+ürün için ilk (kronolojik) kronik eşleşme.
+
+    Args:
+        bayraklar: ardisik_donem_bayraklari çıktısı
+        ad: Değer adı ('acik' veya 'fire')
+
+    Returns:
+        pd.DataFrame: bayraklar satırları (orijinal index korunur)
+    """
+    if bayraklar is None or bayraklar.empty:
+        return pd.DataFrame()
+    hits = bayraklar[bayraklar[f'{ad}_kronik']]
+    if hits.empty:
+        return hits
+    return hits.groupby(seri_anahtarlari(hits, mag_col), sort=False).head(1)
+
+
+# ==================== AYNI SAYIM (RUN-LENGTH) KERNEL ====================
+
+def ayni_sayim_serisi(df, mag_col='magaza_kodu', sayim_kolonlari=None, ek_kolonlar=None,
+                      envanter_doldur=None, seri_frame=None):
+    """
+    Ardışık aynı sayım serileri (run-length encoding, tek geçiş).
+
+    Sayım değişen her satır (diff != 0) veya yeni seri yeni bir run başlatır,
+    run id = cumsum. Ürün/çift bazlı maske döngüsü YOK.
+
+    Eklenen kolonlar:
+        sayim    : sayım miktarı (sayısal, boş = 0)
+        ayni     : satır bir önceki sayımla aynı VE sayım > 0
+        ardisik  : ayni ise o ana kadarki seri uzunluğu (run uzunluğu), değilse 0
+
+    Args:
+        df: Envanter verisi (malzeme_kodu, envanter_sayisi gerekli)
+        mag_col: Mağaza kolonu (None/yoksa tek mağaza kabul edilir)
+        sayim_kolonlari: Sayım kolonu olası adları
+        ek_kolonlar: Sonuca taşınacak bilgi kolonları (varsa)
+        envanter_doldur: None ise envanter_sayisi boş satırlar atılır,
+                         değer verilirse boşluklar bu değerle doldurulur
+        seri_frame: Hazır SeriFrame (verilirse df/mag_col/envanter_doldur kullanılmaz)
+
+    Returns:
+        pd.DataFrame: Sıralı seri tablosu (index = orijinal satır indexi)
+    """
+    sf = _seri_frame(df, seri_frame, mag_col, envanter_doldur)
+    if sf.bos:
+        return pd.DataFrame()
+
+    sayim = sf.sayisal(sayim_kolonlari or SAYIM_KOLONLARI)
+    n = len(sayim)
+
+    degisti = np.ones(n, dtype=bool)
+    degisti[1:] = sayim[1:] != sayim[:-1]
+    yeni_run = sf.ilk | degisti
+    run_bas = np.flatnonzero(yeni_run)
+    run_id = np.cumsum(yeni_run) - 1
+    run_len = np.arange(n) - run_bas[run_id] + 1
+
+    ayni = ~yeni_run & (sayim > 0)
+
+    out = sf.tablo(sf.keys + list(ek_kolonlar or []))
+    out['envanter_sayisi'] = sf.env
+    out['sayim'] = sayim
+    out['ayni'] = ayni
+    out['ardisik'] = np.where(ayni, run_len, 0)
+    return out
+
+
+def ayni_sayim_ozeti(seri, mag_col='magaza_kodu', seri_frame=None):
+    """
+    Ürün (mağaza+malzeme) bazlı aynı sayım özeti.
+
+    seri_frame verilirse (seri bu frame'den üretilmiş olmalı) offset'ler
+    üzerinden reduceat ile, yoksa groupby ile hesaplanır.
+
+    Returns:
+        pd.DataFrame: anahtarlar + kayit_sayisi, ayni_adet (aynı sayım çifti
+                      sayısı), max_ardisik (en uzun seri, yoksa 0);
+                      seri sırasıyla (anahtar sıralı)
+    """
+    if seri is None or seri.empty:
+        return pd.DataFrame()
+
+    if seri_frame is not None and len(seri_frame) == len(seri):
+        ozet = seri_frame.anahtarlar()
+        ozet['kayit_sayisi'] = seri_frame.grup_uzunluk()
+        ozet['ayni_adet'] = seri_frame.grup_topla(seri['ayni'].to_numpy(dtype=np.int64))
+        ozet['max_ardisik'] = seri_frame.grup_max(seri['ardisik'].to_numpy())
+        return ozet
+
+    keys = seri_anahtarlari(seri, mag_col)
+    return seri.groupby(keys, sort=False).agg(
+        kayit_sayisi=('sayim', 'size'),
+        ayni_adet=('ayni', 'sum'),
+        max_ardisik=('ardisik', 'max')
+    ).reset_index()
@@ -0,0 +1,172 @@
+"""
+Ürün Adı Özellikleri ve Aile Kümeleme
+Malzeme adından türetilen aile anahtarları - vektörel, tekil ad başına BİR kez.
+
+Özellikler:
+- İlk2Kelime: ilk 2 kelime (büyük harf)
+- Marka: son kelime (büyük harf)
+- Gramaj / GramajBirim: '750 ML' -> 750, 'ML' | '1,5 LT' -> 1500, 'ML' | '1 KG' -> 1000, 'G'
+- GramajSinifi: birim içinde boyut sınıfı (S / M / L)
+
+Aile kümeleme:
+- Ürünler (ilk 2 kelime, marka, grup, gramaj birimi) hash kovalarına ayrılır
+- Gramaj benzerliği sadece kova içinde karşılaştırılır (tüm frame üzerinde satır başına maske YOK)
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Patterns: 750ML, 750 ML, 1.5L, 1,5 LT, 220G, 220 G, 1KG
+GRAMAJ_DESENI = re.compile(r'(\d+[.,]?\d*)\s*(ML|LT|L|G|GR|KG|MG)\b')
+
+# Birim -> (temel birim, çarpan)
+BIRIM_DONUSUMU = {
+    'ML': ('ML', 1), 'LT': ('ML', 1000), 'L': ('ML', 1000),
+    'G': ('G', 1), 'GR': ('G', 1), 'KG': ('G', 1000),
+    'MG': ('MG', 1),
+}
+
+# Boyut sınıfı sınırları: birim -> (S üst sınırı, M üst sınırı); diğer birimler 'M'
+BOYUT_SINIRLARI = {
+    'ML': (400, 1000),  # Küçük: 0-400ml, Orta: 400-1000ml, Büyük: 1000ml+
+    'G': (100, 400),    # Küçük: 0-100g, Orta: 100-400g, Büyük: 400g+
+}
+
+# Aile içinde izin verilen en büyük gramaj oranı (3 kattan fazla fark benzer değil)
+GRAMAJ_MAX_ORAN = 3
+
+OZELLIK_KOLONLARI = ['İlk2Kelime', 'Marka', 'Gramaj', 'GramajBirim', 'GramajSinifi']
+
+
+def _tekil_ad_ozellikleri(adlar):
+    """Tekil (NaN olmayan) adlar için özellik tablosu"""
+    metin = adlar.map(str)
+    kelimeler = metin.str.split()
+    kelime_sayisi = kelimeler.str.len().to_numpy()
+
+    ilk2 = np.where(kelime_sayisi >= 2,
+                    kelimeler.str[:2].str.join(' ').str.upper(),
+                    metin.str.upper())
+    marka = np.where(kelime_sayisi >= 1, kelimeler.str[-1].str.upper(), '')
+
+    # Gramaj: ilk eşleşme, birim temel birime (ML, G) çevrilir
+    eslesme = metin.str.upper().str.extract(GRAMAJ_DESENI)
+    sayi = eslesme[0].map(lambda x: float(x.replace(',', '.')), na_action='ignore')
+    donusum = eslesme[1].map(BIRIM_DONUSUMU)
+    bulundu = donusum.notna().to_numpy()
+
+    gramaj = np.full(len(adlar), np.nan)
+    birim = np.full(len(adlar), None, dtype=object)
+    if bulundu.any():
+        temel, carpan = zip(*donusum[bulundu])
+        gramaj[bulundu] = sayi[bulundu].to_numpy(dtype=float) * np.array(carpan, dtype=float)
+        birim[bulundu] = temel
+
+    sinif = np.full(len(adlar), None, dtype=object)
+    sinif[bulundu] = 'M'
+    for b, (s_ust, m_ust) in BOYUT_SINIRLARI.items():
+        secili = birim == b
+        sinif[secili] = np.select([gramaj[secili] <= s_ust, gramaj[secili] <= m_ust], ['S', 'M'], default='L')
+
+    return pd.DataFrame({
+        'İlk2Kelime': ilk2,
+        'Marka': marka,
+        'Gramaj': gramaj,
+        'GramajBirim': birim,
+        'GramajSinifi': sinif,
+    })
+
+
+def ad_ozellikleri(adlar):
+    """
+    Malzeme adı Series'i -> özellik DataFrame'i (aynı index).
+    Ayrıştırma tekil ad başına bir kez yapılır, satırlara kodlarla yayılır.
+    Boş ad: İlk2Kelime/Marka '', Gramaj NaN, GramajBirim/GramajSinifi None.
+    """
+    kodlar, tekiller = pd.factorize(adlar)
+    tablo = _tekil_ad_ozellikleri(pd.Series(tekiller, dtype=object))
+    # Kod -1 (boş ad) son satırdaki boş özelliklere düşer
+    bos = pd.DataFrame({'İlk2Kelime': [''], 'Marka': [''], 'Gramaj': [np.nan],
+                        'GramajBirim': [None], 'GramajSinifi': [None]})
+    tablo = pd.concat([tablo, bos], ignore_index=True)
+    sonuc = tablo.iloc[kodlar].reset_index(drop=True)
+    sonuc.index = adlar.index
+    return sonuc
+
+
+def _kova_aileleri(gramaj, sinif, birimsiz):
+    """
+    Tek kova içinde tohum sırasıyla aileler: [(tohum, üye maskesi), ...]
+    Tohuma gramaj benzer olan her ürün aileye girer (başka ailede olsa da);
+    aileye giren ürün tekrar tohum olmaz.
+    """
+    n = len(gramaj)
+    islenmis = np.zeros(n, dtype=bool)
+    aileler = []
+    for i in range(n):
+        if islenmis[i]:
+            continue
+        if birimsiz or gramaj[i] == 0:
+            benzer = np.ones(n, dtype=bool)  # Gramaj bulunamadıysa / 0 ise benzer say
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                oran = np.maximum(gramaj, gramaj[i]) / np.minimum(gramaj, gramaj[i])
+            benzer = (gramaj == 0) | (~(oran > GRAMAJ_MAX_ORAN) & (sinif == sinif[i]))
+        islenmis |= benzer
+        if benzer.sum() > 1:
+            aileler.append((i, benzer))
+    return aileler
+
+
+def aile_uyelikleri(ozellik, grup):
+    """
+    Ürün aileleri.
+    Kural: İlk 2 kelime + Marka + Grup aynı, Gramaj benzer (aynı birim ve boyut sınıfı,
+    en fazla GRAMAJ_MAX_ORAN kat) -> AİLE.
+
+    Args:
+        ozellik: ad_ozellikleri() çıktısı
+        grup: Ürün grubu Series'i (aynı index; boş grup aileye girmez)
+
+    Returns:
+        tuple: (aile_no, pozisyon, tohum) dizileri.
+               aile_no/pozisyon: üyelik çiftleri (satır pozisyonu), aile_no tohum sırasına göre;
+               tohum: her ailenin tohum satırının pozisyonu
+    """
+    bos = (np.array([], dtype=np.int64),) * 3
+    if len(ozellik) == 0:
+        return bos
+
+    anahtar = pd.DataFrame({
+        'ilk2': ozellik['İlk2Kelime'].to_numpy(),
+        'marka': ozellik['Marka'].to_numpy(),
+        'grup': np.asarray(grup, dtype=object),
+        'birim': ozellik['GramajBirim'].fillna('').to_numpy(),
+    })
+    gecerli = (anahtar['ilk2'] != '') & (anahtar['marka'] != '')
+    kovalar = anahtar[gecerli.to_numpy()].groupby(['ilk2', 'marka', 'grup', 'birim'], sort=False).indices
+    konum = np.flatnonzero(gecerli.to_numpy())
+
+    gramaj = ozellik['Gramaj'].to_numpy(dtype=float)
+    sinif = ozellik['GramajSinifi'].to_numpy()
+    tohumlar, uyeler = [], []
+    for (_, _, _, birim), poz in kovalar.items():
+        if len(poz) < 2:
+            continue
+        poz = konum[poz]
+        for i, benzer in _kova_aileleri(gramaj[poz], sinif[poz], birim == ''):
+            tohumlar.append(poz[i])
+            uyeler.append(poz[benzer])
+
+    if not tohumlar:
+        return bos
+
+    # Aileler tohum satırının sırasına göre numaralanır
+    sira = np.argsort(tohumlar, kind='stable')
+    aile_no = np.concatenate([np.full(len(uyeler[j]), k) for k, j in enumerate(sira)])
+    pozisyon = np.concatenate([uyeler[j] for j in sira])
+    tohum = np.asarray(tohumlar)[sira]
+    return aile_no, pozisyon, tohum
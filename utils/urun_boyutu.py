@@ -0,0 +1,121 @@
+"""
+Ürün Boyutu (Product Master)
+malzeme_kodu -> ayrıştırılmış ad özellikleri (İlk2Kelime, Marka, Gramaj, GramajBirim, GramajSinifi).
+
+Mantık:
+- Ad ayrıştırma (utils.urun_adi) ürün başına BİR kez yapılır, process genelinde
+  (mağaza / dönem / oturum arası) paylaşılır
+- Tablo artımlı büyür: sadece yeni kodlar veya adı değişmiş kodlar ayrıştırılır
+- Anahtar malzeme kodu + ad: aynı kod farklı adla gelirse satırın KENDİ adının
+  özellikleri döner (ad değişikliği yeni kayıt açar, eskisi tekrar ayrıştırılmaz)
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.urun_adi import OZELLIK_KOLONLARI, ad_ozellikleri
+
+
+ANAHTAR_AYRACI = '\x1f'
+
+
+class UrunBoyutu:
+    """
+    Thread-safe ürün boyut tablosu (index: "malzeme_kodu\x1fad" anahtarı).
+
+    Kullanım:
+        ozellik = URUN_BOYUTU.ozellikler(df['Malzeme Kodu'], df['Malzeme Adı'])
+        ozellik['Marka']  # df ile aynı index
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tablo = pd.DataFrame(columns=OZELLIK_KOLONLARI, index=pd.Index([], dtype=object))
+        self.ayristirilan = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tablo)
+
+    def katalog_yukle(self, katalog):
+        """
+        Kataloğu boyuta yükle (ör. segment_urun.json: {kod: {'tanim': ad, ...}}).
+        Zaten aynı adla kayıtlı kodlar tekrar ayrıştırılmaz.
+        """
+        kodlar = list(katalog.keys())
+        adlar = [bilgi.get('tanim') if isinstance(bilgi, dict) else bilgi for bilgi in katalog.values()]
+        self.ozellikler(pd.Series(kodlar, dtype=object), pd.Series(adlar, dtype=object))
+
+    def ozellikler(self, kodlar, adlar):
+        """
+        Satır bazlı ad özellikleri (kodlar ile aynı index).
+
+        Args:
+            kodlar: Malzeme kodu Series'i
+            adlar: Malzeme adı Series'i (aynı uzunluk)
+        """
+        # Tekil (kod, ad) çiftleri - satırlar çift kodlarıyla geri yayılır
+        kod_k, kod_tekil = pd.factorize(kodlar, use_na_sentinel=False)
+        ad_k, ad_tekil = pd.factorize(adlar)
+        n_ad = len(ad_tekil) + 1
+        cift_k, cift_tekil = pd.factorize(kod_k.astype(np.int64) * n_ad + (ad_k + 1))
+
+        kod_metin = [str(k) for k in np.asarray(kod_tekil, dtype=object)]
+        ad_dizi = np.append(np.asarray(ad_tekil, dtype=object), None)
+        cift_ad = ad_dizi[cift_tekil % n_ad - 1]
+        anahtar = pd.Index([f"{kod_metin[c // n_ad]}{ANAHTAR_AYRACI}{'' if ad is None else ad}"
+                            for c, ad in zip(cift_tekil, cift_ad)], dtype=object)
+
+        with self._lock:
+            sonuc = self._tablo.reindex(anahtar)
+            hazir = anahtar.isin(self._tablo.index)
+
+        sonuc = sonuc.reset_index(drop=True).astype(object)
+        if not hazir.all():
+            eksik = np.flatnonzero(~hazir)
+            yeni = ad_ozellikleri(pd.Series(cift_ad[eksik], dtype=object)).reset_index(drop=True)
+            sonuc.iloc[eksik] = yeni.to_numpy(dtype=object)
+
+            yeni.index = anahtar[eksik]
+            with self._lock:
+                yeni = yeni[~yeni.index.isin(self._tablo.index)]
+                self._tablo = pd.concat([self._tablo, yeni]) if len(self._tablo) else yeni
+                self.ayristirilan += len(yeni)
+
+        sonuc = sonuc.iloc[cift_k]
+        sonuc.index = kodlar.index
+        sonuc['Gramaj'] = sonuc['Gramaj'].astype(float)
+        return sonuc
+
+    def temizle(self):
+        """Boyutu sıfırla."""
+        with self._lock:
+            self._tablo = self._tablo.iloc[0:0]
+            self.ayristirilan = 0
+
+
+# Process genelinde paylaşılan ürün boyutu
+URUN_BOYUTU = UrunBoyutu()
+
+
+def urun_ozellikleri(df, kod_col='Malzeme Kodu', ad_col='Malzeme Adı'):
+    """DataFrame satırları için ad özellikleri; kod kolonu yoksa doğrudan ayrıştırır"""
+    if kod_col in df.columns:
+        return URUN_BOYUTU.ozellikler(df[kod_col], df[ad_col])
+    return ad_ozellikleri(df[ad_col])
+
+
+def malzeme_kod_anahtari(kodlar):
+    """
+    Malzeme kodu -> int64 ürün anahtarı (ndarray, tekil değer başına bir kez).
+    '20000835', 20000835, 20000835.0 ve '20000835.0' aynı anahtara düşer;
+    boş / sayısal olmayan kodlar -1.
+    """
+    kod_k, tekiller = pd.factorize(kodlar)
+    metin = pd.Series(np.asarray(tekiller, dtype=object), dtype=object).map(str).str.strip()
+    sayi = pd.to_numeric(metin.str.replace(r'\.0+$', '', regex=True), errors='coerce')
+    tam = sayi.notna() & (sayi % 1 == 0) & (sayi >= 0)
+    anahtar = np.where(tam, sayi.fillna(-1), -1).astype(np.int64)
+    return np.append(anahtar, -1)[kod_k]